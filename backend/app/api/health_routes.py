@@ -11,6 +11,8 @@ import psutil
 
 from app.core.user_database import get_db
 from app.core.config import settings
+from app.core.data_manager import data_manager
+from app.api.preview_routes import response_cache as preview_response_cache
 from app.core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -116,6 +118,8 @@ async def metrics_endpoint():
                     "percent": disk.percent
                 }
             },
+            "intermediate_cache": data_manager.memory_cache.stats(),
+            "preview_response_cache": preview_response_cache.stats(),
             "config": {
                 "debug_mode": settings.DEBUG,
                 "max_concurrent_tasks": settings.MAX_CONCURRENT_TASKS,
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
+import hashlib
+import json
 import os
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
+from app.core.column_profile import sample_values_from_profile
 from app.core.data_manager import data_manager
+from app.core.lru_cache import ByteLRUCache
+from app.core.output_formats import (
+    FORMAT_MEDIA_TYPES, MEDIA_JSON, dumps, iter_arrow_stream, iter_ndjson,
+    json_safe_table, negotiate_format,
+)
+from app.core.output_query import MAX_PAGE_SIZE, open_output_dataset, query_output
 from app.core.project_manager import project_manager
 from app.models.user import User
 from app.core.config import settings
@@ -14,6 +25,13 @@ from app.api.routes import get_current_user_optional
 
 router = APIRouter(prefix="/preview", tags=["preview"])
 
+# 最近的预览/查询响应: ETag -> (响应体, media_type)
+# ETag 中包含输出文件指纹，输出重新生成后旧条目不会再被命中，由 LRU 自然淘汰
+response_cache = ByteLRUCache(
+    settings.PREVIEW_RESPONSE_CACHE_MAX_BYTES,
+    sizeof=lambda entry: len(entry[0])
+)
+
 class DataPreviewResponse(BaseModel):
     """数据预览响应模型"""
     rows: List[Dict[str, Any]]  # 预览数据（最多 100 行）
@@ -23,13 +41,322 @@ class DataPreviewResponse(BaseModel):
     sample_values: Dict[str, List[Any]]  # 每列的示例值（用于UI筛选）
 
 
+def _parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    """解析 columns 查询参数（逗号分隔的列名）"""
+    if not columns:
+        return None
+    parsed = [c.strip() for c in columns.split(",") if c.strip()]
+    return parsed or None
+
+
+def _pandas_schema(arrow_schema: pa.Schema) -> Dict[str, str]:
+    """由 Arrow Schema 推导 pandas dtype 名称（不读取数据）"""
+    empty_df = arrow_schema.empty_table().to_pandas()
+    return {str(col): str(dtype) for col, dtype in empty_df.dtypes.items()}
+
+
+def _column_min_max(metadata: pq.FileMetaData, column_index: int) -> List[Any]:
+    """从 row group 统计信息中汇总某列的 min/max"""
+    col_min = None
+    col_max = None
+    for rg in range(metadata.num_row_groups):
+        stats = metadata.row_group(rg).column(column_index).statistics
+        if stats is None or not stats.has_min_max:
+            return []
+        col_min = stats.min if col_min is None else min(col_min, stats.min)
+        col_max = stats.max if col_max is None else max(col_max, stats.max)
+    if col_min is None:
+        return []
+    return [float(col_min), float(col_max)]
+
+
+def _response_format(request: Request, format: Optional[str], default: str = "json") -> str:
+    """内容协商：format 查询参数优先，其次 Accept 头"""
+    try:
+        return negotiate_format(request.headers.get("accept"), format, default=default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _json_response(payload: Any) -> Response:
+    """直接输出序列化后的 JSON（跳过 response_model 对每个单元格的二次校验与编码）"""
+    return Response(content=dumps(payload), media_type=MEDIA_JSON)
+
+
+def _etag(cache_path: str, *params: Any) -> Optional[str]:
+    """由输出指纹和请求参数计算 ETag；输出不存在时返回 None"""
+    fingerprint = data_manager.fingerprint(cache_path)
+    if fingerprint is None:
+        return None
+    raw = json.dumps([fingerprint, *params], default=str, sort_keys=True, ensure_ascii=False)
+    return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中（支持多个 ETag、弱校验前缀和 *）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def conditional_response(
+    request: Request,
+    cache_path: str,
+    params: Tuple[Any, ...],
+    build: Callable[[], Optional[Response]]
+) -> Optional[Response]:
+    """
+    带 ETag 的响应
+    - If-None-Match 命中时直接返回 304，不读取数据
+    - 非流式响应按 ETag 缓存序列化后的响应体，重复请求（编辑器自动刷新）不再重新计算
+    - 输出不存在时直接调用 build，由其给出 404
+    """
+    etag = _etag(cache_path, *params)
+    if etag is None:
+        return build()
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    cached = response_cache.get(etag)
+    if cached is not None:
+        body, media_type = cached
+        return Response(content=body, media_type=media_type, headers=headers)
+    
+    response = build()
+    if response is None:
+        return None
+    response.headers.update(headers)
+    if not isinstance(response, StreamingResponse) and response.status_code == 200:
+        response_cache.put(etag, (response.body, response.media_type))
+    return response
+
+
+def stream_batches(
+    schema: pa.Schema,
+    batches: Iterable[pa.RecordBatch],
+    fmt: str,
+    headers: Optional[Dict[str, str]] = None
+) -> StreamingResponse:
+    """以 Arrow IPC 流或 NDJSON 流式输出 record batch"""
+    body = iter_arrow_stream(schema, batches) if fmt == "arrow" else iter_ndjson(batches)
+    return StreamingResponse(body, media_type=FORMAT_MEDIA_TYPES[fmt], headers=headers)
+
+
+def stream_output(cache_path: str, fmt: str, columns: Optional[List[str]] = None) -> Optional[StreamingResponse]:
+    """
+    流式导出整个缓存输出（Arrow IPC 或 NDJSON），按 batch 读取，不把整表转换为 Python 对象
+    缓存不存在时返回 None
+    """
+    dataset = open_output_dataset(cache_path)
+    if dataset is None:
+        return None
+    all_columns = [c for c in dataset.schema.names if not c.startswith("__index_level_")]
+    selected = columns or all_columns
+    unknown = [c for c in selected if c not in all_columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown columns: {unknown}. Available columns: {all_columns}"
+        )
+    schema = pa.schema([dataset.schema.field(c) for c in selected])
+    return stream_batches(
+        schema,
+        dataset.to_batches(columns=selected),
+        fmt,
+        headers={"X-Total-Rows": str(dataset.count_rows())}
+    )
+
+
+def _preview_table(
+    cache_path: str,
+    limit: int,
+    columns: Optional[List[str]]
+) -> Tuple[pq.FileMetaData, List[str], pa.Table]:
+    """读取预览所需的 footer 与前 limit 行（只读需要的 row group 和列）"""
+    metadata = data_manager.read_metadata(cache_path)
+    if metadata is None:
+        raise FileNotFoundError(cache_path)
+    
+    arrow_schema = metadata.schema.to_arrow_schema()
+    all_columns = [name for name in arrow_schema.names if not name.startswith("__index_level_")]
+    if columns:
+        unknown = [c for c in columns if c not in all_columns]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown columns: {unknown}. Available columns: {all_columns}"
+            )
+    selected = columns or all_columns
+    return metadata, selected, data_manager.read_head(cache_path, limit, columns=selected)
+
+
+def _build_preview(cache_path: str, limit: int, columns: Optional[List[str]]) -> DataPreviewResponse:
+    """
+    构造预览响应
+    - total_rows / schema 来自 Parquet footer
+    - 只读取覆盖前 limit 行的 row group，且只解码请求的列
+    - 行数据在 Arrow 层按列转换为 JSON 安全的值，不再逐单元格处理
+    - schema 与示例值优先读取写入时生成的列画像 sidecar；
+      旧缓存没有 sidecar 时，数值列的 min/max 来自 row group 统计，其他列的示例值取自预览行
+    """
+    metadata, selected, preview_table = _preview_table(cache_path, limit, columns)
+    arrow_schema = metadata.schema.to_arrow_schema()
+    
+    schema = _pandas_schema(arrow_schema)
+    schema = {col: schema.get(col, "object") for col in selected}
+    
+    # NaN/时间等按列向量化转换，行字典由 Arrow 直接生成
+    preview_table = json_safe_table(preview_table)
+    profile = data_manager.load_profile(cache_path)
+    profiled_columns = profile["columns"] if profile else {}
+    
+    # 提取每列的示例值（用于 UI 筛选）
+    sample_values = {}
+    for col in selected:
+        try:
+            if col in profiled_columns:
+                schema[col] = profiled_columns[col].get("dtype", schema[col])
+                sample_values[col] = sample_values_from_profile(profiled_columns[col])
+                continue
+            field = arrow_schema.field(col)
+            if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+                sample_values[col] = _column_min_max(metadata, arrow_schema.get_field_index(col))
+            else:
+                unique_vals = pc.unique(preview_table.column(col).drop_null())
+                sample_values[col] = unique_vals.slice(0, 10).to_pylist()
+        except Exception as col_error:
+            # 如果某列处理失败，跳过该列
+            print(f"[Preview] Warning: Failed to extract sample values for column {col}: {col_error}")
+            sample_values[col] = []
+    
+    # 字段均已是 JSON 安全的值，跳过逐字段校验
+    return DataPreviewResponse.model_construct(
+        rows=preview_table.to_pylist(),
+        total_rows=metadata.num_rows,
+        columns=selected,
+        schema=schema,
+        sample_values=sample_values
+    )
+
+
+def _render_preview(cache_path: str, limit: int, columns: Optional[List[str]], fmt: str) -> Response:
+    """按协商的格式输出预览：JSON 含 schema/示例值，Arrow/NDJSON 只输出前 limit 行"""
+    if fmt == "json":
+        return _json_response(dict(_build_preview(cache_path, limit, columns)))
+    metadata, _, table = _preview_table(cache_path, limit, columns)
+    return stream_batches(
+        table.schema,
+        table.to_batches(),
+        fmt,
+        headers={"X-Total-Rows": str(metadata.num_rows)}
+    )
+
+
+def _missing_cache_detail(prompt_id: str, node_id: str, output_index: int) -> str:
+    """缓存文件不存在时，给出尽量具体的原因"""
+    # 缓存文件不存在，可能的原因：
+    # 1. 节点没有DataFrame输出（如FileUploadNode输出文件元数据）
+    # 2. 节点执行失败
+    # 3. 工作流未执行
+    # 4. 缓存路径不匹配
+    
+    # 尝试查找其他可能的缓存文件（检查是否有其他输出索引）
+    cache_dir = os.path.join(data_manager.cache_dir, prompt_id)
+    has_any_cache = False
+    if os.path.exists(cache_dir):
+        cache_files = [f for f in os.listdir(cache_dir) if f.startswith(f"{node_id}_") and f.endswith(".parquet")]
+        has_any_cache = len(cache_files) > 0
+    
+    if has_any_cache:
+        # 有其他输出索引的缓存文件，说明节点有DataFrame输出，但请求的output_index不存在
+        return f"Cache file not found for output index {output_index} of node '{node_id}'. This node may have DataFrame outputs at different indices. Please check the node's output structure."
+    # 没有任何缓存文件，说明节点可能没有DataFrame输出
+    return f"No DataFrame cache found for node '{node_id}'. This node may not output DataFrame data (it may output metadata, strings, or other non-tabular data). Please select a node that outputs DataFrame, such as ExcelLoader, ColumnMapperNode, NullValueCleanerNode, or ExcelColumnValidator."
+
+
+class QueryFilterSpec(BaseModel):
+    """过滤条件"""
+    column: str
+    op: str = "eq"  # eq/ne/gt/ge/lt/le/in/not_in/between/is_null/not_null/contains/starts_with
+    value: Any = None
+
+
+class QuerySortSpec(BaseModel):
+    """排序条件"""
+    column: str
+    descending: bool = False
+
+
+class DataQueryRequest(BaseModel):
+    """输出查询请求"""
+    filters: List[QueryFilterSpec] = []
+    sort: List[QuerySortSpec] = []
+    columns: Optional[List[str]] = None
+    offset: int = 0
+    limit: int = 100
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor
+
+
+class DataQueryResponse(BaseModel):
+    """输出查询响应"""
+    rows: List[Dict[str, Any]]
+    columns: List[str]
+    total_matched: int           # 满足过滤条件的总行数
+    offset: int                  # 本页第一行在结果中的位置
+    limit: int
+    next_cursor: Optional[str]   # 下一页游标，没有更多数据时为 None
+
+
+def _run_query(cache_path: str, request: DataQueryRequest, fmt: str = "json") -> Optional[Response]:
+    """执行查询并按协商的格式输出；缓存不存在时返回 None"""
+    limit = min(max(request.limit, 0), MAX_PAGE_SIZE)
+    try:
+        page = query_output(
+            cache_path,
+            filters=[f.model_dump() for f in request.filters],
+            sort=[s.model_dump() for s in request.sort],
+            columns=request.columns,
+            offset=request.offset,
+            limit=limit,
+            cursor=request.cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if page is None:
+        return None
+    
+    if fmt != "json":
+        headers = {"X-Total-Matched": str(page.total_matched), "X-Offset": str(page.offset)}
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return stream_batches(page.table.schema, page.table.to_batches(), fmt, headers=headers)
+    
+    return _json_response({
+        "rows": json_safe_table(page.table).to_pylist(),
+        "columns": page.table.column_names,
+        "total_matched": page.total_matched,
+        "offset": page.offset,
+        "limit": limit,
+        "next_cursor": page.next_cursor,
+    })
+
+
 @router.get("/node/{prompt_id}/{node_id}/{output_index}", response_model=DataPreviewResponse)
 async def preview_node_output(
     prompt_id: str,
     node_id: str,
+    request: Request,
     output_index: int = 0,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    limit: int = 100
+    limit: int = 100,
+    columns: Optional[str] = None,
+    format: Optional[str] = None
 ):
     """
     预览节点输出数据
@@ -39,209 +366,55 @@ async def preview_node_output(
     - 完整 Schema 信息
     - 每列的示例值（用于构建筛选器）
     
+    行数和 Schema 直接读取 Parquet footer，数据只读取覆盖前 N 行的 row group，
+    因此预览成本与输出总行数无关。
+    
+    响应格式（format 参数或 Accept 头）：
+    - application/json（默认）
+    - application/vnd.apache.arrow.stream: 前 N 行的 Arrow IPC 流
+    - application/x-ndjson: 前 N 行，每行一个 JSON 对象
+    总行数通过 X-Total-Rows 响应头返回。
+    
+    响应带 ETag（输出指纹 + 请求参数），If-None-Match 命中时返回 304。
+    
     Args:
         prompt_id: 执行任务 ID
         node_id: 节点 ID
         output_index: 输出索引（默认 0）
         limit: 返回行数限制（最大 1000）
+        columns: 只返回这些列（逗号分隔，可选）
+        format: 响应格式 json/arrow/ndjson（可选，优先于 Accept 头）
     
     Returns:
         数据预览信息
     """
     if limit > 1000:
         limit = 1000
+    fmt = _response_format(request, format)
     
-    # 构造缓存路径（与executor.py中的保存路径一致）
-    # executor.py中保存路径为: cache_dir = os.path.join(self.cache_dir, prompt_id)
-    # filename = f"{node_id}_{slot_index}.parquet"
-    # DataManager的cache_dir默认是"cache"，所以完整路径应该是: cache/{prompt_id}/{node_id}_{output_index}.parquet
-    # data_manager.save_intermediate返回的是绝对路径或相对路径，取决于cache_dir的设置
-    # 我们需要尝试多个可能的路径
-    
-    # 获取当前工作目录（通常是backend目录）
-    current_dir = os.getcwd()
-    backend_dir = current_dir if os.path.basename(current_dir) == 'backend' else os.path.join(current_dir, 'backend')
-    
-    # 尝试多个可能的路径
-    possible_paths = [
-        # 相对路径（相对于当前工作目录）
-        os.path.join("cache", prompt_id, f"{node_id}_{output_index}.parquet"),
-        # 相对于backend目录
-        os.path.join(backend_dir, "cache", prompt_id, f"{node_id}_{output_index}.parquet"),
-        # 使用data_manager的cache_dir（可能是绝对路径）
-        os.path.join(data_manager.cache_dir, prompt_id, f"{node_id}_{output_index}.parquet"),
-        # 绝对路径（如果cache_dir是绝对路径）
-        os.path.abspath(os.path.join(data_manager.cache_dir, prompt_id, f"{node_id}_{output_index}.parquet")),
-    ]
-    
-    # 使用第一个路径作为默认值，data_manager.load_intermediate会尝试多个路径
-    cache_path = possible_paths[0]
-    
-    # #region agent log
-    try:
-        with open(r'd:\审计数智析v2\.cursor\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({"sessionId":"debug-session","runId":"preview","hypothesisId":"A","location":"preview_routes.py:58","message":"Preview request received","data":{"prompt_id":prompt_id,"node_id":node_id,"output_index":output_index,"cache_path":cache_path,"cache_exists":os.path.exists(cache_path)},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-    except: pass
-    # #endregion
+    # 缓存路径与 executor.py 中的保存路径一致: cache/{prompt_id}/{node_id}_{output_index}.parquet
+    # data_manager.resolve_path 会在多个候选位置查找（相对/绝对 cache_dir、项目根目录）
+    cache_path = os.path.join("cache", prompt_id, f"{node_id}_{output_index}.parquet")
     
     try:
-        # 加载 DataFrame
-        # #region agent log
-        try:
-            with open(r'd:\审计数智析v2\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({"sessionId":"debug-session","runId":"preview","hypothesisId":"A","location":"preview_routes.py:68","message":"Before loading intermediate","data":{"cache_path":cache_path,"absolute_path":os.path.abspath(cache_path) if cache_path else None},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
-        df = data_manager.load_intermediate(cache_path)
-        # #region agent log
-        try:
-            with open(r'd:\审计数智析v2\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({"sessionId":"debug-session","runId":"preview","hypothesisId":"A","location":"preview_routes.py:77","message":"DataFrame loaded","data":{"df_is_none":df is None,"df_type":str(type(df)),"rows":len(df) if df is not None and isinstance(df, pd.DataFrame) else 0,"columns":df.columns.tolist() if df is not None and isinstance(df, pd.DataFrame) else []},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
-        
-        if df is None:
-            # 缓存文件不存在，可能的原因：
-            # 1. 节点没有DataFrame输出（如FileUploadNode输出文件元数据）
-            # 2. 节点执行失败
-            # 3. 工作流未执行
-            # 4. 缓存路径不匹配
-            
-            # 尝试查找其他可能的缓存文件（检查是否有其他输出索引）
-            cache_dir = os.path.join(data_manager.cache_dir, prompt_id)
-            has_any_cache = False
-            if os.path.exists(cache_dir):
-                cache_files = [f for f in os.listdir(cache_dir) if f.startswith(f"{node_id}_") and f.endswith(".parquet")]
-                has_any_cache = len(cache_files) > 0
-            
-            if has_any_cache:
-                # 有其他输出索引的缓存文件，说明节点有DataFrame输出，但请求的output_index不存在
-                detail = f"Cache file not found for output index {output_index} of node '{node_id}'. This node may have DataFrame outputs at different indices. Please check the node's output structure."
-            else:
-                # 没有任何缓存文件，说明节点可能没有DataFrame输出
-                detail = f"No DataFrame cache found for node '{node_id}'. This node may not output DataFrame data (it may output metadata, strings, or other non-tabular data). Please select a node that outputs DataFrame, such as ExcelLoader, ColumnMapperNode, NullValueCleanerNode, or ExcelColumnValidator."
-            
-            raise HTTPException(
-                status_code=404,
-                detail=detail
-            )
-        
-        if not isinstance(df, pd.DataFrame):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Output is not a DataFrame. Got type: {type(df)}. Only DataFrame outputs can be previewed."
-            )
-        
-        # 提取预览数据
-        try:
-            preview_df = df.head(limit)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to extract preview data: {str(e)}"
-            )
-        
-        # 构造 Schema（列名 -> 数据类型）
-        try:
-            schema = {col: str(df[col].dtype) for col in df.columns}
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to extract schema: {str(e)}"
-            )
-        
-        # 提取每列的示例值（用于 UI 筛选）
-        sample_values = {}
-        try:
-            for col in df.columns:
-                try:
-                    # 对于分类列，提取唯一值
-                    if df[col].dtype == 'object' or df[col].nunique() < 20:
-                        unique_vals = df[col].dropna().unique().tolist()[:10]
-                        # 确保值可以序列化为JSON
-                        sample_values[col] = [str(v) if not isinstance(v, (int, float, bool, str, type(None))) else v for v in unique_vals]
-                    else:
-                        # 对于数值列，提取 min/max
-                        col_min = df[col].min()
-                        col_max = df[col].max()
-                        sample_values[col] = [
-                            float(col_min) if pd.notnull(col_min) else None,
-                            float(col_max) if pd.notnull(col_max) else None
-                        ]
-                except Exception as col_error:
-                    # 如果某列处理失败，跳过该列
-                    print(f"[Preview] Warning: Failed to extract sample values for column {col}: {col_error}")
-                    sample_values[col] = []
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to extract sample values: {str(e)}"
-            )
-        
-        # 转换为字典格式
-        try:
-            rows_dict = preview_df.to_dict(orient="records")
-            # 确保所有值都可以序列化
-            for row in rows_dict:
-                for key, value in row.items():
-                    if pd.isna(value):
-                        row[key] = None
-                    elif isinstance(value, (pd.Timestamp,)):
-                        row[key] = value.isoformat()
-                    elif not isinstance(value, (int, float, bool, str, type(None), list, dict)):
-                        row[key] = str(value)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to convert DataFrame to dict: {str(e)}"
-            )
-        
-        try:
-            return DataPreviewResponse(
-                rows=rows_dict,
-                total_rows=len(df),
-                columns=df.columns.tolist(),
-                schema=schema,
-                sample_values=sample_values
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to create response: {str(e)}"
-            )
-    
+        parsed_columns = _parse_columns(columns)
+        return conditional_response(
+            request, cache_path, ("preview", limit, parsed_columns, fmt),
+            lambda: _render_preview(cache_path, limit, parsed_columns, fmt)
+        )
     except FileNotFoundError:
-        # #region agent log
-        try:
-            with open(r'd:\审计数智析v2\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({"sessionId":"debug-session","runId":"preview","hypothesisId":"A","location":"preview_routes.py:117","message":"FileNotFoundError","data":{"cache_path":cache_path,"absolute_path":os.path.abspath(cache_path) if cache_path else None,"cache_dir_exists":os.path.exists(os.path.dirname(cache_path)) if cache_path else False},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
         raise HTTPException(
             status_code=404,
-            detail=f"No cache found for node {node_id} in prompt {prompt_id}. Please execute the workflow first. Cache path: {cache_path}"
+            detail=_missing_cache_detail(prompt_id, node_id, output_index)
         )
     except HTTPException:
         # 重新抛出HTTP异常（已经处理过的）
         raise
     except Exception as e:
-        # #region agent log
         import traceback
-        error_traceback = traceback.format_exc()
-        try:
-            with open(r'd:\审计数智析v2\.cursor\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({"sessionId":"debug-session","runId":"preview","hypothesisId":"A","location":"preview_routes.py:190","message":"Exception in preview","data":{"error":str(e),"error_type":type(e).__name__,"cache_path":cache_path,"traceback":error_traceback},"timestamp":int(__import__('time').time()*1000)}) + '\n')
-        except: pass
-        # #endregion
-        
         # 记录详细错误到控制台
         print(f"[Preview] Error loading preview for node {node_id}: {str(e)}")
-        print(f"[Preview] Traceback: {error_traceback}")
+        print(f"[Preview] Traceback: {traceback.format_exc()}")
         
         raise HTTPException(
             status_code=500,
@@ -254,9 +427,12 @@ async def preview_project_run_output(
     project_id: str,
     run_id: str,
     node_id: str,
+    request: Request,
     output_index: int = 0,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    limit: int = 100
+    limit: int = 100,
+    columns: Optional[str] = None,
+    format: Optional[str] = None
 ):
     """
     预览项目执行运行的节点输出
@@ -267,55 +443,174 @@ async def preview_project_run_output(
         node_id: 节点 ID
         output_index: 输出索引
         limit: 返回行数限制
+        columns: 只返回这些列（逗号分隔，可选）
+        format: 响应格式 json/arrow/ndjson（可选，优先于 Accept 头）
     
     Returns:
         数据预览信息
     """
     if limit > 1000:
         limit = 1000
+    fmt = _response_format(request, format)
     
     # 使用 project_manager 获取运行目录
-    from app.core.project_manager import project_manager
     run_dir = project_manager.get_run_dir(project_id, run_id)
     cache_path = f"{run_dir}/cache/{node_id}_{output_index}.parquet"
     
     try:
-        df = pd.read_parquet(cache_path)
-        
-        if not isinstance(df, pd.DataFrame):
-            raise HTTPException(
-                status_code=400,
-                detail="Output is not a DataFrame"
-            )
-        
-        preview_df = df.head(limit)
-        schema = {col: str(df[col].dtype) for col in df.columns}
-        
-        sample_values = {}
-        for col in df.columns:
-            if df[col].dtype == 'object' or df[col].nunique() < 20:
-                sample_values[col] = df[col].dropna().unique().tolist()[:10]
-            else:
-                sample_values[col] = [
-                    float(df[col].min()) if pd.notnull(df[col].min()) else None,
-                    float(df[col].max()) if pd.notnull(df[col].max()) else None
-                ]
-        
-        return DataPreviewResponse(
-            rows=preview_df.to_dict(orient="records"),
-            total_rows=len(df),
-            columns=df.columns.tolist(),
-            schema=schema,
-            sample_values=sample_values
+        parsed_columns = _parse_columns(columns)
+        return conditional_response(
+            request, cache_path, ("preview", limit, parsed_columns, fmt),
+            lambda: _render_preview(cache_path, limit, parsed_columns, fmt)
         )
-    
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
             detail=f"No output found for node {node_id} in run {run_id}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to load preview: {str(e)}"
         )
+
+
+@router.post("/node/{prompt_id}/{node_id}/{output_index}/query", response_model=DataQueryResponse)
+async def query_node_output(
+    prompt_id: str,
+    node_id: str,
+    output_index: int,
+    request: DataQueryRequest,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    format: Optional[str] = None
+):
+    """
+    分页查询节点输出（支持多列排序和过滤）
+    
+    过滤条件下推到 Parquet 扫描，按 row group 统计信息裁剪；
+    排序查询推荐使用 next_cursor（keyset 分页）翻页，而不是递增 offset。
+    
+    支持与预览相同的内容协商；Arrow/NDJSON 响应的分页信息放在
+    X-Total-Matched / X-Offset / X-Next-Cursor 响应头中。
+    """
+    cache_path = os.path.join("cache", prompt_id, f"{node_id}_{output_index}.parquet")
+    fmt = _response_format(http_request, format)
+    response = conditional_response(
+        http_request, cache_path, ("query", request.model_dump(), fmt),
+        lambda: _run_query(cache_path, request, fmt)
+    )
+    if response is None:
+        raise HTTPException(
+            status_code=404,
+            detail=_missing_cache_detail(prompt_id, node_id, output_index)
+        )
+    return response
+
+
+@router.post("/project/{project_id}/run/{run_id}/node/{node_id}/{output_index}/query", response_model=DataQueryResponse)
+async def query_project_run_output(
+    project_id: str,
+    run_id: str,
+    node_id: str,
+    output_index: int,
+    request: DataQueryRequest,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    format: Optional[str] = None
+):
+    """
+    分页查询项目执行运行的节点输出（支持多列排序和过滤）
+    """
+    run_dir = project_manager.get_run_dir(project_id, run_id)
+    cache_path = f"{run_dir}/cache/{node_id}_{output_index}.parquet"
+    fmt = _response_format(http_request, format)
+    response = conditional_response(
+        http_request, cache_path, ("query", request.model_dump(), fmt),
+        lambda: _run_query(cache_path, request, fmt)
+    )
+    if response is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No output found for node {node_id} in run {run_id}"
+        )
+    return response
+
+
+@router.get("/node/{prompt_id}/{node_id}/{output_index}/profile")
+async def profile_node_output(
+    prompt_id: str,
+    node_id: str,
+    output_index: int,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    获取节点输出的列画像（null 数、近似 distinct、min/max、top 值、数值直方图）
+    画像在中间结果写入时生成，读取不需要扫描数据
+    """
+    cache_path = os.path.join("cache", prompt_id, f"{node_id}_{output_index}.parquet")
+    profile = data_manager.load_profile(cache_path)
+    if profile is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No column profile found for node {node_id} (output {output_index})"
+        )
+    return profile
+
+
+@router.get("/project/{project_id}/run/{run_id}/node/{node_id}/{output_index}/profile")
+async def profile_project_run_output(
+    project_id: str,
+    run_id: str,
+    node_id: str,
+    output_index: int,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    获取项目执行运行中节点输出的列画像
+    """
+    run_dir = project_manager.get_run_dir(project_id, run_id)
+    cache_path = f"{run_dir}/cache/{node_id}_{output_index}.parquet"
+    profile = data_manager.load_profile(cache_path)
+    if profile is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No column profile found for node {node_id} in run {run_id}"
+        )
+    return profile
+
+
+@router.get("/node/{prompt_id}/{node_id}/{output_index}/export")
+async def export_node_output(
+    prompt_id: str,
+    node_id: str,
+    output_index: int,
+    request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    columns: Optional[str] = None,
+    format: Optional[str] = None
+):
+    """
+    流式导出节点的完整输出
+    
+    - application/x-ndjson（默认）: 按 record batch 分块输出，每行一个 JSON 对象
+    - application/vnd.apache.arrow.stream: Arrow IPC 流，直接由缓存表写出
+    """
+    fmt = _response_format(request, format, default="ndjson")
+    if fmt == "json":
+        # 完整输出不以单个 JSON 数组返回，避免在内存中构造整个响应
+        fmt = "ndjson"
+    cache_path = os.path.join("cache", prompt_id, f"{node_id}_{output_index}.parquet")
+    parsed_columns = _parse_columns(columns)
+    response = conditional_response(
+        request, cache_path, ("export", parsed_columns, fmt),
+        lambda: stream_output(cache_path, fmt, parsed_columns)
+    )
+    if response is None:
+        raise HTTPException(
+            status_code=404,
+            detail=_missing_cache_detail(prompt_id, node_id, output_index)
+        )
+    return response
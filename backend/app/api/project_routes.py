@@ -1,12 +1,22 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.responses import FileResponse
-from typing import List
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import BaseModel, Field
 import os
 import uuid
-from app.core.project_manager import project_manager, ProjectMetadata, Project
+from app.core.project_manager import project_manager, ProjectMetadata, Project, is_safe_id
 from app.core.executor import executor
+from app.core.config import settings
+from app.core.ingest import ingest_store
+from app.core.upload_store import (
+    UPLOAD_CHUNK_SIZE, UPLOAD_EXTENSIONS, StreamingWriter, UploadConflictError, UploadValidationError,
+    blob_store, chunked_uploads
+)
 from app.api.auth_routes import get_current_user
+from app.api.preview_routes import conditional_response, stream_batches, stream_output, _json_response, _response_format
+from app.core.output_formats import json_safe_table
+from app.core.sql_engine import output_tables, run_query
 from app.models.user import User
 import mimetypes
 
@@ -22,6 +32,17 @@ class SaveWorkflowRequest(BaseModel):
     workflow: dict
 
 
+class CreateUploadRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class RunQueryRequest(BaseModel):
+    sql: str
+    max_rows: Optional[int] = Field(default=None, ge=1)  # 不超过 SQL_QUERY_MAX_ROWS
+
+
 @router.post("/", response_model=ProjectMetadata)
 async def create_project(
     request: CreateProjectRequest,
@@ -80,89 +101,226 @@ async def save_workflow(
 @router.post("/{project_id}/upload")
 async def upload_file(
     project_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
     """
     上传文件到项目数据目录
-    仅允许 Excel 文件 (.xlsx, .xls)
-    """
-    project = project_manager.get_project(project_id)
+    仅允许 Excel/CSV 文件 (.xlsx, .xls, .csv)，超过单次请求大小上限的文件使用分块上传 (/uploads)
     
-    if not project:
+    文件按块写入磁盘并同时计算 sha256，不在内存中保留整个文件；相同内容只存一份（硬链接）。
+    保存后在后台将每个 sheet 转换为 Parquet（按内容哈希存放），
+    后续执行中 ExcelLoader 直接读取转换结果，不再重复解析 Excel。
+    """
+    if not project_manager.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # 安全检查：文件类型
-    allowed_extensions = [".xlsx", ".xls", ".csv"]
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    safe_filename = _validate_upload_filename(file.filename)
+    file_ext = os.path.splitext(safe_filename)[1].lower()
     
-    if file_ext not in allowed_extensions:
+    # 按块写入临时文件，同时计算 sha256；文件头魔数在第一个块上校验
+    writer = StreamingWriter(blob_store.tmp_path(), file_ext, max_size=settings.MAX_UPLOAD_SIZE)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(writer.write, chunk)
+        content_hash, size = writer.finish()
+        blob_store.commit(writer.path, content_hash)
+    except UploadValidationError as e:
+        writer.abort()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        writer.abort()
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    
+    return _store_upload(project_id, safe_filename, content_hash, size, background_tasks)
+
+
+def _validate_upload_filename(filename: str) -> str:
+    """校验上传文件名：只允许 Excel/CSV，且不能包含路径"""
+    # 安全检查：文件类型
+    file_ext = os.path.splitext(filename or "")[1].lower()
+    if file_ext not in UPLOAD_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
+            detail=f"Invalid file type. Allowed: {', '.join(UPLOAD_EXTENSIONS)}"
         )
     
     # 安全检查：防止路径遍历攻击
     # 只允许简单的文件名，不允许路径分隔符
-    safe_filename = os.path.basename(file.filename)
-    if safe_filename != file.filename or ".." in file.filename:
+    safe_filename = os.path.basename(filename)
+    if safe_filename != filename or ".." in filename:
         raise HTTPException(
             status_code=400,
             detail="Invalid filename. Path traversal attempt detected."
         )
-    
-    # 读取文件内容
-    content = await file.read()
-    
-    # 安全检查：MIME类型验证（验证文件实际内容）
-    # 检查文件头部魔数（magic bytes）
-    allowed_mime_types = [
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # .xlsx
-        "application/vnd.ms-excel",  # .xls
-        "text/csv",  # .csv
-        "application/zip"  # .xlsx实际上是zip格式
-    ]
-    
-    # 检查文件魔数签名
-    is_valid = False
-    if len(content) > 4:
-        # ZIP signature (xlsx files are actually ZIP archives)
-        if content[:4] == b'PK\x03\x04':
-            is_valid = True
-        # CSV files (check for common CSV patterns)
-        elif file_ext == '.csv':
-            try:
-                # Try to decode as text
-                content.decode('utf-8')
-                is_valid = True
-            except:
-                pass
-        # Old Excel format (.xls) - starts with 0xD0CF11E0A1B11AE1
-        elif content[:8] == b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1':
-            is_valid = True
-    
-    if not is_valid:
-        raise HTTPException(
-            status_code=400,
-            detail="File content does not match expected format. Possible malicious file."
-        )
-    
-    # 保存文件
+    return safe_filename
+
+
+def _store_upload(project_id: str, filename: str, content_hash: str, size: int, background_tasks: BackgroundTasks) -> dict:
+    """
+    把已登记的内容放到项目数据目录（硬链接到按哈希存放的 blob，相同内容不重复占用空间），
+    并在后台转换为 Parquet（相同内容已转换过时直接复用）
+    """
     data_dir = project_manager.get_data_dir(project_id)
-    file_path = os.path.join(data_dir, safe_filename)
-    
+    file_path = os.path.join(data_dir, filename)
     try:
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        return {
-            "status": "success",
-            "filename": file.filename,
-            "path": file_path,
-            "size": len(content)
-        }
+        stored = blob_store.materialize(content_hash, file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    
+    ingest_store.remember(file_path, content_hash)
+    if settings.INGEST_ENABLED:
+        background_tasks.add_task(ingest_store.ingest, file_path, content_hash)
+    
+    return {
+        "status": "success",
+        "filename": filename,
+        "path": file_path,
+        "size": size,
+        "content_hash": content_hash,
+        "stored": stored,
+        "ingest": "scheduled" if settings.INGEST_ENABLED else "disabled"
+    }
+
+
+def _get_upload_session(project_id: str, upload_id: str) -> dict:
+    session = chunked_uploads.get(upload_id)
+    if not session or session["project_id"] != project_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+def _upload_status(session: dict) -> dict:
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "received": session["received"],
+        "chunk_size": session["chunk_size"],
+    }
+
+
+@router.post("/{project_id}/uploads")
+async def create_upload(
+    project_id: str,
+    request: CreateUploadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建分块上传会话（用于超过单次请求大小上限的文件）
+    
+    之后按 chunk_size 依次 PUT /uploads/{upload_id}?offset=N 上传数据块，
+    中断后 GET /uploads/{upload_id} 查询已接收字节数并从该位置续传，
+    全部上传后 POST /uploads/{upload_id}/complete 完成。
+    """
+    if not project_manager.get_project(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    safe_filename = _validate_upload_filename(request.filename)
+    try:
+        session = chunked_uploads.create(project_id, safe_filename, request.size, request.sha256)
+    except UploadValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_status({**session, "received": 0})
+
+
+@router.get("/{project_id}/uploads/{upload_id}")
+async def get_upload(
+    project_id: str,
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """查询分块上传进度（已接收字节数即下一个数据块的 offset）"""
+    return _upload_status(_get_upload_session(project_id, upload_id))
+
+
+@router.put("/{project_id}/uploads/{upload_id}")
+async def upload_chunk(
+    project_id: str,
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    上传一个数据块（请求体为原始字节），offset 必须等于已接收字节数
+    数据边接收边写入磁盘；连接中断时已写入的部分保留，可从新的 offset 续传
+    """
+    _get_upload_session(project_id, upload_id)
+    lock = chunked_uploads.lock(upload_id)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another chunk of this upload is in progress")
+    try:
+        # 持有锁后重新读取会话：已接收字节数以 .part 的实际大小为准，
+        # 重复或并发发送的同一块在这里被拒绝，不会被追加写入两次
+        session = _get_upload_session(project_id, upload_id)
+        try:
+            writer = chunked_uploads.writer(session, offset)
+        except UploadConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        buffer = bytearray()
+        try:
+            try:
+                # 请求体按小片到达，攒成大块再写盘
+                async for piece in request.stream():
+                    buffer += piece
+                    if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                        data = bytes(buffer)
+                        buffer.clear()
+                        await run_in_threadpool(writer.write, data)
+            finally:
+                # 连接中断时同样写入已到达的数据，客户端从新的 offset 续传
+                if buffer:
+                    await run_in_threadpool(writer.write, bytes(buffer))
+        except UploadValidationError as e:
+            writer.close()
+            chunked_uploads.discard(upload_id)
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            chunked_uploads.record(upload_id, writer)
+    finally:
+        lock.release()
+    
+    return _upload_status({**session, "received": writer.size})
+
+
+@router.post("/{project_id}/uploads/{upload_id}/complete")
+async def complete_upload(
+    project_id: str,
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """完成分块上传：校验大小、文件头和哈希后放入项目数据目录"""
+    _get_upload_session(project_id, upload_id)
+    lock = chunked_uploads.lock(upload_id)
+    if not lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another chunk of this upload is in progress")
+    try:
+        session = _get_upload_session(project_id, upload_id)
+        content_hash, _ = await run_in_threadpool(chunked_uploads.complete, session)
+    except UploadValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        lock.release()
+    
+    return _store_upload(project_id, session["filename"], content_hash, session["size"], background_tasks)
+
+
+@router.delete("/{project_id}/uploads/{upload_id}")
+async def abort_upload(
+    project_id: str,
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """取消分块上传并删除已接收的数据"""
+    _get_upload_session(project_id, upload_id)
+    chunked_uploads.discard(upload_id)
+    return {"status": "success", "message": f"Upload {upload_id} aborted"}
 
 
 @router.post("/{project_id}/execute")
@@ -207,24 +365,55 @@ async def delete_project(
     project_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    """删除项目（危险操作）"""
+    """删除项目（危险操作），并删除只被该项目引用的上传 blob"""
+    if not is_safe_id(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    data_dir = project_manager.get_data_dir(project_id)
+    blobs = blob_store.linked_blobs(data_dir) if os.path.isdir(data_dir) else []
     success = project_manager.delete_project(project_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    blob_store.release(blobs)
+    
     return {"status": "success", "message": "Project deleted"}
 
 
+@router.delete("/{project_id}/runs/{run_id}")
+async def delete_run(
+    project_id: str,
+    run_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """删除执行运行的输出与缓存"""
+    # 安全检查：防止路径遍历攻击（run_id 为 %2E%2E 时解码为 ".."）
+    if not is_safe_id(project_id) or not is_safe_id(run_id):
+        raise HTTPException(status_code=400, detail="Invalid project or run id")
+    
+    success = project_manager.delete_run(project_id, run_id)
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    return {"status": "success", "message": "Run deleted"}
+
+
 @router.get("/{project_id}/runs/{run_id}/outputs/{filename}")
 async def download_run_output(
     project_id: str,
     run_id: str,
     filename: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    format: Optional[str] = None
 ):
     """
     下载项目执行运行的输出文件
+    
+    默认返回 Excel 文件；请求 Arrow IPC 流（application/vnd.apache.arrow.stream）
+    或 NDJSON（application/x-ndjson）时，直接从对应节点的 Parquet 缓存流式输出。
     """
     # 安全检查：防止路径遍历攻击
     safe_filename = os.path.basename(filename)
@@ -246,6 +435,22 @@ async def download_run_output(
             detail="Access denied. Path traversal attempt detected."
         )
     
+    fmt = _response_format(request, format, default="xlsx")
+    if fmt in ("arrow", "ndjson"):
+        # 输出文件名为 {run_id}_{node_id}_{idx}.xlsx，对应缓存 cache/{node_id}_{idx}.parquet
+        stem = os.path.splitext(safe_filename)[0]
+        prefix = f"{run_id}_"
+        if stem.startswith(prefix):
+            stem = stem[len(prefix):]
+        cache_path = os.path.join(run_dir, "cache", f"{stem}.parquet")
+        response = conditional_response(
+            request, cache_path, ("export", None, fmt),
+            lambda: stream_output(cache_path, fmt)
+        )
+        if response is None:
+            raise HTTPException(status_code=404, detail="Cached output not found")
+        return response
+    
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
@@ -254,3 +459,64 @@ async def download_run_output(
         filename=filename,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
+
+
+@router.post("/{project_id}/runs/{run_id}/query")
+async def query_run_outputs(
+    project_id: str,
+    run_id: str,
+    body: RunQueryRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    format: Optional[str] = None
+):
+    """
+    对已完成运行的输出执行即席 SQL（只读）
+    
+    运行的每个缓存输出（Parquet 或按引用缓存的数据集）注册为表 node_{node_id}_{output_index}，
+    由嵌入式引擎直接扫描，不重新执行工作流。
+    执行时间与返回行数受 SQL_QUERY_TIMEOUT_SECONDS / SQL_QUERY_MAX_ROWS 限制；
+    结果超过行数上限时截断，truncated 为 true（Arrow/NDJSON 响应放在 X-Truncated 响应头中）。
+    row_count（Arrow/NDJSON 响应为 X-Row-Count 响应头）是本次返回的行数，截断时不是查询结果的总行数
+    （只多取一行判断是否截断，不统计总行数）。
+    """
+    # 安全检查：防止路径遍历攻击
+    for part in (project_id, run_id):
+        if not is_safe_id(part):
+            raise HTTPException(status_code=400, detail="Invalid project or run id")
+    
+    cache_dir = os.path.join(project_manager.projects_root, project_id, "runs", run_id, "cache")
+    tables = output_tables(cache_dir)
+    if not tables:
+        raise HTTPException(status_code=404, detail="Run not found or has no cached outputs")
+    
+    fmt = _response_format(request, format)
+    max_rows = min(body.max_rows or settings.SQL_QUERY_MAX_ROWS, settings.SQL_QUERY_MAX_ROWS)
+    try:
+        # 多取一行用于判断是否截断
+        table = await run_in_threadpool(
+            run_query, body.sql, tables,
+            max_rows=max_rows + 1, timeout=settings.SQL_QUERY_TIMEOUT_SECONDS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}. Available tables: {sorted(tables)}")
+    except TimeoutError as e:
+        raise HTTPException(status_code=408, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    truncated = table.num_rows > max_rows
+    table = table.slice(0, max_rows)
+    if fmt != "json":
+        return stream_batches(
+            table.schema, table.to_batches(), fmt,
+            headers={"X-Row-Count": str(table.num_rows), "X-Truncated": str(truncated).lower()}
+        )
+    
+    return _json_response({
+        "rows": json_safe_table(table).to_pylist(),
+        "columns": table.column_names,
+        "row_count": table.num_rows,
+        "truncated": truncated,
+        "tables": sorted(tables),
+    })
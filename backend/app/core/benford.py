@@ -0,0 +1,131 @@
+"""
+本福特定律（Benford's law）数字分析
+首位数字 / 前两位数字检验：
+
+- 首位数字由 log10 / floor 向量化提取（不做逐行字符串截取）
+- 按分组键（科目、主体、制单人）一次 groupby 统计各组的数字频数矩阵（组 x 数字），
+  频数矩阵可直接相加，分区执行时逐分区统计再合并
+- 由频数矩阵向量化计算各组的 MAD、卡方统计量和逐数字 z 统计量，
+  符合程度按 Nigrini 的 MAD 临界值划分
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+TESTS = {"first_digit": 1, "first_two_digits": 2}
+# Nigrini MAD 临界值：(密切符合, 可接受, 边缘符合)，超过最后一个为不符合
+MAD_THRESHOLDS = {1: (0.006, 0.012, 0.015), 2: (0.0012, 0.0018, 0.0022)}
+CONFORMITY_LABELS = ("close", "acceptable", "marginal", "nonconformity")
+# 显著性水平 0.05 的卡方临界值（自由度 8 / 89）
+CHI_SQUARE_CRITICAL = {1: 15.507, 2: 112.022}
+INSUFFICIENT = "insufficient_data"
+OVERALL = "all"
+
+
+def digit_range(digits: int) -> np.ndarray:
+    """首位数字检验 1..9，前两位数字检验 10..99"""
+    return np.arange(10 ** (digits - 1), 10 ** digits)
+
+
+def expected_distribution(digits: int) -> np.ndarray:
+    """本福特期望比例 log10(1 + 1/d)"""
+    return np.log10(1 + 1 / digit_range(digits))
+
+
+def leading_digits(values: np.ndarray, digits: int = 1, min_amount: float = 10.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    金额 -> (前 digits 位数字, 有效掩码)
+    取绝对值；绝对值小于 min_amount（且小于 10^(digits-1)）、为空或无穷的金额无效。
+    log10 在 10 的整数次幂附近可能有舍入误差，按缩放结果修正一次指数
+    """
+    x = np.abs(np.asarray(values, dtype=float))
+    valid = np.isfinite(x) & (x >= max(min_amount, 10.0 ** (digits - 1), np.finfo(float).tiny))
+    x = np.where(valid, x, 1.0)
+    exponent = np.floor(np.log10(x))
+    scaled = np.round(x * 10.0 ** (digits - 1 - exponent), 9)
+    exponent += (scaled >= 10 ** digits).astype(float) - (scaled < 10 ** (digits - 1)).astype(float)
+    lead = np.floor(np.round(x * 10.0 ** (digits - 1 - exponent), 9)).astype(np.int64)
+    return np.where(valid, lead, 0), valid
+
+
+def digit_counts(
+    df: pd.DataFrame,
+    amount_column: str,
+    group_keys: Sequence[str] = (),
+    digits: int = 1,
+    min_amount: float = 10.0,
+) -> pd.DataFrame:
+    """
+    各组的数字频数矩阵（以分组键为索引，列为数字）
+    全部分组在一次 groupby 中完成；无分组键时为一行（索引 "all"）
+    """
+    missing = [c for c in [amount_column, *group_keys] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+    amounts = pd.to_numeric(df[amount_column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    lead, valid = leading_digits(amounts, digits, min_amount)
+    columns = digit_range(digits)
+    if not group_keys:
+        counts = np.bincount(lead[valid] - columns[0], minlength=len(columns))
+        return pd.DataFrame([counts], index=pd.Index([OVERALL], name="group"), columns=columns)
+    frame = df.loc[valid, list(group_keys)].assign(_digit=lead[valid])
+    counts = frame.groupby([*group_keys, "_digit"], sort=True).size().unstack("_digit", fill_value=0)
+    counts = counts.reindex(columns=columns, fill_value=0)
+    counts.columns.name = None
+    return counts
+
+
+def merge_counts(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """合并两个频数矩阵（分组取并集）"""
+    return a.add(b, fill_value=0).astype(np.int64)
+
+
+def _conformity(mad: np.ndarray, digits: int) -> np.ndarray:
+    return np.array(CONFORMITY_LABELS, dtype=object)[np.searchsorted(MAD_THRESHOLDS[digits], mad, side="right")]
+
+
+def benford_statistics(counts: pd.DataFrame, digits: int = 1, min_count: int = 100) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    频数矩阵 -> (各组汇总, 各组逐数字分布)
+
+    汇总列：record_count, mad, chi_square, chi_square_exceeds（超过 0.05 临界值）, conformity,
+    top_digit / top_digit_z（z 统计量最大的数字）；样本数少于 min_count 的组 conformity 为 insufficient_data
+    逐数字分布列：digit, count, observed, expected, z_statistic（Nigrini 连续性修正）
+    """
+    matrix = counts.to_numpy(dtype=float)
+    expected = expected_distribution(digits)
+    n = matrix.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        observed = matrix / n
+        deviation = np.abs(observed - expected)
+        mad = deviation.mean(axis=1)
+        chi_square = ((matrix - n * expected) ** 2 / (n * expected)).sum(axis=1)
+        # 连续性修正 1/(2n) 小于偏差时才减去
+        correction = 1 / (2 * n)
+        numerator = np.where(correction < deviation, deviation - correction, deviation)
+        z = numerator / np.sqrt(expected * (1 - expected) / n)
+
+    sizes = n[:, 0].astype(np.int64)
+    conformity = np.where(sizes >= min_count, _conformity(mad, digits), INSUFFICIENT)
+    has_data = sizes > 0
+    top = np.where(has_data, np.nanargmax(np.where(has_data[:, None], z, 0.0), axis=1), 0)
+    summary = pd.DataFrame({
+        "record_count": sizes,
+        "mad": mad,
+        "chi_square": chi_square,
+        "chi_square_exceeds": chi_square > CHI_SQUARE_CRITICAL[digits],
+        "conformity": conformity,
+        "top_digit": counts.columns.to_numpy()[top],
+        "top_digit_z": np.where(has_data, z[np.arange(len(z)), top], np.nan),
+    }, index=counts.index).reset_index()
+
+    columns = counts.columns.to_numpy()
+    table = pd.DataFrame({
+        "digit": np.tile(columns, len(counts)),
+        "count": matrix.ravel().astype(np.int64),
+        "observed": observed.ravel(),
+        "expected": np.tile(expected, len(counts)),
+        "z_statistic": z.ravel(),
+    }, index=counts.index.repeat(len(columns))).reset_index()
+    return summary, table
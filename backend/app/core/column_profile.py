@@ -0,0 +1,198 @@
+"""
+列画像 (Column Profile)
+在中间结果写入时一次性计算每列的统计信息，并以 JSON sidecar 的形式与 Parquet 一起保存，
+预览接口直接读取 sidecar，不再对整表重复计算 nunique/unique/min/max。
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+PROFILE_VERSION = 1
+PROFILE_SUFFIX = ".profile.json"
+
+# KMV (k minimum values) 基数估计的 k，distinct 数少于 k 时结果是精确值
+KMV_K = 1024
+TOP_K = 10
+HISTOGRAM_BINS = 20
+# 数值列 distinct 超过该值时不再统计 top 值（高基数数值的 top 值没有筛选意义）
+NUMERIC_TOP_K_MAX_DISTINCT = 1000
+
+
+def profile_path(parquet_path: str) -> str:
+    """Parquet 文件对应的画像 sidecar 路径"""
+    return os.path.splitext(parquet_path)[0] + PROFILE_SUFFIX
+
+
+def _json_value(value: Any) -> Any:
+    """将 Arrow/Python 标量转换为 JSON 可序列化的值"""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return None if np.isnan(value) else value
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return _json_value(value.item())
+    return str(value)
+
+
+def _hash_values(column: pa.ChunkedArray) -> np.ndarray:
+    """对非空值计算 64 位哈希（向量化）"""
+    values = column.drop_null()
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    array = values.to_numpy()
+    if array.dtype.kind == "M" or array.dtype.kind == "m":
+        array = array.view("i8")
+    return pd.util.hash_array(array)
+
+
+def approx_distinct(hashes: np.ndarray, k: int = KMV_K) -> int:
+    """
+    KMV 基数估计: 取最小的 k 个不同哈希值，distinct ≈ (k - 1) / (第 k 小哈希 / 2^64)
+    只需要一次 O(n) 的 partition，内存与 k 成正比
+    """
+    n = len(hashes)
+    if n == 0:
+        return 0
+    m = min(n, 4 * k)
+    smallest = np.unique(np.partition(hashes, m - 1)[:m]) if m < n else np.unique(hashes)
+    if len(smallest) < k:
+        # 重复值很多（或数据量小），此时直接精确计数的代价也很低
+        return int(len(pd.unique(hashes))) if m < n else int(len(smallest))
+    kth = float(smallest[k - 1]) / float(2 ** 64)
+    return int(round((k - 1) / kth))
+
+
+def _is_numeric(arrow_type: pa.DataType) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type)
+
+
+def _is_orderable(arrow_type: pa.DataType) -> bool:
+    return (
+        _is_numeric(arrow_type)
+        or pa.types.is_temporal(arrow_type)
+        or pa.types.is_string(arrow_type)
+        or pa.types.is_large_string(arrow_type)
+        or pa.types.is_boolean(arrow_type)
+    )
+
+
+def _top_values(column: pa.ChunkedArray, k: int) -> list:
+    """出现次数最多的 k 个非空值"""
+    counts = pc.value_counts(column.drop_null())
+    if len(counts) == 0:
+        return []
+    freq = counts.field("counts").to_numpy()
+    order = np.argsort(-freq, kind="stable")[:k]
+    values = counts.field("values").take(pa.array(order)).to_pylist()
+    return [{"value": _json_value(v), "count": int(freq[i])} for v, i in zip(values, order)]
+
+
+def _histogram(column: pa.ChunkedArray, bins: int) -> Optional[Dict[str, list]]:
+    values = column.drop_null().to_numpy().astype("float64", copy=False)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def profile_column(column: pa.ChunkedArray, dtype: str) -> Dict[str, Any]:
+    """计算单列画像（Arrow 内核，每列一次向量化扫描）"""
+    arrow_type = column.type
+    value_type = arrow_type.value_type if pa.types.is_dictionary(arrow_type) else arrow_type
+    profile: Dict[str, Any] = {
+        "type": str(arrow_type),
+        "dtype": dtype,
+        "null_count": int(column.null_count),
+    }
+
+    if len(column) == column.null_count:
+        profile.update({"distinct_count": 0, "min": None, "max": None, "top_values": []})
+        return profile
+
+    distinct = approx_distinct(_hash_values(column))
+    profile["distinct_count"] = distinct
+
+    if _is_orderable(value_type):
+        source = column.cast(value_type) if pa.types.is_dictionary(arrow_type) else column
+        min_max = pc.min_max(source)
+        profile["min"] = _json_value(min_max["min"].as_py())
+        profile["max"] = _json_value(min_max["max"].as_py())
+    else:
+        profile["min"] = None
+        profile["max"] = None
+
+    numeric = _is_numeric(value_type) and not pa.types.is_decimal(value_type)
+    if not numeric or distinct <= NUMERIC_TOP_K_MAX_DISTINCT:
+        profile["top_values"] = _top_values(column, TOP_K)
+    else:
+        profile["top_values"] = []
+
+    if numeric:
+        profile["histogram"] = _histogram(column, HISTOGRAM_BINS)
+
+    return profile
+
+
+def compute_profile(table: pa.Table) -> Dict[str, Any]:
+    """计算整表画像"""
+    pandas_dtypes = table.schema.empty_table().to_pandas().dtypes
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if name.startswith("__index_level_"):
+            continue
+        dtype = str(pandas_dtypes[name]) if name in pandas_dtypes.index else str(column.type)
+        columns[name] = profile_column(column, dtype)
+    return {
+        "version": PROFILE_VERSION,
+        "num_rows": table.num_rows,
+        "columns": columns,
+    }
+
+
+def write_profile(parquet_path: str, profile: Dict[str, Any]) -> str:
+    """写入 sidecar，返回 sidecar 路径"""
+    path = profile_path(parquet_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, default=str)
+    return path
+
+
+def read_profile(parquet_path: str) -> Optional[Dict[str, Any]]:
+    """读取 sidecar，不存在或版本不匹配时返回 None"""
+    path = profile_path(parquet_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("version") != PROFILE_VERSION:
+        return None
+    return profile
+
+
+def sample_values_from_profile(column_profile: Dict[str, Any], limit: int = 10) -> list:
+    """
+    预览接口的示例值（用于 UI 筛选）
+    文本列或低基数列返回常见值，其他列返回 [min, max]
+    """
+    if column_profile.get("dtype") == "object" or column_profile.get("distinct_count", 0) < 20:
+        return [item["value"] for item in column_profile.get("top_values", [])[:limit]]
+    col_min = column_profile.get("min")
+    col_max = column_profile.get("max")
+    if isinstance(col_min, (int, float)) and isinstance(col_max, (int, float)):
+        return [float(col_min), float(col_max)]
+    return [col_min, col_max]
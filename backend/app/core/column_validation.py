@@ -0,0 +1,157 @@
+"""
+多列批量校验
+按规格一次校验多列（必填、类型、范围、正则、允许值），每项检查都是整列的向量化运算，
+违规说明按列拼接（不逐行循环），并汇总为 列 x 检查项 的违规计数矩阵。
+
+规格格式::
+
+    {
+      "amount":   {"type": "number", "min": 0, "max": 1000000, "required": true},
+      "account":  {"regex": "^\\\\d{4}$"},
+      "currency": {"allowed": ["CNY", "USD"]},
+      "date":     {"type": "date", "min": "2024-01-01"}
+    }
+"""
+import json
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMN_TYPES = ("number", "integer", "date", "string")
+CHECKS = ("required", "type", "min", "max", "regex", "allowed")
+CHECK_KEYS = {"required", "type", "min", "max", "regex", "allowed"}
+
+
+def parse_spec(spec: Any) -> Dict[str, Dict[str, Any]]:
+    """校验规格（JSON 文本或字典）-> {列名: 检查项}"""
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid validation spec JSON: {e}")
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("Validation spec must be a non-empty object of {column: checks}")
+    for column, checks in spec.items():
+        if not isinstance(checks, dict):
+            raise ValueError(f"Checks for column '{column}' must be an object")
+        unknown = set(checks) - CHECK_KEYS
+        if unknown:
+            raise ValueError(f"Unknown checks for column '{column}': {sorted(unknown)}. Supported: {sorted(CHECK_KEYS)}")
+        if checks.get("type", "string") not in COLUMN_TYPES:
+            raise ValueError(f"Column '{column}': type must be one of {COLUMN_TYPES}")
+        if "allowed" in checks and not isinstance(checks["allowed"], list):
+            raise ValueError(f"Column '{column}': 'allowed' must be a list")
+    return spec
+
+
+def _typed(series: pd.Series, column_type: str) -> pd.Series:
+    """按声明的类型转换（无法转换的值为空）"""
+    if column_type in ("number", "integer"):
+        return pd.to_numeric(series, errors="coerce")
+    if column_type == "date":
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        return pd.to_datetime(series, errors="coerce", format="mixed")
+    return series
+
+
+def _bound(value: Any, column_type: str) -> Any:
+    return pd.Timestamp(value) if column_type == "date" else value
+
+
+def _format_values(values: pd.Series) -> np.ndarray:
+    """违规说明中的值（数值保留两位小数）"""
+    if pd.api.types.is_numeric_dtype(values):
+        return np.char.mod("%.2f", values.to_numpy(dtype=float, na_value=np.nan)).astype(object)
+    return values.astype(str).to_numpy(dtype=object)
+
+
+def join_labels(labels: List[Tuple[np.ndarray, np.ndarray]], size: int) -> np.ndarray:
+    """
+    [(命中掩码, 说明), ...] -> 每行的说明，多个违规以 "; " 分隔
+    说明可以是字符串或与行数等长的数组；只对命中行拼接
+    """
+    result = np.full(size, "", dtype=object)
+    for mask, label in labels:
+        if not mask.any():
+            continue
+        text = label[mask] if isinstance(label, np.ndarray) else label
+        current = result[mask]
+        separator = np.where(current == "", "", "; ").astype(object)
+        result[mask] = current + separator + text
+    return result
+
+
+def _record(
+    row: Dict[str, Any],
+    column_failed: np.ndarray,
+    labels: List[Tuple[np.ndarray, Any]],
+    check: str,
+    mask: np.ndarray,
+    label: Any,
+) -> None:
+    """记录一项检查的违规：计数累加到违规矩阵的行，并合并到该列的违规掩码和说明列表"""
+    row[check] += int(mask.sum())
+    column_failed |= mask
+    labels.append((mask, label))
+
+
+def validate_columns(
+    df: pd.DataFrame, spec: Dict[str, Dict[str, Any]]
+) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    按规格校验多列
+    返回 (违规行掩码, 每行违规说明, 列 x 检查项 违规计数矩阵)
+    规格中的列不存在时该列计为 missing_column，不影响其他列
+    """
+    size = len(df)
+    any_violation = np.zeros(size, dtype=bool)
+    labels: List[Tuple[np.ndarray, Any]] = []
+    matrix = []
+
+    for column, checks in spec.items():
+        row = {"column": column, **{check: 0 for check in CHECKS}, "rows_failed": 0, "missing_column": False}
+        if column not in df.columns:
+            row["missing_column"] = True
+            matrix.append(row)
+            continue
+
+        raw = df[column]
+        column_type = checks.get("type", "string")
+        typed = _typed(raw, column_type)
+        present = raw.notna().to_numpy()
+        column_failed = np.zeros(size, dtype=bool)
+        values = None
+
+        if checks.get("required"):
+            _record(row, column_failed, labels, "required", ~present, f"{column}: missing")
+        if column_type != "string":
+            _record(row, column_failed, labels, "type", present & typed.isna().to_numpy(), f"{column}: not {column_type}")
+        valid = typed.notna().to_numpy()
+        if column_type == "integer":
+            fractional = valid & (typed.fillna(0) % 1 != 0).to_numpy()
+            _record(row, column_failed, labels, "type", fractional, f"{column}: not integer")
+        if "min" in checks or "max" in checks:
+            values = _format_values(typed)
+        if "min" in checks:
+            low = _bound(checks["min"], column_type)
+            mask = valid & (typed < low).to_numpy(dtype=bool, na_value=False)
+            _record(row, column_failed, labels, "min", mask, f"{column}: below min (" + values + f" < {checks['min']})")
+        if "max" in checks:
+            high = _bound(checks["max"], column_type)
+            mask = valid & (typed > high).to_numpy(dtype=bool, na_value=False)
+            _record(row, column_failed, labels, "max", mask, f"{column}: above max (" + values + f" > {checks['max']})")
+        if "regex" in checks:
+            matched = raw.astype("string").str.fullmatch(str(checks["regex"])).to_numpy(dtype=bool, na_value=True)
+            _record(row, column_failed, labels, "regex", present & ~matched, f"{column}: pattern mismatch")
+        if "allowed" in checks:
+            allowed = raw.isin(checks["allowed"]).to_numpy()
+            _record(row, column_failed, labels, "allowed", present & ~allowed, f"{column}: not in allowed values")
+
+        row["rows_failed"] = int(column_failed.sum())
+        any_violation |= column_failed
+        matrix.append(row)
+
+    summary = pd.DataFrame(matrix, columns=["column", *CHECKS, "rows_failed", "missing_column"])
+    return any_violation, join_labels(labels, size), summary
@@ -20,8 +20,55 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_TASKS: int = 4
     TASK_TIMEOUT_SECONDS: int = 300
     
+    # Intermediate Cache Configuration
+    # 进程内热层缓存（最近使用的中间结果 Arrow Table）的字节上限，0 表示禁用
+    INTERMEDIATE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
+    # 预览/查询接口最近响应的缓存字节上限（按 ETag 缓存序列化后的响应体），0 表示禁用
+    PREVIEW_RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    
+    # Parquet Write Defaults (可在工作流节点的 write_policy 中按输出覆盖)
+    PARQUET_ROW_GROUP_SIZE: int = 100_000  # rows per row group
+    PARQUET_COMPRESSION: str = "zstd"  # zstd / lz4 / snappy / gzip / brotli / none
+    PARQUET_DICTIONARY_MAX_RATIO: float = 0.2  # 字符串列 distinct/rows 低于该值时字典编码
+    
+    # 上传的 Excel/CSV 在后台转换为 Parquet（按内容哈希存放），加载节点优先读取转换结果
+    INGEST_ENABLED: bool = True
+    
+    # 多文件/多 sheet 合并加载的并行进程数上限
+    LOADER_MAX_WORKERS: int = 4
+    
+    # 执行前分析下游节点实际用到的列，下推到加载节点只读取这些列，默认关闭
+    # （开启后加载节点自身的缓存、预览、导出和查询也只包含这些列），也可在工作流节点上用 "pushdown": true/false 单独开启或关闭
+    PROJECTION_PUSHDOWN_ENABLED: bool = False
+    
+    # 加载节点输出的 dtype 压缩（文本 -> category/string[pyarrow]、日期解析、整数降位），默认关闭，
+    # 也可在工作流节点上用 "compact_dtypes": true/false 单独开启或关闭
+    DTYPE_COMPACTION_ENABLED: bool = False
+    # 文本列 distinct/rows 不超过该值时转为 category；默认 0 不转换（category 列不能直接写入新值，
+    # 如按固定值填充空值），文本列一律转为 string[pyarrow]
+    DTYPE_CATEGORY_MAX_RATIO: float = 0.0
+    
+    # 分区执行：加载节点 partitioned 模式输出 Parquet 数据集，下游节点每次处理一个分区的行数
+    OUT_OF_CORE_PARTITION_ROWS: int = 1_000_000
+    
+    # SQL 节点的嵌入式引擎（DuckDB）：线程数（0 表示全部 CPU 核）与内存上限（如 "4GB"，空为引擎默认）
+    SQL_ENGINE_THREADS: int = 0
+    SQL_ENGINE_MEMORY_LIMIT: str = ""
+    # 运行输出的即席 SQL 查询接口：执行时间与返回行数上限
+    SQL_QUERY_TIMEOUT_SECONDS: float = 30.0
+    SQL_QUERY_MAX_ROWS: int = 10_000
+    
+    # 模糊名称匹配节点：MinHash 签名与候选对计算的并行线程数（0 表示全部 CPU 核）
+    ENTITY_MATCH_WORKERS: int = 0
+    
+    # 写入中间结果时同时生成列画像 sidecar（预览的 schema/示例值直接读取）
+    COLUMN_PROFILE_ENABLED: bool = True
+    
     # Request Limits (防止DoS攻击)
     MAX_REQUEST_SIZE: int = 10 * 1024 * 1024  # 10MB max request body size
+    # 分块续传：单个文件大小上限与建议分块大小（分块不超过 MAX_REQUEST_SIZE）
+    MAX_UPLOAD_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB
+    UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # 8MB
     REQUEST_TIMEOUT_SECONDS: int = 60  # Maximum request processing time
     
     # Security Configuration
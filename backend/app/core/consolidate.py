@@ -0,0 +1,285 @@
+"""
+多文件 / 多 sheet 合并加载
+- 按 glob 匹配多个工作簿（或一个工作簿的多个 sheet），多进程并行解析
+- 列取并集，各来源同名列的 dtype 统一后纵向拼接，并添加来源文件（及来源 sheet）列
+- 流式路径：每个来源由子进程直接写成一个 Parquet 分片，主进程只汇总 schema，
+  输出为 pyarrow.dataset 可直接打开的分片目录
+"""
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.core.csv_reader import detect_encoding
+from app.core.excel_reader import read_excel, sheet_names
+from app.core.ingest import ingest_store, normalize_dtypes
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+SOURCE_FILE_COLUMN = "source_file"
+SOURCE_SHEET_COLUMN = "source_sheet"
+ALL_SHEETS = "*"
+
+SheetName = Union[int, str]
+# (文件路径, sheet)，CSV 的 sheet 为 None
+Source = Tuple[str, Optional[SheetName]]
+
+
+def _is_csv(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() == ".csv"
+
+
+def expand_sources(paths: Sequence[str], sheets: Optional[Sequence[SheetName]] = None, engine: str = "auto") -> List[Source]:
+    """
+    文件列表 × sheet 列表 -> 来源列表
+    sheets 为空时每个文件读取第一个 sheet，包含 "*" 时读取全部 sheet；CSV 文件忽略 sheets
+    """
+    sheets = list(sheets) if sheets else [0]
+    sources: List[Source] = []
+    for path in paths:
+        if _is_csv(path):
+            sources.append((path, None))
+        elif ALL_SHEETS in sheets:
+            sources.extend((path, name) for name in sheet_names(path, engine))
+        else:
+            sources.extend((path, sheet) for sheet in sheets)
+    return sources
+
+
+def read_source(path: str, sheet: Optional[SheetName], engine: str = "auto") -> pd.DataFrame:
+    """
+    读取单个来源：已有入库转换结果时读取 Parquet，否则直接解析
+    （不在这里触发整本转换，避免同一工作簿的多个 sheet 在多个进程中重复转换）
+    """
+    if settings.INGEST_ENABLED:
+        df = ingest_store.load(path, sheet_name=0 if sheet is None else sheet, convert=False)
+        if df is not None:
+            return df
+    if _is_csv(path):
+        return pd.read_csv(path, encoding=detect_encoding(path))
+    return read_excel(path, sheet_name=sheet, engine=engine)
+
+
+def _sheet_label(path: str, sheet: Optional[SheetName], engine: str) -> str:
+    if sheet is None:
+        return ""
+    if isinstance(sheet, int):
+        return sheet_names(path, engine)[sheet]
+    return sheet
+
+
+def _load_task(path: str, sheet: Optional[SheetName], engine: str, add_sheet_column: bool) -> pd.DataFrame:
+    """子进程任务：读取一个来源并添加来源列"""
+    try:
+        df = read_source(path, sheet, engine)
+    except Exception as e:
+        where = os.path.basename(path) if sheet is None else f"{os.path.basename(path)}[{sheet}]"
+        raise ValueError(f"Failed to read {where}: {e}") from e
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    df[SOURCE_FILE_COLUMN] = os.path.basename(path)
+    if add_sheet_column:
+        df[SOURCE_SHEET_COLUMN] = _sheet_label(path, sheet, engine)
+    return df
+
+
+def _write_task(path: str, sheet: Optional[SheetName], engine: str, add_sheet_column: bool, part_path: str) -> Dict[str, Any]:
+    """子进程任务：读取一个来源并直接写成 Parquet 分片，只返回行数和 dtype"""
+    df = normalize_dtypes(_load_task(path, sheet, engine, add_sheet_column))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, part_path, compression=settings.PARQUET_COMPRESSION)
+    return {
+        "path": part_path,
+        "rows": len(df),
+        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "schema": table.schema.remove_metadata(),
+    }
+
+
+def _conform_task(part_path: str, columns: List[str], targets: Dict[str, str], schema: pa.Schema) -> None:
+    """子进程任务：把分片改写为统一的列顺序、dtype 和 Arrow schema"""
+    df = conform(pq.read_table(part_path).to_pandas(), columns, targets)
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    pq.write_table(table, part_path, compression=settings.PARQUET_COMPRESSION)
+
+
+def reconcile_dtype(dtypes: Sequence[Optional[str]]) -> str:
+    """
+    统一同名列在各来源中的 dtype（None 表示该来源缺少此列）
+    - 相同 dtype 保持不变（整数/布尔列在部分来源缺失时分别放宽为 float64/object 以容纳空值）
+    - 整数与浮点混合 -> float64
+    - 不同精度的日期时间 -> datetime64[ns]
+    - 其他组合（如编号列在一个文件中是数字、在另一个文件中是文本）-> string
+    """
+    present = [d for d in dtypes if d is not None]
+    has_missing = len(present) < len(dtypes)
+    kinds = set()
+    for dtype in present:
+        if dtype.startswith(("int", "uint")):
+            kinds.add("int")
+        elif dtype.startswith("float"):
+            kinds.add("float")
+        elif dtype.startswith("datetime64") and "," not in dtype:
+            kinds.add("datetime")
+        else:
+            kinds.add(dtype)
+
+    if len(set(present)) == 1:
+        target = present[0]
+        if has_missing and "int" in kinds:
+            return "float64"
+        if has_missing and target == "bool":
+            return "object"
+        return target
+    if kinds <= {"int", "float"}:
+        return "int64" if kinds == {"int"} and not has_missing else "float64"
+    if kinds == {"datetime"}:
+        return "datetime64[ns]"
+    return "string"
+
+
+def _to_string(series: pd.Series) -> pd.Series:
+    """转为字符串，空值保持为空；整数值的浮点列（含空值的整数列）按整数格式化"""
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values == values.round()).all():
+            series = series.astype("Int64")
+    return series.astype(object).where(series.notna(), None).map(lambda v: v if v is None else str(v))
+
+
+def conform(df: pd.DataFrame, columns: List[str], targets: Dict[str, str]) -> pd.DataFrame:
+    """按统一的列顺序补齐缺失列，并转换为目标 dtype"""
+    df = df.reindex(columns=columns)
+    for col in columns:
+        target = targets[col]
+        if str(df[col].dtype) == target:
+            continue
+        if target == "string":
+            df[col] = _to_string(df[col])
+        elif target.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col]).astype(target)
+        else:
+            df[col] = df[col].astype(target)
+    return df
+
+
+def unified_schema(columns: List[str], targets: Dict[str, str], schemas: Sequence[pa.Schema]) -> pa.Schema:
+    """
+    统一后的 Arrow schema（保证所有分片完全一致）
+    object 等无法由 dtype 直接确定类型的列，取各分片中第一个非 null 的 Arrow 类型
+    """
+    fields = []
+    for col in columns:
+        target = targets[col]
+        if target == "string":
+            arrow_type = pa.string()
+        elif target.startswith("datetime64"):
+            arrow_type = pa.timestamp("ns")
+        elif target.startswith(("int", "uint", "float")) or target == "bool":
+            arrow_type = pa.from_numpy_dtype(target)
+        else:
+            candidates = [s.field(col).type for s in schemas if col in s.names]
+            arrow_type = next((t for t in candidates if t != pa.null()), pa.null())
+        fields.append(pa.field(col, arrow_type))
+    return pa.schema(fields)
+
+
+def union_columns(column_lists: Sequence[Sequence[str]]) -> List[str]:
+    """列名并集，按首次出现的顺序；来源列放在最后"""
+    columns: List[str] = []
+    seen = set()
+    for names in column_lists:
+        for name in names:
+            if name not in seen and name not in (SOURCE_FILE_COLUMN, SOURCE_SHEET_COLUMN):
+                seen.add(name)
+                columns.append(name)
+    tail = [c for c in (SOURCE_FILE_COLUMN, SOURCE_SHEET_COLUMN) if any(c in names for names in column_lists)]
+    return columns + tail
+
+
+def _reconcile(dtype_maps: Sequence[Dict[str, str]]) -> Tuple[List[str], Dict[str, str]]:
+    columns = union_columns([list(d) for d in dtype_maps])
+    targets = {col: reconcile_dtype([d.get(col) for d in dtype_maps]) for col in columns}
+    return columns, targets
+
+
+def _run_parallel(func: Callable, tasks: List[tuple], max_workers: Optional[int]) -> List[Any]:
+    """
+    在进程池中按顺序执行任务并返回结果；只有一个任务或 max_workers<=1 时在当前进程执行
+    使用 spawn 启动子进程：调用方运行在执行器的线程池中，fork 多线程进程不安全
+    """
+    workers = min(len(tasks), max_workers or settings.LOADER_MAX_WORKERS, os.cpu_count() or 1)
+    if workers <= 1:
+        return [func(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(func, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def consolidate(
+    sources: Sequence[Source],
+    engine: str = "auto",
+    max_workers: Optional[int] = None,
+    add_sheet_column: bool = False,
+) -> pd.DataFrame:
+    """并行读取所有来源，统一 schema 后拼接为一个 DataFrame（按来源顺序）"""
+    if not sources:
+        raise ValueError("No sources to consolidate")
+    frames = _run_parallel(_load_task, [(path, sheet, engine, add_sheet_column) for path, sheet in sources], max_workers)
+    columns, targets = _reconcile([{col: str(dtype) for col, dtype in df.dtypes.items()} for df in frames])
+    result = pd.concat([conform(df, columns, targets) for df in frames], ignore_index=True)
+    logger.info("consolidate_completed", sources=len(sources), rows=len(result), columns=len(columns))
+    return result
+
+
+def consolidate_to_dataset(
+    sources: Sequence[Source],
+    output_dir: str,
+    engine: str = "auto",
+    max_workers: Optional[int] = None,
+    add_sheet_column: bool = False,
+) -> Dict[str, Any]:
+    """
+    并行把每个来源写为一个 Parquet 分片（part-00000.parquet ...），再把 dtype 与统一 schema 不同的分片改写
+    主进程不持有数据；先写临时目录再整体替换，目录出现即表示写入完成
+
+    返回: {"path", "rows", "parts", "schema", "dtypes"}
+    """
+    if not sources:
+        raise ValueError("No sources to consolidate")
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = os.path.join(parent, f".{os.path.basename(output_dir)}.{uuid.uuid4().hex[:8]}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        tasks = [
+            (path, sheet, engine, add_sheet_column, os.path.join(tmp_dir, f"part-{i:05d}.parquet"))
+            for i, (path, sheet) in enumerate(sources)
+        ]
+        parts = _run_parallel(_write_task, tasks, max_workers)
+        columns, targets = _reconcile([part["dtypes"] for part in parts])
+        schema = unified_schema(columns, targets, [part["schema"] for part in parts])
+
+        # 列顺序或类型与统一 schema 不一致的分片需要改写
+        rewrite = [(part["path"], columns, targets, schema) for part in parts if not part["schema"].equals(schema)]
+        if rewrite:
+            _run_parallel(_conform_task, rewrite, max_workers)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = sum(part["rows"] for part in parts)
+    logger.info("consolidate_dataset_completed", sources=len(sources), rows=rows, rewritten=len(rewrite), path=output_dir)
+    return {"path": output_dir, "rows": rows, "parts": len(parts), "schema": schema, "dtypes": targets}
@@ -1,15 +1,119 @@
+import json
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
 import uuid
-from typing import Any
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.lru_cache import ByteLRUCache
+from app.core.column_profile import compute_profile, read_profile, write_profile
+from app.core.dataset import DatasetHandle
+
+SUPPORTED_PARQUET_CODECS = ("zstd", "lz4", "snappy", "gzip", "brotli", "none")
+
+# 按引用缓存的数据集在缓存目录中的引用记录 {node_id}_{idx}.ref.json（内容为数据集路径）
+REFERENCE_SUFFIX = ".ref.json"
+
+# Parquet footer 中记录排序列的 key（供下游读取方判断数据是否有序）
+SORT_BY_METADATA_KEY = b"audit.sort_by"
+
+
+@dataclass
+class ParquetWritePolicy:
+    """
+    单个输出的 Parquet 写入策略
+
+    - row_group_size: 每个 row group 的行数，小 row group 便于预览/过滤时按统计信息裁剪
+    - compression / compression_level: 压缩编码（zstd/lz4/snappy/gzip/brotli/none）
+    - sort_by: 写入前按这些列排序（如日期、科目），使 min/max 统计具有裁剪价值
+    - dictionary_max_ratio: 字符串列 distinct/行数 不超过该比例时使用字典编码
+    - write_statistics / write_page_index: 写入列统计和页级索引
+    """
+    row_group_size: int = settings.PARQUET_ROW_GROUP_SIZE
+    compression: str = settings.PARQUET_COMPRESSION
+    compression_level: Optional[int] = None
+    sort_by: List[str] = field(default_factory=list)
+    dictionary_max_ratio: float = settings.PARQUET_DICTIONARY_MAX_RATIO
+    write_statistics: bool = True
+    write_page_index: bool = True
+
+    def __post_init__(self):
+        self.compression = (self.compression or "none").lower()
+        if self.compression not in SUPPORTED_PARQUET_CODECS:
+            raise ValueError(
+                f"Unsupported Parquet compression '{self.compression}'. "
+                f"Supported: {', '.join(SUPPORTED_PARQUET_CODECS)}"
+            )
+        if self.row_group_size <= 0:
+            raise ValueError("row_group_size must be positive")
+        if isinstance(self.sort_by, str):
+            self.sort_by = [c.strip() for c in self.sort_by.split(",") if c.strip()]
+
+    @classmethod
+    def from_dict(cls, config: Optional[Dict[str, Any]]) -> "ParquetWritePolicy":
+        """从工作流节点配置构造策略，忽略未知字段"""
+        if not config:
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+    def dictionary_columns(self, table: pa.Table) -> List[str]:
+        """选出低基数的字符串列做字典编码"""
+        if table.num_rows == 0:
+            return []
+        columns = []
+        for name, column in zip(table.column_names, table.columns):
+            col_type = column.type
+            if pa.types.is_dictionary(col_type):
+                columns.append(name)
+            elif pa.types.is_string(col_type) or pa.types.is_large_string(col_type):
+                distinct = pc.count_distinct(column).as_py()
+                if distinct <= table.num_rows * self.dictionary_max_ratio:
+                    columns.append(name)
+        return columns
+
+    def write(self, table: pa.Table, filepath: str) -> pa.Table:
+        """
+        按策略写入 Parquet
+        返回: 实际写入的 Table（排序后）
+        """
+        sort_keys = [c for c in self.sort_by if c in table.column_names]
+        if sort_keys:
+            table = table.sort_by([(c, "ascending") for c in sort_keys])
+            metadata = dict(table.schema.metadata or {})
+            metadata[SORT_BY_METADATA_KEY] = ",".join(sort_keys).encode("utf-8")
+            table = table.replace_schema_metadata(metadata)
+
+        pq.write_table(
+            table,
+            filepath,
+            row_group_size=self.row_group_size,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=self.dictionary_columns(table),
+            write_statistics=self.write_statistics,
+            write_page_index=self.write_page_index,
+        )
+        return table
+
 
 class DataManager:
     """
     负责数据的序列化与缓存管理 (Parquet/Arrow)
+
+    两级缓存：
+    - 热层: 进程内按字节限制的 LRU，缓存最近使用的 Arrow Table
+    - 冷层: 磁盘 Parquet 文件
     """
-    def __init__(self, cache_dir="cache"):
+    def __init__(self, cache_dir="cache", memory_cache_bytes: Optional[int] = None):
         self.cache_dir = cache_dir
         os.makedirs(self.cache_dir, exist_ok=True)
+        if memory_cache_bytes is None:
+            memory_cache_bytes = settings.INTERMEDIATE_CACHE_MAX_BYTES
+        self.memory_cache = ByteLRUCache(memory_cache_bytes)
 
     def save_intermediate(
         self, 
@@ -17,27 +121,43 @@ class DataManager:
         node_id: str, 
         data: Any, 
         slot_index: int = 0,
-        custom_cache_dir: str = None
+        custom_cache_dir: str = None,
+        write_policy: Optional[ParquetWritePolicy] = None
     ) -> str:
         """
         缓存中间结果，如果是 DataFrame 则存为 Parquet
+        数据集句柄：未经选择/过滤的磁盘数据集直接返回其路径（不复制），其他按 Arrow 写入，不经过 pandas
+        write_policy: Parquet 写入策略（row group、排序、编码、压缩），默认使用全局配置
         返回: 缓存路径 或 原始数据的引用(如果无需缓存)
         """
-        if isinstance(data, pd.DataFrame):
-            # 使用自定义缓存目录（项目化执行）或默认缓存目录（临时执行）
-            if custom_cache_dir:
-                cache_dir = custom_cache_dir
-            else:
-                cache_dir = os.path.join(self.cache_dir, prompt_id)
-            
+        # 使用自定义缓存目录（项目化执行）或默认缓存目录（临时执行）
+        if custom_cache_dir:
+            cache_dir = custom_cache_dir
+        else:
+            cache_dir = os.path.join(self.cache_dir, prompt_id)
+        if isinstance(data, DatasetHandle) and data.is_plain_file:
+            # 不复制数据，只在缓存目录记录引用（运行输出查询通过 output_paths 解析）
+            os.makedirs(cache_dir, exist_ok=True)
+            reference = os.path.join(cache_dir, f"{node_id}_{slot_index}{REFERENCE_SUFFIX}")
+            with open(reference, "w", encoding="utf-8") as f:
+                json.dump({"path": os.path.abspath(data.path)}, f, ensure_ascii=False)
+            return data.path
+        if isinstance(data, (pd.DataFrame, DatasetHandle)):
             os.makedirs(cache_dir, exist_ok=True)
             
             filename = f"{node_id}_{slot_index}.parquet"
             filepath = os.path.join(cache_dir, filename)
             
-            # 使用 PyArrow 引擎写入 Parquet
-            data.to_parquet(filepath, engine='pyarrow', index=False)
-            print(f"[DataManager] Cached DataFrame to {filepath} (Shape: {data.shape})")
+            # 使用 PyArrow 写入 Parquet，同时放入内存热层（写穿透）
+            if isinstance(data, DatasetHandle):
+                table = data.to_table()
+            else:
+                table = pa.Table.from_pandas(data, preserve_index=False)
+            table = (write_policy or ParquetWritePolicy()).write(table, filepath)
+            self.memory_cache.put(self._cache_key(filepath), table)
+            if settings.COLUMN_PROFILE_ENABLED:
+                self._write_profile(filepath, table)
+            print(f"[DataManager] Cached DataFrame to {filepath} (Shape: {(table.num_rows, table.num_columns)})")
             return filepath
         
         # 其他类型暂不缓存到磁盘 (或者可以使用 pickle/json)
@@ -50,59 +170,196 @@ class DataManager:
         会尝试多个可能的路径来查找文件
         """
         if isinstance(filepath_or_data, str) and filepath_or_data.endswith(".parquet"):
-            # 尝试多个可能的路径
-            possible_paths = []
-            
-            # 如果是绝对路径，直接使用
-            if os.path.isabs(filepath_or_data):
-                possible_paths.append(filepath_or_data)
-            else:
-                # 相对路径，尝试多个位置
-                possible_paths.extend([
-                    filepath_or_data,  # 相对路径（相对于当前工作目录）
-                    os.path.join(self.cache_dir, filepath_or_data),  # 相对于cache_dir
-                    os.path.join(os.getcwd(), filepath_or_data),  # 相对于当前工作目录
-                    os.path.abspath(filepath_or_data),  # 绝对路径版本
-                ])
-            
-            # 如果路径包含cache目录，也尝试从项目根目录查找
-            if "cache" in filepath_or_data:
-                # 尝试从项目根目录查找（如果当前在backend目录）
-                current_dir = os.getcwd()
-                if os.path.basename(current_dir) == 'backend':
-                    # 在backend目录，尝试从上级目录查找
-                    project_root = os.path.dirname(current_dir)
-                    possible_paths.append(os.path.join(project_root, filepath_or_data))
-                else:
-                    # 在项目根目录，直接使用
-                    possible_paths.append(os.path.join(current_dir, filepath_or_data))
-            
-            # 去重
-            possible_paths = list(dict.fromkeys(possible_paths))
-            
-            # 尝试每个路径
-            for path in possible_paths:
-                if os.path.exists(path):
-                    print(f"[DataManager] Loading DataFrame from {os.path.abspath(path)}")
-                    return pd.read_parquet(path, engine='pyarrow')
-            
-            # 如果所有路径都不存在，打印所有尝试的路径以便调试
-            print(f"[DataManager] Warning: Parquet file not found: {filepath_or_data}")
-            print(f"[DataManager] Tried paths:")
-            for path in possible_paths:
-                print(f"  - {os.path.abspath(path)}")
-            return None
+            table = self.load_table(filepath_or_data)
+            if table is None:
+                return None
+            return table.to_pandas()
             
         return filepath_or_data
 
+    def load_table(self, filepath: str) -> Optional[pa.Table]:
+        """
+        读取中间结果为 Arrow Table
+        优先命中内存热层，未命中时从 Parquet 读取并回填
+        """
+        path = self.resolve_path(filepath)
+        if path is None:
+            return None
+        
+        key = self._cache_key(path)
+        table = self.memory_cache.get(key)
+        if table is not None:
+            return table
+        
+        print(f"[DataManager] Loading DataFrame from {os.path.abspath(path)}")
+        table = pq.read_table(path)
+        self.memory_cache.put(key, table)
+        return table
+
+    def load_profile(self, filepath: str) -> Optional[Dict[str, Any]]:
+        """
+        读取写入时预计算的列画像 sidecar（null 数、近似 distinct、min/max、top 值、直方图）
+        旧缓存没有 sidecar 时返回 None
+        """
+        path = self.resolve_path(filepath)
+        if path is None:
+            return None
+        return read_profile(path)
+
+    def _write_profile(self, filepath: str, table: pa.Table):
+        """计算并写入列画像，失败不影响中间结果本身"""
+        try:
+            write_profile(filepath, compute_profile(table))
+        except Exception as e:
+            print(f"[DataManager] Warning: Failed to profile {filepath}: {e}")
+
+    def read_metadata(self, filepath: str) -> Optional[pq.FileMetaData]:
+        """
+        只读取 Parquet footer（行数、Schema、row group 统计），不解码数据页
+        """
+        path = self.resolve_path(filepath)
+        if path is None:
+            return None
+        return pq.read_metadata(path)
+
+    def read_head(
+        self,
+        filepath: str,
+        limit: int,
+        columns: Optional[List[str]] = None
+    ) -> Optional[pa.Table]:
+        """
+        读取前 limit 行
+        热层命中时直接切片；否则只读取覆盖前 limit 行所需的 row group，并只解码指定列
+        """
+        path = self.resolve_path(filepath)
+        if path is None:
+            return None
+        
+        cached = self.memory_cache.get(self._cache_key(path))
+        if cached is not None:
+            table = cached.select(columns) if columns else cached
+            return table.slice(0, limit)
+        
+        parquet_file = pq.ParquetFile(path)
+        row_groups = []
+        rows = 0
+        for index in range(parquet_file.metadata.num_row_groups):
+            if rows >= limit:
+                break
+            row_groups.append(index)
+            rows += parquet_file.metadata.row_group(index).num_rows
+        
+        if not row_groups:
+            return parquet_file.schema_arrow.empty_table().select(columns or parquet_file.schema_arrow.names)
+        table = parquet_file.read_row_groups(row_groups, columns=columns)
+        return table.slice(0, limit)
+
+    def resolve_path(self, filepath: str) -> Optional[str]:
+        """
+        在多个候选位置查找缓存文件
+        返回: 第一个存在的路径，找不到时返回 None
+        """
+        # 尝试多个可能的路径
+        possible_paths = []
+        
+        # 如果是绝对路径，直接使用
+        if os.path.isabs(filepath):
+            possible_paths.append(filepath)
+        else:
+            # 相对路径，尝试多个位置
+            possible_paths.extend([
+                filepath,  # 相对路径（相对于当前工作目录）
+                os.path.join(self.cache_dir, filepath),  # 相对于cache_dir
+                os.path.join(os.getcwd(), filepath),  # 相对于当前工作目录
+                os.path.abspath(filepath),  # 绝对路径版本
+            ])
+        
+        # 如果路径包含cache目录，也尝试从项目根目录查找
+        if "cache" in filepath:
+            # 尝试从项目根目录查找（如果当前在backend目录）
+            current_dir = os.getcwd()
+            if os.path.basename(current_dir) == 'backend':
+                # 在backend目录，尝试从上级目录查找
+                project_root = os.path.dirname(current_dir)
+                possible_paths.append(os.path.join(project_root, filepath))
+            else:
+                # 在项目根目录，直接使用
+                possible_paths.append(os.path.join(current_dir, filepath))
+        
+        # 去重
+        possible_paths = list(dict.fromkeys(possible_paths))
+        
+        # 尝试每个路径
+        for path in possible_paths:
+            if os.path.exists(path):
+                return path
+        
+        # 如果所有路径都不存在，打印所有尝试的路径以便调试
+        print(f"[DataManager] Warning: Parquet file not found: {filepath}")
+        print(f"[DataManager] Tried paths:")
+        for path in possible_paths:
+            print(f"  - {os.path.abspath(path)}")
+        return None
+
+    def output_paths(self, cache_dir: str) -> Dict[str, str]:
+        """
+        运行缓存目录中的输出 -> {"{node_id}_{idx}": 路径}
+        包括写入缓存目录的 Parquet 和按引用缓存的数据集（引用的数据集已不存在时跳过）
+        """
+        outputs: Dict[str, str] = {}
+        if not os.path.isdir(cache_dir):
+            return outputs
+        for entry in sorted(os.listdir(cache_dir)):
+            path = os.path.join(cache_dir, entry)
+            if entry.endswith(REFERENCE_SUFFIX):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        target = json.load(f)["path"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+                if os.path.exists(target):
+                    outputs[entry[: -len(REFERENCE_SUFFIX)]] = target
+            elif entry.endswith(".parquet") and os.path.isfile(path):
+                outputs[entry[: -len(".parquet")]] = path
+        return outputs
+
+    def invalidate_dir(self, directory: str) -> int:
+        """
+        使某个目录下所有中间结果的内存缓存失效（删除运行/项目时调用）
+        返回: 失效的条目数
+        """
+        prefix = self._cache_key(directory).rstrip(os.sep) + os.sep
+        removed = self.memory_cache.invalidate_where(lambda key: key.startswith(prefix))
+        if removed:
+            print(f"[DataManager] Invalidated {removed} cached tables under {directory}")
+        return removed
+
     def cleanup(self, prompt_id: str):
         """
         清理指定任务的缓存
         """
         prompt_dir = os.path.join(self.cache_dir, prompt_id)
+        self.invalidate_dir(prompt_dir)
         if os.path.exists(prompt_dir):
             import shutil
             shutil.rmtree(prompt_dir)
             print(f"[DataManager] Cleaned up cache for {prompt_id}")
 
+    def fingerprint(self, filepath: str) -> Optional[str]:
+        """
+        缓存文件指纹（规范化路径 + 大小 + 修改时间）
+        运行完成后输出不再变化，指纹可用于 ETag；重新写入同一路径时指纹随之改变
+        """
+        path = self.resolve_path(filepath)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        return f"{self._cache_key(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def _cache_key(path: str) -> str:
+        """内存缓存的 key：规范化后的绝对路径"""
+        return os.path.realpath(path)
+
 data_manager = DataManager()
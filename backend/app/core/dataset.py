@@ -0,0 +1,219 @@
+"""
+惰性数据集句柄 (DatasetHandle)
+节点之间除了 pandas DataFrame，还可以传递数据集句柄：背后是内存中的 Arrow Table，
+或磁盘上的 Parquet 文件 / Parquet 分片目录 / Arrow IPC 文件的引用。
+
+- 不读取数据即可得到 schema 和行数（Parquet 直接读元数据）
+- 列选择、行过滤只记录在句柄上，读取时才下推到扫描
+- 只有需要 pandas 的节点（输入类型为 DATAFRAME）才物化为 DataFrame，且只读取用到的列；
+  能直接处理 Arrow 的节点（输入类型为 DATASET）不付出 pandas 转换的开销
+- 分区句柄（partition_rows 不为空，由加载节点的 partitioned 模式产生）按分区逐块转换为 DataFrame，
+  执行器据此以分区为单位执行节点（见 app.core.out_of_core）
+"""
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+IPC_EXTENSIONS = (".arrow", ".feather", ".ipc")
+DEFAULT_PARTITION_ROWS = 1_000_000
+
+
+class DatasetHandle:
+    """
+    惰性数据集：数据源 + 列选择 + 行过滤
+    select()/filter() 返回新的句柄，不修改原句柄，也不读取数据
+    """
+
+    def __init__(
+        self,
+        source: Union[pa.Table, str],
+        columns: Optional[Sequence[str]] = None,
+        filter: Optional[ds.Expression] = None,
+        partition_rows: Optional[int] = None,
+    ):
+        if isinstance(source, pa.Table):
+            self.path: Optional[str] = None
+            self._dataset = ds.dataset(source)
+        elif isinstance(source, str):
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Dataset not found: {source}")
+            self.path = source
+            fmt = "ipc" if os.path.splitext(source)[1].lower() in IPC_EXTENSIONS else "parquet"
+            self._dataset = ds.dataset(source, format=fmt)
+        else:
+            raise TypeError(f"Unsupported dataset source: {type(source).__name__}")
+
+        names = self._dataset.schema.names
+        if columns is not None:
+            missing = [c for c in columns if c not in names]
+            if missing:
+                raise ValueError(f"Columns not found: {missing}. Available columns: {names}")
+        self.columns: Optional[List[str]] = list(columns) if columns is not None else None
+        self.filter_expression = filter
+        # 非空时表示按分区（每个分区约 partition_rows 行）处理，不整体物化
+        self.partition_rows = partition_rows
+        self._num_rows: Optional[int] = None
+
+    @classmethod
+    def from_pandas(cls, df: pd.DataFrame) -> "DatasetHandle":
+        return cls(pa.Table.from_pandas(df, preserve_index=False))
+
+    def _derive(self, columns: Optional[Sequence[str]], filter: Optional[ds.Expression]) -> "DatasetHandle":
+        handle = DatasetHandle.__new__(DatasetHandle)
+        handle.path = self.path
+        handle._dataset = self._dataset
+        handle.columns = list(columns) if columns is not None else None
+        handle.filter_expression = filter
+        handle.partition_rows = self.partition_rows
+        handle._num_rows = None
+        return handle
+
+    # ---- 元数据（不读取数据） ----
+
+    @property
+    def schema(self) -> pa.Schema:
+        schema = self._dataset.schema
+        if self.columns is None:
+            return schema
+        return pa.schema([schema.field(c) for c in self.columns])
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.schema.names
+
+    @property
+    def num_rows(self) -> int:
+        """行数：无过滤条件时 Parquet 只读元数据"""
+        if self._num_rows is None:
+            self._num_rows = self._dataset.count_rows(filter=self.filter_expression)
+        return self._num_rows
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def is_plain_file(self) -> bool:
+        """是否为未经选择/过滤的磁盘数据集（可以直接引用其路径）"""
+        return self.path is not None and self.columns is None and self.filter_expression is None
+
+    def __repr__(self) -> str:
+        source = self.path or "<memory>"
+        return f"DatasetHandle({source}, columns={len(self.column_names)}, filtered={self.filter_expression is not None})"
+
+    # ---- 惰性变换 ----
+
+    def select(self, columns: Sequence[str]) -> "DatasetHandle":
+        """列选择（列名必须存在于当前 schema）"""
+        missing = [c for c in columns if c not in self.column_names]
+        if missing:
+            raise ValueError(f"Columns not found: {missing}. Available columns: {self.column_names}")
+        return self._derive(columns, self.filter_expression)
+
+    def filter(self, expression: ds.Expression) -> "DatasetHandle":
+        """行过滤（pyarrow.dataset 表达式，与已有条件取交集）"""
+        if self.filter_expression is not None:
+            expression = self.filter_expression & expression
+        return self._derive(self.columns, expression)
+
+    def arrow_source(self) -> Union[ds.Dataset, pa.Table]:
+        """
+        供外部引擎（如 DuckDB）扫描的 Arrow 对象：未选择/过滤时为数据集本身，
+        引擎可把列选择和过滤条件下推到扫描；否则读取为 Table（只读取选择的列和满足条件的行）
+        """
+        if self.columns is None and self.filter_expression is None:
+            return self._dataset
+        return self.to_table()
+    
+    # ---- 物化 ----
+
+    def _scan_columns(self, columns: Optional[Sequence[str]]) -> Optional[List[str]]:
+        if columns is None:
+            return self.columns
+        missing = [c for c in columns if c not in self.column_names]
+        if missing:
+            raise ValueError(f"Columns not found: {missing}. Available columns: {self.column_names}")
+        return list(columns)
+
+    def to_table(self, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """读取为 Arrow Table（只扫描需要的列，过滤条件下推到扫描）"""
+        return self._dataset.to_table(columns=self._scan_columns(columns), filter=self.filter_expression)
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """物化为 pandas DataFrame"""
+        return self.to_table(columns).to_pandas(date_as_object=False)
+
+    def head(self, n: int = 5, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """读取前 n 行（只扫描到满足行数为止）"""
+        table = self._dataset.head(n, columns=self._scan_columns(columns), filter=self.filter_expression)
+        return table.to_pandas(date_as_object=False)
+
+    def to_batches(self, columns: Optional[Sequence[str]] = None):
+        """按批迭代 RecordBatch，内存占用与数据集大小无关"""
+        return self._dataset.to_batches(columns=self._scan_columns(columns), filter=self.filter_expression)
+
+    def iter_partitions(self, rows: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        按分区迭代 DataFrame：把扫描得到的批拼接到约 rows 行再转换，
+        同时在内存中的只有一个分区；数据集为空时产出一个只含列结构的空 DataFrame
+        """
+        rows = rows or self.partition_rows or DEFAULT_PARTITION_ROWS
+        schema = None
+        pending: List[pa.RecordBatch] = []
+        pending_rows = 0
+        emitted = False
+        for batch in self._dataset.to_batches(
+            columns=self._scan_columns(columns), filter=self.filter_expression, batch_size=rows
+        ):
+            schema = batch.schema
+            if batch.num_rows == 0:
+                continue
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= rows:
+                emitted = True
+                yield pa.Table.from_batches(pending).to_pandas(date_as_object=False)
+                pending, pending_rows = [], 0
+        if pending or not emitted:
+            if not pending:
+                names = self._scan_columns(columns) or self.column_names
+                table = (schema or pa.schema([self.schema.field(c) for c in names])).empty_table()
+            else:
+                table = pa.Table.from_batches(pending)
+            yield table.to_pandas(date_as_object=False)
+
+    def aggregate(self, aggregations: Sequence[tuple], group_by: Sequence[str] = ()) -> pa.Table:
+        """
+        在 Arrow 上聚合，只读取分组列和聚合列
+        aggregations: [(列名, "sum"/"count"/"mean"/"min"/"max"/...), ...]，结果列名为 "{列名}_{函数}"
+        """
+        needed = list(dict.fromkeys(list(group_by) + [column for column, _ in aggregations]))
+        return self.to_table(needed).group_by(list(group_by)).aggregate(list(aggregations))
+
+
+def is_dataset(value: Any) -> bool:
+    return isinstance(value, DatasetHandle)
+
+
+def materialize(value: Any, columns: Optional[Sequence[str]] = None) -> Any:
+    """
+    数据集句柄 -> DataFrame（其他值原样返回）
+    columns 为执行计划计算出的所需列：只读取其中存在的列，不存在的列名忽略
+    """
+    if not isinstance(value, DatasetHandle):
+        return value
+    if columns is not None:
+        wanted = set(columns)
+        columns = [c for c in value.column_names if c in wanted]
+    return value.to_pandas(columns)
+
+
+def dataset_info(handle: DatasetHandle) -> Dict[str, Any]:
+    """schema 与行数概要（不读取数据）"""
+    return {
+        "path": handle.path,
+        "rows": handle.num_rows,
+        "columns": [{"name": f.name, "type": str(f.type)} for f in handle.schema],
+    }
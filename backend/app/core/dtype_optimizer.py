@@ -0,0 +1,122 @@
+"""
+DataFrame dtype 压缩
+read_excel 得到的 DataFrame 中，科目编码、往来单位、日期等大多是 object 列，金额是 float64，
+内存通常是实际需要的 5~10 倍。按列选择更紧凑的类型：
+- 文本列 -> string[pyarrow]（连续内存，不再每个值一个 Python 对象）
+- 低基数文本列（科目、往来单位等）-> category（需指定 category_max_ratio 开启，
+  category 列写入不在类别中的值会报错）
+- 全部可解析为日期的文本列 / datetime 对象列 -> datetime64[ns]
+- 整数列在取值范围允许时无损降位（int64 -> int32/int16/int8）
+浮点列（金额）不降精度；数字与文本混杂的列保持不变
+"""
+import re
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 日期文本：2024-01-31 / 2024/1/31 / 2024.01.31 / 2024年1月31日，可带时间
+DATE_PATTERN = re.compile(r"^\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+# 少于该行数时不转换 category（基数比例没有意义）
+CATEGORY_MIN_ROWS = 50
+
+
+def _is_text(values: pd.Series) -> bool:
+    return bool(values.map(type).eq(str).all())
+
+
+def _parse_dates(values: pd.Series) -> Optional[pd.Series]:
+    """所有非空值都是日期文本且都能解析时返回解析结果，否则返回 None"""
+    stripped = values.str.strip()
+    if not stripped.str.match(DATE_PATTERN).all():
+        return None
+    normalized = stripped.str.replace("年", "-").str.replace("月", "-").str.replace("日", "")
+    parsed = pd.to_datetime(normalized, errors="coerce", format="mixed")
+    if parsed.isna().any():
+        return None
+    return parsed
+
+
+def _compact_object(series: pd.Series, category_max_ratio: float, parse_dates: bool) -> Optional[pd.Series]:
+    values = series.dropna()
+    if values.empty:
+        return None
+    if not _is_text(values):
+        if parse_dates and values.map(lambda v: isinstance(v, date)).all():
+            try:
+                return pd.to_datetime(series)
+            except (ValueError, TypeError, OverflowError):
+                return None
+        # 数字与文本混杂等情况保持原样
+        return None
+
+    if parse_dates:
+        parsed = _parse_dates(values)
+        if parsed is not None:
+            return parsed.reindex(series.index)
+
+    if (category_max_ratio > 0 and len(series) >= CATEGORY_MIN_ROWS
+            and values.nunique() <= category_max_ratio * len(series)):
+        return series.astype("category")
+    return series.astype("string[pyarrow]")
+
+
+def compact_dtypes(
+    df: pd.DataFrame,
+    category_max_ratio: Optional[float] = None,
+    parse_dates: bool = True,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    按列压缩 dtype，返回 (新 DataFrame, 报告)，不修改传入的 DataFrame
+
+    Args:
+        category_max_ratio: distinct/rows 不超过该比例的文本列转为 category，默认取配置（0 表示不转换）
+        parse_dates: 是否解析日期文本
+
+    Returns:
+        报告: {"rows", "memory_before", "memory_after", "saved_bytes", "saved_ratio",
+               "columns": {列名: {"from", "to"}}}（只列出类型发生变化的列）
+    """
+    if category_max_ratio is None:
+        category_max_ratio = settings.DTYPE_CATEGORY_MAX_RATIO
+    memory_before = int(df.memory_usage(deep=True).sum())
+
+    result = df.copy(deep=False)
+    changed: Dict[str, Dict[str, str]] = {}
+    for col in df.columns:
+        series = df[col]
+        compacted = None
+        if series.dtype == object:
+            compacted = _compact_object(series, category_max_ratio, parse_dates)
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            compacted = pd.to_numeric(series, downcast="integer")
+        if compacted is not None and compacted.dtype != series.dtype:
+            result[col] = compacted
+            changed[str(col)] = {"from": str(series.dtype), "to": str(compacted.dtype)}
+
+    memory_after = int(result.memory_usage(deep=True).sum())
+    report = {
+        "rows": len(df),
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+        "saved_bytes": memory_before - memory_after,
+        "saved_ratio": round(1 - memory_after / memory_before, 4) if memory_before else 0.0,
+        "columns": changed,
+    }
+    return result, report
+
+
+def compact_outputs(outputs: Tuple[Any, ...], **kwargs) -> Tuple[Tuple[Any, ...], Dict[int, Dict[str, Any]]]:
+    """压缩节点输出中的每个 DataFrame，返回 (新输出, {输出序号: 报告})"""
+    compacted = []
+    reports: Dict[int, Dict[str, Any]] = {}
+    for idx, value in enumerate(outputs):
+        if isinstance(value, pd.DataFrame) and not value.empty:
+            value, reports[idx] = compact_dtypes(value, **kwargs)
+        compacted.append(value)
+    return tuple(compacted), reports
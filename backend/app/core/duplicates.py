@@ -0,0 +1,241 @@
+"""
+重复/疑似重复交易检测
+关键列（如供应商、金额、发票号）规范化后整行哈希为 64 位整数，所有比较都在哈希上进行：
+
+- 完全重复：关键列哈希相同的行
+- 疑似重复：匹配列（如供应商 + 金额）哈希相同、日期相差不超过 N 天的行；
+  按 (哈希, 日期) 排序后只比较相邻行，相邻间隔不超过窗口的行连成一组
+- 历史比对：哈希索引（每行 key_hash / near_hash / 日期 / 期间 / 行号，约 30 字节）按项目保存为 Parquet，
+  新期间的数据只与索引比对，无需重新读取历史数据；同一期间重复运行时替换该期间的索引
+"""
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_COLUMNS = ["key_hash", "near_hash", "date", "period", "record_id"]
+# 无效行（关键列为空）的哈希
+_NO_HASH = np.uint64(0)
+
+
+def _normalized(series: pd.Series) -> pd.Series:
+    """规范化关键列：数值统一为保留两位小数的 float，日期统一为 datetime，文本去掉首尾空白"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(str)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float).round(2)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ns]")
+    return series.astype("string").str.strip()
+
+
+def hash_rows(df: pd.DataFrame, columns: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    关键列 -> (每行 64 位哈希, 有效掩码)
+    任一关键列为空的行无效（空发票号不应互相匹配）
+    """
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64), np.zeros(len(df), dtype=bool)
+    frame = pd.DataFrame({col: _normalized(df[col]) for col in columns})
+    valid = frame.notna().all(axis=1).to_numpy()
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+    return np.where(valid, hashes, _NO_HASH), valid
+
+
+def parse_columns(columns: str) -> List[str]:
+    return [c.strip() for c in (columns or "").split(",") if c.strip()]
+
+
+def _exact_groups(key_hash: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """完全重复 -> (命中掩码, 组号 = 组内第一行的位置)"""
+    hashes = pd.Series(key_hash)
+    hit = valid & hashes.duplicated(keep=False).to_numpy()
+    first = pd.Series(np.arange(len(hashes))).groupby(hashes.to_numpy()).transform("first").to_numpy()
+    return hit, first
+
+
+def _window_clusters(near_hash: np.ndarray, days: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    按 (哈希, 日期) 排序，相邻行哈希相同且间隔不超过 window 天时属于同一组
+    返回 (排序位置, 组号, 与相邻行的最小间隔天数, 组大小)，均按排序后的顺序
+    """
+    order = np.lexsort((days, near_hash))
+    h = near_hash[order]
+    d = days[order]
+    gap = np.diff(d).astype(float)
+    linked = (h[1:] == h[:-1]) & (gap <= window)
+    starts = np.concatenate([[True], ~linked])
+    cluster = np.cumsum(starts) - 1
+    # 与前一行 / 后一行（同组内）的间隔，取较小者
+    before = np.concatenate([[np.inf], np.where(linked, gap, np.inf)])
+    after = np.concatenate([np.where(linked, gap, np.inf), [np.inf]])
+    nearest = np.minimum(before, after)
+    sizes = np.bincount(cluster)[cluster]
+    return order, cluster, nearest, sizes
+
+
+def _day_numbers(dates: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """日期 -> (自纪元起的天数, 有效掩码)"""
+    parsed = pd.to_datetime(dates, errors="coerce")
+    valid = parsed.notna().to_numpy()
+    days = (parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64))
+    return np.where(valid, days, 0), valid
+
+
+class DuplicateIndex:
+    """按项目保存的哈希索引（Parquet），每个期间一段"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, exclude_period: Optional[str] = None) -> pd.DataFrame:
+        if not os.path.exists(self.path):
+            return pd.DataFrame({
+                "key_hash": np.empty(0, dtype=np.uint64), "near_hash": np.empty(0, dtype=np.uint64),
+                "date": pd.Series(dtype="datetime64[ns]"), "period": pd.Series(dtype=object),
+                "record_id": np.empty(0, dtype=np.int64),
+            })
+        filters = [("period", "!=", exclude_period)] if exclude_period else None
+        return pq.read_table(self.path, filters=filters).to_pandas()
+
+    def replace_period(self, period: str, entries: pd.DataFrame) -> int:
+        """替换某期间的索引（先写临时文件再替换，中途失败不破坏原索引），返回索引总行数"""
+        kept = self.load(exclude_period=period)
+        combined = pd.concat([kept, entries[INDEX_COLUMNS]], ignore_index=True)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        table = pa.Table.from_pandas(combined, preserve_index=False)
+        tmp_path = f"{self.path}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, self.path)
+        return len(combined)
+
+
+def detect_duplicates(
+    df: pd.DataFrame,
+    key_columns: Sequence[str],
+    near_columns: Sequence[str] = (),
+    date_column: Optional[str] = None,
+    window_days: int = 0,
+    history: Optional[pd.DataFrame] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    检测重复与疑似重复
+
+    返回 (命中行：原始列 + duplicate_type / duplicate_group / matched_with / days_apart,
+          本期哈希索引条目：key_hash / near_hash / date / record_id)
+    duplicate_type（一行命中多种时取靠前者）: exact（本期内）, history_exact（与历史期间）,
+    near（本期内）, history_near（与历史期间）
+    """
+    missing = [c for c in list(key_columns) + list(near_columns) + ([date_column] if date_column else []) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+
+    size = len(df)
+    key_hash, key_valid = hash_rows(df, key_columns)
+    near_hash, near_valid = hash_rows(df, near_columns)
+    if date_column:
+        days, date_valid = _day_numbers(df[date_column])
+        near_valid &= date_valid
+    else:
+        days, near_valid = np.zeros(size, dtype=np.int64), np.zeros(size, dtype=bool)
+    labels = df.index.astype(str).to_numpy(dtype=object)
+
+    dup_type = np.full(size, "", dtype=object)
+    group = np.full(size, "", dtype=object)
+    matched = np.full(size, "", dtype=object)
+    apart = np.full(size, np.nan)
+
+    # 本期完全重复
+    hit, first = _exact_groups(key_hash, key_valid)
+    if hit.any():
+        hit_rows = np.flatnonzero(hit)
+        group_first = first[hit_rows]
+        is_first = hit_rows == group_first
+        # 组内第一行匹配组内第二行，其余行匹配组内第一行
+        second = pd.Series(hit_rows[~is_first]).groupby(group_first[~is_first]).first()
+        partner = np.where(is_first, second.reindex(group_first).to_numpy(), group_first)
+        dup_type[hit_rows] = "exact"
+        group[hit_rows] = "E" + group_first.astype(str).astype(object)
+        matched[hit_rows] = labels[partner]
+        apart[hit_rows] = 0
+
+    # 与历史期间完全重复
+    has_history = history is not None and len(history) > 0
+    if has_history:
+        hist_keys = history["key_hash"].to_numpy(dtype=np.uint64)
+        in_history = key_valid & np.isin(key_hash, hist_keys) & (dup_type == "")
+        if in_history.any():
+            first_hist = history.drop_duplicates("key_hash").set_index("key_hash")
+            ref = first_hist.reindex(key_hash[in_history])
+            dup_type[in_history] = "history_exact"
+            group[in_history] = "H" + pd.Series(key_hash[in_history]).astype(str).to_numpy(dtype=object)
+            matched[in_history] = (ref["period"].astype(str) + "#" + ref["record_id"].astype(str)).to_numpy(dtype=object)
+            apart[in_history] = np.nan
+
+    # 本期疑似重复（窗口内同金额等）
+    if near_valid.any() and near_columns:
+        positions = np.flatnonzero(near_valid)
+        order, cluster, nearest, sizes = _window_clusters(near_hash[positions], days[positions], window_days)
+        rows = positions[order]
+        in_cluster = sizes > 1
+        # 组内相邻行作为匹配对象：组内第一行匹配下一行，其余行匹配上一行
+        prev_rows = np.concatenate([[rows[0]], rows[:-1]])
+        next_rows = np.concatenate([rows[1:], [rows[-1]]])
+        is_start = np.concatenate([[True], cluster[1:] != cluster[:-1]])
+        partner = np.where(is_start, next_rows, prev_rows)
+        new = in_cluster & (dup_type[rows] == "")
+        target = rows[new]
+        dup_type[target] = "near"
+        group[target] = "N" + cluster[new].astype(str).astype(object)
+        matched[target] = labels[partner[new]]
+        apart[target] = nearest[new]
+
+    # 与历史期间疑似重复
+    if has_history:
+        hist_dates = history["date"]
+        hist_valid = hist_dates.notna().to_numpy() & (history["near_hash"].to_numpy(dtype=np.uint64) != _NO_HASH)
+        if near_columns and date_column and hist_valid.any() and near_valid.any():
+            hist_days, _ = _day_numbers(hist_dates[hist_valid])
+            positions = np.flatnonzero(near_valid)
+            combined_hash = np.concatenate([near_hash[positions], history["near_hash"].to_numpy(dtype=np.uint64)[hist_valid]])
+            combined_days = np.concatenate([days[positions], hist_days])
+            is_new = np.concatenate([np.ones(len(positions), dtype=bool), np.zeros(int(hist_valid.sum()), dtype=bool)])
+            order, cluster, nearest, sizes = _window_clusters(combined_hash, combined_days, window_days)
+            touches_history = np.bincount(cluster, weights=~is_new[order]).astype(bool)[cluster]
+            hist_refs = (history["period"].astype(str) + "#" + history["record_id"].astype(str)).to_numpy(dtype=object)[hist_valid]
+            # 组内的一条历史记录作为匹配对象
+            ref_of_cluster = pd.Series(np.where(~is_new[order], order - len(positions), -1)).groupby(cluster).max().to_numpy()
+            candidate = is_new[order] & touches_history
+            rows = positions[order[candidate]]
+            new = dup_type[rows] == ""
+            target = rows[new]
+            dup_type[target] = "history_near"
+            group[target] = "HN" + cluster[candidate][new].astype(str).astype(object)
+            matched[target] = hist_refs[ref_of_cluster[cluster[candidate][new]]]
+            apart[target] = nearest[candidate][new]
+
+    flagged = dup_type != ""
+    result = df.loc[flagged].copy()
+    result["duplicate_type"] = dup_type[flagged]
+    result["duplicate_group"] = group[flagged]
+    result["matched_with"] = matched[flagged]
+    result["days_apart"] = apart[flagged]
+
+    entries = pd.DataFrame({
+        "key_hash": key_hash,
+        "near_hash": np.where(near_valid, near_hash, _NO_HASH),
+        "date": pd.to_datetime(df[date_column], errors="coerce").to_numpy(dtype="datetime64[ns]") if date_column
+        else np.full(size, np.datetime64("NaT"), dtype="datetime64[ns]"),
+        "record_id": np.arange(size, dtype=np.int64),
+    })[key_valid | near_valid]
+
+    logger.info("duplicates_detected", rows=size, flagged=int(flagged.sum()),
+                history_rows=0 if history is None else len(history))
+    return result, entries
@@ -0,0 +1,257 @@
+"""
+模糊名称匹配（供应商主数据清理、关联方核对）
+避免 O(n²) 逐对比较：
+
+0. 去重：重复出现的原名称只保留一个（记录出现次数），规范化后相同的名称只参与一次分块和评分，
+   否则交易明细中的高频名称会占满分桶内的比较窗口
+1. 规范化：NFKC（全角 -> 半角）、小写，去掉括号/标点/空白和公司后缀（有限公司、Co., Ltd. 等），
+   地名（省、直辖市、主要城市）单独提取，"北京XX科技有限公司" 与 "XX科技(北京)有限公司" 的主体名相同
+2. 分块：主体名的字符二元组做 MinHash 签名，按带（band）做 LSH 分桶，只有至少一个带的桶相同的名称才成为候选对；
+   桶内按主体名排序后只与相邻的 MAX_NEIGHBORS 个比较（超大桶退化为有序邻域法）
+3. 评分：候选对先用签名估计相似度过滤，再计算二元组 Jaccard 相似度；地名不同的乘以 REGION_MISMATCH_FACTOR
+
+签名计算和分桶按块并行（numpy 运算释放 GIL，线程数见 ENTITY_MATCH_WORKERS）。
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+NUM_PERM = 64
+BANDS = 16  # 每带 4 个签名值，相似度约 0.5 以上的名称大概率至少一个带相同
+MAX_NEIGHBORS = 50
+SIGNATURE_CHUNK = 20_000  # 每块名称数（块内矩阵约 名称数 x 二元组数 x NUM_PERM x 8 字节）
+ESTIMATE_SLACK = 0.2  # 签名估计的相似度低于 threshold - ESTIMATE_SLACK 的候选对直接丢弃
+REGION_MISMATCH_FACTOR = 0.5
+MATCH_COLUMNS = [
+    "left_index", "left_name", "left_count", "right_index", "right_name", "right_count",
+    "score", "normalized_name", "region_match",
+]
+
+_PRIME = np.uint64(4294967311)  # 大于 2^32 的素数
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+COMPANY_SUFFIXES = [
+    "股份有限公司", "有限责任公司", "集团有限公司", "有限公司", "集团公司", "分公司", "总公司", "集团", "公司",
+    "有限责任", "股份", "有限",
+    "company limited", "co ltd", "co limited", "corporation", "limited", "company", "corp", "inc", "llc", "ltd",
+    "gmbh", "plc", "co",
+]
+REGIONS = [
+    "内蒙古", "黑龙江", "乌鲁木齐", "呼和浩特", "石家庄", "哈尔滨",
+    "北京", "天津", "上海", "重庆", "河北", "山西", "辽宁", "吉林", "江苏", "浙江", "安徽", "福建", "江西", "山东",
+    "河南", "湖北", "湖南", "广东", "海南", "四川", "贵州", "云南", "陕西", "甘肃", "青海", "台湾", "广西", "西藏",
+    "宁夏", "新疆", "香港", "澳门", "深圳", "广州", "杭州", "南京", "苏州", "武汉", "成都", "西安", "厦门", "青岛",
+    "大连", "宁波", "无锡", "长沙", "郑州", "济南", "合肥", "福州", "沈阳", "长春", "昆明", "南宁", "贵阳", "太原",
+    "南昌", "兰州", "海口", "珠海", "东莞", "佛山",
+]
+_REGION_PATTERN = "(" + "|".join(REGIONS) + ")(?:壮族自治区|回族自治区|维吾尔自治区|特别行政区|自治区|省|市)?"
+_SUFFIX_PATTERN = r"(?:" + "|".join(re.escape(s.replace(" ", "")) for s in COMPANY_SUFFIXES) + r")+$"
+
+
+def normalize_names(names: pd.Series) -> pd.DataFrame:
+    """
+    名称 -> DataFrame(core 主体名, region 地名)
+    主体名去掉地名后不超过 2 个字时保留地名（如 "北京银行" 不应与 "上海银行" 相同）
+    """
+    text = names.astype("string").fillna("").str.normalize("NFKC").str.lower()
+    # 括号内容保留（常见为地名），只去掉标点、空白和括号本身
+    text = text.str.replace(r"[\W_]+", "", regex=True)
+    region = text.str.extract(_REGION_PATTERN, expand=False).fillna("")
+    without_region = text.str.replace(_REGION_PATTERN, "", n=1, regex=True)
+    core = without_region.str.replace(_SUFFIX_PATTERN, "", regex=True)
+    short = core.str.len() <= 2
+    core = core.where(~short, text.str.replace(_SUFFIX_PATTERN, "", regex=True))
+    region = region.where(~short, "")
+    return pd.DataFrame({"core": core.astype(object), "region": region.astype(object)}, index=names.index)
+
+
+def _shingles(core: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """主体名 -> (所有名称的字符二元组哈希, 每个名称的二元组数)；单字名称以该字本身为一个二元组"""
+    grams = [[s[i:i + 2] for i in range(len(s) - 1)] or [s] for s in core]
+    lengths = np.fromiter((len(g) for g in grams), dtype=np.int64, count=len(grams))
+    flat = np.array([g for gs in grams for g in gs], dtype=object)
+    hashes = pd.util.hash_array(flat) & _MASK32 if len(flat) else np.empty(0, dtype=np.uint64)
+    return hashes, lengths
+
+
+def _workers() -> int:
+    return settings.ENTITY_MATCH_WORKERS or os.cpu_count() or 1
+
+
+def minhash_signatures(core: np.ndarray, seed: int = 0) -> np.ndarray:
+    """主体名 -> MinHash 签名矩阵 (名称数 x NUM_PERM)，按名称分块并行计算"""
+    hashes, lengths = _shingles(core)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 32, NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    signatures = np.empty((len(core), NUM_PERM), dtype=np.uint64)
+
+    def compute(start: int) -> None:
+        stop = min(start + SIGNATURE_CHUNK, len(core))
+        lo, hi = offsets[start], offsets[stop]
+        # (a * x + b) mod p：x < 2^32、a < 2^32，乘积不溢出 uint64
+        values = (hashes[lo:hi, None] * a[None, :] + b[None, :]) % _PRIME
+        signatures[start:stop] = np.minimum.reduceat(values, offsets[start:stop] - lo, axis=0)
+
+    with ThreadPoolExecutor(max_workers=_workers()) as pool:
+        list(pool.map(compute, range(0, len(core), SIGNATURE_CHUNK)))
+    return signatures
+
+
+def _band_candidates(keys: np.ndarray, rank: np.ndarray, allowed: Optional[np.ndarray]) -> np.ndarray:
+    """一个带：按 (桶, 主体名) 排序，与同桶中之后的 MAX_NEIGHBORS 个名称组成候选对（编码为 i * n + j）"""
+    n = len(keys)
+    order = np.lexsort((rank, keys))
+    sorted_keys = keys[order]
+    pairs = []
+    for distance in range(1, MAX_NEIGHBORS + 1):
+        same = sorted_keys[distance:] == sorted_keys[:-distance]
+        if not same.any():
+            break
+        left = order[:-distance][same]
+        right = order[distance:][same]
+        i, j = np.minimum(left, right), np.maximum(left, right)
+        if allowed is not None:
+            keep = allowed[i] != allowed[j]
+            i, j = i[keep], j[keep]
+        pairs.append(i.astype(np.int64) * n + j)
+    return np.concatenate(pairs) if pairs else np.empty(0, dtype=np.int64)
+
+
+def candidate_pairs(signatures: np.ndarray, core: np.ndarray, side: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    LSH 分桶得到候选对 (i, j)，i < j
+    side 非空时只保留两侧不同的对（两个名单之间匹配）
+    """
+    n = len(signatures)
+    rows = NUM_PERM // BANDS
+    rank = pd.factorize(pd.Series(core), sort=True)[0]
+    multipliers = np.random.default_rng(1).integers(1, 2 ** 63, rows, dtype=np.uint64) | np.uint64(1)
+
+    def band(index: int) -> np.ndarray:
+        block = signatures[:, index * rows:(index + 1) * rows]
+        keys = (block * multipliers[None, :]).sum(axis=1, dtype=np.uint64)
+        return _band_candidates(keys, rank, side)
+
+    with ThreadPoolExecutor(max_workers=_workers()) as pool:
+        encoded = np.unique(np.concatenate(list(pool.map(band, range(BANDS))) or [np.empty(0, dtype=np.int64)]))
+    return encoded // n, encoded % n
+
+
+def _jaccard(left: List[str], right: List[str]) -> np.ndarray:
+    scores = np.empty(len(left))
+    for k, (a, b) in enumerate(zip(left, right)):
+        sa = {a[i:i + 2] for i in range(len(a) - 1)} or {a}
+        sb = {b[i:i + 2] for i in range(len(b) - 1)} or {b}
+        scores[k] = len(sa & sb) / len(sa | sb)
+    return scores
+
+
+def _unit_pairs(
+    core: np.ndarray, region: np.ndarray, side: Optional[np.ndarray], threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """不同规范化名称之间的 LSH 匹配 -> (i, j, score, region_match)"""
+    empty = np.empty(0, dtype=np.int64)
+    if len(core) < 2:
+        return empty, empty, np.empty(0), np.empty(0, dtype=bool)
+    signatures = minhash_signatures(core)
+    i, j = candidate_pairs(signatures, core, side)
+
+    estimate = np.empty(len(i))
+    for start in range(0, len(i), 1_000_000):
+        stop = start + 1_000_000
+        estimate[start:stop] = (signatures[i[start:stop]] == signatures[j[start:stop]]).mean(axis=1)
+    keep = estimate >= threshold - ESTIMATE_SLACK
+    i, j = i[keep], j[keep]
+
+    region_match = (region[i] == region[j]) | (region[i] == "") | (region[j] == "")
+    score = _jaccard(core[i].tolist(), core[j].tolist()) * np.where(region_match, 1.0, REGION_MISMATCH_FACTOR)
+    keep = score >= threshold
+    logger.info("entity_matching_scored", units=len(core), candidates=len(keep), matches=int(keep.sum()))
+    return i[keep], j[keep], score[keep], region_match[keep]
+
+
+def match_names(
+    names: pd.Series,
+    reference: Optional[pd.Series] = None,
+    threshold: float = 0.8,
+) -> pd.DataFrame:
+    """
+    名称模糊匹配，返回相似度不低于 threshold 的名称对（按相似度降序）
+
+    reference 为空时在 names 内部查找相似名称（主数据去重）；否则匹配 names 与 reference 两个名单
+    重复出现的名称（如交易明细中的供应商列）先去重，只匹配不同的名称；规范化后相同的名称
+    只参与一次 LSH，再展开为原名称对（相似度 1.0）
+    结果列：left_index / left_name / left_count（names 中该名称首次出现的行、名称、出现次数）、
+    right_index / right_name / right_count（reference 或 names 中的另一名称）、
+    score、normalized_name（左侧主体名）、region_match（两侧地名相同或缺失）
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    combined = names if reference is None else pd.concat([names, reference])
+    side = np.zeros(len(combined), dtype=bool) if reference is None else np.concatenate(
+        [np.zeros(len(names), bool), np.ones(len(reference), bool)]
+    )
+    rows = pd.DataFrame({"side": side, "name": combined.to_numpy(dtype=object), "label": combined.index.to_numpy(dtype=object)})
+    rows = rows[rows["name"].notna()]
+
+    # 原名称去重（每侧分别），记录首次出现的行和出现次数
+    grouped = rows.groupby(["side", "name"], sort=False)
+    distinct = grouped["label"].first().to_frame().assign(count=grouped.size()).reset_index()
+    normalized = normalize_names(distinct["name"])
+    distinct = distinct.assign(core=normalized["core"], region=normalized["region"])
+    distinct = distinct[distinct["core"].str.len() > 0].reset_index(drop=True)
+    if distinct.empty:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+
+    # 规范化名称去重：每侧每个 (主体名, 地名) 只参与一次 LSH
+    distinct["unit"] = distinct.groupby(["side", "core", "region"], sort=False).ngroup()
+    units = distinct.drop_duplicates("unit").sort_values("unit")
+    unit_side = units["side"].to_numpy()
+    i, j, score, region_match = _unit_pairs(
+        units["core"].to_numpy(dtype=object), units["region"].to_numpy(dtype=object),
+        None if reference is None else unit_side, threshold
+    )
+    pairs = pd.DataFrame({"left_unit": i, "right_unit": j, "score": score, "region_match": region_match})
+    if reference is None:
+        # 规范化后相同的不同原名称
+        shared = distinct["unit"].value_counts()
+        shared = shared.index[shared > 1].to_numpy()
+        pairs = pd.concat([pairs, pd.DataFrame({
+            "left_unit": shared, "right_unit": shared, "score": 1.0, "region_match": True,
+        })], ignore_index=True)
+    else:
+        # 左侧固定为 names 中的名称
+        swap = unit_side[pairs["left_unit"].to_numpy()]
+        left, right = pairs["left_unit"].to_numpy(), pairs["right_unit"].to_numpy()
+        pairs["left_unit"], pairs["right_unit"] = np.where(swap, right, left), np.where(swap, left, right)
+
+    members = distinct[["unit", "label", "name", "count", "core"]].reset_index(names="member")
+    result = pairs.merge(
+        members.rename(columns={"unit": "left_unit", "member": "left_member", "label": "left_index",
+                                "name": "left_name", "count": "left_count", "core": "normalized_name"}),
+        on="left_unit",
+    ).merge(
+        members.drop(columns="core").rename(columns={"unit": "right_unit", "member": "right_member", "label": "right_index",
+                                                     "name": "right_name", "count": "right_count"}),
+        on="right_unit",
+    )
+    # 同一规范化名称内部的名称对只保留一次
+    same_unit = result["left_unit"] == result["right_unit"]
+    result = result[~same_unit | (result["left_member"] < result["right_member"])]
+    result = result.assign(score=result["score"].round(4))[MATCH_COLUMNS]
+    result = result.sort_values(["score", "left_name", "right_name"], ascending=[False, True, True], kind="stable")
+    result = result.reset_index(drop=True)
+    logger.info("entity_matching_completed", names=len(combined), distinct_names=len(distinct),
+                units=len(units), matches=len(result))
+    return result
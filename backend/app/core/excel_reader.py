@@ -0,0 +1,236 @@
+"""
+Excel 读取引擎
+- calamine: Rust 实现的 python-calamine（可选依赖），解析速度最快，支持 xlsx/xlsm/xlsb/xls/ods
+- openpyxl: read_only 流式读取，只遍历需要的行和列，内存占用与文件大小无关
+- pandas: pandas.read_excel 默认实现
+
+calamine/openpyxl 读出的单元格按 pandas 的规则转换后交给 pandas 的 TextParser 推断类型，
+因此在相同参数下得到的 DataFrame 与 pandas.read_excel 一致。
+"""
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# python-calamine 为可选依赖
+try:
+    from python_calamine import CalamineWorkbook
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+EXCEL_ENGINES = ("auto", "calamine", "openpyxl", "pandas")
+CALAMINE_EXTENSIONS = (".xlsx", ".xlsm", ".xlsb", ".xls", ".ods")
+OPENPYXL_EXTENSIONS = (".xlsx", ".xlsm")
+
+SheetName = Union[int, str]
+UseCols = Optional[Union[str, Sequence[Union[int, str]], Callable[[str], bool]]]
+
+_COLUMN_LETTERS = re.compile(r"^[A-Za-z]{1,3}$")
+
+
+def select_engine(path: str, engine: str = "auto") -> str:
+    """根据可用依赖和文件类型选择实际使用的引擎"""
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'. Supported: {', '.join(EXCEL_ENGINES)}")
+    ext = os.path.splitext(path)[1].lower()
+    if engine == "calamine" and not HAS_CALAMINE:
+        raise ValueError("Excel engine 'calamine' requires the python-calamine package")
+    if engine != "auto":
+        return engine
+    if HAS_CALAMINE and ext in CALAMINE_EXTENSIONS:
+        return "calamine"
+    if ext in OPENPYXL_EXTENSIONS:
+        return "openpyxl"
+    return "pandas"
+
+
+def _column_index(letters: str) -> int:
+    """Excel 列字母 -> 从 0 开始的列序号"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def parse_usecols(usecols: UseCols) -> Optional[Union[List[int], List[str]]]:
+    """
+    规范化列选择
+    - 含列范围时（如 "A:C,E"、"E:E"）按 Excel 列字母解析 -> 列序号列表
+    - 否则逗号分隔的都是列名（"ID,TAX" 是列名，不是列字母）-> 列名列表
+    - 列表原样返回（元素为列序号或列名）
+    - 可调用对象原样返回（按列名判断是否读取，不存在的列名不报错）
+    列序号与列名不能混用
+    """
+    if usecols is None or usecols == "" or usecols == []:
+        return None
+    if callable(usecols):
+        return usecols
+    tokens = [t.strip() for t in usecols.split(",")] if isinstance(usecols, str) else list(usecols)
+    tokens = [t for t in tokens if t != ""]
+    # 只有显式的列范围语法才按列字母解析，避免把大写列名（ID、QTY、TAX）当作列字母
+    letters = isinstance(usecols, str) and any(":" in t for t in tokens)
+
+    indices: List[int] = []
+    names: List[str] = []
+    for token in tokens:
+        if isinstance(token, (int, np.integer)):
+            indices.append(int(token))
+            continue
+        parts = token.split(":")
+        if letters and len(parts) in (1, 2) and all(_COLUMN_LETTERS.match(p) for p in parts):
+            start = _column_index(parts[0])
+            end = _column_index(parts[-1])
+            indices.extend(range(start, end + 1))
+        else:
+            names.append(token)
+    if indices and names:
+        raise ValueError(f"usecols cannot mix column letters/positions and names: {usecols}")
+    return indices or names
+
+
+def _finish_rows(data: List[List[Any]]) -> List[List[Any]]:
+    """与 pandas 的 Excel 读取器一致：去掉尾部空行，并把各行补齐到相同宽度"""
+    last_row_with_data = -1
+    for i, row in enumerate(data):
+        while row and row[-1] == "":
+            row.pop()
+        if row:
+            last_row_with_data = i
+    data = data[: last_row_with_data + 1]
+    if data:
+        width = max(len(row) for row in data)
+        data = [row + [""] * (width - len(row)) for row in data]
+    return data
+
+
+def _convert_number(value: Any) -> Any:
+    """整数值的浮点数转换为 int（与 pandas 读取器一致）"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _calamine_rows(path: str, sheet_name: SheetName, max_rows: Optional[int], max_col: Optional[int]) -> List[List[Any]]:
+    workbook = CalamineWorkbook.from_path(path)
+    try:
+        sheet = workbook.get_sheet_by_index(sheet_name) if isinstance(sheet_name, int) else workbook.get_sheet_by_name(sheet_name)
+        raw = sheet.to_python(skip_empty_area=False, nrows=max_rows) if max_rows else sheet.to_python(skip_empty_area=False)
+    finally:
+        workbook.close()
+
+    data = []
+    for row in raw:
+        if max_col is not None:
+            row = row[:max_col]
+        converted = []
+        for value in row:
+            if isinstance(value, float):
+                value = _convert_number(value)
+            elif isinstance(value, (datetime, date)) and not isinstance(value, time):
+                value = pd.Timestamp(value)
+            elif isinstance(value, timedelta):
+                value = pd.Timedelta(value)
+            converted.append(value)
+        data.append(converted)
+    return data
+
+
+def _openpyxl_rows(path: str, sheet_name: SheetName, max_rows: Optional[int], max_col: Optional[int]) -> List[List[Any]]:
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        # 部分生成工具写入的 dimension 不可靠（或缺失），与 pandas 一致按实际内容遍历
+        sheet.reset_dimensions()
+
+        data = []
+        for row in sheet.iter_rows(max_row=max_rows, max_col=max_col):
+            converted = []
+            for cell in row:
+                value = cell.value
+                if value is None:
+                    value = ""
+                elif cell.data_type == TYPE_ERROR:
+                    value = np.nan
+                elif cell.data_type == TYPE_NUMERIC:
+                    value = _convert_number(value)
+                converted.append(value)
+            data.append(converted)
+    finally:
+        workbook.close()
+    return data
+
+
+def read_excel(
+    path: str,
+    sheet_name: SheetName = 0,
+    usecols: UseCols = None,
+    nrows: Optional[int] = None,
+    skiprows: Optional[int] = None,
+    engine: str = "auto",
+) -> pd.DataFrame:
+    """
+    读取单个 sheet
+
+    Args:
+        sheet_name: sheet 序号或名称
+        usecols: 列范围 "A:C,E"、列名列表、列序号列表，或按列名判断的可调用对象
+        nrows: 只读取表头之后的前 nrows 行
+        skiprows: 表头之前跳过的行数
+        engine: auto / calamine / openpyxl / pandas
+    """
+    engine = select_engine(path, engine)
+    columns = parse_usecols(usecols)
+    skiprows = int(skiprows or 0)
+    nrows = int(nrows) if nrows else None
+
+    if engine == "pandas":
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=columns, nrows=nrows, skiprows=skiprows or None)
+
+    # 只解析需要的行（跳过的行 + 表头 + nrows），按列序号选择时只解析到最右侧的列
+    max_rows = skiprows + 1 + nrows if nrows is not None else None
+    max_col = max(columns) + 1 if isinstance(columns, list) and columns and isinstance(columns[0], int) else None
+    reader = _calamine_rows if engine == "calamine" else _openpyxl_rows
+    data = _finish_rows(reader(path, sheet_name, max_rows, max_col)[skiprows:])
+    if not data:
+        return pd.DataFrame()
+
+    parser = TextParser(data, header=0, usecols=columns, nrows=nrows)
+    try:
+        return parser.read()
+    finally:
+        parser.close()
+
+
+def sheet_names(path: str, engine: str = "auto") -> List[str]:
+    """列出工作簿中的 sheet 名称"""
+    engine = select_engine(path, engine)
+    if engine == "calamine":
+        workbook = CalamineWorkbook.from_path(path)
+        try:
+            return list(workbook.sheet_names)
+        finally:
+            workbook.close()
+    if engine == "openpyxl":
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, keep_links=False)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    return list(pd.ExcelFile(path).sheet_names)
+
+
+def read_all_sheets(path: str, engine: str = "auto") -> Dict[str, pd.DataFrame]:
+    """读取全部 sheet（名称 -> DataFrame，保持工作簿中的顺序）"""
+    engine = select_engine(path, engine)
+    if engine == "pandas":
+        return pd.read_excel(path, sheet_name=None)
+    return {name: read_excel(path, sheet_name=index, engine=engine) for index, name in enumerate(sheet_names(path, engine))}
@@ -10,9 +10,13 @@ from typing import Dict, Any, List, Optional
 from concurrent.futures import ThreadPoolExecutor
 from app.core.registry import node_registry
 from app.api.websocket import manager as ws_manager
-from app.core.data_manager import data_manager
+from app.core.data_manager import data_manager, ParquetWritePolicy
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.planner import plan_input_columns, plan_projections
+from app.core.dataset import DatasetHandle, dataset_info, materialize
+from app.core.out_of_core import AGGREGATE, ROWWISE, run_aggregate, run_rowwise
+from app.core.dtype_optimizer import compact_outputs
 
 logger = get_logger(__name__)
 
@@ -127,6 +131,15 @@ class PromptExecutor:
                     "class_type": class_type,
                     "inputs": params.copy() if params else {}  # 先复制原始参数
                 }
+                # 节点级 Parquet 写入策略（可选）
+                if node.get("write_policy"):
+                    graph[node_id]["write_policy"] = node["write_policy"]
+                # 单独开启或关闭该加载节点的列投影下推（可选）
+                if isinstance(node.get("pushdown"), bool):
+                    graph[node_id]["pushdown"] = node["pushdown"]
+                # 节点级 dtype 压缩开关（可选）
+                if isinstance(node.get("compact_dtypes"), bool):
+                    graph[node_id]["compact_dtypes"] = node["compact_dtypes"]
             
             # 处理 edges，将连线转换为 inputs 中的引用
             # 注意：如果 params 中已经包含了引用（如 "@n5.filtered_df.amount"），
@@ -278,11 +291,13 @@ class PromptExecutor:
             run_dir = project_manager.get_run_dir(project_id, prompt_id)
             output_dir = os.path.join(run_dir, "outputs")
             cache_dir = os.path.join(run_dir, "cache")
+            state_dir = project_manager.get_state_dir(project_id)
         else:
             # 临时执行，使用旧的输出目录
             output_dir = "output"
             cache_dir = os.path.join("cache", prompt_id)
             os.makedirs(cache_dir, exist_ok=True)
+            state_dir = None
         
         # 1. 解析 DAG 并获取拓扑排序
         sorted_nodes = self._topological_sort(graph_data)
@@ -291,6 +306,15 @@ class PromptExecutor:
                    execution_order=sorted_nodes,
                    output_dir=output_dir)
         
+        # 列投影下推（可选）：加载节点只读取下游实际用到的列，加载节点自身的输出也只包含这些列
+        # 数据集句柄物化为 DataFrame 时只读取下游节点用到的列（不影响保存的输出，始终生效）
+        projections = plan_projections(
+            graph_data, sorted_nodes, node_registry.get_node_class, default=settings.PROJECTION_PUSHDOWN_ENABLED
+        )
+        input_columns = plan_input_columns(graph_data, sorted_nodes, node_registry.get_node_class)
+        if projections:
+            logger.info("projection_pushdown", prompt_id=prompt_id, projections=projections)
+        
         # 2. 执行上下文缓存 (存储节点输出)
         # 格式: { node_id: (output0, output1, ...) }
         results_cache = {} 
@@ -322,17 +346,43 @@ class PromptExecutor:
             func = getattr(instance, func_name)
             
             # 5. 准备输入参数 (解析依赖，支持默认值)
+            node_inputs = node_def.get("inputs", {})
+            if node_id in projections:
+                node_inputs = {**node_inputs, "projection": projections[node_id]}
+            if getattr(node_class, "USES_PROJECT_STATE", False):
+                node_inputs = {**node_inputs, "state_dir": state_dir}
             inputs = self._resolve_inputs(
-                node_def.get("inputs", {}), 
+                node_inputs, 
                 results_cache,
                 node_class=node_class,
                 func=func
             )
             
+            # 分区执行：DATAFRAME 输入收到分区句柄（加载节点 partitioned 模式）时，
+            # 逐行节点按分区执行、聚合节点合并部分聚合；其他节点整体物化
+            partition_key = self._partition_input(inputs, node_class)
+            partition_handle = None
+            if partition_key:
+                mode_of = getattr(node_class, "partition_mode", None)
+                partition_mode = mode_of(node_def.get("inputs", {})) if mode_of else None
+                if partition_mode in (ROWWISE, AGGREGATE):
+                    partition_handle = inputs.pop(partition_key)
+                else:
+                    logger.warning("partitioned_input_materialized",
+                                   prompt_id=prompt_id,
+                                   node_id=node_id,
+                                   class_type=class_type)
+            
             # 6. 验证和转换输入类型（确保类型匹配）
             inputs = self._validate_and_convert_inputs(
-                inputs, node_class, class_type
+                inputs, node_class, class_type, input_columns=input_columns.get(node_id)
             )
+            if partition_handle is not None:
+                func = self._partitioned_function(
+                    instance, func, node_class, partition_mode, partition_key, partition_handle,
+                    output_dir=os.path.join(cache_dir, f"{node_id}_partitions"),
+                    columns=(input_columns.get(node_id) or {}).get(partition_key)
+                )
             
             logger.debug("node_execution_started",
                         prompt_id=prompt_id,
@@ -381,6 +431,25 @@ class PromptExecutor:
             if not isinstance(outputs, tuple):
                 outputs = (outputs,)
             
+            # dtype 压缩（可选）：加载节点按全局配置，工作流节点的 compact_dtypes 优先
+            compact = node_def.get(
+                "compact_dtypes",
+                settings.DTYPE_COMPACTION_ENABLED and getattr(node_class, "COMPACT_OUTPUTS", False)
+            )
+            if compact:
+                outputs, compaction_reports = await asyncio.get_event_loop().run_in_executor(
+                    self.thread_pool, compact_outputs, outputs
+                )
+                for idx, report in compaction_reports.items():
+                    logger.info("dtype_compaction",
+                               prompt_id=prompt_id,
+                               node_id=node_id,
+                               output_index=idx,
+                               memory_before=report["memory_before"],
+                               memory_after=report["memory_after"],
+                               saved_bytes=report["saved_bytes"],
+                               columns=report["columns"])
+            
             # 6. 缓存结果 & 持久化
             results_cache[node_id] = outputs
             
@@ -390,10 +459,11 @@ class PromptExecutor:
                 # 使用 DataManager 进行 Parquet 缓存 (Audit Trail / High Performance Cache)
                 # 注意: 这里我们同时保留了内存对象 (val) 和磁盘缓存
                 # 在内存不足场景下，可以只保留路径，下次使用 data_manager.load_intermediate()
-                if isinstance(val, pd.DataFrame):
+                if isinstance(val, (pd.DataFrame, DatasetHandle)):
                     cache_path = data_manager.save_intermediate(
                         prompt_id, node_id, val, idx,
-                        custom_cache_dir=cache_dir if project_id else None
+                        custom_cache_dir=cache_dir if project_id else None,
+                        write_policy=self._resolve_write_policy(node_def, node_class, idx)
                     )
                 
                 if isinstance(val, pd.DataFrame):
@@ -414,6 +484,14 @@ class PromptExecutor:
                         "preview": val.head(5).to_dict(orient="records"),
                         "cache_path": cache_path # 调试用
                     })
+                elif isinstance(val, DatasetHandle):
+                    # 数据集不导出 Excel（可能远大于内存），只返回 schema、行数和前几行
+                    ui_outputs.append({
+                        "type": "dataset",
+                        **dataset_info(val),
+                        "preview": val.head(5).to_dict(orient="records"),
+                        "cache_path": cache_path
+                    })
                 else:
                     ui_outputs.append({
                         "type": "text",
@@ -435,6 +513,38 @@ class PromptExecutor:
             "status": { "exec_info": { "queue_remaining": 0 } }
         }, client_id)
 
+    def _resolve_write_policy(
+        self,
+        node_def: Dict[str, Any],
+        node_class: Any,
+        output_index: int
+    ) -> ParquetWritePolicy:
+        """
+        解析某个输出的 Parquet 写入策略
+        优先级: 工作流节点 write_policy > 节点类 WRITE_POLICY > 全局默认
+        两者都支持按输出索引或输出名称分别配置，如 {"0": {...}} / {"outliers": {...}}
+        """
+        return_names = getattr(node_class, "RETURN_NAMES", ())
+        output_name = return_names[output_index] if output_index < len(return_names) else None
+        
+        def select(config):
+            if not isinstance(config, dict):
+                return {}
+            for key in (str(output_index), output_name):
+                if key is not None and isinstance(config.get(key), dict):
+                    return config[key]
+            return config
+        
+        merged = {
+            **select(getattr(node_class, "WRITE_POLICY", None)),
+            **select(node_def.get("write_policy")),
+        }
+        try:
+            return ParquetWritePolicy.from_dict(merged)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Invalid write_policy for output {output_index}: {e}. Using defaults.")
+            return ParquetWritePolicy()
+
     def _topological_sort(self, graph: Dict[str, Any]) -> List[str]:
         """
         简单的拓扑排序
@@ -598,19 +708,12 @@ class PromptExecutor:
         
         return None
     
-    def _validate_and_convert_inputs(
-        self,
-        inputs: Dict[str, Any],
-        node_class: Any,
-        class_type: str
-    ) -> Dict[str, Any]:
+    @staticmethod
+    def _input_type_map(node_class: Any) -> Dict[str, Any]:
         """
-        验证和转换输入类型，确保与INPUT_TYPES定义匹配
-        参考ComfyUI的实现，进行类型检查和转换
+        INPUT_TYPES（ComfyUI格式或新格式）-> {输入名: 类型定义}
+        INPUT_TYPES 未定义或为空时使用 INPUT_TYPES_LEGACY
         """
-        validated = {}
-        
-        # 获取INPUT_TYPES定义
         input_types = None
         if hasattr(node_class, "INPUT_TYPES"):
             input_types_attr = getattr(node_class, "INPUT_TYPES")
@@ -618,26 +721,92 @@ class PromptExecutor:
                 input_types = input_types_attr()
             else:
                 input_types = input_types_attr
-        elif hasattr(node_class, "INPUT_TYPES_LEGACY"):
+        if not input_types and hasattr(node_class, "INPUT_TYPES_LEGACY"):
             input_types = node_class.INPUT_TYPES_LEGACY()
         
-        if not input_types:
+        if not isinstance(input_types, dict):
+            return {}
+        if "required" in input_types or "optional" in input_types:
+            # ComfyUI格式
+            return {
+                **input_types.get("required", {}),
+                **input_types.get("optional", {})
+            }
+        # 新格式
+        return input_types
+    
+    @staticmethod
+    def _type_name(type_info: Any) -> Optional[str]:
+        """类型定义 ("TYPE", {...}) 或 {"type": "TYPE", ...} -> 类型名"""
+        if isinstance(type_info, tuple):
+            return type_info[0] if len(type_info) > 0 else None
+        if isinstance(type_info, dict):
+            return type_info.get("type")
+        return None
+    
+    def _partitioned_function(
+        self,
+        instance: Any,
+        func: Any,
+        node_class: Any,
+        mode: str,
+        key: str,
+        handle: DatasetHandle,
+        output_dir: str,
+        columns: Optional[List[str]] = None
+    ):
+        """
+        把节点函数包装为按分区执行，调用方式与原函数相同（func(**inputs) -> 输出元组）
+        逐行节点的 DataFrame 输出写入 {output_dir}_{序号}/ 分片目录
+        """
+        sig = inspect.signature(func)
+        accepts_all = any(p.kind == p.VAR_KEYWORD for p in sig.parameters.values())
+        if columns is not None:
+            wanted = set(columns)
+            columns = [c for c in handle.column_names if c in wanted]
+        
+        def run(**inputs):
+            if not accepts_all:
+                inputs = {k: v for k, v in inputs.items() if k in sig.parameters}
+            if mode == AGGREGATE:
+                return run_aggregate(instance, inputs, key, handle, columns)
+            return run_rowwise(func, node_class, inputs, key, handle, output_dir, columns)
+        
+        return run
+    
+    def _partition_input(self, inputs: Dict[str, Any], node_class: Any) -> Optional[str]:
+        """收到分区句柄的 DATAFRAME 输入名（没有时返回 None）"""
+        all_types = self._input_type_map(node_class)
+        for key, value in inputs.items():
+            if (
+                isinstance(value, DatasetHandle)
+                and value.partition_rows
+                and key in all_types
+                and self._type_name(all_types[key]) == "DATAFRAME"
+            ):
+                return key
+        return None
+    
+    def _validate_and_convert_inputs(
+        self,
+        inputs: Dict[str, Any],
+        node_class: Any,
+        class_type: str,
+        input_columns: Optional[Dict[str, List[str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        验证和转换输入类型，确保与INPUT_TYPES定义匹配
+        参考ComfyUI的实现，进行类型检查和转换
+
+        input_columns: 执行计划计算出的各输入所需列，DATAFRAME 输入收到数据集句柄时只物化这些列
+        """
+        validated = {}
+        
+        all_types = self._input_type_map(node_class)
+        if not all_types:
             # 如果没有INPUT_TYPES定义，直接返回原始输入
             return inputs
         
-        # 解析INPUT_TYPES格式
-        all_types = {}
-        if isinstance(input_types, dict):
-            if "required" in input_types or "optional" in input_types:
-                # ComfyUI格式
-                all_types = {
-                    **input_types.get("required", {}),
-                    **input_types.get("optional", {})
-                }
-            else:
-                # 新格式
-                all_types = input_types
-        
         # 验证和转换每个输入
         for key, value in inputs.items():
             if key not in all_types:
@@ -646,19 +815,17 @@ class PromptExecutor:
                 validated[key] = value
                 continue
             
-            type_info = all_types[key]
-            expected_type = None
-            
-            # 提取类型信息
-            if isinstance(type_info, tuple):
-                expected_type = type_info[0] if len(type_info) > 0 else None
-            elif isinstance(type_info, dict):
-                expected_type = type_info.get("type")
+            expected_type = self._type_name(all_types[key])
             
             if not expected_type:
                 validated[key] = value
                 continue
             
+            # 需要 pandas 的输入收到数据集句柄：物化为 DataFrame，只读取用到的列
+            if expected_type == "DATAFRAME" and isinstance(value, DatasetHandle):
+                validated[key] = materialize(value, (input_columns or {}).get(key))
+                continue
+            
             # 类型检查和转换
             try:
                 converted_value = self._convert_value_type(value, expected_type)
@@ -681,8 +848,20 @@ class PromptExecutor:
         if target_type == "DATAFRAME":
             if isinstance(value, pd.DataFrame):
                 return value
+            elif isinstance(value, DatasetHandle):
+                return value.to_pandas()
             else:
                 raise TypeError(f"Cannot convert {type(value)} to DataFrame")
+        elif target_type == "DATASET":
+            # 可直接处理 Arrow 的节点：DataFrame 包装为句柄，字符串视为 Parquet/IPC 路径
+            if isinstance(value, DatasetHandle):
+                return value
+            elif isinstance(value, pd.DataFrame):
+                return DatasetHandle.from_pandas(value)
+            elif isinstance(value, str):
+                return DatasetHandle(value)
+            else:
+                raise TypeError(f"Cannot convert {type(value)} to dataset")
         elif target_type == "STRING":
             if isinstance(value, str):
                 return value
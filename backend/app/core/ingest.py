@@ -0,0 +1,292 @@
+"""
+上传文件的入库转换 (Ingest)
+Excel/CSV 在上传后于后台转换为 Parquet（每个 sheet 一个文件），按文件内容的 sha256 存放：
+
+    {STORAGE_PATH}/ingest/{sha256}/
+        manifest.json      # sheet 列表；已转换的 sheet 带行数、列名与 dtype
+        sheet_0.parquet
+        sheet_1.parquet
+
+ExcelLoader / FileRecognitionNode 读取文件时先计算内容哈希，命中则直接读 Parquet，
+源文件内容不变就不再重复解析 Excel；内容变化后哈希不同，自然重新转换。
+读取时只转换请求的 sheet（其余 sheet 在第一次被读取或后台全量转换时再转换），
+内容哈希针对整个文件，与读取哪个 sheet 无关。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.core.csv_reader import detect_encoding
+from app.core.excel_reader import UseCols, parse_usecols, read_all_sheets, read_excel, select_engine, sheet_names
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+INGEST_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+INGESTIBLE_EXTENSIONS = EXCEL_EXTENSIONS + (".csv",)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """流式计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    规范化 dtype，使其可以无损写入 Parquet 并原样读回
+    - 列名统一为字符串
+    - 混合类型的 object 列（如数字与文本混杂的编号列）统一转为字符串，空值保持为空
+    其他列保持 read_excel 推断出的类型，保证读回的 DataFrame 与直接解析 Excel 一致
+    """
+    df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            continue
+        try:
+            pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            df[col] = series.where(series.isna(), series.astype(str))
+    return df
+
+
+class IngestStore:
+    """按内容哈希存放的 Parquet 转换结果"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(settings.STORAGE_PATH, "ingest")
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # (realpath, size, mtime_ns) -> sha256，同一文件未修改时不重复计算哈希
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+    def content_hash(self, path: str) -> str:
+        """文件内容哈希（文件大小和修改时间不变时复用上次结果）"""
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        sha = self._hash_memo.get(key)
+        if sha is None:
+            sha = file_sha256(path)
+            self._hash_memo[key] = sha
+        return sha
+
+    def remember(self, path: str, sha256: str) -> None:
+        """登记已知的内容哈希（上传时已边写边算），之后读取该文件不再重新计算"""
+        stat = os.stat(path)
+        self._hash_memo[(os.path.realpath(path), stat.st_size, stat.st_mtime_ns)] = sha256
+
+    def entry_dir(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256)
+
+    def get_manifest(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """读取转换清单；未转换或版本不匹配时返回 None"""
+        manifest_path = os.path.join(self.entry_dir(sha256), MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != INGEST_VERSION:
+            return None
+        return manifest
+
+    def ingest(
+        self,
+        path: str,
+        sha256: Optional[str] = None,
+        sheet_name: Optional[Union[int, str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        将 Excel/CSV 转换为 Parquet，已转换过的内容直接返回清单
+        sheet_name 为 None 时转换全部 sheet，否则只转换该 sheet（不存在时不转换）
+        可作为后台任务调用：失败只记录日志，返回 None
+        """
+        if os.path.splitext(path)[1].lower() not in INGESTIBLE_EXTENSIONS:
+            return None
+        try:
+            sha256 = sha256 or self.content_hash(path)
+            manifest = self.get_manifest(sha256)
+            if manifest is not None and not self._pending(manifest, sheet_name):
+                return manifest
+            with self._lock_for(sha256):
+                manifest = self.get_manifest(sha256)
+                if manifest is None:
+                    manifest = self._create_manifest(path, sha256)
+                pending = self._pending(manifest, sheet_name)
+                if pending:
+                    self._convert(path, manifest, pending)
+            return manifest
+        except Exception as e:
+            logger.warning("ingest_failed", path=path, error=str(e))
+            return None
+
+    def load(
+        self,
+        path: str,
+        sheet_name: Union[int, str] = 0,
+        usecols: UseCols = None,
+        nrows: Optional[int] = None,
+        convert: bool = True,
+        projection: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        读取文件的某个 sheet（按位置或名称），可只读取部分列和前 nrows 行
+        已转换时读取 Parquet；未转换且 convert=True 时先转换（只解析一次 Excel），
+        无法满足时返回 None 由调用方回退到直接解析
+
+        projection: 执行计划下推的列名，只从 Parquet 读取这些列（不存在的列名忽略）
+        """
+        if convert:
+            manifest = self.ingest(path, sheet_name=sheet_name)
+        else:
+            if os.path.splitext(path)[1].lower() not in INGESTIBLE_EXTENSIONS:
+                return None
+            manifest = self.get_manifest(self.content_hash(path))
+        if manifest is None:
+            return None
+        sheet = self._find_sheet(manifest, sheet_name)
+        if sheet is None or not self._converted(sheet):
+            return None
+
+        columns = parse_usecols(usecols)
+        if columns and isinstance(columns[0], int):
+            if max(columns) >= len(sheet["columns"]):
+                return None
+            columns = [sheet["columns"][i] for i in sorted(set(columns))]
+        elif columns:
+            if any(c not in sheet["columns"] for c in columns):
+                return None
+            columns = [c for c in sheet["columns"] if c in columns]
+        if projection is not None:
+            wanted = set(projection)
+            columns = [c for c in (columns or sheet["columns"]) if c in wanted]
+
+        table = pq.read_table(os.path.join(self.entry_dir(manifest["sha256"]), sheet["file"]), columns=columns)
+        if nrows:
+            table = table.slice(0, nrows)
+        return table.to_pandas()
+
+    def _create_manifest(self, path: str, sha256: str) -> Dict[str, Any]:
+        """列出 sheet 并写入尚未转换任何 sheet 的清单（只读取工作簿目录，不解析单元格）"""
+        ext = os.path.splitext(path)[1].lower()
+        names = ["Sheet1"] if ext == ".csv" else sheet_names(path)
+        target = self.entry_dir(sha256)
+        # 旧版本或中断的转换结果
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.makedirs(target)
+        manifest = {
+            "version": INGEST_VERSION,
+            "sha256": sha256,
+            "source_name": os.path.basename(path),
+            "format": ext.lstrip("."),
+            "size": os.path.getsize(path),
+            "created_at": datetime.now().isoformat(),
+            "sheets": [{"name": str(name), "index": index, "file": f"sheet_{index}.parquet"}
+                       for index, name in enumerate(names)],
+        }
+        self._write_manifest(manifest)
+        return manifest
+
+    def _convert(self, path: str, manifest: Dict[str, Any], sheets: List[Dict[str, Any]]) -> None:
+        """
+        解析指定的 sheet 并写入 Parquet（调用方需持有 lock）
+        每个 Parquet 先写临时文件再替换，之后更新清单：清单中带列名的 sheet 即已转换完成
+        """
+        target = self.entry_dir(manifest["sha256"])
+        for index, df in self._read_sheets(path, [sheet["index"] for sheet in sheets]):
+            sheet = manifest["sheets"][index]
+            df = normalize_dtypes(df)
+            tmp_path = os.path.join(target, f".{sheet['file']}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                pq.write_table(table, tmp_path, compression=settings.PARQUET_COMPRESSION)
+                os.replace(tmp_path, os.path.join(target, sheet["file"]))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            sheet.update({
+                "rows": len(df),
+                "columns": list(df.columns),
+                "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            })
+            self._write_manifest(manifest)
+
+        logger.info("ingest_completed",
+                    source=os.path.basename(path),
+                    sha256=manifest["sha256"],
+                    sheets=[sheet["name"] for sheet in sheets],
+                    rows=sum(sheet["rows"] for sheet in sheets))
+
+    @staticmethod
+    def _read_sheets(path: str, indices: List[int]) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """逐个解析 sheet，内存中同时只保留一个"""
+        if os.path.splitext(path)[1].lower() == ".csv":
+            yield 0, pd.read_csv(path, encoding=detect_encoding(path))
+            return
+        if len(indices) > 1 and select_engine(path) == "pandas":
+            # 旧版 xls 每次读取都解析整个工作簿，多个 sheet 一次读出
+            frames = list(read_all_sheets(path, engine="pandas").values())
+            for index in indices:
+                yield index, frames[index]
+            return
+        for index in indices:
+            yield index, read_excel(path, sheet_name=index)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """先写临时文件再替换，读取方不会读到写了一半的清单"""
+        manifest_path = os.path.join(self.entry_dir(manifest["sha256"]), MANIFEST_NAME)
+        tmp_path = f"{manifest_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    @staticmethod
+    def _converted(sheet: Dict[str, Any]) -> bool:
+        return "columns" in sheet
+
+    @classmethod
+    def _pending(cls, manifest: Dict[str, Any], sheet_name: Optional[Union[int, str]]) -> List[Dict[str, Any]]:
+        """需要转换的 sheet：sheet_name 为 None 时为全部未转换的 sheet"""
+        if sheet_name is None:
+            sheets = manifest["sheets"]
+        else:
+            sheet = cls._find_sheet(manifest, sheet_name)
+            sheets = [sheet] if sheet is not None else []
+        return [sheet for sheet in sheets if not cls._converted(sheet)]
+
+    @staticmethod
+    def _find_sheet(manifest: Dict[str, Any], sheet_name: Union[int, str]) -> Optional[Dict[str, Any]]:
+        for sheet in manifest["sheets"]:
+            if isinstance(sheet_name, int) and sheet["index"] == sheet_name:
+                return sheet
+            if isinstance(sheet_name, str) and sheet["name"] == sheet_name:
+                return sheet
+        return None
+
+    def _lock_for(self, sha256: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(sha256, threading.Lock())
+
+
+ingest_store = IngestStore()
@@ -0,0 +1,121 @@
+"""
+按字节容量限制的进程内 LRU 缓存
+用于缓存热点中间结果（Arrow Table）等体积差异较大的对象
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def _default_sizeof(value: Any) -> int:
+    """估算对象占用的字节数（优先使用 Arrow/pandas 自带的统计）"""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            return int(memory_usage(deep=True).sum())
+        except Exception:
+            pass
+    return 0
+
+
+class ByteLRUCache:
+    """
+    线程安全的 LRU 缓存，以条目字节数之和作为容量上限
+
+    - 写入时按最近最少使用顺序淘汰，直到总字节数不超过 max_bytes
+    - 单个条目超过 max_bytes 时直接跳过，不会清空整个缓存
+    - 记录命中、未命中和淘汰次数，供监控接口展示
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_bytes = max(0, int(max_bytes))
+        self._sizeof = sizeof or _default_sizeof
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存条目，命中时将其移动到最近使用位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """
+        写入缓存条目
+        返回: 是否实际写入（超过容量上限的条目不会写入）
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes == 0 or size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key: Hashable) -> bool:
+        """删除单个条目"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """删除所有 key 满足条件的条目，返回删除数量"""
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+
+    def clear(self):
+        """清空缓存（保留统计计数）"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
@@ -20,7 +20,8 @@ class NodeValidator:
         "FLOAT": ["STRING"],
         "STRING": [],  # 字符串可以转换为其他类型，但不应该自动连接
         "BOOLEAN": ["STRING"],
-        "DATAFRAME": [],  # DataFrame只能连接到DATAFRAME类型
+        "DATAFRAME": ["DATASET"],  # DataFrame 可由执行器包装为数据集句柄
+        "DATASET": ["DATAFRAME"],  # 数据集句柄由执行器按需物化为 DataFrame
         "LIST": [],
         "DICT": []
     }
@@ -0,0 +1,159 @@
+"""
+分区执行 (Out-of-core)
+加载节点的 partitioned 模式输出 Parquet 数据集的分区句柄，下游节点按分区执行，
+同时在内存中的只有一个分区：
+
+- 逐行节点（PARTITION_MODE = "rowwise"，如列映射、按行过滤/清洗）：每个分区单独执行，
+  DataFrame 输出逐个写为 Parquet 分片，输出仍是分区句柄，非 DataFrame 输出由节点合并
+- 聚合节点（PARTITION_MODE = "aggregate"，如通用指标、场景指标）：每个分区计算部分聚合，
+  两两合并后得到最终结果（见 app.core.partial_aggregates）
+- 其他节点：整体物化为 DataFrame（与内存模式相同，数据量大时可能内存不足）
+"""
+import os
+import shutil
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+from app.core.consolidate import conform, reconcile_dtype, unified_schema, union_columns
+from app.core.dataset import DatasetHandle
+from app.core.ingest import normalize_dtypes
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+ROWWISE = "rowwise"
+AGGREGATE = "aggregate"
+
+
+class PartitionWriter:
+    """把逐个分区的 DataFrame 写为一个分片目录，结束时统一各分片的 schema"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        parent = os.path.dirname(os.path.abspath(output_dir))
+        os.makedirs(parent, exist_ok=True)
+        self.tmp_dir = os.path.join(parent, f".{os.path.basename(output_dir)}.{uuid.uuid4().hex[:8]}.tmp")
+        os.makedirs(self.tmp_dir)
+        self.parts: List[Dict[str, Any]] = []
+
+    def write(self, df: pd.DataFrame) -> None:
+        df = normalize_dtypes(df)
+        path = os.path.join(self.tmp_dir, f"part-{len(self.parts):05d}.parquet")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression=settings.PARQUET_COMPRESSION)
+        self.parts.append({
+            "path": path,
+            "rows": len(df),
+            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "schema": table.schema.remove_metadata(),
+        })
+
+    def finish(self, partition_rows: Optional[int]) -> DatasetHandle:
+        """各分片 dtype 不一致时（如某分区中整列为空）按统一 schema 逐个改写，然后替换输出目录"""
+        dtype_maps = [part["dtypes"] for part in self.parts]
+        columns = union_columns([list(d) for d in dtype_maps])
+        targets = {col: reconcile_dtype([d.get(col) for d in dtype_maps]) for col in columns}
+        schema = unified_schema(columns, targets, [part["schema"] for part in self.parts])
+        for part in self.parts:
+            if not part["schema"].equals(schema):
+                df = conform(pq.read_table(part["path"]).to_pandas(), columns, targets)
+                pq.write_table(
+                    pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                    part["path"],
+                    compression=settings.PARQUET_COMPRESSION,
+                )
+        if os.path.exists(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.replace(self.tmp_dir, self.output_dir)
+        return DatasetHandle(self.output_dir, partition_rows=partition_rows)
+
+    def abort(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def merge_partition_outputs(values: Sequence[Any]) -> Any:
+    """
+    非 DataFrame 输出的默认合并方式：数字求和，文本去重后按行拼接，其他取最后一个分区的值
+    """
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return sum(values)
+    if all(isinstance(v, str) for v in values):
+        return "\n".join(dict.fromkeys(values))
+    return values[-1]
+
+
+def run_rowwise(
+    func: Callable[..., Any],
+    node_class: Any,
+    inputs: Dict[str, Any],
+    key: str,
+    handle: DatasetHandle,
+    output_dir: str,
+    columns: Optional[Sequence[str]] = None,
+) -> Tuple[Any, ...]:
+    """
+    逐分区执行逐行节点
+    第 i 个 DataFrame 输出写入 {output_dir}_{i}/ 分片目录，返回的输出中替换为分区句柄；
+    节点 PARTITION_MERGED_OUTPUTS 中列出的输出（如汇总表）不写分片，与非 DataFrame 输出一样合并
+    """
+    writers: Dict[int, PartitionWriter] = {}
+    others: Dict[int, List[Any]] = {}
+    merge = getattr(node_class, "merge_partition_outputs", None)
+    merged_outputs = set(getattr(node_class, "PARTITION_MERGED_OUTPUTS", ()))
+    partitions = 0
+    output_count = 0
+    try:
+        for partition in handle.iter_partitions(columns=columns):
+            outputs = func(**{**inputs, key: partition})
+            if not isinstance(outputs, tuple):
+                outputs = (outputs,)
+            output_count = len(outputs)
+            for idx, value in enumerate(outputs):
+                if isinstance(value, pd.DataFrame) and idx not in merged_outputs:
+                    if idx not in writers:
+                        writers[idx] = PartitionWriter(f"{output_dir}_{idx}")
+                    writers[idx].write(value)
+                else:
+                    others.setdefault(idx, []).append(value)
+            partitions += 1
+
+        results = []
+        for idx in range(output_count):
+            if idx in writers:
+                results.append(writers.pop(idx).finish(handle.partition_rows))
+            else:
+                values = others[idx]
+                results.append(merge(idx, values) if merge else merge_partition_outputs(values))
+    finally:
+        for writer in writers.values():
+            writer.abort()
+
+    logger.info("partitioned_rowwise_completed", node_class=node_class.__name__, partitions=partitions, output_dir=output_dir)
+    return tuple(results)
+
+
+def run_aggregate(
+    instance: Any,
+    inputs: Dict[str, Any],
+    key: str,
+    handle: DatasetHandle,
+    columns: Optional[Sequence[str]] = None,
+) -> Tuple[Any, ...]:
+    """
+    逐分区计算部分聚合并合并，最后由合并结果得到节点输出
+    节点需实现 partial_aggregate(**inputs) / merge_aggregates(a, b) / finalize_aggregate(state, **inputs)
+    """
+    state = None
+    partitions = 0
+    for partition in handle.iter_partitions(columns=columns):
+        partial = instance.partial_aggregate(**{**inputs, key: partition})
+        state = partial if state is None else instance.merge_aggregates(state, partial)
+        partitions += 1
+    outputs = instance.finalize_aggregate(state, **{k: v for k, v in inputs.items() if k != key})
+    logger.info("partitioned_aggregate_completed", node_class=type(instance).__name__, partitions=partitions)
+    return outputs if isinstance(outputs, tuple) else (outputs,)
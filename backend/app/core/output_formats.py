@@ -0,0 +1,172 @@
+"""
+输出数据的响应格式（内容协商）
+- application/json: 行字典列表，空值/时间等在 Arrow 层按列向量化转换，使用 orjson 序列化（可用时）
+- application/vnd.apache.arrow.stream: Arrow IPC 流，直接由缓存的 Arrow Table 写出
+- application/x-ndjson: 每行一个 JSON 对象，按 record batch 分块流式输出
+"""
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# orjson 为可选依赖，不可用时退回标准库 json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+MEDIA_JSON = "application/json"
+MEDIA_ARROW_STREAM = "application/vnd.apache.arrow.stream"
+MEDIA_NDJSON = "application/x-ndjson"
+
+FORMAT_MEDIA_TYPES = {
+    "json": MEDIA_JSON,
+    "arrow": MEDIA_ARROW_STREAM,
+    "ndjson": MEDIA_NDJSON,
+}
+_MEDIA_ALIASES = {
+    MEDIA_JSON: "json",
+    MEDIA_ARROW_STREAM: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    MEDIA_NDJSON: "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-seq": "ndjson",
+}
+
+# NDJSON 流式输出时每块的最大行数
+NDJSON_CHUNK_ROWS = 10_000
+
+
+def negotiate_format(accept: Optional[str], format_param: Optional[str] = None, default: str = "json") -> str:
+    """
+    确定响应格式
+    优先使用显式的 format 查询参数，其次按 Accept 头的 q 值选择，均无法识别时返回 default
+    """
+    if format_param:
+        fmt = format_param.strip().lower()
+        if fmt not in FORMAT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported format '{format_param}'. Supported: {', '.join(FORMAT_MEDIA_TYPES)}")
+        return fmt
+
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        pieces = [p.strip() for p in part.split(";")]
+        media = pieces[0].lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media in _MEDIA_ALIASES and quality > 0:
+            candidates.append((-quality, position, _MEDIA_ALIASES[media]))
+    if not candidates:
+        return default
+    return min(candidates)[2]
+
+
+def _json_safe_column(column: Union[pa.Array, pa.ChunkedArray]) -> Union[pa.Array, pa.ChunkedArray]:
+    """将单列转换为 JSON 友好的 Arrow 类型（整列向量化，不逐个单元格处理）"""
+    arrow_type = column.type
+    if pa.types.is_dictionary(arrow_type):
+        column = column.cast(arrow_type.value_type)
+        arrow_type = arrow_type.value_type
+
+    if pa.types.is_floating(arrow_type):
+        # NaN -> null
+        return pc.if_else(pc.is_nan(column), pa.scalar(None, arrow_type), column)
+    if pa.types.is_timestamp(arrow_type):
+        has_fraction = len(column) > column.null_count and pc.max(pc.subsecond(column)).as_py() > 0
+        # 与 Timestamp.isoformat() 一致：整秒不带小数，否则保留到微秒
+        fmt = "%Y-%m-%dT%H:%M:%S"
+        unit = "us" if has_fraction else "s"
+        if arrow_type.unit != unit:
+            column = column.cast(pa.timestamp(unit, tz=arrow_type.tz), safe=False)
+        if arrow_type.tz:
+            fmt += "%z"
+        return pc.strftime(column, format=fmt)
+    if pa.types.is_decimal(arrow_type):
+        return column.cast(pa.float64())
+    if (
+        pa.types.is_date(arrow_type)
+        or pa.types.is_time(arrow_type)
+        or pa.types.is_duration(arrow_type)
+        or pa.types.is_binary(arrow_type)
+        or pa.types.is_large_binary(arrow_type)
+    ):
+        try:
+            return column.cast(pa.string())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return column
+    return column
+
+
+def json_safe_table(table: Union[pa.Table, pa.RecordBatch]) -> Union[pa.Table, pa.RecordBatch]:
+    """NaN -> null，时间 -> ISO 字符串，decimal -> float"""
+    columns = [_json_safe_column(column) for column in table.columns]
+    if isinstance(table, pa.RecordBatch):
+        return pa.RecordBatch.from_arrays(columns, names=table.schema.names)
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+def table_to_rows(table: Union[pa.Table, pa.RecordBatch]) -> List[dict]:
+    """Arrow Table -> 可直接 JSON 序列化的行字典列表"""
+    return json_safe_table(table).to_pylist()
+
+
+def dumps(payload: Any) -> bytes:
+    """序列化为 JSON bytes（orjson 可用时使用 orjson）"""
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class _ChunkSink:
+    """收集 IPC writer 写出的字节，供生成器按 batch 逐块输出"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_arrow_stream(schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """以 Arrow IPC 流格式逐 batch 输出"""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        yield sink.drain()
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def iter_ndjson(batches: Iterable[pa.RecordBatch], chunk_rows: int = NDJSON_CHUNK_ROWS) -> Iterator[bytes]:
+    """以 NDJSON 格式逐块输出（每块最多 chunk_rows 行）"""
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_rows):
+            rows = table_to_rows(batch.slice(start, chunk_rows))
+            if rows:
+                yield b"\n".join(dumps(row) for row in rows) + b"\n"
+
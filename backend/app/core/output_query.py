@@ -0,0 +1,274 @@
+"""
+运行输出查询：分页、多列排序与过滤
+过滤条件转换为 pyarrow.dataset 表达式下推到扫描层，
+Parquet 的 row group 统计信息会被用于跳过不可能命中的 row group。
+"""
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from app.core.data_manager import data_manager
+
+MAX_PAGE_SIZE = 1000
+
+FILTER_OPERATORS = (
+    "eq", "ne", "gt", "ge", "lt", "le",
+    "in", "not_in", "between",
+    "is_null", "not_null",
+    "contains", "starts_with",
+)
+
+
+@dataclass
+class QueryPage:
+    """一页查询结果"""
+    table: pa.Table
+    total_matched: int
+    offset: int
+    next_cursor: Optional[str]
+
+
+def open_output_dataset(filepath: str) -> Optional[ds.Dataset]:
+    """
+    打开缓存输出为 Dataset
+    热层命中时直接基于内存 Table，否则基于 Parquet 文件（支持 row group 裁剪）
+    """
+    path = data_manager.resolve_path(filepath)
+    if path is None:
+        return None
+    cached = data_manager.memory_cache.get(data_manager._cache_key(path))
+    if cached is not None:
+        return ds.dataset(cached)
+    return ds.dataset(path, format="parquet")
+
+
+def _coerce_value(value: Any, field_type: pa.DataType) -> Any:
+    """将 JSON 值转换为列类型的标量，转换失败时保留原值交给 Arrow 隐式转换"""
+    if value is None:
+        return None
+    try:
+        return pa.scalar(value).cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return value
+
+
+def build_filter_expression(
+    filters: List[Dict[str, Any]],
+    schema: pa.Schema
+) -> Optional[ds.Expression]:
+    """
+    将过滤条件列表转换为 dataset 表达式（条件之间为 AND）
+    每个条件: {"column": "vendor", "op": "eq", "value": "A"}
+    """
+    expression = None
+    for spec in filters or []:
+        column = spec.get("column")
+        op = spec.get("op", "eq")
+        value = spec.get("value")
+        if column not in schema.names:
+            raise ValueError(f"Unknown filter column: {column}")
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{op}'. Supported: {', '.join(FILTER_OPERATORS)}")
+
+        field = ds.field(column)
+        field_type = schema.field(column).type
+
+        if op == "is_null":
+            condition = field.is_null()
+        elif op == "not_null":
+            condition = field.is_valid()
+        elif op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise ValueError(f"Filter '{op}' on '{column}' requires a list value")
+            values = pa.array(value).cast(field_type) if value else pa.array([], type=field_type)
+            condition = field.isin(values)
+            if op == "not_in":
+                condition = ~condition
+        elif op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(f"Filter 'between' on '{column}' requires [low, high]")
+            low, high = (_coerce_value(v, field_type) for v in value)
+            condition = (field >= low) & (field <= high)
+        elif op in ("contains", "starts_with"):
+            if not (pa.types.is_string(field_type) or pa.types.is_large_string(field_type)):
+                raise ValueError(f"Filter '{op}' requires a string column, '{column}' is {field_type}")
+            func = pc.match_substring if op == "contains" else pc.starts_with
+            condition = func(field, pattern=str(value))
+        else:
+            scalar = _coerce_value(value, field_type)
+            condition = {
+                "eq": lambda: field == scalar,
+                "ne": lambda: field != scalar,
+                "gt": lambda: field > scalar,
+                "ge": lambda: field >= scalar,
+                "lt": lambda: field < scalar,
+                "le": lambda: field <= scalar,
+            }[op]()
+
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _keyset_expression(
+    sort: List[Tuple[str, bool]],
+    keys: List[Any],
+    schema: pa.Schema
+) -> ds.Expression:
+    """
+    游标之后（含相等）的行: (k1 > v1) | (k1 == v1 & k2 > v2) | ... | (全部相等)
+    降序列使用 <；空值排在最后（null_placement="at_end"），
+    因此非空游标值之后还包括该列为空的行，空游标值之后只有该列同为空的行
+    """
+    values = [_coerce_value(v, schema.field(c).type) for (c, _), v in zip(sort, keys)]
+    expression = None
+    equal_prefix = None
+    for (column, descending), value in zip(sort, values):
+        field = ds.field(column)
+        if value is None:
+            equal = field.is_null()
+        else:
+            after = (field < value if descending else field > value) | field.is_null()
+            branch = after if equal_prefix is None else equal_prefix & after
+            expression = branch if expression is None else expression | branch
+            equal = field == value
+        equal_prefix = equal if equal_prefix is None else equal_prefix & equal
+    return equal_prefix if expression is None else expression | equal_prefix
+
+
+def _row_keys(table: pa.Table, columns: List[str], index: int) -> List[Any]:
+    return [table.column(c)[index].as_py() for c in columns]
+
+
+def query_output(
+    filepath: str,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    sort: Optional[List[Dict[str, Any]]] = None,
+    columns: Optional[List[str]] = None,
+    offset: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Optional[QueryPage]:
+    """
+    查询某个缓存输出的一页数据
+
+    分页方式:
+    - offset: 跳过前 offset 条匹配行
+    - cursor: 上一页返回的 next_cursor（keyset 分页，有排序时不需要扫描被跳过的页）
+
+    返回: QueryPage；缓存文件不存在时返回 None
+    """
+    dataset = open_output_dataset(filepath)
+    if dataset is None:
+        return None
+
+    schema = dataset.schema
+    all_columns = [c for c in schema.names if not c.startswith("__index_level_")]
+    selected = columns or all_columns
+    unknown = [c for c in selected if c not in schema.names]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}")
+
+    limit = max(0, min(int(limit), MAX_PAGE_SIZE))
+    offset = max(0, int(offset))
+    sort_keys = [(s["column"], bool(s.get("descending", False))) for s in (sort or [])]
+    for column, _ in sort_keys:
+        if column not in schema.names:
+            raise ValueError(f"Unknown sort column: {column}")
+    sort_columns = [c for c, _ in sort_keys]
+
+    expression = build_filter_expression(filters or [], schema)
+    total_matched = dataset.count_rows(filter=expression)
+
+    state = _decode_cursor(cursor) if cursor else {}
+    if "offset" in state:
+        offset = int(state["offset"])
+
+    if not sort_keys:
+        table = _scan_slice(dataset, selected, expression, offset, limit)
+        next_offset = offset + table.num_rows
+        next_cursor = _encode_cursor({"offset": next_offset}) if next_offset < total_matched else None
+        return QueryPage(table=table, total_matched=total_matched, offset=offset, next_cursor=next_cursor)
+
+    # 有排序：keyset 游标把“跳过前面所有页”变成一个下推的过滤条件
+    ties = 0
+    scan_expression = expression
+    if "keys" in state:
+        ties = int(state.get("ties", 0))
+        keyset = _keyset_expression(sort_keys, state["keys"], schema)
+        scan_expression = keyset if scan_expression is None else scan_expression & keyset
+        start = ties
+    else:
+        start = offset
+
+    read_columns = list(dict.fromkeys(selected + sort_columns))
+    candidates = dataset.to_table(columns=read_columns, filter=scan_expression)
+    order = pc.sort_indices(
+        candidates,
+        sort_keys=[(c, "descending" if desc else "ascending") for c, desc in sort_keys],
+        null_placement="at_end",
+    )
+    page = candidates.take(order[start:start + limit]) if limit else candidates.slice(0, 0)
+
+    page_offset = (int(state.get("position", 0)) if "keys" in state else offset)
+    next_position = page_offset + page.num_rows
+    next_cursor = None
+    if page.num_rows and next_position < total_matched:
+        last_keys = _row_keys(page, sort_columns, page.num_rows - 1)
+        trailing = 0
+        for i in range(page.num_rows - 1, -1, -1):
+            if _row_keys(page, sort_columns, i) != last_keys:
+                break
+            trailing += 1
+        if "keys" in state and trailing == page.num_rows and last_keys == state["keys"]:
+            trailing += ties
+        next_cursor = _encode_cursor({"keys": last_keys, "ties": trailing, "position": next_position})
+
+    return QueryPage(
+        table=page.select(selected),
+        total_matched=total_matched,
+        offset=page_offset,
+        next_cursor=next_cursor,
+    )
+
+
+def _scan_slice(
+    dataset: ds.Dataset,
+    columns: List[str],
+    expression: Optional[ds.Expression],
+    offset: int,
+    limit: int
+) -> pa.Table:
+    """按扫描顺序流式跳过 offset 行并取 limit 行，不物化整个结果"""
+    batches = []
+    remaining = limit
+    skip = offset
+    for batch in dataset.to_batches(columns=columns, filter=expression):
+        if remaining <= 0:
+            break
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        batch = batch.slice(skip, remaining)
+        skip = 0
+        batches.append(batch)
+        remaining -= batch.num_rows
+    if not batches:
+        return dataset.schema.empty_table().select(columns)
+    return pa.Table.from_batches(batches).select(columns)
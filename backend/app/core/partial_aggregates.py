@@ -0,0 +1,251 @@
+"""
+可合并的部分聚合 (Mergeable Partial Aggregates)
+分区执行时，聚合节点对每个分区计算部分结果，再两两合并，最后由合并结果得到指标，
+内存只与分区大小和分组数有关，与总行数无关。
+
+- NumericSummary: 数值列的行数、和、均值、二阶中心矩（并行方差合并公式）、最小/最大值和分位数草图；
+  所有数值列的基础统计由一次 agg 计算，未参与合并时分位数是精确值
+- QuantileSketch: 可合并的分位数草图（t-digest 式压缩：按值排序的质心，越靠近两端质心越小），
+  值的个数不超过压缩参数时保留全部值，分位数是精确的
+- GroupSummary: 按分组键（实体、期间）累计多个数值列的行数、和、二阶中心矩、最小/最大值
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 分位数草图的压缩参数：值的个数超过该值时压缩，压缩后质心数约为一半
+SKETCH_COMPRESSION = 1000
+SUMMARY_STATS = ["count", "sum", "mean", "std", "min", "max"]
+
+
+def _compress(means: np.ndarray, weights: np.ndarray, compression: int):
+    """
+    按 t-digest 的 k1 尺度函数把相邻质心分桶合并（已按值排序）
+    桶在分位数两端更窄，尾部分位数更准确；质心数不超过 compression / 2 + 1
+    """
+    if len(means) <= compression:
+        return means, weights
+    cumulative = np.cumsum(weights)
+    q = (cumulative - weights / 2) / cumulative[-1]
+    k = compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+    bucket = np.floor(k - k[0]).astype(np.int64)
+    sizes = np.bincount(bucket, weights=weights)
+    sums = np.bincount(bucket, weights=means * weights)
+    keep = sizes > 0
+    return sums[keep] / sizes[keep], sizes[keep]
+
+
+class QuantileSketch:
+    """可合并的分位数草图：按值排序的质心（均值、权重）"""
+
+    def __init__(
+        self,
+        means: Optional[np.ndarray] = None,
+        weights: Optional[np.ndarray] = None,
+        compression: Optional[int] = None,
+    ):
+        self.compression = compression or SKETCH_COMPRESSION
+        self.means = means if means is not None else np.empty(0)
+        self.weights = weights if weights is not None else np.empty(0)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, compression: Optional[int] = None) -> "QuantileSketch":
+        compression = compression or SKETCH_COMPRESSION
+        values = np.sort(values[~np.isnan(values)])
+        return cls(*_compress(values, np.ones(len(values)), compression), compression)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """合并两个草图（不修改参与合并的对象）"""
+        if len(other.means) == 0:
+            return self
+        if len(self.means) == 0:
+            return other
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind="stable")
+        return QuantileSketch(*_compress(means[order], weights[order], self.compression), self.compression)
+
+    def quantile(self, q: float) -> float:
+        """
+        估计分位数：在质心中点之间线性插值
+        未压缩时与 pandas/numpy 的 linear 插值一致
+        """
+        if len(self.means) == 0:
+            return np.nan
+        centers = np.cumsum(self.weights) - self.weights / 2
+        rank = q * (self.weights.sum() - 1) + 0.5
+        return float(np.interp(rank, centers, self.means))
+
+
+@dataclass
+class NumericSummary:
+    """一个数值列的部分聚合"""
+    count: int = 0
+    total: float = 0.0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = np.nan
+    maximum: float = np.nan
+    # 参与合并前的精确分位数 {q: 值}（合并后失效，改用草图估计）
+    exact_quantiles: Dict[float, float] = field(default_factory=dict)
+    sketch: Optional[QuantileSketch] = None
+
+    @classmethod
+    def from_series(cls, series: pd.Series, quantiles: Sequence[float] = (0.5,), sketch: bool = True) -> "NumericSummary":
+        return summarize_numeric(series.rename("value").to_frame(), quantiles, sketch)["value"]
+
+    def merge(self, other: "NumericSummary") -> "NumericSummary":
+        """合并两个部分聚合（不修改参与合并的对象）"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        sketch = None
+        if self.sketch is not None and other.sketch is not None:
+            sketch = self.sketch.merge(other.sketch)
+        return NumericSummary(
+            count=count,
+            total=self.total + other.total,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta ** 2 * self.count * other.count / count,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            sketch=sketch,
+        )
+
+    @property
+    def std(self) -> float:
+        """样本标准差（ddof=1，与 pandas 一致）"""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+        if q in self.exact_quantiles:
+            return self.exact_quantiles[q]
+        if self.sketch is None:
+            raise ValueError(f"Quantile {q} was not computed and no sketch is available")
+        return self.sketch.quantile(q)
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+
+def summarize_numeric(
+    df: pd.DataFrame, quantiles: Sequence[float] = (0.5,), sketch: bool = True
+) -> Dict[str, NumericSummary]:
+    """
+    DataFrame 中每个数值列的部分聚合
+    所有数值列的基础统计由一次 agg 计算，精确分位数由一次 quantile 计算；
+    sketch=False 时不构建分位数草图（不需要合并的整体计算）
+    """
+    numeric = df.select_dtypes(include=["number"])
+    if numeric.columns.empty:
+        return {}
+    stats = numeric.agg(SUMMARY_STATS)
+    exact = numeric.quantile(list(quantiles)) if len(quantiles) else None
+
+    summaries = {}
+    for col in numeric.columns:
+        count = int(stats.at["count", col])
+        column_sketch = QuantileSketch.from_values(numeric[col].to_numpy(dtype=float, na_value=np.nan)) if sketch else None
+        if count == 0:
+            summaries[col] = NumericSummary(sketch=column_sketch)
+            continue
+        std = float(stats.at["std", col]) if count > 1 else 0.0
+        summaries[col] = NumericSummary(
+            count=count,
+            total=float(stats.at["sum", col]),
+            mean=float(stats.at["mean", col]),
+            m2=std ** 2 * (count - 1),
+            minimum=float(stats.at["min", col]),
+            maximum=float(stats.at["max", col]),
+            exact_quantiles={} if exact is None else {float(q): float(exact.at[q, col]) for q in exact.index},
+            sketch=column_sketch,
+        )
+    return summaries
+
+
+def merge_summaries(a: Dict[str, NumericSummary], b: Dict[str, NumericSummary]) -> Dict[str, NumericSummary]:
+    merged = dict(a)
+    for col, summary in b.items():
+        merged[col] = merged[col].merge(summary) if col in merged else summary
+    return merged
+
+
+class GroupSummary:
+    """
+    按分组键累计多个数值列的行数、和、均值、二阶中心矩、最小/最大值（分组数决定内存占用）
+    frame 以分组键为索引、列为 (列名, 统计量)；sizes 为各组行数
+    """
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None, sizes: Optional[pd.Series] = None):
+        self.frame = frame if frame is not None else pd.DataFrame()
+        self.sizes = sizes if sizes is not None else pd.Series(dtype="int64")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keys: List[str], columns: List[str]) -> "GroupSummary":
+        """一次分组、一次 agg 得到所有列的组内统计"""
+        grouped = df.groupby(keys)
+        stats = grouped[columns].agg(["count", "sum", "mean", "var", "min", "max"])
+        for col in columns:
+            stats[(col, "var")] = (stats[(col, "var")] * (stats[(col, "count")] - 1)).fillna(0.0)
+        stats = stats.rename(columns={"var": "m2"}, level=1)
+        return cls(stats, grouped.size())
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.frame.columns.get_level_values(0).unique())
+
+    def merge(self, other: "GroupSummary") -> "GroupSummary":
+        if self.frame.empty:
+            return other
+        if other.frame.empty:
+            return self
+        combined = pd.concat([self.frame, other.frame])
+        levels = list(range(combined.index.nlevels))
+        merged = {}
+        for col in self.columns:
+            part = combined[col]
+            grouped = part.groupby(level=levels)
+            count = grouped["count"].sum()
+            total = grouped["sum"].sum()
+            mean = total / count.where(count > 0)
+            # 并行方差合并：组内二阶矩之和 + 各部分均值相对合并均值的偏差平方和
+            deviation = part["count"] * (part["mean"] - mean.reindex(part.index).to_numpy()) ** 2
+            merged.update({
+                (col, "count"): count,
+                (col, "sum"): total,
+                (col, "mean"): mean,
+                (col, "m2"): grouped["m2"].sum() + deviation.fillna(0.0).groupby(level=levels).sum(),
+                (col, "min"): grouped["min"].min(),
+                (col, "max"): grouped["max"].max(),
+            })
+        sizes = pd.concat([self.sizes, other.sizes]).groupby(level=levels).sum()
+        return GroupSummary(pd.DataFrame(merged), sizes)
+
+    def sums(self, column: str) -> pd.Series:
+        return self.frame[(column, "sum")]
+
+    def means(self, column: str) -> pd.Series:
+        return self.frame[(column, "mean")]
+
+    def to_frame(self) -> pd.DataFrame:
+        """每组一行：分组键、record_count、{列}_count / _sum / _mean / _std / _min / _max"""
+        if self.frame.empty:
+            return pd.DataFrame()
+        result = {"record_count": self.sizes}
+        for col in self.columns:
+            count = self.frame[(col, "count")]
+            result[f"{col}_count"] = count
+            result[f"{col}_sum"] = self.frame[(col, "sum")]
+            result[f"{col}_mean"] = self.frame[(col, "mean")]
+            result[f"{col}_std"] = np.sqrt(self.frame[(col, "m2")] / (count - 1).where(count > 1))
+            result[f"{col}_min"] = self.frame[(col, "min")]
+            result[f"{col}_max"] = self.frame[(col, "max")]
+        return pd.DataFrame(result).reset_index()
@@ -0,0 +1,161 @@
+"""
+执行计划：投影下推 (Projection Pushdown)
+从下游向上游计算每个节点实际用到的列，把加载节点输出需要的列集合下推为加载节点的 projection 输入，
+加载节点只读取这些列（Excel 列选择 / Parquet 列选择 / CSV 列投影），加载时间和内存随之按比例减少。
+
+节点通过 required_columns(inputs, downstream) 声明从各 DATAFRAME 输入读取的列；
+未声明的节点、没有下游的输出（最终结果）都视为需要全部列。
+
+下推到加载节点是可选的（PROJECTION_PUSHDOWN_ENABLED，或工作流节点上的 "pushdown": true/false）：
+开启后加载节点自身的输出（缓存、预览、导出、查询）也只包含投影的列。
+数据集句柄物化为 DataFrame 时的列选择（plan_input_columns）不改变任何保存的输出，始终生效。
+"""
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+ALL_COLUMNS = None  # 需要全部列
+
+Requirement = Optional[Set[str]]
+
+
+def is_reference(value: Any) -> bool:
+    """工作流输入是否为连线引用 ["node_id", slot]"""
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def static_flag(value: Any, default: bool) -> Optional[bool]:
+    """静态布尔参数（与执行器的 BOOLEAN 转换规则一致）；连线输入无法在计划阶段确定，返回 None"""
+    if value is None:
+        return default
+    if is_reference(value):
+        return None
+    if isinstance(value, str):
+        return value.lower() in ("true", "1", "yes", "on")
+    return bool(value)
+
+
+def static_columns(value: Any) -> Optional[Set[str]]:
+    """逗号分隔的静态列名参数；连线输入或非字符串返回 None"""
+    if not isinstance(value, str):
+        return None
+    return {c.strip() for c in value.split(",") if c.strip()}
+
+
+def merge_requirements(a: Requirement, b: Requirement) -> Requirement:
+    """两个需求的并集；任一方需要全部列时结果为全部列"""
+    if a is ALL_COLUMNS or b is ALL_COLUMNS:
+        return ALL_COLUMNS
+    return a | b
+
+
+def _declared(node_class: Any, inputs: Dict[str, Any], downstream: Dict[int, Requirement]) -> Optional[Dict[str, Requirement]]:
+    declare = getattr(node_class, "required_columns", None)
+    if declare is None:
+        return None
+    try:
+        declared = declare(inputs, downstream)
+    except Exception as e:
+        # 声明失败只影响优化，不影响执行
+        logger.warning("projection_declaration_failed", node_class=getattr(node_class, "__name__", str(node_class)), error=str(e))
+        return None
+    return declared
+
+
+def _plan_requirements(
+    graph: Dict[str, Any],
+    execution_order: List[str],
+    get_node_class: Callable[[str], Any]
+) -> Tuple[Dict[Tuple[str, int], List[Tuple[str, str]]], Dict[str, Dict[str, Requirement]], Dict[str, Dict[int, Requirement]]]:
+    """
+    逆拓扑序计算每个节点各输入、各输出需要的列
+    返回 (consumers, input_requirements, output_requirements)
+    """
+    # (上游节点, 输出序号) -> [(下游节点, 输入名)]
+    consumers: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+    for node_id in execution_order:
+        for key, value in graph[node_id].get("inputs", {}).items():
+            if is_reference(value) and value[0] in graph:
+                consumers.setdefault((value[0], value[1]), []).append((node_id, key))
+
+    # 节点 -> {输入名: 需求}；逆拓扑序处理，保证下游先于上游
+    input_requirements: Dict[str, Dict[str, Requirement]] = {}
+    output_requirements: Dict[str, Dict[int, Requirement]] = {}
+    for node_id in reversed(execution_order):
+        node_def = graph[node_id]
+        node_class = get_node_class(node_def.get("class_type"))
+        inputs = node_def.get("inputs", {})
+        slots = range(len(getattr(node_class, "RETURN_TYPES", ()) or ()) or 1)
+
+        downstream: Dict[int, Requirement] = {}
+        for slot in slots:
+            users = consumers.get((node_id, slot), [])
+            requirement: Requirement = set() if users else ALL_COLUMNS
+            for consumer_id, key in users:
+                requirement = merge_requirements(requirement, input_requirements[consumer_id].get(key, ALL_COLUMNS))
+            downstream[slot] = requirement
+        output_requirements[node_id] = downstream
+
+        declared = _declared(node_class, inputs, downstream) if node_class else None
+        input_requirements[node_id] = {
+            key: (declared.get(key, ALL_COLUMNS) if declared is not None else ALL_COLUMNS)
+            for key, value in inputs.items() if is_reference(value)
+        }
+    return consumers, input_requirements, output_requirements
+
+
+def plan_projections(
+    graph: Dict[str, Any],
+    execution_order: List[str],
+    get_node_class: Callable[[str], Any],
+    default: bool = True
+) -> Dict[str, List[str]]:
+    """
+    计算可下推的投影
+
+    Args:
+        graph: 标准化后的图 {node_id: {"class_type", "inputs", ...}}
+        execution_order: 拓扑排序结果
+        get_node_class: class_type -> 节点类
+        default: 节点未设置 "pushdown" 时是否下推
+
+    Returns:
+        {加载节点 id: 需要读取的列（排序后的列表）}；不能下推的节点不出现
+    """
+    consumers, _, output_requirements = _plan_requirements(graph, execution_order, get_node_class)
+
+    projections: Dict[str, List[str]] = {}
+    for node_id in execution_order:
+        node_def = graph[node_id]
+        node_class = get_node_class(node_def.get("class_type"))
+        if not getattr(node_class, "SUPPORTS_PROJECTION", False) or not node_def.get("pushdown", default):
+            continue
+        # 投影作用于加载节点的全部输出（如流式模式写出的 Parquet），其他输出被引用时不下推
+        if any(slot != 0 and (node_id, slot) in consumers for slot in output_requirements[node_id]):
+            continue
+        requirement = output_requirements[node_id].get(0, ALL_COLUMNS)
+        if requirement is not ALL_COLUMNS:
+            projections[node_id] = sorted(requirement)
+    return projections
+
+
+def plan_input_columns(
+    graph: Dict[str, Any],
+    execution_order: List[str],
+    get_node_class: Callable[[str], Any]
+) -> Dict[str, Dict[str, List[str]]]:
+    """
+    每个节点各连线输入实际用到的列（只包含可以确定的输入）
+    执行器把数据集句柄物化为 DataFrame 时只读取这些列
+
+    Returns:
+        {node_id: {输入名: 列名列表}}
+    """
+    _, input_requirements, _ = _plan_requirements(graph, execution_order, get_node_class)
+    return {
+        node_id: {key: sorted(requirement) for key, requirement in requirements.items() if requirement is not ALL_COLUMNS}
+        for node_id, requirements in input_requirements.items()
+        if any(requirement is not ALL_COLUMNS for requirement in requirements.values())
+    }
@@ -6,6 +6,12 @@ from typing import List, Optional, Dict, Any
 from pathlib import Path
 from pydantic import BaseModel
 from app.core.config import settings
+from app.core.data_manager import data_manager
+
+
+def is_safe_id(part: str) -> bool:
+    """项目 / 运行 ID 只能是单个路径段（非空、不是 "." / ".."、不含路径分隔符）"""
+    return bool(part) and part not in (".", "..") and os.path.basename(part) == part
 
 
 class ProjectMetadata(BaseModel):
@@ -121,12 +127,36 @@ class ProjectManager:
         
         try:
             shutil.rmtree(project_dir)
+            data_manager.invalidate_dir(project_dir)
             print(f"[ProjectManager] Deleted project: {project_id}")
             return True
         except Exception as e:
             print(f"[ProjectManager] Failed to delete project: {e}")
             return False
     
+    def delete_run(self, project_id: str, run_id: str) -> bool:
+        """删除单次执行运行（输出与缓存），并使其内存缓存失效"""
+        if not is_safe_id(project_id) or not is_safe_id(run_id):
+            return False
+        runs_dir = os.path.join(self._get_project_dir(project_id), "runs")
+        run_dir = os.path.join(runs_dir, run_id)
+        # 删除前确认实际路径直接位于 <项目>/runs 下（防止路径遍历和符号链接）
+        if os.path.dirname(os.path.realpath(run_dir)) != os.path.realpath(runs_dir):
+            return False
+        if not os.path.isdir(run_dir):
+            return False
+        
+        import shutil
+        
+        try:
+            shutil.rmtree(run_dir)
+            data_manager.invalidate_dir(run_dir)
+            print(f"[ProjectManager] Deleted run: {project_id}/{run_id}")
+            return True
+        except Exception as e:
+            print(f"[ProjectManager] Failed to delete run: {e}")
+            return False
+    
     def get_data_dir(self, project_id: str) -> str:
         """获取项目数据目录"""
         return os.path.join(self._get_project_dir(project_id), "data")
@@ -139,6 +169,12 @@ class ProjectManager:
         os.makedirs(os.path.join(run_dir, "cache"), exist_ok=True)
         return run_dir
     
+    def get_state_dir(self, project_id: str) -> str:
+        """获取项目状态目录（跨运行保存的节点状态，如重复检测的哈希索引）"""
+        state_dir = os.path.join(self._get_project_dir(project_id), "state")
+        os.makedirs(state_dir, exist_ok=True)
+        return state_dir
+    
     # Private methods
     
     def _get_project_dir(self, project_id: str) -> str:
@@ -0,0 +1,357 @@
+"""
+声明式审计规则引擎
+规则集（JSON，或安装 PyYAML 时的 YAML）编译为向量化的 pandas/numpy 表达式，
+所有规则在同一遍计算中求值：列只取一次，相同的子条件、分组聚合只计算一次，供多条规则共用。
+命中结果按规则以列的形式拼接为风险明细表，不逐行构造字典。
+
+规则格式::
+
+    {"rules": [
+      {"id": "AMOUNT_OUTLIER", "severity": "HIGH", "description": "金额异常: {amount:.2f}",
+       "when": {"column": "amount", "op": ">", "value": "= amount_mean + 3 * amount_std"},
+       "defaults": {"amount_mean": 0, "amount_std": 1}},
+      {"id": "VENDOR_TOTAL", "severity": "HIGH", "group_by": ["vendor"],
+       "when": {"all": [{"column": "amount", "agg": "sum", "op": ">", "value": 1000000},
+                        {"column": "invoice_no", "op": "not_null"}]}},
+      {"id": "DUPLICATE_RECORDS", "severity": "MEDIUM", "emit": "summary",
+       "description": "发现{count}条重复记录", "when": {"op": "duplicated"}}
+    ]}
+
+- 条件：{"column", "op", "value"}，或组合 {"all": [...]} / {"any": [...]} / {"not": {...}}
+- op: == != > >= < <= in not_in between is_null not_null contains regex duplicated
+- value: 常量、列表、{"column": "另一列"}（列间比较），或以 "=" 开头的指标表达式（引用上游指标，支持 + - * /）
+- group_by + agg（sum/mean/count/min/max/std/nunique）：条件作用于分组聚合值，命中分组的所有行都命中
+- emit: rows（每个命中行一条，默认）/ summary（每条规则一条汇总）
+- 规则引用的列不存在或指标缺失时跳过该规则，并记录在结果中
+"""
+import ast
+import json
+import operator
+import re
+import string
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# PyYAML 为可选依赖，未安装时规则集只能使用 JSON
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+SEVERITIES = ("HIGH", "MEDIUM", "LOW")
+COMPARISONS = {
+    "==": operator.eq, "!=": operator.ne,
+    ">": operator.gt, ">=": operator.ge,
+    "<": operator.lt, "<=": operator.le,
+}
+OPERATORS = tuple(COMPARISONS) + ("in", "not_in", "between", "is_null", "not_null", "contains", "regex", "duplicated")
+AGGREGATES = ("sum", "mean", "count", "min", "max", "std", "nunique")
+RISK_COLUMNS = ["rule_id", "risk_level", "description", "record_id"]
+
+DEFAULT_RULES = [
+    {
+        "id": "AMOUNT_OUTLIER",
+        "severity": "HIGH",
+        "description": "金额异常: {amount:.2f}",
+        "when": {"column": "amount", "op": ">", "value": "= amount_mean + 3 * amount_std"},
+        "defaults": {"amount_mean": 0, "amount_std": 1},
+    },
+    {
+        "id": "DUPLICATE_RECORDS",
+        "severity": "MEDIUM",
+        "emit": "summary",
+        "description": "发现{count}条重复记录",
+        "when": {"op": "duplicated"},
+    },
+]
+
+_ARITHMETIC = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_PRINTF_SPEC = re.compile(r"^[-+ 0#]*\d*(\.\d+)?[dfeEgG]$")
+
+
+class RuleSkipped(Exception):
+    """规则引用的列或指标不存在"""
+
+
+@dataclass
+class Rule:
+    id: str
+    severity: str
+    when: Dict[str, Any]
+    description: str = ""
+    group_by: List[str] = field(default_factory=list)
+    emit: str = "rows"
+    defaults: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class RuleResult:
+    risk_items: pd.DataFrame
+    # 每条规则的命中数（跳过的规则 hits 为空，reason 说明原因）
+    summary: pd.DataFrame
+
+
+def parse_rules(spec: Any) -> List[Rule]:
+    """
+    规则集文本（JSON/YAML）或已解析的对象 -> 规则列表
+    空值使用默认规则（金额异常、重复记录）
+    """
+    if spec is None or (isinstance(spec, str) and not spec.strip()):
+        spec = DEFAULT_RULES
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except ValueError as json_error:
+            if not HAS_YAML:
+                raise ValueError(f"Invalid rule set JSON: {json_error}")
+            try:
+                spec = yaml.safe_load(spec)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid rule set (neither JSON nor YAML): {e}")
+    if isinstance(spec, dict):
+        spec = spec.get("rules")
+    if not isinstance(spec, list):
+        raise ValueError("Rule set must be a list of rules or an object with a 'rules' list")
+
+    rules = []
+    seen = set()
+    for i, item in enumerate(spec):
+        if not isinstance(item, dict) or not isinstance(item.get("when"), dict):
+            raise ValueError(f"Rule #{i + 1} must be an object with a 'when' condition")
+        rule_id = str(item.get("id") or f"RULE_{i + 1}")
+        if rule_id in seen:
+            raise ValueError(f"Duplicate rule id '{rule_id}'")
+        seen.add(rule_id)
+        severity = str(item.get("severity", "MEDIUM")).upper()
+        if severity not in SEVERITIES:
+            raise ValueError(f"Rule '{rule_id}': severity must be one of {SEVERITIES}")
+        emit = item.get("emit", "rows")
+        if emit not in ("rows", "summary"):
+            raise ValueError(f"Rule '{rule_id}': emit must be 'rows' or 'summary'")
+        group_by = item.get("group_by") or []
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        _check_condition(rule_id, item["when"], bool(group_by))
+        rules.append(Rule(
+            id=rule_id,
+            severity=severity,
+            when=item["when"],
+            description=str(item.get("description") or rule_id),
+            group_by=list(group_by),
+            emit=emit,
+            defaults=dict(item.get("defaults") or {}),
+        ))
+    return rules
+
+
+def _check_condition(rule_id: str, cond: Dict[str, Any], grouped: bool) -> None:
+    """编译前检查条件结构，错误在执行前报告"""
+    for key in ("all", "any"):
+        if key in cond:
+            if not isinstance(cond[key], list) or not cond[key]:
+                raise ValueError(f"Rule '{rule_id}': '{key}' must be a non-empty list")
+            for sub in cond[key]:
+                _check_condition(rule_id, sub, grouped)
+            return
+    if "not" in cond:
+        _check_condition(rule_id, cond["not"], grouped)
+        return
+    op = cond.get("op")
+    if op not in OPERATORS:
+        raise ValueError(f"Rule '{rule_id}': unsupported op '{op}'. Supported: {', '.join(OPERATORS)}")
+    if op != "duplicated" and not cond.get("column"):
+        raise ValueError(f"Rule '{rule_id}': condition with op '{op}' needs a 'column'")
+    agg = cond.get("agg")
+    if agg is not None and (agg not in AGGREGATES or not grouped):
+        raise ValueError(f"Rule '{rule_id}': 'agg' must be one of {AGGREGATES} and requires 'group_by'")
+
+
+def _metric_value(expression: str, metrics: Dict[str, Any]) -> float:
+    """
+    "= amount_mean + 3 * amount_std" -> 数值
+    只允许数字、指标名和 + - * /，不执行任意代码
+    """
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id not in metrics or metrics[node.id] is None:
+                raise RuleSkipped(f"metric '{node.id}' not available")
+            return float(metrics[node.id])
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            return _ARITHMETIC[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = evaluate(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        raise ValueError(f"Unsupported metric expression: {expression}")
+
+    try:
+        tree = ast.parse(expression.lstrip("=").strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid metric expression '{expression}': {e}")
+    return evaluate(tree)
+
+
+class _Evaluator:
+    """一遍求值的共享状态：列、分组聚合、条件掩码均按键缓存"""
+
+    def __init__(self, df: pd.DataFrame, metrics: Dict[str, Any]):
+        self.df = df
+        self.metrics = metrics
+        self.masks: Dict[str, np.ndarray] = {}
+        self.series: Dict[Tuple, pd.Series] = {}
+
+    def column(self, name: str, group_by: Tuple[str, ...] = (), agg: Optional[str] = None) -> pd.Series:
+        key = (name, group_by, agg)
+        if key not in self.series:
+            for col in (name,) + group_by:
+                if col not in self.df.columns:
+                    raise RuleSkipped(f"column '{col}' not found")
+            series = self.df[name]
+            if agg is not None:
+                series = self.df.groupby(list(group_by), observed=True, sort=False, dropna=False)[name].transform(agg)
+            self.series[key] = series
+        return self.series[key]
+
+    def mask(self, rule: Rule, cond: Dict[str, Any]) -> np.ndarray:
+        key = json.dumps([rule.group_by, cond, rule.defaults], sort_keys=True, default=str)
+        if key not in self.masks:
+            self.masks[key] = self._evaluate(rule, cond)
+        return self.masks[key]
+
+    def _evaluate(self, rule: Rule, cond: Dict[str, Any]) -> np.ndarray:
+        if "all" in cond:
+            return np.logical_and.reduce([self.mask(rule, sub) for sub in cond["all"]])
+        if "any" in cond:
+            return np.logical_or.reduce([self.mask(rule, sub) for sub in cond["any"]])
+        if "not" in cond:
+            return ~self.mask(rule, cond["not"])
+
+        op = cond["op"]
+        if op == "duplicated":
+            columns = cond.get("columns") or None
+            missing = [c for c in columns or [] if c not in self.df.columns]
+            if missing:
+                raise RuleSkipped(f"columns {missing} not found")
+            return self.df.duplicated(subset=columns, keep=False).to_numpy()
+
+        series = self.column(cond["column"], tuple(rule.group_by), cond.get("agg"))
+        value = self._value(rule, cond.get("value"))
+        if op == "is_null":
+            result = series.isna()
+        elif op == "not_null":
+            result = series.notna()
+        elif op == "in":
+            result = series.isin(value if isinstance(value, list) else [value])
+        elif op == "not_in":
+            result = ~series.isin(value if isinstance(value, list) else [value]) & series.notna()
+        elif op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(f"Rule '{rule.id}': 'between' needs [low, high]")
+            result = series.between(value[0], value[1])
+        elif op in ("contains", "regex"):
+            result = series.astype("string").str.contains(str(value), regex=(op == "regex"), na=False)
+        else:
+            try:
+                result = COMPARISONS[op](series, value)
+            except TypeError as e:
+                raise ValueError(f"Rule '{rule.id}': cannot compare column '{cond['column']}' with {value!r}: {e}")
+        return _to_bool(result)
+
+    def _value(self, rule: Rule, value: Any) -> Any:
+        if isinstance(value, dict) and "column" in value:
+            return self.column(value["column"])
+        if isinstance(value, str) and value.startswith("="):
+            return _metric_value(value, {**rule.defaults, **self.metrics})
+        return value
+
+
+def _to_bool(result: Any) -> np.ndarray:
+    """比较结果（可能含缺失值）-> numpy 布尔数组，缺失视为不命中"""
+    if isinstance(result, pd.Series):
+        return result.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(result, dtype=bool)
+
+
+def _format_field(values: pd.Series, spec: str) -> np.ndarray:
+    """按格式说明批量格式化一列（printf 兼容的格式用 numpy 向量化，其他逐值格式化）"""
+    if not spec:
+        return values.astype(str).to_numpy(dtype=object)
+    if _PRINTF_SPEC.match(spec) and pd.api.types.is_numeric_dtype(values):
+        array = values.to_numpy(dtype=float if spec[-1] != "d" else np.int64, na_value=np.nan if spec[-1] != "d" else 0)
+        return np.char.mod(f"%{spec}", array).astype(object)
+    return values.map(lambda v: format(v, spec)).to_numpy(dtype=object)
+
+
+def _describe(template: str, df: pd.DataFrame, positions: Optional[np.ndarray], count: int) -> Any:
+    """
+    描述模板 -> 命中行的描述（模板中的 {列名[:格式]} 按列向量化填充，{count} 为命中数）
+    positions 为空（汇总规则）时只填充 {count}
+    """
+    parts = []
+    for literal, name, spec, _ in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if name is None:
+            continue
+        if name == "count":
+            parts.append(format(count, spec or ""))
+        elif positions is not None and name in df.columns:
+            parts.append(_format_field(df[name].iloc[positions], spec or ""))
+        else:
+            parts.append("{" + name + "}")
+    if all(isinstance(p, str) for p in parts):
+        return "".join(parts)
+    result = np.full(len(positions), "", dtype=object)
+    for part in parts:
+        result = result + part
+    return result
+
+
+def evaluate_rules(df: pd.DataFrame, rules: List[Rule], metrics: Optional[Dict[str, Any]] = None) -> RuleResult:
+    """
+    对 DataFrame 求值规则集
+    风险明细列: rule_id / risk_level / description / record_id（命中行的索引，汇总规则为空）
+    """
+    evaluator = _Evaluator(df, metrics or {})
+    pieces = []
+    summary = []
+    for rule in rules:
+        try:
+            mask = evaluator.mask(rule, rule.when)
+        except RuleSkipped as e:
+            summary.append({"rule_id": rule.id, "risk_level": rule.severity, "hits": None, "reason": str(e)})
+            continue
+        positions = np.flatnonzero(mask)
+        summary.append({"rule_id": rule.id, "risk_level": rule.severity, "hits": len(positions), "reason": ""})
+        if len(positions) == 0:
+            continue
+        if rule.emit == "summary":
+            pieces.append(pd.DataFrame({
+                "rule_id": [rule.id],
+                "risk_level": [rule.severity],
+                "description": [_describe(rule.description, df, None, len(positions))],
+                "record_id": [None],
+            }))
+            continue
+        pieces.append(pd.DataFrame({
+            "rule_id": rule.id,
+            "risk_level": rule.severity,
+            "description": _describe(rule.description, df, positions, len(positions)),
+            "record_id": df.index.to_numpy()[positions],
+        }))
+
+    if pieces:
+        risk_items = pd.concat(pieces, ignore_index=True)
+        if pd.api.types.is_integer_dtype(df.index):
+            risk_items["record_id"] = risk_items["record_id"].astype("Int64")
+    else:
+        risk_items = pd.DataFrame({col: pd.Series(dtype=object) for col in RISK_COLUMNS})
+    summary_df = pd.DataFrame(summary, columns=["rule_id", "risk_level", "hits", "reason"])
+    return RuleResult(risk_items=risk_items, summary=summary_df)
@@ -0,0 +1,204 @@
+"""
+场景指标插件
+每个业务场景注册为插件，声明所需的分组键和各列的聚合（sum/mean/count/std/min/max）。
+计算时对所选场景的需求按分组键合并：每种分组只做一次 groupby，所需的聚合在同一次 agg 中完成，
+分组结果交给所有使用该分组的插件。分组汇总可合并，分区执行时逐分区计算再合并。
+
+注册新场景::
+
+    @register_scene("refund_audit", group_by=["customer_id"], aggregations={"amount": ["sum", "count"]})
+    def refund_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+        return {"max_refund_per_customer": float(groups["amount_sum"].max())}
+
+插件收到以分组键为索引的 DataFrame，列为 record_count 和声明的 {列}_{聚合}；
+数据中缺少分组键或聚合列时跳过该场景。各场景的指标名应互不相同（同时计算多个场景时合并为一个字典）。
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.partial_aggregates import GroupSummary
+
+GROUP_AGGREGATIONS = ("count", "sum", "mean", "std", "min", "max")
+ALL_SCENES = "all"
+
+GroupKeys = Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ScenePlugin:
+    """场景指标插件：分组键、各列聚合和指标计算函数"""
+    name: str
+    group_by: GroupKeys
+    aggregations: Dict[str, Tuple[str, ...]]
+    compute: Callable[[pd.DataFrame, Dict], Dict]
+
+    @property
+    def output_columns(self) -> List[str]:
+        return ["record_count"] + [f"{col}_{agg}" for col, aggs in self.aggregations.items() for agg in aggs]
+
+
+SCENE_PLUGINS: Dict[str, ScenePlugin] = {}
+
+
+def register_scene(name: str, group_by: Sequence[str], aggregations: Dict[str, Sequence[str]]):
+    """装饰器：注册场景指标插件（同名场景覆盖）"""
+    if name == ALL_SCENES:
+        raise ValueError(f"'{ALL_SCENES}' is reserved")
+    if not group_by:
+        raise ValueError(f"Scene '{name}' must declare group keys")
+    for col, aggs in aggregations.items():
+        unknown = set(aggs) - set(GROUP_AGGREGATIONS)
+        if unknown:
+            raise ValueError(f"Scene '{name}': unsupported aggregations {sorted(unknown)} for '{col}'. Supported: {GROUP_AGGREGATIONS}")
+
+    def decorator(func: Callable[[pd.DataFrame, Dict], Dict]) -> Callable[[pd.DataFrame, Dict], Dict]:
+        SCENE_PLUGINS[name] = ScenePlugin(
+            name=name,
+            group_by=tuple(group_by),
+            aggregations={col: tuple(aggs) for col, aggs in aggregations.items()},
+            compute=func,
+        )
+        return func
+
+    return decorator
+
+
+def select_scenes(business_scene: str) -> List[ScenePlugin]:
+    """场景名（或 "all"、逗号分隔的多个场景）-> 插件列表"""
+    names = list(SCENE_PLUGINS) if business_scene == ALL_SCENES else [
+        s.strip() for s in (business_scene or "").split(",") if s.strip()
+    ]
+    unknown = [name for name in names if name not in SCENE_PLUGINS]
+    if unknown:
+        raise ValueError(f"Unknown business scenes: {unknown}. Registered: {list(SCENE_PLUGINS)}")
+    return [SCENE_PLUGINS[name] for name in names]
+
+
+def plan_groupings(plugins: Sequence[ScenePlugin], columns: Sequence[str]) -> Dict[GroupKeys, List[str]]:
+    """
+    按分组键合并插件需求 -> {分组键: 需聚合的列}
+    数据中缺少分组键或聚合列的插件不参与
+    """
+    available = set(columns)
+    groupings: Dict[GroupKeys, List[str]] = {}
+    for plugin in plugins:
+        if not set(plugin.group_by) <= available or not set(plugin.aggregations) <= available:
+            continue
+        wanted = groupings.setdefault(plugin.group_by, [])
+        wanted.extend(col for col in plugin.aggregations if col not in wanted)
+    return groupings
+
+
+def compute_groupings(df: pd.DataFrame, groupings: Dict[GroupKeys, List[str]]) -> Dict[GroupKeys, GroupSummary]:
+    """每种分组一次 groupby，所有列的聚合在同一次 agg 中完成"""
+    return {keys: GroupSummary.from_frame(df, list(keys), columns) for keys, columns in groupings.items()}
+
+
+def merge_groupings(a: Dict[GroupKeys, GroupSummary], b: Dict[GroupKeys, GroupSummary]) -> Dict[GroupKeys, GroupSummary]:
+    merged = dict(a)
+    for keys, summary in b.items():
+        merged[keys] = merged[keys].merge(summary) if keys in merged else summary
+    return merged
+
+
+def reusable_groups(group_metrics: Optional[pd.DataFrame], plugin: ScenePlugin) -> Optional[pd.DataFrame]:
+    """
+    上游 CommonMetricsNode 的分组指标中每组恰好一行、且包含插件所需列时直接复用（以分组键为索引）
+    """
+    if not isinstance(group_metrics, pd.DataFrame) or group_metrics.empty:
+        return None
+    keys = list(plugin.group_by)
+    if not set(keys + plugin.output_columns) <= set(group_metrics.columns):
+        return None
+    if group_metrics.duplicated(keys).any():
+        return None
+    return group_metrics.set_index(keys)
+
+
+def run_scenes(
+    plugins: Sequence[ScenePlugin],
+    groups: Dict[GroupKeys, GroupSummary],
+    common_metrics: Optional[Dict] = None,
+    group_metrics: Optional[pd.DataFrame] = None,
+) -> Dict:
+    """把分组结果交给各插件，合并各场景的指标"""
+    frames = {
+        keys: summary.to_frame().set_index(list(keys)) for keys, summary in groups.items() if not summary.frame.empty
+    }
+    scene_metrics: Dict = {}
+    for plugin in plugins:
+        frame = reusable_groups(group_metrics, plugin)
+        if frame is None:
+            frame = frames.get(plugin.group_by)
+        if frame is None or frame.empty:
+            continue
+        scene_metrics.update(plugin.compute(frame[plugin.output_columns], common_metrics or {}))
+    return scene_metrics
+
+
+# ---------------------------------------------------------------------------
+# 内置场景
+# ---------------------------------------------------------------------------
+
+@register_scene("travel_audit", group_by=["employee_id"], aggregations={"amount": ["mean", "sum"]})
+def travel_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """差旅审计：人均差旅、个人差旅合计最大值"""
+    return {
+        "avg_travel_per_person": groups["amount_mean"].mean(),
+        "max_travel_per_person": groups["amount_sum"].max(),
+    }
+
+
+@register_scene("contract_audit", group_by=["contract_id"], aggregations={"amount": ["sum"]})
+def contract_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """合同审计：合同数、单个合同金额最大值"""
+    return {
+        "contract_count": int(len(groups)),
+        "max_contract_amount": float(groups["amount_sum"].max()),
+    }
+
+
+@register_scene("invoice_audit", group_by=["vendor"], aggregations={"amount": ["sum"]})
+def invoice_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """发票审计：金额最大的供应商及其集中度"""
+    vendor_amounts = groups["amount_sum"]
+    return {
+        "top_vendor": vendor_amounts.idxmax(),
+        "vendor_concentration": float(vendor_amounts.max() / vendor_amounts.sum()),
+    }
+
+
+@register_scene("procurement_audit", group_by=["vendor"], aggregations={"amount": ["sum", "max"]})
+def procurement_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """采购审计：供应商数、供应商集中度指数（HHI）、单笔采购最大值"""
+    shares = groups["amount_sum"] / groups["amount_sum"].sum()
+    return {
+        "supplier_count": int(len(groups)),
+        "supplier_hhi": float((shares ** 2).sum()),
+        "max_single_purchase": float(groups["amount_max"].max()),
+    }
+
+
+@register_scene("payroll_audit", group_by=["employee_id"], aggregations={"amount": ["sum", "mean", "std"]})
+def payroll_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """薪酬审计：发薪人数、人均薪酬、个人发薪波动（变异系数）最大值"""
+    variation = groups["amount_std"] / groups["amount_mean"].replace(0, np.nan)
+    return {
+        "employees_paid": int(len(groups)),
+        "avg_pay_per_employee": float(groups["amount_sum"].mean()),
+        "max_pay_variation": float(variation.max()),
+    }
+
+
+@register_scene("expense_audit", group_by=["expense_type"], aggregations={"amount": ["sum", "count"]})
+def expense_metrics(groups: pd.DataFrame, common_metrics: Dict) -> Dict:
+    """费用审计：金额最大的费用类型及其占比、费用类型数"""
+    type_amounts = groups["amount_sum"]
+    return {
+        "top_expense_type": type_amounts.idxmax(),
+        "top_expense_type_share": float(type_amounts.max() / type_amounts.sum()),
+        "expense_type_count": int(len(groups)),
+    }
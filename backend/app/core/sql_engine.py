@@ -0,0 +1,139 @@
+"""
+嵌入式 SQL 引擎
+使用 DuckDB（可选依赖）对上游 DataFrame、数据集句柄和 Parquet 中间结果执行 SQL：
+
+- DataFrame / Arrow Table / 数据集句柄注册为表，DuckDB 直接扫描，不复制为 pandas
+- Parquet 文件/分片目录以 pyarrow.dataset 注册，列选择和过滤条件下推到扫描
+- 向量化执行，多线程（默认使用全部 CPU 核，可用 SQL_ENGINE_THREADS 限制）
+- 只允许单条只读查询；注册完输入表后禁用外部访问（不能读写其他文件、加载扩展）
+- 可限制执行时间（超时中断查询）和结果行数
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+from app.core.data_manager import data_manager
+from app.core.dataset import DatasetHandle
+from app.core.logger import get_logger
+
+# duckdb 为可选依赖，未安装时 SQL 节点/查询不可用
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+logger = get_logger(__name__)
+
+READ_ONLY_KEYWORDS = ("select", "with", "from", "values", "table", "pivot", "unpivot")
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# 字符串、带引号的标识符和注释（检查语句时先去掉，避免其中的分号/关键字干扰判断）
+_LITERALS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.S)
+_PARTITION_DIR = re.compile(r"^(?P<node>.+)_partitions_(?P<index>\d+)$")
+
+
+def check_query(sql: str) -> str:
+    """
+    检查是否为单条只读查询（SELECT / WITH / FROM 开头），返回去掉末尾分号的语句
+    """
+    sql = (sql or "").strip().rstrip(";").strip()
+    stripped = _LITERALS_AND_COMMENTS.sub(" ", sql).strip()
+    if not stripped:
+        raise ValueError("SQL query is empty")
+    if ";" in stripped:
+        raise ValueError("Only a single SQL statement is allowed")
+    first = stripped.lstrip("(").split(None, 1)[0].lower()
+    if first not in READ_ONLY_KEYWORDS:
+        raise ValueError(f"Only read-only queries are allowed ({', '.join(k.upper() for k in READ_ONLY_KEYWORDS)})")
+    return sql
+
+
+def _scan_source(value: Any) -> Any:
+    """输入值 -> DuckDB 可注册的对象"""
+    if isinstance(value, DatasetHandle):
+        return value.arrow_source()
+    if isinstance(value, (pd.DataFrame, pa.Table)):
+        return value
+    if isinstance(value, str):
+        return DatasetHandle(value).arrow_source()
+    raise TypeError(f"Cannot query value of type {type(value).__name__}")
+
+
+def table_name(label: str) -> str:
+    """任意标签 -> 合法的表名（非字母数字替换为下划线，数字开头时加前缀）"""
+    name = re.sub(r"\W", "_", label, flags=re.ASCII)
+    return name if _TABLE_NAME.match(name) else f"t_{name}"
+
+
+def output_tables(cache_dir: str) -> Dict[str, str]:
+    """
+    运行缓存目录中的输出 -> {表名: 路径}
+    输出由 data_manager 解析（{node_id}_{idx}.parquet 与按引用缓存的数据集），
+    分区执行写出的 {node_id}_partitions_{idx}/ 分片目录同样注册；表名为 node_{node_id}_{idx}
+    """
+    tables: Dict[str, str] = {
+        table_name(f"node_{stem}"): path for stem, path in data_manager.output_paths(cache_dir).items()
+    }
+    if not os.path.isdir(cache_dir):
+        return tables
+    for entry in sorted(os.listdir(cache_dir)):
+        path = os.path.join(cache_dir, entry)
+        match = _PARTITION_DIR.match(entry)
+        if match and os.path.isdir(path):
+            tables.setdefault(table_name(f"node_{match['node']}_{match['index']}"), path)
+    return tables
+
+
+def run_query(
+    sql: str,
+    tables: Dict[str, Any],
+    max_rows: Optional[int] = None,
+    threads: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> pa.Table:
+    """
+    执行只读 SQL，返回 Arrow Table
+
+    tables: {表名: DataFrame / Arrow Table / 数据集句柄 / Parquet 路径}
+    max_rows: 结果行数上限（超出部分不计算）
+    timeout: 执行时间上限（秒），超时中断查询并抛出 TimeoutError
+    """
+    if not HAS_DUCKDB:
+        raise RuntimeError("SQL queries require the duckdb package (pip install duckdb)")
+    sql = check_query(sql)
+    for name in tables:
+        if not _TABLE_NAME.match(name):
+            raise ValueError(f"Invalid table name '{name}'")
+
+    config = {"threads": threads or settings.SQL_ENGINE_THREADS or os.cpu_count() or 1}
+    if settings.SQL_ENGINE_MEMORY_LIMIT:
+        config["memory_limit"] = settings.SQL_ENGINE_MEMORY_LIMIT
+    con = duckdb.connect(":memory:", config=config)
+    timer = threading.Timer(timeout, con.interrupt) if timeout else None
+    try:
+        for name, value in tables.items():
+            con.register(name, _scan_source(value))
+        # 输入表已注册，之后的查询不能访问文件系统或加载扩展
+        con.execute("SET enable_external_access = false")
+        if max_rows is not None:
+            sql = f"SELECT * FROM ({sql}) AS q LIMIT {int(max_rows)}"
+        if timer:
+            timer.start()
+        result = con.execute(sql).fetch_arrow_table()
+    except duckdb.InterruptException:
+        raise TimeoutError(f"SQL query exceeded the time limit of {timeout}s")
+    except duckdb.Error as e:
+        raise ValueError(f"SQL error: {e}")
+    finally:
+        if timer:
+            timer.cancel()
+        con.close()
+
+    logger.info("sql_query_completed", tables=list(tables), rows=result.num_rows, threads=config["threads"])
+    return result
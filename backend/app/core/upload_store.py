@@ -0,0 +1,352 @@
+"""
+上传文件存储
+- 流式写入：按大块写磁盘，同时增量计算 sha256，并在第一个块上校验文件头魔数，不在内存中保留整个文件
+- 按内容去重：文件内容存放在 {STORAGE_PATH}/blobs/{sha256[:2]}/{sha256}，
+  项目数据目录中的文件是指向 blob 的硬链接（跨文件系统等无法硬链接时回退为复制）；
+  硬链接数即引用计数，删除项目后不再被任何项目文件引用的 blob 随之删除
+- 分块续传：超过单次请求大小上限（MAX_REQUEST_SIZE）的文件按块上传，
+  会话状态持久化在 {STORAGE_PATH}/upload_sessions/，中断后按已接收字节数续传
+"""
+import codecs
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.ingest import file_sha256
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+UPLOAD_EXTENSIONS = (".xlsx", ".xls", ".csv")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 64 * 1024
+
+ZIP_SIGNATURE = b"PK\x03\x04"  # xlsx 实际上是 zip
+OLE_SIGNATURE = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"  # 旧版 xls
+
+
+def sniff_upload(head: bytes, ext: str) -> bool:
+    """
+    根据文件开头的字节校验文件内容与扩展名是否相符
+    - xlsx/xls: zip 或 OLE 魔数
+    - csv: 可按 UTF-8 或 GB18030 解码的文本（只检查开头，末尾可能截断在多字节字符中间）
+    """
+    if len(head) <= 4:
+        return False
+    if head[:4] == ZIP_SIGNATURE or head[:8] == OLE_SIGNATURE:
+        return ext != ".csv"
+    if ext != ".csv" or b"\x00" in head:
+        return False
+    for encoding in ("utf-8", "gb18030"):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return True
+        except UnicodeDecodeError:
+            continue
+    return False
+
+
+class UploadValidationError(ValueError):
+    """上传内容校验失败（类型不符、大小不符、哈希不符）"""
+
+
+class UploadConflictError(UploadValidationError):
+    """分块的 offset 与已接收字节数不符（重复或并发发送的块）"""
+
+
+class StreamingWriter:
+    """
+    边写边算哈希的文件写入器
+    文件开头的 SNIFF_BYTES 字节写入前（或结束时）校验魔数，finish() 返回 (sha256, size)
+
+    append=True 时在已有数据后续写：hasher 为之前数据的增量哈希；
+    未提供 hasher 时无法得到完整哈希，finish() 返回的 sha256 为 None
+    """
+
+    def __init__(self, path: str, ext: str, max_size: Optional[int] = None, append: bool = False, hasher: Any = None):
+        self.path = path
+        self.ext = ext
+        self.max_size = max_size
+        self.size = os.path.getsize(path) if append and os.path.exists(path) else 0
+        if hasher is None and self.size == 0:
+            hasher = hashlib.sha256()
+        self.hasher = hasher
+        self._head = b""
+        self._sniffed = self.size > 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab" if append else "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.max_size is not None and self.size + len(chunk) > self.max_size:
+            raise UploadValidationError(f"File too large. Maximum size: {self.max_size} bytes")
+        if not self._sniffed:
+            self._head += chunk[: SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_head()
+        self._file.write(chunk)
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+        self.size += len(chunk)
+
+    def _check_head(self) -> None:
+        self._sniffed = True
+        if not sniff_upload(self._head, self.ext):
+            raise UploadValidationError("File content does not match expected format. Possible malicious file.")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def finish(self) -> Tuple[Optional[str], int]:
+        """关闭文件并返回 (sha256, size)"""
+        if not self._sniffed:
+            self._check_head()
+        self.close()
+        return (self.hasher.hexdigest() if self.hasher is not None else None), self.size
+
+    def abort(self) -> None:
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """
+    把 src 放到 dst（原子替换已存在的 dst）：优先硬链接，失败时复制
+    返回实际使用的方式 "link" / "copy"
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        try:
+            os.link(src, tmp)
+            method = "link"
+        except OSError:
+            shutil.copyfile(src, tmp)
+            method = "copy"
+        # 先链接到临时名再替换：不会截断 dst 原先指向的 blob
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return method
+
+
+class BlobStore:
+    """按 sha256 存放的上传内容，相同内容只存一份"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(settings.STORAGE_PATH, "blobs")
+        # 链接到 blob 与删除无引用的 blob 互斥
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.blob_path(sha256))
+
+    def tmp_path(self) -> str:
+        """与 blob 同目录树下的临时文件（保证 os.replace 在同一文件系统内）"""
+        return os.path.join(self.root, "tmp", uuid.uuid4().hex)
+
+    def commit(self, tmp_path: str, sha256: str) -> str:
+        """把已写完的临时文件登记为 blob；内容已存在时丢弃临时文件"""
+        blob = self.blob_path(sha256)
+        if os.path.exists(blob):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp_path, blob)
+        return blob
+
+    def materialize(self, sha256: str, dst: str) -> str:
+        """把 blob 放到目标路径（硬链接，必要时复制）"""
+        with self._lock:
+            return link_or_copy(self.blob_path(sha256), dst)
+
+    def linked_blobs(self, directory: str) -> List[str]:
+        """目录下（递归）的文件硬链接到的 blob 路径"""
+        inodes = set()
+        for dirpath, _, filenames in os.walk(directory):
+            for name in filenames:
+                st = os.lstat(os.path.join(dirpath, name))
+                if st.st_nlink > 1:
+                    inodes.add((st.st_dev, st.st_ino))
+        if not inodes:
+            return []
+        blobs = []
+        tmp_dir = os.path.dirname(self.tmp_path())
+        for dirpath, _, filenames in os.walk(self.root):
+            if dirpath == tmp_dir:
+                continue
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                st = os.lstat(path)
+                if (st.st_dev, st.st_ino) in inodes:
+                    blobs.append(path)
+        return blobs
+
+    def release(self, blobs: Iterable[str]) -> int:
+        """
+        删除已不被任何项目文件引用的 blob（硬链接数只剩 blob 自身），返回删除数量
+        在删除引用这些 blob 的项目文件之后调用；仍有其他项目链接的 blob 保留
+        """
+        removed = 0
+        with self._lock:
+            for blob in blobs:
+                try:
+                    if os.stat(blob).st_nlink == 1:
+                        os.remove(blob)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        if removed:
+            logger.info("blobs_released", count=removed)
+        return removed
+
+    def store_file(self, path: str) -> Tuple[str, int, str]:
+        """
+        读取一遍本地文件：复制到 blob 临时文件的同时计算 sha256
+        返回 (sha256, size, blob_path)
+        """
+        tmp = self.tmp_path()
+        os.makedirs(os.path.dirname(tmp), exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(path, "rb") as src, open(tmp, "wb") as dst:
+                for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                    dst.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            return sha256, size, self.commit(tmp, sha256)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class ChunkedUploadManager:
+    """
+    分块续传会话
+    会话文件 {id}.json 记录目标文件名、总大小、期望的 sha256；已接收的数据追加写入 {id}.part，
+    已接收字节数以 .part 的实际大小为准。增量哈希保存在内存中，服务重启后在完成时重新计算。
+    """
+
+    def __init__(self, root: Optional[str] = None, blob_store: Optional[BlobStore] = None):
+        self.root = root or os.path.join(settings.STORAGE_PATH, "upload_sessions")
+        self.blob_store = blob_store or BlobStore()
+        # upload_id -> (增量哈希, 已计入哈希的字节数)
+        self._hashers: Dict[str, Tuple[Any, int]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _session_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.json")
+
+    def part_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.part")
+
+    def lock(self, upload_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, project_id: str, filename: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+        if size <= 0 or size > settings.MAX_UPLOAD_SIZE:
+            raise UploadValidationError(f"Invalid upload size. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes")
+        session = {
+            "upload_id": uuid.uuid4().hex,
+            "project_id": project_id,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "chunk_size": min(settings.UPLOAD_CHUNK_SIZE, settings.MAX_REQUEST_SIZE),
+            "created_at": datetime.now().isoformat(),
+        }
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._session_path(session["upload_id"]), "w", encoding="utf-8") as f:
+            json.dump(session, f, ensure_ascii=False)
+        open(self.part_path(session["upload_id"]), "wb").close()
+        return session
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """读取会话，附带已接收字节数；会话不存在时返回 None"""
+        try:
+            with open(self._session_path(upload_id), "r", encoding="utf-8") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        part = self.part_path(upload_id)
+        session["received"] = os.path.getsize(part) if os.path.exists(part) else 0
+        return session
+
+    def writer(self, session: Dict[str, Any], offset: int) -> StreamingWriter:
+        """
+        从 offset 处续写；offset 必须等于 .part 当前的实际大小（调用方需持有 lock），
+        不以传入会话中的 received 为准，会话可能是加锁前读取的
+        """
+        upload_id = session["upload_id"]
+        part = self.part_path(upload_id)
+        received = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset != received:
+            raise UploadConflictError(f"Offset mismatch: expected {received}, got {offset}")
+        ext = os.path.splitext(session["filename"])[1].lower()
+        # 增量哈希与已接收数据不连续（如服务重启）时不再增量计算，完成时重新计算
+        hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+        if hashed != offset:
+            hasher = None
+        return StreamingWriter(part, ext, max_size=session["size"], append=True, hasher=hasher)
+
+    def record(self, upload_id: str, writer: StreamingWriter) -> None:
+        """保存本次写入后的增量哈希（写入中断时同样保存，已写入的数据仍然有效）"""
+        writer.close()
+        if writer.hasher is not None and os.path.exists(self._session_path(upload_id)):
+            self._hashers[upload_id] = (writer.hasher, writer.size)
+
+    def complete(self, session: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        校验大小、文件头和哈希后把数据登记为 blob
+        返回 (sha256, blob_path)
+        """
+        upload_id = session["upload_id"]
+        part = self.part_path(upload_id)
+        if session["received"] != session["size"]:
+            raise UploadValidationError(f"Upload incomplete: received {session['received']} of {session['size']} bytes")
+
+        ext = os.path.splitext(session["filename"])[1].lower()
+        with open(part, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+        if not sniff_upload(head, ext):
+            raise UploadValidationError("File content does not match expected format. Possible malicious file.")
+
+        hasher, hashed = self._hashers.get(upload_id, (None, 0))
+        sha256 = hasher.hexdigest() if hasher is not None and hashed == session["size"] else file_sha256(part)
+        if session.get("sha256") and session["sha256"] != sha256:
+            raise UploadValidationError("Content hash mismatch")
+
+        blob = self.blob_store.commit(part, sha256)
+        self.discard(upload_id)
+        logger.info("chunked_upload_completed", upload_id=upload_id, filename=session["filename"], size=session["size"])
+        return sha256, blob
+
+    def discard(self, upload_id: str) -> None:
+        """删除会话及已接收的数据"""
+        self._hashers.pop(upload_id, None)
+        for path in (self._session_path(upload_id), self.part_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
+
+
+blob_store = BlobStore()
+chunked_uploads = ChunkedUploadManager(blob_store=blob_store)
@@ -8,6 +8,7 @@ import app.nodes.script_nodes
 import app.nodes.viz_nodes
 import app.nodes.clean_nodes
 import app.nodes.ai_nodes
+import app.nodes.dataset_nodes
 
 node_registry.register_nodes_from_module("app.nodes.audit_nodes")
 node_registry.register_nodes_from_module("app.nodes.file_nodes")
@@ -15,3 +16,4 @@ node_registry.register_nodes_from_module("app.nodes.script_nodes")
 node_registry.register_nodes_from_module("app.nodes.viz_nodes")
 node_registry.register_nodes_from_module("app.nodes.clean_nodes")
 node_registry.register_nodes_from_module("app.nodes.ai_nodes")
+node_registry.register_nodes_from_module("app.nodes.dataset_nodes")
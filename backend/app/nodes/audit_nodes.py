@@ -3,11 +3,25 @@ Audit Nodes Module
 Enhanced with workflow orchestration support
 """
 
-from typing import Any, Dict, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
+import numpy as np
 import pandas as pd
 import hashlib
 import json
+import os
+import re
 
+from app.core.benford import TESTS as BENFORD_TESTS, benford_statistics, digit_counts, merge_counts
+from app.core.column_validation import join_labels, parse_spec, validate_columns
+from app.core.duplicates import DuplicateIndex, detect_duplicates, parse_columns
+from app.core.entity_matching import match_names
+from app.core.out_of_core import merge_partition_outputs as merge_partition_values
+from app.core.partial_aggregates import GroupSummary, merge_summaries, summarize_numeric
+from app.core.rule_engine import evaluate_rules, parse_rules
+from app.core.scene_metrics import (
+    ALL_SCENES, SCENE_PLUGINS, compute_groupings, merge_groupings, plan_groupings, reusable_groups, run_scenes,
+    select_scenes
+)
 from .base_node import BaseNode, ExecutionContext, NodeMetadata, NodeResult, NodeStatus, FailurePolicy
 
 
@@ -111,6 +125,10 @@ class ExcelColumnValidator(BaseNode):
     Validates values in a specified column against min/max thresholds.
     Returns rows that violate the constraints.
     Enhanced with streaming support for large datasets.
+    
+    Multi-column mode: a validation_spec (JSON, see app.core.column_validation) checks
+    ranges, types, regexes and allowed sets for many columns in one vectorized pass,
+    producing one outliers frame and a column x check summary matrix.
     """
     
     # Node configuration
@@ -124,12 +142,14 @@ class ExcelColumnValidator(BaseNode):
         "dataframe": {"type": "DATAFRAME", "required": True},
         "column_name": {"type": "STRING", "required": True},
         "min_value": {"type": "FLOAT", "required": False},
-        "max_value": {"type": "FLOAT", "required": False}
+        "max_value": {"type": "FLOAT", "required": False},
+        "validation_spec": {"type": "STRING", "required": False, "multiline": True}
     }
     
     OUTPUT_TYPES = {
         "outliers": {"type": "DATAFRAME"},
-        "report": {"type": "STRING"}
+        "report": {"type": "STRING"},
+        "summary": {"type": "DATAFRAME"}
     }
     
     @classmethod
@@ -140,13 +160,20 @@ class ExcelColumnValidator(BaseNode):
                 "column_name": ("STRING", {"default": "amount"}),
                 "min_value": ("FLOAT", {"default": 0.0, "min": 0.0}),
                 "max_value": ("FLOAT", {"default": 1000000.0}),
+            },
+            "optional": {
+                "validation_spec": ("STRING", {"default": "", "multiline": True,
+                                               "placeholder": '{"amount": {"min": 0, "max": 1000000}, "currency": {"allowed": ["CNY"]}}'}),
             }
         }
     
-    RETURN_TYPES = ("DATAFRAME", "STRING")
-    RETURN_NAMES = ("outliers", "report")
+    RETURN_TYPES = ("DATAFRAME", "STRING", "DATAFRAME")
+    RETURN_NAMES = ("outliers", "report", "summary")
     FUNCTION = "execute_validation"
     OUTPUT_NODE = False
+    PARTITION_MODE = "rowwise"
+    # The summary matrix is summed across partitions instead of being written as parts
+    PARTITION_MERGED_OUTPUTS = (2,)
     
     def __init__(self, metadata: Optional[NodeMetadata] = None):
         """Initialize with metadata"""
@@ -164,6 +191,41 @@ class ExcelColumnValidator(BaseNode):
             )
         super().__init__(metadata)
     
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """
+        Projection pushdown: the validated column plus whatever downstream nodes read from the outliers
+        (outliers keep every column, so an unconsumed outliers output needs all columns)
+        """
+        column_name = inputs.get("column_name")
+        wanted = downstream.get(0)
+        validation_spec = inputs.get("validation_spec") or ""
+        if not isinstance(validation_spec, str) or wanted is None:
+            return None
+        if validation_spec.strip():
+            try:
+                columns = set(parse_spec(validation_spec))
+            except ValueError:
+                return None
+        elif isinstance(column_name, str):
+            columns = {column_name}
+        else:
+            return None
+        return {"dataframe": (wanted - {"violation_type"}) | columns}
+    
+    @classmethod
+    def merge_partition_outputs(cls, idx: int, values: List[Any]) -> Any:
+        """Partitioned execution: add up the per-partition summary matrices"""
+        if idx == 2:
+            frames = [v for v in values if isinstance(v, pd.DataFrame) and not v.empty]
+            if not frames:
+                return values[-1]
+            merged = pd.concat(frames).groupby("column", sort=False).agg(
+                {c: ("max" if c == "missing_column" else "sum") for c in frames[0].columns if c != "column"}
+            )
+            return merged.reset_index()
+        return merge_partition_values(values)
+    
     def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
         """
         Pure function implementation for column validation
@@ -172,18 +234,24 @@ class ExcelColumnValidator(BaseNode):
         column_name = inputs.get("column_name")
         min_value = inputs.get("min_value")
         max_value = inputs.get("max_value")
+        validation_spec = inputs.get("validation_spec") or ""
         
         # Validate inputs
         if dataframe is None or dataframe.empty:
             return {
                 "outliers": pd.DataFrame(),
-                "report": "No data to validate"
+                "report": "No data to validate",
+                "summary": pd.DataFrame()
             }
         
+        if validation_spec.strip():
+            return self._validate_spec(dataframe, parse_spec(validation_spec), context)
+        
         if column_name not in dataframe.columns:
             return {
                 "outliers": pd.DataFrame(),
-                "report": f"Column '{column_name}' not found in dataframe"
+                "report": f"Column '{column_name}' not found in dataframe",
+                "summary": pd.DataFrame()
             }
         
         # Convert column to numeric
@@ -192,7 +260,8 @@ class ExcelColumnValidator(BaseNode):
         except Exception as e:
             return {
                 "outliers": pd.DataFrame(),
-                "report": f"Error converting column to numeric: {str(e)}"
+                "report": f"Error converting column to numeric: {str(e)}",
+                "summary": pd.DataFrame()
             }
         
         # Build filter conditions
@@ -218,18 +287,15 @@ class ExcelColumnValidator(BaseNode):
             outlier_mask = pd.concat(conditions, axis=1).any(axis=1)
             outliers = dataframe[outlier_mask].copy()
             
-            # Add violation type column
-            violation_types = []
-            for idx in outliers.index:
-                violations = []
-                val = numeric_col.loc[idx]
-                if min_value is not None and val < min_value:
-                    violations.append(f"Below min ({val:.2f} < {min_value:.2f})")
-                if max_value is not None and val > max_value:
-                    violations.append(f"Above max ({val:.2f} > {max_value:.2f})")
-                violation_types.append("; ".join(violations))
-            
-            outliers['violation_type'] = violation_types
+            # Add violation type column (labels built per column, not per row)
+            values = numeric_col[outlier_mask]
+            formatted = np.char.mod("%.2f", values.to_numpy(dtype=float)).astype(object)
+            labels = []
+            if min_value is not None:
+                labels.append(((values < min_value).to_numpy(), "Below min (" + formatted + f" < {min_value:.2f})"))
+            if max_value is not None:
+                labels.append(((values > max_value).to_numpy(), "Above max (" + formatted + f" > {max_value:.2f})"))
+            outliers['violation_type'] = join_labels(labels, len(outliers))
         else:
             outliers = pd.DataFrame()
         
@@ -273,10 +339,45 @@ class ExcelColumnValidator(BaseNode):
         
         return {
             "outliers": outliers,
-            "report": report
+            "report": report,
+            "summary": pd.DataFrame()
+        }
+    
+    def _validate_spec(self, dataframe: pd.DataFrame, spec: Dict[str, Dict[str, Any]],
+                       context: ExecutionContext) -> Dict[str, Any]:
+        """Multi-column mode: every check in one vectorized pass over the frame"""
+        mask, labels, summary = validate_columns(dataframe, spec)
+        outliers = dataframe[mask].copy()
+        outliers['violation_type'] = labels[mask]
+        
+        total_rows = len(dataframe)
+        report_lines = [
+            f"Validation Report for {len(spec)} columns:",
+            f"Total rows: {total_rows}",
+            f"Rows with violations: {len(outliers)} ({len(outliers)/total_rows*100:.1f}% of total)",
+            ""
+        ]
+        for row in summary.itertuples(index=False):
+            if row.missing_column:
+                report_lines.append(f"  • {row.column}: column not found")
+            elif row.rows_failed:
+                counts = ", ".join(f"{check}={getattr(row, check)}" for check in ("required", "type", "min", "max", "regex", "allowed")
+                                   if getattr(row, check))
+                report_lines.append(f"  • {row.column}: {row.rows_failed} rows ({counts})")
+        if len(outliers) == 0:
+            report_lines.append("No violations found. All columns passed.")
+        
+        context.add_evidence(
+            f"multi_column_validation_{len(outliers)}",
+            f"Validated {len(spec)} columns, {len(outliers)} rows with violations"
+        )
+        return {
+            "outliers": outliers,
+            "report": "\n".join(report_lines),
+            "summary": summary
         }
     
-    def execute_validation(self, dataframe, column_name, min_value, max_value):
+    def execute_validation(self, dataframe, column_name="", min_value=None, max_value=None, validation_spec=""):
         print(f"Validating column '{column_name}' range [{min_value}, {max_value}]")
         
         context = ExecutionContext(
@@ -290,12 +391,13 @@ class ExcelColumnValidator(BaseNode):
                 "dataframe": dataframe,
                 "column_name": column_name,
                 "min_value": min_value,
-                "max_value": max_value
+                "max_value": max_value,
+                "validation_spec": validation_spec
             },
             context
         )
         
-        return result["outliers"], result["report"]
+        return result["outliers"], result["report"], result["summary"]
     
     def estimate_cost(self, inputs: Dict[str, Any]) -> Dict[str, float]:
         """
@@ -319,19 +421,26 @@ class ExcelColumnValidator(BaseNode):
 class CommonMetricsNode(BaseNode):
     """
     2A 通用指标服务 - 跨场景基础指标计算
+    所有数值列的基础统计一次 agg 计算；可选分位数（分区执行时由可合并的分位数草图估计）；
+    可选按实体列和/或期间分组，分组指标供 SceneMetricsNode 复用
     """
     
     NODE_TYPE = "CommonMetricsNode"
-    VERSION = "1.0.0"
+    VERSION = "1.1.0"
     CATEGORY = "audit"
     DISPLAY_NAME = "通用指标计算"
     
     INPUT_TYPES = {
-        "dataframe": {"type": "DATAFRAME", "required": True}
+        "dataframe": {"type": "DATAFRAME", "required": True},
+        "group_by": {"type": "STRING", "required": False},
+        "period_column": {"type": "STRING", "required": False},
+        "period": {"type": "STRING", "required": False},
+        "quantiles": {"type": "STRING", "required": False}
     }
     
     OUTPUT_TYPES = {
-        "metrics": {"type": "DICT"}
+        "metrics": {"type": "DICT"},
+        "group_metrics": {"type": "DATAFRAME"}
     }
     
     @classmethod
@@ -339,40 +448,144 @@ class CommonMetricsNode(BaseNode):
         return {
             "required": {
                 "dataframe": ("DATAFRAME",)
+            },
+            "optional": {
+                "group_by": ("STRING", {"default": "", "placeholder": "分组列，逗号分隔，如 vendor"}),
+                "period_column": ("STRING", {"default": "", "placeholder": "日期列，按期间分组"}),
+                "period": (list(cls.PERIODS), {"default": "M"}),
+                "quantiles": ("STRING", {"default": "", "placeholder": "0.25,0.75,0.95"})
             }
         }
     
-    RETURN_TYPES = ("DICT",)
-    RETURN_NAMES = ("metrics",)
+    RETURN_TYPES = ("DICT", "DATAFRAME")
+    RETURN_NAMES = ("metrics", "group_metrics")
     FUNCTION = "calculate_metrics"
+    PARTITION_MODE = "aggregate"
+    
+    # 期间分组粒度：日、周、月、季、年
+    PERIODS = ("D", "W", "M", "Q", "Y")
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        metrics, group_metrics = self.calculate_metrics(
+            inputs["dataframe"], inputs.get("group_by", ""), inputs.get("period_column", ""),
+            inputs.get("period", "M"), inputs.get("quantiles", "")
+        )
+        return {"metrics": metrics, "group_metrics": group_metrics}
+    
+    def calculate_metrics(
+        self,
+        dataframe: pd.DataFrame,
+        group_by: str = "",
+        period_column: str = "",
+        period: str = "M",
+        quantiles: str = ""
+    ) -> Tuple[Dict, pd.DataFrame]:
+        """计算通用指标（整体计算不需要合并，分位数直接精确计算，不构建草图）"""
+        state = self.partial_aggregate(dataframe, group_by, period_column, period, quantiles, sketch=False)
+        return self.finalize_aggregate(state, group_by, period_column, period, quantiles)
     
-    def calculate_metrics(self, dataframe: pd.DataFrame) -> Tuple[Dict]:
-        """计算通用指标"""
+    @staticmethod
+    def parse_quantiles(quantiles: str) -> List[float]:
+        """"0.25,0.95" -> [0.25, 0.5, 0.95]（中位数总是计算）"""
+        values = {0.5}
+        for item in (quantiles or "").split(","):
+            if not item.strip():
+                continue
+            try:
+                q = float(item)
+            except ValueError:
+                raise ValueError(f"Invalid quantile '{item.strip()}'")
+            if not 0 < q < 1:
+                raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+            values.add(q)
+        return sorted(values)
+    
+    def _group_frame(
+        self, dataframe: pd.DataFrame, group_by: str, period_column: str, period: str
+    ) -> Tuple[pd.DataFrame, List[str]]:
+        """分组键（实体列 + 期间列），期间由日期列按粒度派生"""
+        keys = [c.strip() for c in (group_by or "").split(",") if c.strip()]
+        missing = [c for c in keys + ([period_column] if period_column else []) if c not in dataframe.columns]
+        if missing:
+            raise ValueError(f"Group columns not found: {missing}")
+        if not period_column:
+            return dataframe, keys
+        if period not in self.PERIODS:
+            raise ValueError(f"period must be one of {self.PERIODS}")
+        dates = pd.to_datetime(dataframe[period_column], errors="coerce")
+        name = f"{period_column}_period"
+        periods = dates.dt.to_period(period).astype(str).where(dates.notna())
+        return dataframe.assign(**{name: periods}), keys + [name]
+    
+    # Partitioned execution: per-partition numeric summaries and group summaries, merged pairwise.
+    # Quantiles are exact for a single partition and estimated from mergeable sketches otherwise.
+    
+    def partial_aggregate(
+        self,
+        dataframe: pd.DataFrame,
+        group_by: str = "",
+        period_column: str = "",
+        period: str = "M",
+        quantiles: str = "",
+        sketch: bool = True
+    ) -> Dict[str, Any]:
+        frame, keys = self._group_frame(dataframe, group_by, period_column, period)
+        columns = summarize_numeric(dataframe, self.parse_quantiles(quantiles), sketch)
+        groups = None
+        if keys:
+            value_columns = [c for c in columns if c not in keys]
+            groups = GroupSummary.from_frame(frame, keys, value_columns)
+        return {"record_count": len(dataframe), "columns": columns, "groups": groups}
+    
+    def merge_aggregates(self, a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+        groups = a["groups"]
+        if groups is not None and b["groups"] is not None:
+            groups = groups.merge(b["groups"])
+        return {
+            "record_count": a["record_count"] + b["record_count"],
+            "columns": merge_summaries(a["columns"], b["columns"]),
+            "groups": groups
+        }
+    
+    def finalize_aggregate(
+        self,
+        state: Dict[str, Any],
+        group_by: str = "",
+        period_column: str = "",
+        period: str = "M",
+        quantiles: str = ""
+    ) -> Tuple[Dict, pd.DataFrame]:
         metrics = {}
         
         # 基础统计
-        metrics["record_count"] = len(dataframe)
+        metrics["record_count"] = state["record_count"]
         
         # 数值列统计
-        numeric_columns = dataframe.select_dtypes(include=['number']).columns
-        for col in numeric_columns:
-            metrics[f"{col}_sum"] = float(dataframe[col].sum())
-            metrics[f"{col}_mean"] = float(dataframe[col].mean())
-            metrics[f"{col}_median"] = float(dataframe[col].median())
-            metrics[f"{col}_std"] = float(dataframe[col].std())
-            metrics[f"{col}_min"] = float(dataframe[col].min())
-            metrics[f"{col}_max"] = float(dataframe[col].max())
-        
-        return (metrics,)
+        extra_quantiles = [q for q in self.parse_quantiles(quantiles) if q != 0.5]
+        for col, summary in state["columns"].items():
+            metrics[f"{col}_sum"] = float(summary.total)
+            metrics[f"{col}_mean"] = float(summary.mean) if summary.count else float("nan")
+            metrics[f"{col}_median"] = float(summary.median)
+            metrics[f"{col}_std"] = float(summary.std)
+            metrics[f"{col}_min"] = float(summary.minimum)
+            metrics[f"{col}_max"] = float(summary.maximum)
+            for q in extra_quantiles:
+                metrics[f"{col}_p{q * 100:g}"] = float(summary.quantile(q))
+        
+        # 分组统计
+        group_metrics = state["groups"].to_frame() if state.get("groups") is not None else pd.DataFrame()
+        return metrics, group_metrics
 
 
 class SceneMetricsNode(BaseNode):
     """
     2B 场景指标插件 - 针对不同业务场景
+    场景由 app.core.scene_metrics 中注册的插件提供；所选场景按分组键合并需求，每种分组只计算一次。
+    连接 CommonMetricsNode 的 group_metrics 且分组一致时直接使用其中的组内统计，不再重复分组
     """
     
     NODE_TYPE = "SceneMetricsNode"
-    VERSION = "1.0.0"
+    VERSION = "2.0.0"
     CATEGORY = "audit"
     DISPLAY_NAME = "场景指标计算"
     
@@ -381,45 +594,71 @@ class SceneMetricsNode(BaseNode):
         return {
             "required": {
                 "dataframe": ("DATAFRAME",),
-                "business_scene": (["travel_audit", "contract_audit", "invoice_audit"], {"default": "invoice_audit"})
+                "business_scene": (list(SCENE_PLUGINS) + [ALL_SCENES], {"default": "invoice_audit"})
             },
             "optional": {
-                "common_metrics": ("DICT",)
+                "common_metrics": ("DICT",),
+                "group_metrics": ("DATAFRAME",)
             }
         }
     
     RETURN_TYPES = ("DICT",)
     RETURN_NAMES = ("scene_metrics",)
     FUNCTION = "calculate_scene_metrics"
+    PARTITION_MODE = "aggregate"
     
-    def calculate_scene_metrics(self, dataframe: pd.DataFrame, business_scene: str, common_metrics: Dict = None):
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        (scene_metrics,) = self.calculate_scene_metrics(
+            inputs["dataframe"], inputs.get("business_scene", "invoice_audit"),
+            inputs.get("common_metrics"), inputs.get("group_metrics")
+        )
+        return {"scene_metrics": scene_metrics}
+    
+    def calculate_scene_metrics(
+        self,
+        dataframe: pd.DataFrame,
+        business_scene: str,
+        common_metrics: Dict = None,
+        group_metrics: Optional[pd.DataFrame] = None
+    ):
         """计算场景特定指标"""
-        scene_metrics = {}
-        
-        if business_scene == "travel_audit":
-            # 差旅审计指标
-            if "employee_id" in dataframe.columns and "amount" in dataframe.columns:
-                scene_metrics["avg_travel_per_person"] = dataframe.groupby("employee_id")["amount"].mean().mean()
-                scene_metrics["max_travel_per_person"] = dataframe.groupby("employee_id")["amount"].sum().max()
-                
-        elif business_scene == "invoice_audit":
-            # 发票审计指标
-            if "vendor" in dataframe.columns and "amount" in dataframe.columns:
-                vendor_amounts = dataframe.groupby("vendor")["amount"].sum()
-                if len(vendor_amounts) > 0:
-                    scene_metrics["top_vendor"] = vendor_amounts.idxmax()
-                    scene_metrics["vendor_concentration"] = float(vendor_amounts.max() / vendor_amounts.sum())
-        
+        state = self.partial_aggregate(dataframe, business_scene, common_metrics, group_metrics)
+        return self.finalize_aggregate(state, business_scene, common_metrics, group_metrics)
+    
+    # Partitioned execution: one mergeable group summary per distinct grouping, merged pairwise.
+    
+    def partial_aggregate(
+        self,
+        dataframe: pd.DataFrame,
+        business_scene: str,
+        common_metrics: Dict = None,
+        group_metrics: Optional[pd.DataFrame] = None
+    ) -> Dict[Tuple[str, ...], GroupSummary]:
+        plugins = [p for p in select_scenes(business_scene) if reusable_groups(group_metrics, p) is None]
+        return compute_groupings(dataframe, plan_groupings(plugins, dataframe.columns))
+    
+    def merge_aggregates(self, a: Dict[Tuple[str, ...], GroupSummary], b: Dict[Tuple[str, ...], GroupSummary]):
+        return merge_groupings(a, b)
+    
+    def finalize_aggregate(
+        self,
+        state: Dict[Tuple[str, ...], GroupSummary],
+        business_scene: str,
+        common_metrics: Dict = None,
+        group_metrics: Optional[pd.DataFrame] = None
+    ):
+        scene_metrics = run_scenes(select_scenes(business_scene), state or {}, common_metrics, group_metrics)
         return (scene_metrics,)
 
 
 class RuleCalculationNode(BaseNode):
     """
     2C 规则计算节点 - 基于指标执行审计规则
+    规则集为声明式 JSON/YAML（见 app.core.rule_engine），未指定时使用默认规则（金额异常、重复记录）
     """
     
     NODE_TYPE = "RuleCalculationNode"
-    VERSION = "1.0.0"
+    VERSION = "2.0.0"
     CATEGORY = "audit"
     DISPLAY_NAME = "规则计算"
     
@@ -429,43 +668,397 @@ class RuleCalculationNode(BaseNode):
             "required": {
                 "dataframe": ("DATAFRAME",),
                 "metrics": ("DICT",)
+            },
+            "optional": {
+                "rules": ("STRING", {"default": "", "multiline": True,
+                                     "placeholder": "JSON/YAML 规则集，留空使用默认规则"})
             }
         }
     
-    RETURN_TYPES = ("DATAFRAME", "INT")
-    RETURN_NAMES = ("risk_items", "risk_count")
+    RETURN_TYPES = ("DATAFRAME", "INT", "DATAFRAME")
+    RETURN_NAMES = ("risk_items", "risk_count", "rule_summary")
     FUNCTION = "execute_rules"
     
-    def execute_rules(self, dataframe: pd.DataFrame, metrics: Dict):
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        rules = parse_rules(inputs.get("rules"))
+        result = evaluate_rules(inputs["dataframe"], rules, inputs.get("metrics") or {})
+        context.add_evidence(
+            "rule_calculation",
+            f"Evaluated {len(rules)} rules, {len(result.risk_items)} risk items"
+        )
+        return {
+            "risk_items": result.risk_items,
+            "risk_count": len(result.risk_items),
+            "rule_summary": result.summary
+        }
+    
+    def execute_rules(self, dataframe: pd.DataFrame, metrics: Dict, rules: str = ""):
         """执行规则计算"""
-        risk_items = []
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="rule_calculation"
+        )
         
-        # 示例规则1：金额异常
-        if "amount" in dataframe.columns:
-            amount_mean = metrics.get("amount_mean", 0)
-            amount_std = metrics.get("amount_std", 1)
-            threshold = amount_mean + 3 * amount_std
-            
-            outliers = dataframe[dataframe["amount"] > threshold]
-            for idx, row in outliers.iterrows():
-                risk_items.append({
-                    "rule_id": "AMOUNT_OUTLIER",
-                    "risk_level": "HIGH",
-                    "description": f"金额异常: {row['amount']:.2f}",
-                    "record_id": int(idx)
-                })
-        
-        # 示例规则2：重复记录
-        duplicates = dataframe[dataframe.duplicated(keep=False)]
-        if len(duplicates) > 0:
-            risk_items.append({
-                "rule_id": "DUPLICATE_RECORDS",
-                "risk_level": "MEDIUM",
-                "description": f"发现{len(duplicates)}条重复记录"
-            })
-        
-        risk_df = pd.DataFrame(risk_items) if risk_items else pd.DataFrame()
-        return risk_df, len(risk_items)
+        result = self._execute_pure({"dataframe": dataframe, "metrics": metrics, "rules": rules}, context)
+        return result["risk_items"], result["risk_count"], result["rule_summary"]
+
+
+class DuplicateDetectionNode(BaseNode):
+    """
+    Detects duplicate and near-duplicate transactions over a hash index of key columns.
+    
+    - exact: rows whose key columns (e.g. vendor, amount, invoice no.) hash identically
+    - near: rows whose match columns (e.g. vendor, amount) hash identically and whose
+      dates lie within window_days of each other (sort + adjacent comparison)
+    - history_exact / history_near: matches against earlier periods of the same project,
+      read from a persisted hash index (see app.core.duplicates) instead of the raw data
+    """
+    
+    NODE_TYPE = "DuplicateDetectionNode"
+    VERSION = "1.0.0"
+    CATEGORY = "audit"
+    DISPLAY_NAME = "Duplicate Detection"
+    USES_PROJECT_STATE = True
+    
+    INPUT_TYPES = {
+        "dataframe": {"type": "DATAFRAME", "required": True},
+        "key_columns": {"type": "STRING", "required": True, "default": "vendor,amount,invoice_no"},
+        "near_columns": {"type": "STRING", "required": False, "default": "vendor,amount"},
+        "date_column": {"type": "STRING", "required": False},
+        "window_days": {"type": "INT", "required": False, "default": 7},
+        "history_index": {"type": "STRING", "required": False},
+        "period_label": {"type": "STRING", "required": False}
+    }
+    
+    OUTPUT_TYPES = {
+        "duplicates": {"type": "DATAFRAME"},
+        "duplicate_count": {"type": "INT"},
+        "report": {"type": "STRING"}
+    }
+    
+    @classmethod
+    def INPUT_TYPES_LEGACY(cls) -> Dict[str, Any]:
+        return {
+            "required": {
+                "dataframe": ("DATAFRAME",),
+                "key_columns": ("STRING", {"default": "vendor,amount,invoice_no"}),
+            },
+            "optional": {
+                "near_columns": ("STRING", {"default": "vendor,amount"}),
+                "date_column": ("STRING", {"default": "", "placeholder": "date"}),
+                "window_days": ("INT", {"default": 7, "min": 0, "max": 366}),
+                "history_index": ("STRING", {"default": "", "placeholder": "index name, e.g. payments"}),
+                "period_label": ("STRING", {"default": "", "placeholder": "e.g. 2024-Q1"}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "INT", "STRING")
+    RETURN_NAMES = ("duplicates", "duplicate_count", "report")
+    FUNCTION = "detect"
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """
+        Projection pushdown: the hashed columns plus whatever downstream nodes read from the duplicates
+        """
+        wanted = downstream.get(0)
+        names = [inputs.get("key_columns", "vendor,amount,invoice_no"), inputs.get("near_columns", "vendor,amount"),
+                 inputs.get("date_column", "")]
+        if wanted is None or not all(isinstance(n, str) for n in names):
+            return None
+        columns = set(parse_columns(",".join(names)))
+        return {"dataframe": (wanted - {"duplicate_type", "duplicate_group", "matched_with", "days_apart"}) | columns}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        dataframe = inputs["dataframe"]
+        key_columns = parse_columns(inputs.get("key_columns", "vendor,amount,invoice_no"))
+        near_columns = parse_columns(inputs.get("near_columns", "vendor,amount"))
+        date_column = (inputs.get("date_column") or "").strip() or None
+        window_days = int(inputs.get("window_days", 7) or 0)
+        history_index = (inputs.get("history_index") or "").strip()
+        period_label = (inputs.get("period_label") or "").strip()
+        state_dir = inputs.get("state_dir")
+        
+        if not key_columns:
+            raise ValueError("key_columns must name at least one column")
+        if window_days < 0:
+            raise ValueError("window_days must be >= 0")
+        if near_columns and not date_column:
+            near_columns = []
+        
+        index = None
+        history = None
+        if history_index:
+            if not state_dir:
+                raise ValueError("history_index requires running inside a project")
+            if not period_label:
+                raise ValueError("period_label is required when history_index is set")
+            if not re.match(r"^[\w\-]+$", history_index):
+                raise ValueError(f"Invalid history index name '{history_index}'")
+            index = DuplicateIndex(os.path.join(state_dir, "duplicate_index", f"{history_index}.parquet"))
+            history = index.load(exclude_period=period_label)
+        
+        duplicates, entries = detect_duplicates(
+            dataframe, key_columns, near_columns, date_column, window_days, history
+        )
+        
+        counts = duplicates["duplicate_type"].value_counts().to_dict()
+        report = (
+            f"Checked {len(dataframe)} rows: "
+            + ", ".join(f"{counts.get(t, 0)} {t}" for t in ("exact", "near", "history_exact", "history_near"))
+        )
+        if index is not None:
+            total = index.replace_period(period_label, entries.assign(period=period_label))
+            report += f". History index '{history_index}': {len(history)} earlier rows, {total} rows after adding {period_label}"
+        
+        context.add_evidence("duplicate_detection", report)
+        return {"duplicates": duplicates, "duplicate_count": len(duplicates), "report": report}
+    
+    def detect(
+        self,
+        dataframe: pd.DataFrame,
+        key_columns: str = "vendor,amount,invoice_no",
+        near_columns: str = "vendor,amount",
+        date_column: str = "",
+        window_days: int = 7,
+        history_index: str = "",
+        period_label: str = "",
+        state_dir: Optional[str] = None
+    ) -> Tuple[pd.DataFrame, int, str]:
+        """Legacy entry point"""
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="duplicate_detection"
+        )
+        result = self._execute_pure({
+            "dataframe": dataframe, "key_columns": key_columns, "near_columns": near_columns,
+            "date_column": date_column, "window_days": window_days, "history_index": history_index,
+            "period_label": period_label, "state_dir": state_dir
+        }, context)
+        return result["duplicates"], result["duplicate_count"], result["report"]
+
+
+class EntityMatchNode(BaseNode):
+    """
+    Fuzzy matching of vendor / entity names without pairwise O(n^2) comparison.
+    
+    Names are normalized (full-width -> half-width, company suffixes, regions), blocked with
+    MinHash LSH over character bigrams, and scored only within blocks (see app.core.entity_matching).
+    Without a reference table the names are matched against each other (master data cleanup);
+    with one, every name is matched against the reference list (e.g. related parties).
+    """
+    
+    NODE_TYPE = "EntityMatchNode"
+    VERSION = "1.0.0"
+    CATEGORY = "audit"
+    DISPLAY_NAME = "Fuzzy Entity Match"
+    
+    INPUT_TYPES = {
+        "dataframe": {"type": "DATAFRAME", "required": True},
+        "name_column": {"type": "STRING", "required": True, "default": "vendor"},
+        "reference": {"type": "DATAFRAME", "required": False},
+        "reference_column": {"type": "STRING", "required": False},
+        "threshold": {"type": "FLOAT", "required": False, "default": 0.8}
+    }
+    
+    OUTPUT_TYPES = {
+        "matches": {"type": "DATAFRAME"},
+        "match_count": {"type": "INT"},
+        "report": {"type": "STRING"}
+    }
+    
+    @classmethod
+    def INPUT_TYPES_LEGACY(cls) -> Dict[str, Any]:
+        return {
+            "required": {
+                "dataframe": ("DATAFRAME",),
+                "name_column": ("STRING", {"default": "vendor"}),
+            },
+            "optional": {
+                "reference": ("DATAFRAME",),
+                "reference_column": ("STRING", {"default": "", "placeholder": "defaults to name_column"}),
+                "threshold": ("FLOAT", {"default": 0.8, "min": 0.1, "max": 1.0, "step": 0.05}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "INT", "STRING")
+    RETURN_NAMES = ("matches", "match_count", "report")
+    FUNCTION = "match_entities"
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """Projection pushdown: only the name columns are read (the output holds match pairs)"""
+        name_column = inputs.get("name_column", "vendor")
+        reference_column = inputs.get("reference_column") or name_column
+        if not isinstance(name_column, str) or not isinstance(reference_column, str):
+            return None
+        return {"dataframe": {name_column}, "reference": {reference_column}}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        dataframe = inputs["dataframe"]
+        name_column = inputs.get("name_column", "vendor")
+        reference = inputs.get("reference")
+        reference_column = inputs.get("reference_column") or name_column
+        threshold = float(inputs.get("threshold", 0.8) or 0.8)
+        
+        if name_column not in dataframe.columns:
+            raise ValueError(f"Column '{name_column}' not found")
+        reference_names = None
+        if reference is not None:
+            if reference_column not in reference.columns:
+                raise ValueError(f"Reference column '{reference_column}' not found")
+            reference_names = reference[reference_column]
+        
+        matches = match_names(dataframe[name_column], reference_names, threshold)
+        scope = "within the table" if reference_names is None else f"against {len(reference_names)} reference names"
+        report = f"Matched {len(dataframe)} names {scope}: {len(matches)} pairs with score >= {threshold}"
+        context.add_evidence("entity_match", report)
+        return {"matches": matches, "match_count": len(matches), "report": report}
+    
+    def match_entities(
+        self,
+        dataframe: pd.DataFrame,
+        name_column: str = "vendor",
+        reference: Optional[pd.DataFrame] = None,
+        reference_column: str = "",
+        threshold: float = 0.8
+    ) -> Tuple[pd.DataFrame, int, str]:
+        """Legacy entry point"""
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="entity_match"
+        )
+        result = self._execute_pure({
+            "dataframe": dataframe, "name_column": name_column, "reference": reference,
+            "reference_column": reference_column, "threshold": threshold
+        }, context)
+        return result["matches"], result["match_count"], result["report"]
+
+
+class BenfordNode(BaseNode):
+    """
+    Benford's law digit analysis (first-digit and first-two-digit tests) for journal entries.
+    
+    Leading digits are extracted with vectorized log10/floor arithmetic; digit counts for all
+    groups (e.g. account, entity, user) come from a single group-by, and MAD, chi-square and
+    per-digit z statistics are computed on the resulting count matrix (see app.core.benford).
+    Count matrices add up, so partitioned execution counts each partition and merges.
+    """
+    
+    NODE_TYPE = "BenfordNode"
+    VERSION = "1.0.0"
+    CATEGORY = "audit"
+    DISPLAY_NAME = "Benford Analysis"
+    
+    INPUT_TYPES = {
+        "dataframe": {"type": "DATAFRAME", "required": True},
+        "amount_column": {"type": "STRING", "required": True, "default": "amount"},
+        "test": {"type": "STRING", "required": False, "default": "first_digit"},
+        "group_by": {"type": "STRING", "required": False},
+        "min_amount": {"type": "FLOAT", "required": False, "default": 10.0},
+        "min_count": {"type": "INT", "required": False, "default": 100}
+    }
+    
+    OUTPUT_TYPES = {
+        "summary": {"type": "DATAFRAME"},
+        "digit_table": {"type": "DATAFRAME"},
+        "report": {"type": "STRING"}
+    }
+    
+    @classmethod
+    def INPUT_TYPES_LEGACY(cls) -> Dict[str, Any]:
+        return {
+            "required": {
+                "dataframe": ("DATAFRAME",),
+                "amount_column": ("STRING", {"default": "amount"}),
+            },
+            "optional": {
+                "test": (list(BENFORD_TESTS), {"default": "first_digit"}),
+                "group_by": ("STRING", {"default": "", "placeholder": "e.g. account,user"}),
+                "min_amount": ("FLOAT", {"default": 10.0, "min": 0.0}),
+                "min_count": ("INT", {"default": 100, "min": 1}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "DATAFRAME", "STRING")
+    RETURN_NAMES = ("summary", "digit_table", "report")
+    FUNCTION = "analyze"
+    PARTITION_MODE = "aggregate"
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """Projection pushdown: only the amount and group columns are read"""
+        amount_column = inputs.get("amount_column", "amount")
+        group_by = inputs.get("group_by", "")
+        if not isinstance(amount_column, str) or not isinstance(group_by or "", str):
+            return None
+        return {"dataframe": {amount_column, *parse_columns(group_by)}}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        summary, digit_table, report = self.analyze(
+            inputs["dataframe"], inputs.get("amount_column", "amount"), inputs.get("test", "first_digit"),
+            inputs.get("group_by", ""), inputs.get("min_amount", 10.0), inputs.get("min_count", 100)
+        )
+        context.add_evidence("benford", report)
+        return {"summary": summary, "digit_table": digit_table, "report": report}
+    
+    def analyze(
+        self,
+        dataframe: pd.DataFrame,
+        amount_column: str = "amount",
+        test: str = "first_digit",
+        group_by: str = "",
+        min_amount: float = 10.0,
+        min_count: int = 100
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, str]:
+        state = self.partial_aggregate(dataframe, amount_column, test, group_by, min_amount, min_count)
+        return self.finalize_aggregate(state, amount_column, test, group_by, min_amount, min_count)
+    
+    @staticmethod
+    def _digits(test: str) -> int:
+        if test not in BENFORD_TESTS:
+            raise ValueError(f"test must be one of {list(BENFORD_TESTS)}")
+        return BENFORD_TESTS[test]
+    
+    # Partitioned execution: per-partition digit count matrices, added pairwise.
+    
+    def partial_aggregate(
+        self,
+        dataframe: pd.DataFrame,
+        amount_column: str = "amount",
+        test: str = "first_digit",
+        group_by: str = "",
+        min_amount: float = 10.0,
+        min_count: int = 100
+    ) -> pd.DataFrame:
+        return digit_counts(dataframe, amount_column, parse_columns(group_by), self._digits(test), float(min_amount))
+    
+    def merge_aggregates(self, a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+        return merge_counts(a, b)
+    
+    def finalize_aggregate(
+        self,
+        state: pd.DataFrame,
+        amount_column: str = "amount",
+        test: str = "first_digit",
+        group_by: str = "",
+        min_amount: float = 10.0,
+        min_count: int = 100
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, str]:
+        digits = self._digits(test)
+        summary, digit_table = benford_statistics(state, digits, int(min_count))
+        (overall,) = benford_statistics(state.sum().to_frame().T, digits, int(min_count))[0].itertuples()
+        report = (
+            f"Benford {test} on '{amount_column}': {overall.record_count} amounts, "
+            f"MAD {overall.mad:.4f} ({overall.conformity}), chi-square {overall.chi_square:.1f}"
+        )
+        if parse_columns(group_by):
+            flagged = int((summary["conformity"] == "nonconformity").sum())
+            report += f"; {flagged} of {len(summary)} groups nonconforming"
+        return summary, digit_table, report
 
 
 NODE_CLASS_MAPPINGS = {
@@ -473,7 +1066,10 @@ NODE_CLASS_MAPPINGS = {
     "ExcelColumnValidator": ExcelColumnValidator,
     "CommonMetricsNode": CommonMetricsNode,
     "SceneMetricsNode": SceneMetricsNode,
-    "RuleCalculationNode": RuleCalculationNode
+    "RuleCalculationNode": RuleCalculationNode,
+    "DuplicateDetectionNode": DuplicateDetectionNode,
+    "EntityMatchNode": EntityMatchNode,
+    "BenfordNode": BenfordNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -481,5 +1077,8 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "ExcelColumnValidator": "Excel列值校验",
     "CommonMetricsNode": "通用指标计算",
     "SceneMetricsNode": "场景指标计算",
-    "RuleCalculationNode": "规则计算"
+    "RuleCalculationNode": "规则计算",
+    "DuplicateDetectionNode": "重复交易检测",
+    "EntityMatchNode": "名称模糊匹配",
+    "BenfordNode": "本福特定律分析"
 }
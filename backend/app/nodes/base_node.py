@@ -7,11 +7,13 @@ import json
 import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, List, Tuple, Generator
+from typing import Any, Dict, Optional, List, Set, Tuple, Generator
 from enum import Enum
 import pandas as pd
 import numpy as np
 
+from app.core.dataset import DatasetHandle
+
 
 class NodeStatus(Enum):
     """Node execution status"""
@@ -140,6 +142,21 @@ class BaseNode(ABC):
     INPUT_TYPES = {}
     OUTPUT_TYPES = {}
     
+    # Loader nodes that accept a planner-provided "projection" input (list of column names)
+    SUPPORTS_PROJECTION = False
+    
+    # Loader nodes whose DataFrame outputs are dtype-compacted when DTYPE_COMPACTION_ENABLED is set
+    COMPACT_OUTPUTS = False
+    
+    # Nodes that keep state across runs of a project receive a "state_dir" input
+    # (the project's state directory; None for runs outside a project)
+    USES_PROJECT_STATE = False
+    
+    # How the node runs on a partitioned dataset (see app.core.out_of_core):
+    # None = materialize the whole input, "rowwise" = run once per partition,
+    # "aggregate" = partial_aggregate / merge_aggregates / finalize_aggregate
+    PARTITION_MODE: Optional[str] = None
+    
     def __init__(self, metadata: Optional[NodeMetadata] = None):
         """Initialize node with metadata"""
         self.metadata = metadata or NodeMetadata(
@@ -210,6 +227,8 @@ class BaseNode(ABC):
                 # Type checking
                 if expected_type == "DATAFRAME" and not isinstance(value, pd.DataFrame):
                     return False, f"Input '{key}' must be a DataFrame"
+                elif expected_type == "DATASET" and not isinstance(value, DatasetHandle):
+                    return False, f"Input '{key}' must be a dataset"
                 elif expected_type == "STRING" and not isinstance(value, str):
                     return False, f"Input '{key}' must be a string"
                 elif expected_type == "INT" and not isinstance(value, (int, np.integer)):
@@ -290,6 +309,14 @@ class BaseNode(ABC):
             logs=["No compensation logic implemented"]
         )
     
+    @classmethod
+    def partition_mode(cls, inputs: Dict[str, Any]) -> Optional[str]:
+        """
+        Partition mode for the given static inputs; override when it depends on parameters
+        (e.g. a strategy that looks across rows)
+        """
+        return cls.PARTITION_MODE
+    
     def estimate_cost(self, inputs: Dict[str, Any]) -> Dict[str, float]:
         """
         Estimate execution cost (time, memory, AI tokens)
@@ -302,6 +329,26 @@ class BaseNode(ABC):
             "ai_cost_usd": 0.0
         }
     
+    @classmethod
+    def required_columns(
+        cls,
+        inputs: Dict[str, Any],
+        downstream: Dict[int, Optional[Set[str]]]
+    ) -> Optional[Dict[str, Optional[Set[str]]]]:
+        """
+        Declare which columns this node reads from its DATAFRAME inputs (projection pushdown)
+        
+        Args:
+            inputs: static node inputs (connected inputs are ["node_id", slot] references)
+            downstream: columns required from each output slot by downstream nodes,
+                        None means all columns (e.g. the output is a final result)
+        
+        Returns:
+            {input_name: set of columns or None for all columns};
+            None (default) means unknown, every DATAFRAME input needs all columns
+        """
+        return None
+    
     @classmethod
     def get_node_info(cls) -> Dict[str, Any]:
         """
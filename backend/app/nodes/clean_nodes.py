@@ -8,6 +8,8 @@ import re
 from typing import Optional, Dict, Any, Tuple, Generator
 import hashlib
 
+from app.core.dtype_optimizer import compact_dtypes
+from app.core.planner import static_columns, static_flag
 from .base_node import BaseNode, ExecutionContext, NodeMetadata, NodeResult, NodeStatus, FailurePolicy
 
 class ColumnMapperNode(BaseNode):
@@ -61,6 +63,7 @@ class ColumnMapperNode(BaseNode):
     RETURN_NAMES = ("cleaned_df", "report")
     FUNCTION = "process_columns"
     CATEGORY = "审计/数据清洗"
+    PARTITION_MODE = "rowwise"
 
     def __init__(self, metadata: Optional[NodeMetadata] = None):
         """Initialize with metadata"""
@@ -78,6 +81,30 @@ class ColumnMapperNode(BaseNode):
             )
         super().__init__(metadata)
     
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """
+        投影下推：需要映射中的原始列；保留其他列时还需要下游用到的未映射列
+        """
+        mapping_json = inputs.get("mapping_json", "{}")
+        keep_other_columns = static_flag(inputs.get("keep_other_columns"), True)
+        if not isinstance(mapping_json, str) or keep_other_columns is None:
+            return None
+        try:
+            mapping = json.loads(mapping_json)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(mapping, dict):
+            return None
+        
+        needed = set(mapping.keys())
+        if not keep_other_columns:
+            return {"dataframe": needed}
+        wanted = downstream.get(0)
+        if wanted is None:
+            return {"dataframe": None}
+        return {"dataframe": needed | (wanted - set(mapping.values()))}
+    
     def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
         """
         Pure function implementation for column mapping
@@ -174,6 +201,23 @@ class ColumnMapperNode(BaseNode):
         return result["cleaned_df"], result["report"]
 
 
+def _fill_nulls(series: pd.Series, value: Any) -> pd.Series:
+    """
+    用固定值填充空值，兼容 dtype 压缩后的列：
+    category 列先把填充值加入类别；string 列放不下非文本填充值时转回 object（与未压缩时结果一致）
+    """
+    if not series.hasnans:
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+        return series.fillna(value)
+    try:
+        return series.fillna(value)
+    except (TypeError, ValueError):
+        return series.astype(object).fillna(value)
+
+
 class NullValueCleanerNode(BaseNode):
     """
     空值清洗节点 (Null Value Cleaner)
@@ -244,6 +288,32 @@ class NullValueCleanerNode(BaseNode):
             )
         super().__init__(metadata)
     
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """
+        投影下推：下游用到的列加上清洗的目标列
+        按全部列（*）删除空值行时结果取决于所有列，需要全部列
+        """
+        wanted = downstream.get(0)
+        target_columns = inputs.get("target_columns") or "*"
+        if wanted is None or not isinstance(target_columns, str):
+            return None
+        if target_columns.strip() == "*":
+            if inputs.get("strategy", "drop_rows") == "drop_rows":
+                return None
+            return {"dataframe": wanted}
+        return {"dataframe": wanted | static_columns(target_columns)}
+    
+    @classmethod
+    def partition_mode(cls, inputs):
+        """
+        分区执行：删除行、填充固定值只看当前行，可按分区执行；
+        均值填充、前向/后向填充依赖其他行，需要整体物化
+        """
+        if inputs.get("strategy", "drop_rows") in ("drop_rows", "fill_zero", "fill_custom"):
+            return "rowwise"
+        return None
+    
     def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
         """
         Pure function implementation for null value cleaning
@@ -273,13 +343,15 @@ class NullValueCleanerNode(BaseNode):
         if strategy == "drop_rows":
             df = df.dropna(subset=cols)
         elif strategy == "fill_zero":
-            df[cols] = df[cols].fillna(0)
+            for col in cols:
+                df[col] = _fill_nulls(df[col], 0)
         elif strategy == "fill_mean":
             for col in cols:
                 if pd.api.types.is_numeric_dtype(df[col]):
                     df[col] = df[col].fillna(df[col].mean())
         elif strategy == "fill_custom":
-            df[cols] = df[cols].fillna(custom_value)
+            for col in cols:
+                df[col] = _fill_nulls(df[col], custom_value)
         elif strategy == "forward_fill":
             df[cols] = df[cols].ffill()
         elif strategy == "backward_fill":
@@ -366,6 +438,127 @@ class NullValueCleanerNode(BaseNode):
             "ai_cost_usd": 0.0
         }
 
+class DtypeOptimizerNode(BaseNode):
+    """
+    dtype 压缩节点 (Dtype Optimizer)
+    
+    功能：
+    1. 文本列转为 string[pyarrow]；设置 category_max_ratio 时低基数文本列转为 category。
+    2. 日期文本列解析为日期时间，整数列无损降位。
+    3. 报告每列的类型变化与节省的内存。
+    金额等浮点列不降精度，数字与文本混杂的列保持不变。
+    """
+    
+    # Node configuration
+    NODE_TYPE = "DtypeOptimizerNode"
+    VERSION = "1.0.0"
+    CATEGORY = "审计/数据清洗"
+    DISPLAY_NAME = "类型压缩"
+    
+    # Schema definition
+    INPUT_TYPES = {
+        "dataframe": {"type": "DATAFRAME", "required": True},
+        "category_max_ratio": {"type": "FLOAT", "required": False},
+        "parse_dates": {"type": "BOOLEAN", "required": False}
+    }
+    
+    OUTPUT_TYPES = {
+        "optimized_df": {"type": "DATAFRAME"},
+        "report": {"type": "STRING"}
+    }
+    
+    @classmethod
+    def INPUT_TYPES_LEGACY(cls):
+        return {
+            "required": {
+                "dataframe": ("DATAFRAME",),
+            },
+            "optional": {
+                "category_max_ratio": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0}),
+                "parse_dates": ("BOOLEAN", {"default": True}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "STRING")
+    RETURN_NAMES = ("optimized_df", "report")
+    FUNCTION = "optimize_dtypes"
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.SKIP,
+                timeout_seconds=60
+            )
+        super().__init__(metadata)
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """投影下推：只改变类型，不增删列"""
+        return {"dataframe": downstream.get(0)}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for dtype compaction
+        """
+        dataframe = inputs.get("dataframe")
+        ratio = inputs.get("category_max_ratio")
+        parse_dates = inputs.get("parse_dates", True)
+        
+        df, stats = compact_dtypes(
+            dataframe,
+            category_max_ratio=float(ratio) if ratio is not None else None,
+            parse_dates=bool(parse_dates),
+        )
+        
+        mb = 1024 * 1024
+        report_lines = [
+            f"🗜️ Dtype Optimization Report:",
+            f"  • Memory before: {stats['memory_before'] / mb:.2f} MB",
+            f"  • Memory after: {stats['memory_after'] / mb:.2f} MB",
+            f"  • Saved: {stats['saved_bytes'] / mb:.2f} MB ({stats['saved_ratio'] * 100:.1f}%)"
+        ]
+        if stats["columns"]:
+            report_lines.append("\nColumn changes:")
+            for col, change in stats["columns"].items():
+                report_lines.append(f"  • {col}: {change['from']} -> {change['to']}")
+        
+        context.add_evidence(
+            "dtype_optimization",
+            f"Compacted {len(stats['columns'])} columns, saved {stats['saved_bytes']} bytes"
+        )
+        
+        return {
+            "optimized_df": df,
+            "report": "\n".join(report_lines)
+        }
+    
+    def optimize_dtypes(self, dataframe: pd.DataFrame, category_max_ratio: float = 0.0,
+                        parse_dates: bool = True) -> Tuple[pd.DataFrame, str]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="dtype_optimizer"
+        )
+        
+        result = self._execute_pure(
+            {
+                "dataframe": dataframe,
+                "category_max_ratio": category_max_ratio,
+                "parse_dates": parse_dates
+            },
+            context
+        )
+        
+        return result["optimized_df"], result["report"]
+
 # Cost estimation for ColumnMapperNode
 def _column_mapper_estimate_cost(self, inputs: Dict[str, Any]) -> Dict[str, float]:
     """
@@ -391,10 +584,12 @@ ColumnMapperNode.estimate_cost = _column_mapper_estimate_cost
 # Register nodes for ComfyUI
 NODE_CLASS_MAPPINGS = {
     "ColumnMapperNode": ColumnMapperNode,
-    "NullValueCleanerNode": NullValueCleanerNode
+    "NullValueCleanerNode": NullValueCleanerNode,
+    "DtypeOptimizerNode": DtypeOptimizerNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ColumnMapperNode": "列名映射",
-    "NullValueCleanerNode": "空值清洗"
+    "NullValueCleanerNode": "空值清洗",
+    "DtypeOptimizerNode": "类型压缩"
 }
@@ -0,0 +1,474 @@
+"""
+Dataset Nodes - Arrow-backed processing without pandas conversion
+数据集节点：输入输出为 DatasetHandle，过滤、列选择、聚合直接在 Arrow 上执行，
+只扫描用到的列；下游需要 DataFrame 的节点由执行器按需物化
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.dataset import DatasetHandle, dataset_info
+from app.core.sql_engine import run_query
+from .base_node import BaseNode, ExecutionContext, NodeMetadata, FailurePolicy
+from .file_nodes import resolve_input_path
+
+FILTER_OPERATORS = ["==", "!=", ">", ">=", "<", "<=", "in", "not_in", "contains", "is_null", "not_null"]
+AGGREGATE_FUNCTIONS = ["sum", "count", "mean", "min", "max", "count_distinct"]
+
+
+def _split(value: Any) -> List[str]:
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+def _typed_scalar(value: str, arrow_type: pa.DataType) -> pa.Scalar:
+    """把文本参数转换为列的 Arrow 类型（字典编码列按值类型转换）"""
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    try:
+        return pa.scalar(value).cast(arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Cannot compare value '{value}' with column type {arrow_type}: {e}")
+
+
+def build_filter(schema: pa.Schema, column: str, operator: str, value: Any) -> ds.Expression:
+    """单列过滤条件 -> pyarrow.dataset 表达式"""
+    if column not in schema.names:
+        raise ValueError(f"Column '{column}' not found. Available columns: {schema.names}")
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"Unsupported operator '{operator}'. Supported: {', '.join(FILTER_OPERATORS)}")
+    field = ds.field(column)
+    arrow_type = schema.field(column).type
+    if operator == "is_null":
+        return field.is_null()
+    if operator == "not_null":
+        return field.is_valid()
+    if operator == "contains":
+        return pc.match_substring(field, str(value))
+    if operator in ("in", "not_in"):
+        values = pa.array([_typed_scalar(v, arrow_type).as_py() for v in _split(value)])
+        expression = field.isin(values)
+        return ~expression if operator == "not_in" else expression
+    scalar = _typed_scalar(str(value), arrow_type)
+    return {
+        "==": field == scalar,
+        "!=": field != scalar,
+        ">": field > scalar,
+        ">=": field >= scalar,
+        "<": field < scalar,
+        "<=": field <= scalar,
+    }[operator]
+
+
+class DatasetLoader(BaseNode):
+    """
+    数据集加载节点 (Dataset Loader)
+    
+    功能：
+    - 打开 Parquet 文件、Parquet 分片目录（如合并加载/CSV 流式模式的输出）或 Arrow IPC 文件
+    - 只读取元数据，不加载数据；输出数据集句柄
+    - 支持执行计划的列投影下推（只保留下游用到的列）
+    """
+    
+    NODE_TYPE = "DatasetLoader"
+    VERSION = "1.0.0"
+    CATEGORY = "输入/文件"
+    DISPLAY_NAME = "数据集加载"
+    
+    OUTPUT_TYPES = {
+        "dataset": {
+            "type": "DATASET",
+            "description": "惰性数据集句柄"
+        },
+        "info": {
+            "type": "STRING",
+            "description": "行数与列结构"
+        }
+    }
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "path": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "columns": ("STRING", {"default": ""}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATASET", "STRING")
+    RETURN_NAMES = ("dataset", "info")
+    FUNCTION = "load_dataset"
+    SUPPORTS_PROJECTION = True
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.RETRY,
+                timeout_seconds=60
+            )
+        super().__init__(metadata)
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for opening a dataset
+        """
+        handle = DatasetHandle(resolve_input_path(inputs.get("path") or ""))
+        columns = _split(inputs.get("columns"))
+        if columns:
+            handle = handle.select(columns)
+        elif inputs.get("projection") is not None:
+            # 执行计划下推的列（用户指定 columns 时以 columns 为准）
+            wanted = set(inputs["projection"])
+            handle = handle.select([c for c in handle.column_names if c in wanted])
+        
+        info = dataset_info(handle)
+        summary = f"{info['rows']} rows, {len(info['columns'])} columns: " + ", ".join(
+            f"{c['name']} ({c['type']})" for c in info["columns"]
+        )
+        return {"dataset": handle, "info": summary}
+    
+    def load_dataset(self, path: str, columns: str = "", projection: Optional[List[str]] = None) -> Tuple[DatasetHandle, str]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="dataset_loader"
+        )
+        
+        result = self._execute_pure({"path": path, "columns": columns, "projection": projection}, context)
+        return (result["dataset"], result["info"])
+
+
+class DatasetFilterNode(BaseNode):
+    """
+    数据集过滤节点 (Dataset Filter)
+    
+    功能：
+    - 按单列条件过滤行（==, !=, >, >=, <, <=, in, not_in, contains, is_null, not_null）
+    - 可选只保留部分列
+    - 条件和列选择记录在句柄上，读取时下推到 Parquet 扫描（按 row group 统计裁剪），不经过 pandas
+    """
+    
+    NODE_TYPE = "DatasetFilterNode"
+    VERSION = "1.0.0"
+    CATEGORY = "审计/数据清洗"
+    DISPLAY_NAME = "数据集过滤"
+    
+    INPUT_TYPES = {
+        "dataset": {"type": "DATASET", "required": True},
+        "column": {"type": "STRING", "required": True},
+        "operator": {"type": "STRING", "required": True, "default": "=="},
+        "value": {"type": "STRING", "required": False},
+        "keep_columns": {"type": "STRING", "required": False}
+    }
+    
+    OUTPUT_TYPES = {
+        "dataset": {"type": "DATASET"},
+        "row_count": {"type": "INT"}
+    }
+    
+    RETURN_TYPES = ("DATASET", "INT")
+    RETURN_NAMES = ("dataset", "row_count")
+    FUNCTION = "filter_dataset"
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.SKIP,
+                timeout_seconds=120
+            )
+        super().__init__(metadata)
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """投影下推：过滤列加上下游用到的列（或指定保留的列）"""
+        column = inputs.get("column")
+        keep_columns = inputs.get("keep_columns") or ""
+        if not isinstance(column, str) or not isinstance(keep_columns, str):
+            return None
+        wanted = set(_split(keep_columns)) or downstream.get(0)
+        if wanted is None:
+            return None
+        return {"dataset": wanted | {column}}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for dataset filtering
+        """
+        handle = inputs.get("dataset")
+        if isinstance(handle, pd.DataFrame):
+            handle = DatasetHandle.from_pandas(handle)
+        
+        expression = build_filter(handle.schema, inputs.get("column"), inputs.get("operator") or "==", inputs.get("value"))
+        filtered = handle.filter(expression)
+        keep_columns = _split(inputs.get("keep_columns"))
+        if keep_columns:
+            filtered = filtered.select(keep_columns)
+        
+        row_count = filtered.num_rows
+        context.add_evidence(
+            "dataset_filter",
+            f"{inputs.get('column')} {inputs.get('operator')} {inputs.get('value')}: {row_count} of {handle.num_rows} rows"
+        )
+        return {"dataset": filtered, "row_count": row_count}
+    
+    def filter_dataset(
+        self,
+        dataset: DatasetHandle,
+        column: str,
+        operator: str = "==",
+        value: str = "",
+        keep_columns: str = ""
+    ) -> Tuple[DatasetHandle, int]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="dataset_filter"
+        )
+        
+        result = self._execute_pure({
+            "dataset": dataset,
+            "column": column,
+            "operator": operator,
+            "value": value,
+            "keep_columns": keep_columns,
+        }, context)
+        return (result["dataset"], result["row_count"])
+
+
+class DatasetAggregateNode(BaseNode):
+    """
+    数据集聚合节点 (Dataset Aggregate)
+    
+    功能：
+    - 按分组列聚合（sum, count, mean, min, max, count_distinct），只读取分组列和聚合列
+    - 聚合在 Arrow 上执行，结果为内存中的数据集句柄（结果列名为 "{列名}_{函数}"）
+    """
+    
+    NODE_TYPE = "DatasetAggregateNode"
+    VERSION = "1.0.0"
+    CATEGORY = "审计/数据清洗"
+    DISPLAY_NAME = "数据集聚合"
+    
+    INPUT_TYPES = {
+        "dataset": {"type": "DATASET", "required": True},
+        "group_by": {"type": "STRING", "required": False},
+        "aggregations": {"type": "STRING", "required": True}
+    }
+    
+    OUTPUT_TYPES = {
+        "dataset": {"type": "DATASET"}
+    }
+    
+    RETURN_TYPES = ("DATASET",)
+    RETURN_NAMES = ("dataset",)
+    FUNCTION = "aggregate_dataset"
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.SKIP,
+                timeout_seconds=300
+            )
+        super().__init__(metadata)
+    
+    @staticmethod
+    def parse_aggregations(aggregations: str) -> List[Tuple[str, str]]:
+        """"金额:sum, 凭证号:count" -> [("金额", "sum"), ("凭证号", "count")]"""
+        parsed = []
+        for item in _split(aggregations):
+            column, _, func = item.rpartition(":")
+            func = func.strip().lower()
+            if not column or func not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Invalid aggregation '{item}'. Expected column:function with function in {AGGREGATE_FUNCTIONS}")
+            parsed.append((column.strip(), func))
+        if not parsed:
+            raise ValueError("No aggregations specified")
+        return parsed
+    
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """投影下推：分组列和聚合列"""
+        group_by = inputs.get("group_by") or ""
+        aggregations = inputs.get("aggregations")
+        if not isinstance(group_by, str) or not isinstance(aggregations, str):
+            return None
+        return {"dataset": set(_split(group_by)) | {column for column, _ in cls.parse_aggregations(aggregations)}}
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for dataset aggregation
+        """
+        handle = inputs.get("dataset")
+        if isinstance(handle, pd.DataFrame):
+            handle = DatasetHandle.from_pandas(handle)
+        
+        group_by = _split(inputs.get("group_by"))
+        aggregations = self.parse_aggregations(inputs.get("aggregations") or "")
+        result = handle.aggregate(aggregations, group_by)
+        # 分组列放在前面
+        result = result.select(group_by + [n for n in result.column_names if n not in group_by])
+        return {"dataset": DatasetHandle(result)}
+    
+    def aggregate_dataset(self, dataset: DatasetHandle, aggregations: str, group_by: str = "") -> Tuple[DatasetHandle]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="dataset_aggregate"
+        )
+        
+        result = self._execute_pure({"dataset": dataset, "group_by": group_by, "aggregations": aggregations}, context)
+        return (result["dataset"],)
+
+
+SQL_TABLE_INPUTS = ("t1", "t2", "t3", "t4")
+SQL_DEFAULT_QUERY = """-- 上游输入按 t1 ~ t4 引用（可在 table_names 中改名）
+SELECT 科目, SUM(金额) AS 合计, COUNT(*) AS 笔数
+FROM t1
+GROUP BY 科目
+ORDER BY 合计 DESC
+"""
+
+
+class SqlNode(BaseNode):
+    """
+    SQL 查询节点 (SQL Query)
+    
+    功能：
+    - 对上游 DataFrame / 数据集（含 Parquet 中间结果、分片目录）执行 SQL：连接、分组、窗口函数等
+    - 使用嵌入式列式引擎 DuckDB（可选依赖），向量化、多线程执行
+    - Parquet 输入直接扫描（列选择和过滤下推），不转换为 pandas
+    - 只允许单条只读查询，查询中不能访问其他文件
+    
+    输入：
+    - query: SQL 语句，上游输入按 t1 ~ t4 引用
+    - t1 ~ t4: 上游 DataFrame 或数据集
+    - table_names: 逗号分隔的表名，按顺序替换 t1 ~ t4（可选，如 "ledger,vendors"）
+    
+    输出：
+    - dataset: 查询结果（内存中的数据集句柄，下游需要 DataFrame 时由执行器物化）
+    - row_count: 结果行数
+    """
+    
+    NODE_TYPE = "SqlNode"
+    VERSION = "1.0.0"
+    CATEGORY = "script"
+    DISPLAY_NAME = "SQL 查询"
+    
+    INPUT_TYPES = {
+        "query": {"type": "STRING", "required": True, "multiline": True, "default": SQL_DEFAULT_QUERY},
+        **{name: {"type": "DATASET", "required": False} for name in SQL_TABLE_INPUTS},
+        "table_names": {"type": "STRING", "required": False}
+    }
+    
+    OUTPUT_TYPES = {
+        "dataset": {"type": "DATASET"},
+        "row_count": {"type": "INT"}
+    }
+    
+    RETURN_TYPES = ("DATASET", "INT")
+    RETURN_NAMES = ("dataset", "row_count")
+    FUNCTION = "run_sql"
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.SKIP,
+                timeout_seconds=600,
+                cache_results=True
+            )
+        super().__init__(metadata)
+    
+    @staticmethod
+    def table_mapping(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """已连接的输入 -> {表名: 值}（table_names 按顺序替换 t1 ~ t4）"""
+        names = _split(inputs.get("table_names"))
+        if len(names) > len(SQL_TABLE_INPUTS):
+            raise ValueError(f"At most {len(SQL_TABLE_INPUTS)} table names can be given")
+        tables = {}
+        for idx, key in enumerate(SQL_TABLE_INPUTS):
+            if inputs.get(key) is not None:
+                name = names[idx] if idx < len(names) else key
+                if name in tables:
+                    raise ValueError(f"Duplicate table name '{name}'")
+                tables[name] = inputs[key]
+        return tables
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for SQL queries
+        """
+        tables = self.table_mapping(inputs)
+        result = run_query(inputs.get("query") or "", tables)
+        context.add_evidence("sql_query", f"{inputs.get('query')} -> {result.num_rows} rows")
+        return {"dataset": DatasetHandle(result), "row_count": result.num_rows}
+    
+    def run_sql(
+        self,
+        query: str,
+        t1: Any = None,
+        t2: Any = None,
+        t3: Any = None,
+        t4: Any = None,
+        table_names: str = ""
+    ) -> Tuple[DatasetHandle, int]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="sql_node"
+        )
+        
+        result = self._execute_pure({
+            "query": query, "t1": t1, "t2": t2, "t3": t3, "t4": t4, "table_names": table_names
+        }, context)
+        return (result["dataset"], result["row_count"])
+
+
+# Register nodes for ComfyUI
+NODE_CLASS_MAPPINGS = {
+    "DatasetLoader": DatasetLoader,
+    "DatasetFilterNode": DatasetFilterNode,
+    "DatasetAggregateNode": DatasetAggregateNode,
+    "SqlNode": SqlNode
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "DatasetLoader": "数据集加载",
+    "DatasetFilterNode": "数据集过滤",
+    "DatasetAggregateNode": "数据集聚合",
+    "SqlNode": "SQL 查询"
+}
@@ -1,13 +1,105 @@
 import pandas as pd
 import os
+import glob
 import hashlib
+import json
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional, Tuple
-import shutil
+from typing import Dict, Any, List, Optional, Tuple
 
+from app.core.config import settings
+from app.core.consolidate import ALL_SHEETS, consolidate, consolidate_to_dataset, expand_sources
+from app.core.csv_reader import CSV_ENCODINGS, detect_encoding, read_csv, read_header, stream_csv_to_parquet
+from app.core.dataset import DatasetHandle
+from app.core.excel_reader import EXCEL_ENGINES, parse_usecols, read_excel
+from app.core.ingest import ingest_store
+from app.core.upload_store import blob_store
 from .base_node import BaseNode, ExecutionContext, NodeMetadata, FailurePolicy
 
+
+def read_tabular_file(
+    path: str,
+    sheet_name=0,
+    usecols=None,
+    nrows: Optional[int] = None,
+    skiprows: int = 0,
+    engine: str = "auto",
+    projection: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    读取 Excel/CSV：源文件内容未变化时直接读取入库转换后的 Parquet，
+    否则解析一次源文件并写入转换结果；转换不可用时回退到直接解析
+
+    只读取部分范围（usecols/nrows/skiprows）时不触发整本转换：
+    已有转换结果则从 Parquet 读取，否则只解析需要的行和列
+
+    projection: 执行计划下推的列名（下游实际用到的列），只读取其中存在的列；
+    与 usecols 不同，不存在的列名不报错，也不影响整本转换；指定 usecols 时忽略
+    """
+    if usecols:
+        projection = None
+    partial = bool(usecols or nrows or skiprows)
+    if settings.INGEST_ENABLED and not skiprows:
+        df = ingest_store.load(
+            path, sheet_name=sheet_name, usecols=usecols, nrows=nrows, convert=not partial, projection=projection
+        )
+        if df is not None:
+            return df
+    if projection is not None:
+        wanted = set(projection)
+        usecols = lambda column: column in wanted  # noqa: E731
+    if os.path.splitext(path)[1].lower() == ".csv":
+        # 与 Excel 相同的列选择语法："A:C,E" 为列字母范围，其他为列名
+        return pd.read_csv(
+            path, encoding=detect_encoding(path), usecols=parse_usecols(usecols), nrows=nrows, skiprows=skiprows
+        )
+    return read_excel(path, sheet_name=sheet_name, usecols=usecols, nrows=nrows, skiprows=skiprows, engine=engine)
+
+
+def resolve_input_path(file_path: str) -> str:
+    """在工作目录、input/ 和 backend/input/ 下查找输入文件"""
+    base_dir = os.getcwd()
+    full_path = os.path.join(base_dir, file_path)
+    if os.path.exists(full_path):
+        return full_path
+    # 尝试在 input 目录下查找
+    input_path = os.path.join(base_dir, "input", file_path)
+    if os.path.exists(input_path):
+        return input_path
+    # 尝试 backend/input 目录
+    backend_input_path = os.path.join(base_dir, "backend", "input", os.path.basename(file_path))
+    if os.path.exists(backend_input_path):
+        return backend_input_path
+    raise FileNotFoundError(f"File not found: {file_path}")
+
+
+def resolve_input_glob(patterns: str) -> list:
+    """
+    按 glob 匹配输入文件（多个模式用换行或分号分隔），与 resolve_input_path 相同的查找顺序：
+    工作目录、input/、backend/input/；返回去重并排序后的文件列表
+    """
+    base_dir = os.getcwd()
+    paths = []
+    for pattern in [p.strip() for p in patterns.replace(";", "\n").splitlines() if p.strip()]:
+        for base in (base_dir, os.path.join(base_dir, "input"), os.path.join(base_dir, "backend", "input")):
+            matches = sorted(p for p in glob.glob(os.path.join(base, pattern)) if os.path.isfile(p))
+            if matches:
+                paths.extend(m for m in matches if m not in paths)
+                break
+    if not paths:
+        raise FileNotFoundError(f"No files match: {patterns}")
+    return paths
+
+
+def _parse_sheet_name(sheet_name: Any):
+    """sheet 参数：空值为第一个 sheet，纯数字为序号，其他为名称"""
+    if sheet_name is None or sheet_name == "":
+        return 0
+    if isinstance(sheet_name, int):
+        return sheet_name
+    sheet_name = str(sheet_name).strip()
+    return int(sheet_name) if sheet_name.isdigit() else sheet_name
+
 class ExcelLoader(BaseNode):
     """
     加载 Excel 文件为 DataFrame
@@ -16,10 +108,18 @@ class ExcelLoader(BaseNode):
     - 从文件路径加载Excel文件
     - 支持.xlsx和.xls格式
     - 自动查找input目录
+    - 文件内容未变化时读取入库转换后的 Parquet，不重复解析 Excel
     - 返回标准化的DataFrame
+    - 解析引擎可选：calamine（已安装 python-calamine 时自动使用）/ openpyxl 流式 / pandas
+    - 可只读取指定 sheet、列范围和行数
     
     输入：
     - file_path: Excel文件路径
+    - sheet_name: sheet 名称或序号（默认第一个）
+    - engine: auto / calamine / openpyxl / pandas
+    - usecols: 列范围 "A:C,E"（含 ":" 时按列字母解析，单列写作 "E:E"）或逗号分隔的列名（可选）
+    - nrows: 只读取表头之后的前 N 行（0 表示全部）
+    - skiprows: 表头之前跳过的行数
     
     输出：
     - dataframe: 加载的DataFrame
@@ -44,12 +144,21 @@ class ExcelLoader(BaseNode):
         return {
             "required": {
                 "file_path": ("STRING", {"default": "input/data.xlsx"}),
+            },
+            "optional": {
+                "sheet_name": ("STRING", {"default": ""}),
+                "engine": (list(EXCEL_ENGINES), {"default": "auto"}),
+                "usecols": ("STRING", {"default": ""}),
+                "nrows": ("INT", {"default": 0, "min": 0}),
+                "skiprows": ("INT", {"default": 0, "min": 0}),
             }
         }
 
     RETURN_TYPES = ("DATAFRAME",)
     RETURN_NAMES = ("dataframe",)
     FUNCTION = "load_excel"
+    SUPPORTS_PROJECTION = True
+    COMPACT_OUTPUTS = True
     
     def __init__(self, metadata: Optional[NodeMetadata] = None):
         """Initialize with metadata"""
@@ -70,33 +179,33 @@ class ExcelLoader(BaseNode):
         Pure function implementation for loading Excel
         """
         file_path = inputs.get("file_path", "input/data.xlsx")
-        
-        # 简单防路径穿越 (POC)
-        base_dir = os.getcwd()
-        full_path = os.path.join(base_dir, file_path)
-        
-        if not os.path.exists(full_path):
-            # 尝试在 input 目录下查找
-            input_path = os.path.join(base_dir, "input", file_path)
-            if os.path.exists(input_path):
-                full_path = input_path
-            else:
-                # 尝试 backend/input 目录
-                backend_input_path = os.path.join(
-                    base_dir, "backend", "input", os.path.basename(file_path)
-                )
-                if os.path.exists(backend_input_path):
-                    full_path = backend_input_path
-                else:
-                    raise FileNotFoundError(f"File not found: {file_path}")
+        full_path = resolve_input_path(file_path)
 
         try:
-            df = pd.read_excel(full_path)
+            df = read_tabular_file(
+                full_path,
+                sheet_name=_parse_sheet_name(inputs.get("sheet_name")),
+                usecols=inputs.get("usecols") or None,
+                nrows=int(inputs.get("nrows") or 0) or None,
+                skiprows=int(inputs.get("skiprows") or 0),
+                engine=inputs.get("engine") or "auto",
+                # 执行计划下推的列（用户指定 usecols 时以 usecols 为准）
+                projection=inputs.get("projection"),
+            )
             return {"dataframe": df}
         except Exception as e:
             raise ValueError(f"Failed to load Excel file {file_path}: {str(e)}")
     
-    def load_excel(self, file_path: str = "input/data.xlsx") -> Tuple[pd.DataFrame]:
+    def load_excel(
+        self,
+        file_path: str = "input/data.xlsx",
+        sheet_name: str = "",
+        engine: str = "auto",
+        usecols: str = "",
+        nrows: int = 0,
+        skiprows: int = 0,
+        projection: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame]:
         """
         Legacy interface for backward compatibility
         """
@@ -106,9 +215,326 @@ class ExcelLoader(BaseNode):
             node_exec_id="excel_loader"
         )
         
-        result = self._execute_pure({"file_path": file_path}, context)
+        result = self._execute_pure({
+            "file_path": file_path,
+            "sheet_name": sheet_name,
+            "engine": engine,
+            "usecols": usecols,
+            "nrows": nrows,
+            "skiprows": skiprows,
+            "projection": projection,
+        }, context)
         return (result["dataframe"],)
 
+class CsvLoader(BaseNode):
+    """
+    加载 CSV 文件为 DataFrame（pyarrow 多线程解析）
+    
+    功能：
+    - 自动识别编码（UTF-8 / GBK），也可手动指定
+    - 显式指定列类型，如 {"账号": "string"} 保留前导 0
+    - 只读取指定的列
+    - 流式模式：按块写入 Parquet，适用于超过内存的大文件
+    - 分区模式：同流式模式写入 Parquet，输出分区数据集，下游节点按分区执行（见 app.core.out_of_core）
+    
+    输入：
+    - file_path: CSV文件路径
+    - encoding: auto / utf-8 / gbk / gb18030 / utf-16
+    - delimiter: 分隔符（默认逗号）
+    - columns: 逗号分隔的列名（可选）
+    - dtypes: JSON 格式的列类型，如 {"账号": "string", "金额": "float64"}
+    - skip_rows: 表头之前跳过的行数
+    - mode: memory（读入内存）/ streaming（流式写入 Parquet）/ partitioned（分区执行）
+    
+    输出：
+    - dataframe: 加载的DataFrame（streaming 模式下为 Parquet 数据集句柄，需要 DataFrame 的下游节点
+      只物化用到的列；partitioned 模式下为分区数据集）
+    - parquet_path: streaming / partitioned 模式写出的 Parquet 路径（memory 模式为空）
+    """
+    
+    NODE_TYPE = "CsvLoader"
+    VERSION = "1.0.0"
+    CATEGORY = "输入/文件"
+    DISPLAY_NAME = "CSV加载器"
+    
+    OUTPUT_TYPES = {
+        "dataframe": {
+            "type": "DATAFRAME",
+            "description": "加载的DataFrame"
+        },
+        "parquet_path": {
+            "type": "STRING",
+            "description": "流式模式写出的 Parquet 文件路径"
+        }
+    }
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "file_path": ("STRING", {"default": "input/data.csv"}),
+            },
+            "optional": {
+                "encoding": (list(CSV_ENCODINGS), {"default": "auto"}),
+                "delimiter": ("STRING", {"default": ","}),
+                "columns": ("STRING", {"default": ""}),
+                "dtypes": ("STRING", {"default": "", "multiline": True}),
+                "skip_rows": ("INT", {"default": 0, "min": 0}),
+                "mode": (["memory", "streaming", "partitioned"], {"default": "memory"}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "STRING")
+    RETURN_NAMES = ("dataframe", "parquet_path")
+    FUNCTION = "load_csv"
+    SUPPORTS_PROJECTION = True
+    COMPACT_OUTPUTS = True
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.RETRY,
+                timeout_seconds=300,
+                cache_results=True
+            )
+        super().__init__(metadata)
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for loading CSV
+        """
+        file_path = inputs.get("file_path", "input/data.csv")
+        full_path = resolve_input_path(file_path)
+        
+        columns = [c.strip() for c in (inputs.get("columns") or "").split(",") if c.strip()] or None
+        dtypes = inputs.get("dtypes") or None
+        if isinstance(dtypes, str):
+            try:
+                dtypes = json.loads(dtypes)
+            except ValueError as e:
+                raise ValueError(f"Invalid dtypes JSON: {e}")
+        options = {
+            "encoding": inputs.get("encoding") or "auto",
+            "delimiter": inputs.get("delimiter") or ",",
+            "columns": columns,
+            "dtypes": dtypes,
+            "skip_rows": int(inputs.get("skip_rows") or 0),
+        }
+        
+        # 执行计划下推的列：只转换表头中存在的列（用户指定 columns 时以 columns 为准）
+        projection = inputs.get("projection")
+        if projection is not None and not columns:
+            wanted = set(projection)
+            header = read_header(full_path, options["encoding"], options["delimiter"], options["skip_rows"])
+            options["columns"] = [c for c in header if c in wanted]
+            if options["dtypes"]:
+                options["dtypes"] = {k: v for k, v in options["dtypes"].items() if k in wanted}
+        
+        mode = inputs.get("mode", "memory")
+        try:
+            if mode in ("streaming", "partitioned"):
+                output_path = self._stream_output_path(full_path, options)
+                if not os.path.exists(output_path):
+                    stream_csv_to_parquet(full_path, output_path, **options)
+                partition_rows = settings.OUT_OF_CORE_PARTITION_ROWS if mode == "partitioned" else None
+                return {
+                    "dataframe": DatasetHandle(output_path, partition_rows=partition_rows),
+                    "parquet_path": output_path
+                }
+            
+            table = read_csv(full_path, **options)
+            return {"dataframe": table.to_pandas(date_as_object=False), "parquet_path": ""}
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to load CSV file {file_path}: {str(e)}")
+    
+    @staticmethod
+    def _stream_output_path(full_path: str, options: Dict[str, Any]) -> str:
+        """流式输出路径：源文件（路径/大小/修改时间）与读取参数相同时复用已写出的 Parquet"""
+        stat = os.stat(full_path)
+        key = json.dumps(
+            [os.path.realpath(full_path), stat.st_size, stat.st_mtime_ns, options],
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(settings.STORAGE_PATH, "csv_streams", f"{digest}.parquet")
+    
+    def load_csv(
+        self,
+        file_path: str = "input/data.csv",
+        encoding: str = "auto",
+        delimiter: str = ",",
+        columns: str = "",
+        dtypes: str = "",
+        skip_rows: int = 0,
+        mode: str = "memory",
+        projection: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame, str]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="csv_loader"
+        )
+        
+        result = self._execute_pure({
+            "file_path": file_path,
+            "encoding": encoding,
+            "delimiter": delimiter,
+            "columns": columns,
+            "dtypes": dtypes,
+            "skip_rows": skip_rows,
+            "mode": mode,
+            "projection": projection,
+        }, context)
+        return (result["dataframe"], result["parquet_path"])
+
+
+class ConsolidationLoader(BaseNode):
+    """
+    多文件 / 多 sheet 合并加载
+    
+    功能：
+    - 按 glob 匹配多个工作簿/CSV（如 input/2024-*.xlsx），或读取一个工作簿的多个 sheet
+    - 多进程并行解析各来源
+    - 列取并集，同名列 dtype 统一（整数+浮点 -> 浮点，数字+文本 -> 文本）
+    - 添加来源文件列 source_file（读取多个 sheet 时另加 source_sheet）
+    - 流式模式：每个来源写为一个 Parquet 分片，输出分片目录（pyarrow.dataset 可直接打开）
+    - 分区模式：同流式模式写出分片目录，输出分区数据集，下游节点按分区执行
+    
+    输入：
+    - file_pattern: glob 模式，多个模式用换行或分号分隔
+    - sheets: 空为第一个 sheet，"*" 为全部 sheet，或逗号分隔的 sheet 名称/序号
+    - engine: Excel 读取引擎
+    - max_workers: 并行进程数（0 使用配置 LOADER_MAX_WORKERS）
+    - mode: memory（合并为一个 DataFrame）/ streaming（输出分片目录）/ partitioned（分区执行）
+    
+    输出：
+    - dataframe: 合并后的DataFrame（streaming 模式下为分片目录的数据集句柄，需要 DataFrame 的下游节点
+      只物化用到的列；partitioned 模式下为分区数据集）
+    - dataset_path: streaming / partitioned 模式输出的分片目录（memory 模式为空）
+    """
+    
+    NODE_TYPE = "ConsolidationLoader"
+    VERSION = "1.0.0"
+    CATEGORY = "输入/文件"
+    DISPLAY_NAME = "多文件合并加载"
+    
+    OUTPUT_TYPES = {
+        "dataframe": {
+            "type": "DATAFRAME",
+            "description": "合并后的DataFrame"
+        },
+        "dataset_path": {
+            "type": "STRING",
+            "description": "流式模式输出的 Parquet 分片目录"
+        }
+    }
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "file_pattern": ("STRING", {"default": "input/*.xlsx", "multiline": True}),
+            },
+            "optional": {
+                "sheets": ("STRING", {"default": ""}),
+                "engine": (list(EXCEL_ENGINES), {"default": "auto"}),
+                "max_workers": ("INT", {"default": 0, "min": 0}),
+                "mode": (["memory", "streaming", "partitioned"], {"default": "memory"}),
+            }
+        }
+    
+    RETURN_TYPES = ("DATAFRAME", "STRING")
+    RETURN_NAMES = ("dataframe", "dataset_path")
+    FUNCTION = "load_consolidated"
+    COMPACT_OUTPUTS = True
+    
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.RETRY,
+                timeout_seconds=600,
+                cache_results=True
+            )
+        super().__init__(metadata)
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        Pure function implementation for consolidating files/sheets
+        """
+        paths = resolve_input_glob(inputs.get("file_pattern") or "input/*.xlsx")
+        sheets = [_parse_sheet_name(s) for s in str(inputs.get("sheets") or "").split(",") if s.strip()]
+        engine = inputs.get("engine") or "auto"
+        max_workers = int(inputs.get("max_workers") or 0) or None
+        # 指定了 sheet 列表或读取全部 sheet 时，同一文件会有多个来源，添加来源 sheet 列
+        add_sheet_column = ALL_SHEETS in sheets or len(sheets) > 1
+        sources = expand_sources(paths, sheets, engine)
+        
+        mode = inputs.get("mode", "memory")
+        if mode in ("streaming", "partitioned"):
+            output_dir = self._dataset_output_dir(sources, engine, add_sheet_column)
+            if not os.path.isdir(output_dir):
+                consolidate_to_dataset(sources, output_dir, engine, max_workers, add_sheet_column)
+            partition_rows = settings.OUT_OF_CORE_PARTITION_ROWS if mode == "partitioned" else None
+            return {
+                "dataframe": DatasetHandle(output_dir, partition_rows=partition_rows),
+                "dataset_path": output_dir
+            }
+        
+        df = consolidate(sources, engine, max_workers, add_sheet_column)
+        return {"dataframe": df, "dataset_path": ""}
+    
+    @staticmethod
+    def _dataset_output_dir(sources: list, engine: str, add_sheet_column: bool) -> str:
+        """分片目录：所有来源文件（路径/大小/修改时间）与参数相同时复用"""
+        key = [engine, add_sheet_column]
+        for path, sheet in sources:
+            stat = os.stat(path)
+            key.append([os.path.realpath(path), stat.st_size, stat.st_mtime_ns, sheet])
+        digest = hashlib.sha1(json.dumps(key, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+        return os.path.join(settings.STORAGE_PATH, "consolidated", digest)
+    
+    def load_consolidated(
+        self,
+        file_pattern: str = "input/*.xlsx",
+        sheets: str = "",
+        engine: str = "auto",
+        max_workers: int = 0,
+        mode: str = "memory"
+    ) -> Tuple[pd.DataFrame, str]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id="legacy",
+            run_id="legacy_run",
+            node_exec_id="consolidation_loader"
+        )
+        
+        result = self._execute_pure({
+            "file_pattern": file_pattern,
+            "sheets": sheets,
+            "engine": engine,
+            "max_workers": max_workers,
+            "mode": mode,
+        }, context)
+        return (result["dataframe"], result["dataset_path"])
+
+
 class FileUploadNode(BaseNode):
     """
     1A 文件上传节点 - 负责接收和存储各类文件
@@ -142,8 +568,28 @@ class FileUploadNode(BaseNode):
     RETURN_NAMES = ("file_id", "storage_path", "file_metadata")
     FUNCTION = "upload_file"
     
-    def upload_file(self, file_path: str, workflow_id: str, file_type_hint: str = "auto") -> Tuple[str, str, Dict]:
-        """文件上传处理"""
+    def __init__(self, metadata: Optional[NodeMetadata] = None):
+        """Initialize with metadata"""
+        if metadata is None:
+            metadata = NodeMetadata(
+                node_type=self.NODE_TYPE,
+                version=self.VERSION,
+                display_name=self.DISPLAY_NAME,
+                category=self.CATEGORY,
+                failure_policy=FailurePolicy.RETRY,
+                timeout_seconds=120,
+                cache_results=False
+            )
+        super().__init__(metadata)
+    
+    def _execute_pure(self, inputs: Dict[str, Any], context: ExecutionContext) -> Dict[str, Any]:
+        """
+        文件上传处理：读取一遍源文件，复制到按内容哈希存放的 blob 的同时计算 sha256，
+        存储路径是指向 blob 的硬链接（相同内容只存一份）
+        """
+        file_path = inputs.get("file_path", "")
+        workflow_id = inputs.get("workflow_id", "default_workflow")
+        
         # 生成文件ID
         file_id = f"file_{workflow_id}_{uuid.uuid4().hex[:8]}"
         
@@ -166,32 +612,41 @@ class FileUploadNode(BaseNode):
         
         # 存储路径
         storage_base = "backend/storage/uploads"
-        os.makedirs(storage_base, exist_ok=True)
         storage_path = os.path.join(storage_base, workflow_id, file_id)
-        os.makedirs(os.path.dirname(storage_path), exist_ok=True)
         
-        # 复制文件
-        shutil.copy2(file_path, storage_path)
+        checksum, file_size, _ = blob_store.store_file(file_path)
+        stored = blob_store.materialize(checksum, storage_path)
         
         # 生成元数据
         file_metadata = {
             "file_id": file_id,
             "original_name": file_name,
             "size": file_size,
-            "type_hint": file_type_hint,
+            "type_hint": inputs.get("file_type_hint", "auto"),
             "upload_time": datetime.now().isoformat(),
-            "checksum": self._calculate_file_hash(file_path)
+            "checksum": checksum,
+            "checksum_algorithm": "sha256",
+            "stored": stored
         }
         
-        return file_id, storage_path, file_metadata
-    
-    def _calculate_file_hash(self, file_path: str) -> str:
-        """计算文件哈希值"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return {"file_id": file_id, "storage_path": storage_path, "file_metadata": file_metadata}
+    
+    def upload_file(self, file_path: str, workflow_id: str, file_type_hint: str = "auto") -> Tuple[str, str, Dict]:
+        """
+        Legacy interface for backward compatibility
+        """
+        context = ExecutionContext(
+            workflow_id=workflow_id,
+            run_id="legacy_run",
+            node_exec_id="file_upload"
+        )
+        
+        result = self._execute_pure({
+            "file_path": file_path,
+            "workflow_id": workflow_id,
+            "file_type_hint": file_type_hint,
+        }, context)
+        return (result["file_id"], result["storage_path"], result["file_metadata"])
 
 
 class FileRecognitionNode(BaseNode):
@@ -229,11 +684,8 @@ class FileRecognitionNode(BaseNode):
         recognized_text = ""
         
         if file_ext in ['.xlsx', '.xls', '.csv']:
-            # Excel/CSV直接解析
-            if file_ext == '.csv':
-                extracted_data = pd.read_csv(storage_path)
-            else:
-                extracted_data = pd.read_excel(storage_path)
+            # Excel/CSV直接解析（优先读取入库转换后的 Parquet）
+            extracted_data = read_tabular_file(storage_path)
             recognized_text = f"Extracted {len(extracted_data)} rows"
             
         elif file_ext in ['.pdf', '.png', '.jpg', '.jpeg']:
@@ -264,12 +716,16 @@ class FileRecognitionNode(BaseNode):
 
 NODE_CLASS_MAPPINGS = {
     "ExcelLoader": ExcelLoader,
+    "CsvLoader": CsvLoader,
+    "ConsolidationLoader": ConsolidationLoader,
     "FileUploadNode": FileUploadNode,
     "FileRecognitionNode": FileRecognitionNode
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ExcelLoader": "Excel加载器",
+    "CsvLoader": "CSV加载器",
+    "ConsolidationLoader": "多文件合并加载",
     "FileUploadNode": "文件上传",
     "FileRecognitionNode": "文件识别(OCR)"
 }
@@ -51,6 +51,14 @@ class QuickPlotNode(BaseNode):
     # Performance settings
     MAX_DATA_POINTS = 1000  # Auto-sample if dataset larger than this
     
+    @classmethod
+    def required_columns(cls, inputs, downstream):
+        """Projection pushdown: the chart only reads the X and Y columns"""
+        columns = [inputs.get("x_column"), inputs.get("y_column")]
+        if not all(isinstance(c, str) and c for c in columns):
+            return None
+        return {"dataframe": set(columns)}
+    
     def generate_chart(
         self,
         dataframe: pd.DataFrame,
@@ -0,0 +1,94 @@
+"""
+本福特定律分析测试
+验证向量化首位数字提取与逐行字符串截取一致、分组 MAD / 卡方与按定义计算一致，
+人为编造金额的分组被判为不符合，以及分区执行合并后结果与整体计算相同
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.benford import expected_distribution, leading_digits
+from app.core.dataset import DatasetHandle
+from app.core.out_of_core import run_aggregate
+from app.nodes.audit_nodes import BenfordNode
+
+
+def journal(rows: int = 20000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # 跨多个数量级的对数均匀金额服从本福特定律
+    amount = np.round(10 ** rng.uniform(1, 6, rows), 2)
+    user = rng.choice(["u1", "u2", "u3"], rows)
+    # u3 的金额为编造的均匀分布（首位数字不服从本福特定律）
+    fabricated = user == "u3"
+    amount[fabricated] = np.round(rng.uniform(1000, 9999, fabricated.sum()), 2)
+    amount[::101] = -amount[::101]
+    df = pd.DataFrame({"account": rng.choice(["6601", "6602"], rows), "user": user, "amount": amount})
+    df.loc[::997, "amount"] = np.nan
+    df.loc[1, "amount"] = 5.0
+    return df
+
+
+def test_digit_statistics():
+    """测试首位 / 前两位数字检验：数字提取、分组 MAD 与卡方，编造金额的分组不符合"""
+    print("\n=== Test 1: 首位与前两位数字检验 ===")
+    df = journal()
+    values = np.array([10, 100, 1000, 1e6, 99.99, 0.3 * 1000, 19.999, -472.5, 9.99, np.nan, np.inf])
+    lead, valid = leading_digits(values, 2)
+    assert lead[valid].tolist() == [10, 10, 10, 10, 99, 30, 19, 47]
+    assert valid.tolist() == [True] * 8 + [False] * 3
+
+    node = BenfordNode()
+    for test, digits in (("first_digit", 1), ("first_two_digits", 2)):
+        summary, table, report = node.analyze(df, test=test, group_by="user")
+        print(report)
+        print(summary)
+        # 按定义逐行截取字符串计算
+        usable = df[df["amount"].abs() >= 10]
+        first = usable["amount"].abs().map(lambda x: int(f"{x:.2f}".lstrip("0.")[:digits]))
+        for user, group in first.groupby(usable["user"]):
+            observed = group.value_counts(normalize=True).reindex(range(10 ** (digits - 1), 10 ** digits), fill_value=0)
+            expected = expected_distribution(digits)
+            row = summary.set_index("user").loc[user]
+            assert row["record_count"] == len(group)
+            assert row["mad"] == pytest.approx(np.abs(observed.to_numpy() - expected).mean())
+            chi = ((observed.to_numpy() * len(group) - len(group) * expected) ** 2 / (len(group) * expected)).sum()
+            assert row["chi_square"] == pytest.approx(chi)
+        conformity = summary.set_index("user")["conformity"]
+        assert conformity["u3"] == "nonconformity" and conformity["u1"] != "nonconformity"
+        assert len(table) == 3 * 9 * 10 ** (digits - 1)
+        assert table.groupby("user")["observed"].sum().to_numpy() == pytest.approx(1.0)
+        assert "1 of 3 groups nonconforming" in report
+
+    summary, _, _ = node.analyze(df.head(50), group_by="account,user")
+    assert (summary["conformity"] == "insufficient_data").all()
+    assert list(summary.columns[:2]) == ["account", "user"]
+    with pytest.raises(ValueError):
+        node.analyze(df, test="last_digit")
+    with pytest.raises(ValueError):
+        node.analyze(df, group_by="missing")
+    print("✅ 测试通过")
+
+
+def test_partitioned_merge(tmp_path):
+    """测试分区执行：逐分区统计频数矩阵再合并，结果与整体计算相同"""
+    print("\n=== Test 2: 分区合并 ===")
+    df = journal(9000, seed=1)
+    node = BenfordNode()
+    summary, table, report = node.analyze(df, test="first_two_digits", group_by="account,user")
+
+    path = tmp_path / "journal.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=1000)
+    inputs = {"amount_column": "amount", "test": "first_two_digits", "group_by": "account,user"}
+    merged_summary, merged_table, merged_report = run_aggregate(
+        node, inputs, "dataframe", DatasetHandle(str(path), partition_rows=1000)
+    )
+    print(merged_report)
+    pd.testing.assert_frame_equal(merged_summary, summary)
+    pd.testing.assert_frame_equal(merged_table, table)
+    assert merged_report == report
+
+    overall, _, _ = node.analyze(df)
+    assert overall["group"].tolist() == ["all"] and overall.loc[0, "record_count"] == summary["record_count"].sum()
+    print("✅ 测试通过")
@@ -0,0 +1,98 @@
+"""
+列画像测试
+验证写入中间结果时生成的 sidecar 统计信息，以及预览接口对 sidecar 的使用
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.api import preview_routes
+from app.core.column_profile import approx_distinct, compute_profile, profile_path
+from app.core.data_manager import DataManager
+
+
+def test_sidecar_written_with_statistics(tmp_path):
+    """测试保存中间结果时同时写入列画像"""
+    print("\n=== Test 1: 列画像 sidecar ===")
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    df = pd.DataFrame({
+        "amount": [1.0, 2.0, None, 4.0, 4.0],
+        "vendor": ["甲", "乙", "甲", None, "甲"],
+        "date": pd.to_datetime(["2024-01-01", "2024-02-01", None, "2024-03-01", "2024-01-15"]),
+    })
+    path = manager.save_intermediate("run1", "n1", df, 0)
+
+    assert os.path.exists(profile_path(path))
+    profile = manager.load_profile(path)
+    print(f"画像: {profile['columns']['vendor']}")
+
+    assert profile["num_rows"] == 5
+    amount = profile["columns"]["amount"]
+    assert amount["null_count"] == 1
+    assert amount["distinct_count"] == 3
+    assert (amount["min"], amount["max"]) == (1.0, 4.0)
+    assert sum(amount["histogram"]["counts"]) == 4
+
+    vendor = profile["columns"]["vendor"]
+    assert vendor["dtype"] == "object"
+    assert vendor["top_values"][0] == {"value": "甲", "count": 3}
+
+    assert profile["columns"]["date"]["min"].startswith("2024-01-01")
+    print("✅ 测试通过")
+
+
+def test_approx_distinct_accuracy():
+    """测试 KMV 近似 distinct：小基数精确，大基数误差在 10% 以内"""
+    print("\n=== Test 2: 近似 distinct ===")
+
+    rng = np.random.default_rng(0)
+    small = pd.util.hash_array(rng.integers(0, 500, 100_000))
+    assert approx_distinct(small) == 500
+
+    values = rng.integers(0, 10**9, 200_000)
+    estimate = approx_distinct(pd.util.hash_array(values))
+    exact = len(np.unique(values))
+    print(f"估计: {estimate}, 精确: {exact}")
+    assert abs(estimate - exact) / exact < 0.1
+    print("✅ 测试通过")
+
+
+def test_all_null_and_dictionary_columns():
+    """测试全空列和字典编码列"""
+    table = pa.table({
+        "empty": pa.array([None, None], type=pa.float64()),
+        "category": pa.array(["a", "b"]).dictionary_encode(),
+    })
+    profile = compute_profile(table)
+    assert profile["columns"]["empty"]["distinct_count"] == 0
+    assert profile["columns"]["category"]["min"] == "a"
+    assert profile["columns"]["category"]["distinct_count"] == 2
+
+
+def test_preview_uses_profile(tmp_path, monkeypatch):
+    """测试预览的示例值来自完整数据的画像，而不仅是预览行"""
+    print("\n=== Test 3: 预览读取画像 ===")
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    monkeypatch.setattr(preview_routes, "data_manager", manager)
+
+    df = pd.DataFrame({
+        "amount": np.arange(1000, dtype=float),
+        "vendor": ["A"] * 990 + ["Z"] * 10,
+    })
+    path = manager.save_intermediate("run1", "n1", df, 0)
+
+    preview = preview_routes._build_preview(path, 5, None)
+    print(f"示例值: {preview.sample_values}")
+    assert len(preview.rows) == 5
+    assert preview.sample_values["amount"] == [0.0, 999.0]
+    assert set(preview.sample_values["vendor"]) == {"A", "Z"}
+
+    # 没有 sidecar 的旧缓存仍走 footer + 预览行的逻辑
+    os.remove(profile_path(path))
+    preview = preview_routes._build_preview(path, 5, None)
+    assert preview.sample_values["vendor"] == ["A"]
+    print("✅ 测试通过")
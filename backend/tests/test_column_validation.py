@@ -0,0 +1,92 @@
+"""
+多列批量校验测试
+验证一次校验多列的结果与逐列校验一致、违规说明、汇总矩阵，以及分区执行时汇总矩阵按分区相加
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.column_validation import parse_spec, validate_columns
+from app.core.dataset import DatasetHandle
+from app.core.out_of_core import run_rowwise
+from app.nodes.audit_nodes import ExcelColumnValidator
+
+SPEC = {
+    "amount": {"type": "number", "min": 0, "max": 5000, "required": True},
+    "account": {"regex": r"\d{4}"},
+    "currency": {"allowed": ["CNY", "USD"]},
+    "date": {"type": "date", "min": "2024-01-01"},
+    "qty": {"type": "integer"},
+    "missing": {"required": True},
+}
+
+
+def ledger() -> pd.DataFrame:
+    return pd.DataFrame({
+        "amount": [100, -5, 6000, None, "abc", 200],
+        "account": ["1001", "10A1", "2001", "3001", None, "4001"],
+        "currency": ["CNY", "CNY", "EUR", "USD", "CNY", None],
+        "date": ["2024-02-01", "2023-12-31", "2024-03-01", "not a date", "2024-05-01", "2024-06-01"],
+        "qty": [1, 2, 3.5, 4, 5, 6],
+    })
+
+
+def test_validate_columns():
+    """测试各检查项的命中行、违规说明和汇总矩阵"""
+    print("\n=== Test 1: 多列校验 ===")
+    mask, labels, summary = validate_columns(ledger(), parse_spec(SPEC))
+    print(summary)
+    for i, label in enumerate(labels):
+        print(i, label)
+
+    assert mask.tolist() == [False, True, True, True, True, False]
+    assert labels[1] == "amount: below min (-5.00 < 0); account: pattern mismatch; date: below min (2023-12-31 < 2024-01-01)"
+    assert labels[2] == "amount: above max (6000.00 > 5000); currency: not in allowed values; qty: not integer"
+    assert labels[3] == "amount: missing; date: not date"
+    assert labels[4] == "amount: not number"
+    assert labels[5] == ""
+
+    matrix = summary.set_index("column")
+    assert matrix.loc["amount", ["required", "type", "min", "max", "rows_failed"]].tolist() == [1, 1, 1, 1, 4]
+    assert matrix.loc["currency", "allowed"] == 1
+    assert matrix.loc["qty", "type"] == 1
+    assert bool(matrix.loc["missing", "missing_column"])
+
+    for bad in ["{}", "[1]", '{"a": {"between": 1}}', '{"a": {"type": "uuid"}}', "not json"]:
+        with pytest.raises(ValueError):
+            parse_spec(bad)
+    print("✅ 测试通过")
+
+
+def test_validator_multi_column_mode(tmp_path):
+    """测试节点的多列模式输出、单列模式违规说明不变，以及分区执行时汇总矩阵相加"""
+    print("\n=== Test 2: 节点多列模式 ===")
+    validator = ExcelColumnValidator()
+    outliers, report, summary = validator.execute_validation(ledger(), validation_spec=json.dumps(SPEC))
+    print(report)
+    assert outliers.index.tolist() == [1, 2, 3, 4]
+    assert "violation_type" in outliers.columns
+    assert "missing: column not found" in report
+    assert len(summary) == len(SPEC)
+
+    single, _, _ = validator.execute_validation(pd.DataFrame({"amount": [-1.0, 50.0, 2000.0]}), "amount", 0, 1000)
+    assert single["violation_type"].tolist() == ["Below min (-1.00 < 0.00)", "Above max (2000.00 > 1000.00)"]
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"amount": rng.normal(0, 1000, 1000), "currency": rng.choice(["CNY", "EUR"], 1000)})
+    path = tmp_path / "ledger.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=100)
+    spec = '{"amount": {"min": 0}, "currency": {"allowed": ["CNY"]}}'
+    parted_outliers, _, parted_summary = run_rowwise(
+        validator.execute_validation, ExcelColumnValidator,
+        {"validation_spec": spec}, "dataframe",
+        DatasetHandle(str(path), partition_rows=300), str(tmp_path / "out"),
+    )
+    _, _, expected = validator.execute_validation(df, validation_spec=spec)
+    assert parted_outliers.num_rows == int(((df["amount"] < 0) | (df["currency"] != "CNY")).sum())
+    pd.testing.assert_frame_equal(parted_summary, expected, check_dtype=False)
+    print("✅ 测试通过")
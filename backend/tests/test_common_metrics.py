@@ -0,0 +1,87 @@
+"""
+通用指标测试
+验证一次聚合的整体指标、分位数（分区合并后由草图估计）、按实体/期间分组指标，
+以及场景指标复用分组指标
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.dataset import DatasetHandle
+from app.core.out_of_core import run_aggregate
+from app.nodes.audit_nodes import CommonMetricsNode, SceneMetricsNode
+
+
+def ledger(rows: int = 5000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    amount = rng.lognormal(7, 1, rows)
+    amount[::97] = np.nan
+    return pd.DataFrame({
+        "vendor": rng.choice(["甲公司", "乙公司", "丙公司"], rows),
+        "employee_id": rng.integers(0, 20, rows),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "amount": amount,
+    })
+
+
+def test_metrics_quantiles_and_groups(tmp_path):
+    """测试整体指标与 pandas 一致、分区执行时分位数估计和分组指标合并"""
+    print("\n=== Test 1: 指标、分位数与分组 ===")
+    df = ledger()
+    node = CommonMetricsNode()
+    metrics, groups = node.calculate_metrics(df, group_by="vendor", period_column="date", period="Q",
+                                             quantiles="0.25, 0.95")
+    print(groups.head())
+    amount = df["amount"]
+    assert metrics["record_count"] == len(df)
+    assert metrics["amount_median"] == pytest.approx(amount.median())
+    assert metrics["amount_p95"] == pytest.approx(amount.quantile(0.95))
+    assert metrics["amount_std"] == pytest.approx(amount.std())
+
+    expected = df.assign(date_period=df["date"].dt.to_period("Q").astype(str)).groupby(["vendor", "date_period"])
+    assert len(groups) == 12
+    assert groups["record_count"].tolist() == expected.size().tolist()
+    assert groups["amount_sum"].to_numpy() == pytest.approx(expected["amount"].sum().to_numpy())
+    assert groups["amount_std"].to_numpy() == pytest.approx(expected["amount"].std().to_numpy())
+    assert "employee_id_sum" in groups.columns
+
+    path = tmp_path / "ledger.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=700)
+    inputs = {"group_by": "vendor", "period_column": "date", "period": "Q", "quantiles": "0.25,0.95"}
+    merged, merged_groups = run_aggregate(node, inputs, "dataframe", DatasetHandle(str(path), partition_rows=700))
+    for key in ("amount_sum", "amount_mean", "amount_std", "amount_min", "amount_max"):
+        assert merged[key] == pytest.approx(metrics[key]), key
+    # 分位数由草图估计（值未超过压缩参数时仍为精确值）
+    for key in ("amount_median", "amount_p25", "amount_p95"):
+        assert merged[key] == pytest.approx(metrics[key], rel=0.02), key
+    pd.testing.assert_frame_equal(merged_groups, groups, check_dtype=False)
+
+    metrics, groups = node.calculate_metrics(df)
+    assert "amount_p95" not in metrics and groups.empty
+    for bad in [{"group_by": "missing"}, {"quantiles": "1.5"}, {"period_column": "date", "period": "H"}]:
+        with pytest.raises(ValueError):
+            node.calculate_metrics(df, **bad)
+    print("✅ 测试通过")
+
+
+def test_scene_metrics_reuse_group_metrics():
+    """测试场景指标直接使用通用指标的分组结果，与自行分组计算一致"""
+    print("\n=== Test 2: 场景指标复用分组 ===")
+    df = ledger()
+    scene = SceneMetricsNode()
+    for business_scene, key in [("travel_audit", "employee_id"), ("invoice_audit", "vendor")]:
+        _, groups = CommonMetricsNode().calculate_metrics(df, group_by=key)
+        assert scene.partial_aggregate(df, business_scene, None, groups) == {}
+        (reused,) = scene.calculate_scene_metrics(df, business_scene, group_metrics=groups)
+        (direct,) = scene.calculate_scene_metrics(df, business_scene)
+        print(business_scene, reused)
+        assert reused.keys() == direct.keys() and reused
+        for name, value in direct.items():
+            assert reused[name] == (value if isinstance(value, str) else pytest.approx(value))
+
+    # 按期间细分的分组（同一供应商多行）不能直接复用，回退到自行分组
+    _, by_period = CommonMetricsNode().calculate_metrics(df, group_by="vendor", period_column="date")
+    assert list(scene.partial_aggregate(df, "invoice_audit", None, by_period)) == [("vendor",)]
+    print("✅ 测试通过")
@@ -0,0 +1,105 @@
+"""
+多文件 / 多 sheet 合并加载测试
+验证 schema 并集与 dtype 统一、来源列、多进程读取，以及流式分片输出
+"""
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from app.core.config import settings
+from app.core.consolidate import consolidate, consolidate_to_dataset, expand_sources, reconcile_dtype
+from app.core.dataset import DatasetHandle, materialize
+from app.nodes.file_nodes import ConsolidationLoader
+
+
+@pytest.fixture
+def ledgers(tmp_path):
+    """三个月的台账：2 月凭证号变为文本、缺少备注列，3 月金额为整数"""
+    jan = pd.DataFrame({"凭证号": [1001, 1002], "金额": [100.5, 200.0], "备注": ["a", None]})
+    feb = pd.DataFrame({"凭证号": ["B-01", "1003"], "金额": [50.25, 60.0]})
+    mar = pd.DataFrame({"凭证号": [1004], "金额": [300], "备注": ["c"]})
+    paths = []
+    for name, df in (("2024-01", jan), ("2024-02", feb), ("2024-03", mar)):
+        path = tmp_path / f"{name}.xlsx"
+        df.to_excel(path, index=False)
+        paths.append(str(path))
+
+    workbook = tmp_path / "q1.xlsx"
+    with pd.ExcelWriter(workbook) as writer:
+        jan.to_excel(writer, sheet_name="1月", index=False)
+        mar.to_excel(writer, sheet_name="3月", index=False)
+    return paths, str(workbook)
+
+
+def test_reconcile_dtype():
+    """测试 dtype 统一规则"""
+    assert reconcile_dtype(["int64", "int64"]) == "int64"
+    assert reconcile_dtype(["int64", None]) == "float64"
+    assert reconcile_dtype(["int64", "float64"]) == "float64"
+    assert reconcile_dtype(["datetime64[s]", "datetime64[ns]"]) == "datetime64[ns]"
+    assert reconcile_dtype(["int64", "object"]) == "string"
+    assert reconcile_dtype(["bool", None]) == "object"
+
+
+def test_consolidate_files_in_parallel(tmp_path, ledgers, monkeypatch):
+    """测试多个工作簿在多进程中读取，列取并集、dtype 统一并添加来源文件列"""
+    print("\n=== Test 1: 多文件合并 ===")
+    monkeypatch.setattr(settings, "INGEST_ENABLED", False)
+    # 进程数受 CPU 核数限制，单核环境下也走进程池
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    paths, _ = ledgers
+
+    df = consolidate(expand_sources(paths), max_workers=2)
+    print(df)
+
+    assert list(df.columns) == ["凭证号", "金额", "备注", "source_file"]
+    assert df["凭证号"].tolist() == ["1001", "1002", "B-01", "1003", "1004"]
+    assert str(df["金额"].dtype) == "float64"
+    assert df["备注"].isna().tolist() == [False, True, True, True, False]
+    assert df["source_file"].tolist() == ["2024-01.xlsx"] * 2 + ["2024-02.xlsx"] * 2 + ["2024-03.xlsx"]
+
+    # 单进程结果一致
+    pd.testing.assert_frame_equal(consolidate(expand_sources(paths), max_workers=1), df)
+    print("✅ 测试通过")
+
+
+def test_consolidate_sheets_and_dataset(tmp_path, ledgers, monkeypatch):
+    """测试读取全部 sheet（来源 sheet 列），以及流式分片输出与内存合并一致"""
+    print("\n=== Test 2: 多 sheet 与分片输出 ===")
+    monkeypatch.setattr(settings, "INGEST_ENABLED", False)
+    paths, workbook = ledgers
+
+    sheets = consolidate(expand_sources([workbook], ["*"]), max_workers=1, add_sheet_column=True)
+    assert sheets["source_sheet"].tolist() == ["1月", "1月", "3月"]
+    assert str(sheets["凭证号"].dtype) == "int64"
+
+    result = consolidate_to_dataset(expand_sources(paths), str(tmp_path / "dataset"), max_workers=1)
+    assert result["rows"] == 5 and result["parts"] == 3
+    table = ds.dataset(result["path"], format="parquet").to_table()
+    pd.testing.assert_frame_equal(table.to_pandas(), consolidate(expand_sources(paths), max_workers=1))
+    print("✅ 测试通过")
+
+
+def test_consolidation_loader_node(tmp_path, ledgers, monkeypatch):
+    """测试节点按 glob 匹配文件，流式模式复用分片目录"""
+    print("\n=== Test 3: ConsolidationLoader 节点 ===")
+    monkeypatch.setattr(settings, "INGEST_ENABLED", False)
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    monkeypatch.chdir(tmp_path)
+    node = ConsolidationLoader()
+
+    df, dataset_path = node.load_consolidated("2024-*.xlsx", max_workers=1)
+    assert len(df) == 5 and dataset_path == ""
+
+    handle, dataset_path = node.load_consolidated("2024-*.xlsx", max_workers=1, mode="streaming")
+    assert isinstance(handle, DatasetHandle) and handle.partition_rows is None
+    streamed = materialize(handle)
+    assert len(streamed) == 5 and "source_file" in streamed.columns
+    _, again = node.load_consolidated("2024-*.xlsx", max_workers=1, mode="streaming")
+    assert again == dataset_path
+
+    with pytest.raises(FileNotFoundError):
+        node.load_consolidated("1999-*.xlsx")
+    print("✅ 测试通过")
@@ -0,0 +1,127 @@
+"""
+CSV 加载测试
+验证编码识别、显式列类型、列投影，以及流式写入 Parquet 与内存读取结果一致，
+直接解析 CSV 时与 Excel 相同的 usecols / nrows 语义
+"""
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.config import settings
+from app.core.csv_reader import detect_encoding, read_csv, stream_csv_to_parquet
+from app.core.dataset import DatasetHandle, materialize
+from app.nodes.file_nodes import CsvLoader, read_tabular_file
+
+ROWS = [
+    "账号,户名,金额,日期",
+    "0012345,北京甲科技有限公司,100.5,2024-01-01",
+    "0067890,上海乙贸易有限公司,,2024-01-02",
+    "0099999,深圳丙电子有限公司,300,2024-01-03",
+]
+
+
+@pytest.fixture
+def gbk_csv(tmp_path):
+    path = tmp_path / "bank_gbk.csv"
+    path.write_bytes("\n".join(ROWS).encode("gbk"))
+    return str(path)
+
+
+def test_detect_encoding(tmp_path, gbk_csv):
+    """测试 GBK / UTF-8 / 带 BOM 的 UTF-8 识别"""
+    print("\n=== Test 1: 编码识别 ===")
+    utf8 = tmp_path / "utf8.csv"
+    utf8.write_text("\n".join(ROWS), encoding="utf-8")
+    bom = tmp_path / "bom.csv"
+    bom.write_text("\n".join(ROWS), encoding="utf-8-sig")
+
+    assert detect_encoding(gbk_csv) == "gb18030"
+    assert detect_encoding(str(utf8)) == "utf-8"
+    assert detect_encoding(str(bom)) == "utf-8-sig"
+    assert read_csv(str(bom)).column_names[0] == "账号"
+    print("✅ 测试通过")
+
+
+def test_dtypes_and_projection(gbk_csv):
+    """测试显式列类型保留前导 0，列投影只返回指定列"""
+    print("\n=== Test 2: 列类型与列投影 ===")
+    table = read_csv(gbk_csv, columns=["账号", "金额"], dtypes={"账号": "string"})
+    df = table.to_pandas()
+    print(df)
+
+    assert list(df.columns) == ["账号", "金额"]
+    assert df["账号"].tolist() == ["0012345", "0067890", "0099999"]
+    assert pd.isna(df["金额"][1])
+
+    with pytest.raises(ValueError):
+        read_csv(gbk_csv, dtypes={"账号": "decimal"})
+    print("✅ 测试通过")
+
+
+def test_streaming_matches_memory(tmp_path, gbk_csv):
+    """测试按小块流式写入 Parquet 的结果与一次性读取一致"""
+    print("\n=== Test 3: 流式写入 ===")
+    output = str(tmp_path / "out.parquet")
+    result = stream_csv_to_parquet(gbk_csv, output, dtypes={"账号": "string", "金额": "float64"}, block_size=64)
+
+    assert result["rows"] == 3
+    streamed = pq.read_table(output).to_pandas()
+    in_memory = read_csv(gbk_csv, dtypes={"账号": "string", "金额": "float64"}).to_pandas()
+    pd.testing.assert_frame_equal(streamed, in_memory)
+    print("✅ 测试通过")
+
+
+def test_csv_loader_node(tmp_path, gbk_csv, monkeypatch):
+    """测试 CsvLoader 节点的内存模式与流式模式（相同参数复用已写出的 Parquet）"""
+    print("\n=== Test 4: CsvLoader 节点 ===")
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    node = CsvLoader()
+
+    df, parquet_path = node.load_csv(gbk_csv, columns="账号,日期", dtypes='{"账号": "string"}')
+    assert parquet_path == ""
+    assert df["账号"].tolist()[0] == "0012345"
+    assert str(df["日期"].dtype).startswith("datetime64")
+
+    # 流式模式输出数据集句柄，需要 DataFrame 的下游节点物化后得到全部数据
+    handle, parquet_path = node.load_csv(gbk_csv, dtypes='{"账号": "string"}', mode="streaming")
+    assert isinstance(handle, DatasetHandle) and handle.partition_rows is None and handle.path == parquet_path
+    assert pq.read_metadata(parquet_path).num_rows == 3
+    streamed = materialize(handle, ["账号", "日期"])
+    pd.testing.assert_frame_equal(streamed, df)
+
+    _, again = node.load_csv(gbk_csv, dtypes='{"账号": "string"}', mode="streaming")
+    assert again == parquet_path
+
+    with pytest.raises(ValueError):
+        node.load_csv(gbk_csv, dtypes="{not json")
+    print("✅ 测试通过")
+
+
+def test_csv_loader_projection(gbk_csv):
+    """测试执行计划下推的投影：只转换表头中存在的列，用户指定的 columns 优先"""
+    print("\n=== Test 5: CsvLoader 投影 ===")
+    node = CsvLoader()
+
+    df, _ = node.load_csv(gbk_csv, dtypes='{"账号": "string", "户名": "string"}', projection=["金额", "账号", "不存在"])
+    assert list(df.columns) == ["账号", "金额"]
+    assert df["账号"].tolist()[0] == "0012345"
+
+    df, _ = node.load_csv(gbk_csv, columns="户名", projection=["金额"])
+    assert list(df.columns) == ["户名"]
+    print("✅ 测试通过")
+
+
+def test_read_tabular_csv_usecols_nrows(gbk_csv, monkeypatch):
+    """测试直接解析 CSV：usecols 与 Excel 相同（列名或列字母范围），nrows 只读前几行"""
+    print("\n=== Test 6: CSV 部分读取 ===")
+    monkeypatch.setattr(settings, "INGEST_ENABLED", False)
+
+    df = read_tabular_file(gbk_csv, usecols="户名,金额", nrows=2)
+    print(df)
+    assert list(df.columns) == ["户名", "金额"] and len(df) == 2
+
+    df = read_tabular_file(gbk_csv, usecols="A:A,C:D", nrows=1)
+    assert list(df.columns) == ["账号", "金额", "日期"] and len(df) == 1
+
+    assert len(read_tabular_file(gbk_csv)) == len(ROWS) - 1
+    print("✅ 测试通过")
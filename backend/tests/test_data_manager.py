@@ -0,0 +1,201 @@
+"""
+DataManager 缓存测试
+验证 Parquet 冷层与进程内 LRU 热层的读写、淘汰和失效
+"""
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.api import project_routes
+from app.core.config import settings
+from app.core.data_manager import DataManager
+from app.core.lru_cache import ByteLRUCache
+
+
+def _make_df(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({
+        "amount": [float(i) for i in range(rows)],
+        "vendor": [f"V{i % 7}" for i in range(rows)],
+    })
+
+
+def test_lru_eviction_by_bytes():
+    """测试按字节容量淘汰最久未使用的条目"""
+    print("\n=== Test 1: LRU 字节容量淘汰 ===")
+
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # a 变为最近使用
+
+    cache.put("c", b"12345")  # 超出容量，应淘汰 b
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+
+    # 单个条目超过上限时不写入，也不清空已有条目
+    assert cache.put("huge", b"x" * 11) is False
+    assert len(cache) == 2
+
+    stats = cache.stats()
+    print(f"统计: {stats}")
+    assert stats["evictions"] == 1
+    assert stats["current_bytes"] == 10
+    print("✅ 测试通过")
+
+
+def test_load_hits_memory_tier(tmp_path):
+    """测试写入后读取命中内存热层，且结果与原数据一致"""
+    print("\n=== Test 2: 热层命中 ===")
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=64 * 1024 * 1024)
+    df = _make_df()
+    path = manager.save_intermediate("run1", "n1", df, 0)
+
+    loaded = manager.load_intermediate(path)
+    pd.testing.assert_frame_equal(loaded, df)
+    assert manager.memory_cache.stats()["hits"] == 1
+
+    # 修改返回的 DataFrame 不应影响缓存中的数据
+    loaded["amount"] = 0.0
+    pd.testing.assert_frame_equal(manager.load_intermediate(path), df)
+    print("✅ 测试通过")
+
+
+def test_miss_falls_back_to_parquet(tmp_path):
+    """测试热层未命中时从 Parquet 读取并回填"""
+    print("\n=== Test 3: 冷层回填 ===")
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=64 * 1024 * 1024)
+    df = _make_df()
+    path = manager.save_intermediate("run1", "n1", df, 0)
+    manager.memory_cache.clear()
+
+    pd.testing.assert_frame_equal(manager.load_intermediate(path), df)
+    stats = manager.memory_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+    manager.load_intermediate(path)
+    assert manager.memory_cache.stats()["hits"] == 1
+    print("✅ 测试通过")
+
+
+def test_cleanup_invalidates_memory_tier(tmp_path):
+    """测试清理运行缓存时同时使内存热层失效"""
+    print("\n=== Test 4: 删除运行时失效 ===")
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=64 * 1024 * 1024)
+    path_a = manager.save_intermediate("run_a", "n1", _make_df(), 0)
+    path_b = manager.save_intermediate("run_b", "n1", _make_df(), 0)
+
+    manager.cleanup("run_a")
+
+    assert not os.path.exists(path_a)
+    assert manager.load_intermediate(path_a) is None
+    assert len(manager.memory_cache) == 1
+    assert manager.load_intermediate(path_b) is not None
+    print("✅ 测试通过")
+
+
+def test_delete_run_rejects_path_traversal(tmp_path, monkeypatch):
+    """测试删除运行：run_id 为 ".."、"." 或含路径分隔符时拒绝，不删除项目目录"""
+    print("\n=== Test 4b: 删除运行的路径校验 ===")
+    from app.core.project_manager import ProjectManager
+
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    projects = ProjectManager()
+    monkeypatch.setattr(project_routes, "project_manager", projects)
+    project_id = projects.create_project("删除测试").id
+    run_dir = projects.get_run_dir(project_id, "run_1")
+    project_dir = os.path.dirname(os.path.dirname(run_dir))
+    # 指向项目目录的符号链接也不能被当作运行目录删除
+    os.symlink(project_dir, os.path.join(project_dir, "runs", "link"))
+
+    for run_id in ("..", ".", "", "../runs", "link"):
+        assert not projects.delete_run(project_id, run_id)
+    for run_id in ("..", "."):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(project_routes.delete_run(project_id, run_id, None))
+        assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        asyncio.run(project_routes.delete_run("..", "runs", None))
+    assert os.path.isdir(project_dir) and os.path.isdir(run_dir)
+
+    assert asyncio.run(project_routes.delete_run(project_id, "run_1", None))["status"] == "success"
+    assert not os.path.exists(run_dir) and os.path.isdir(project_dir)
+    print("✅ 测试通过")
+
+
+def test_write_policy_row_groups_and_sort(tmp_path):
+    """测试写入策略：row group 切分、排序、压缩编码与统计信息"""
+    print("\n=== Test 5: Parquet 写入策略 ===")
+
+    import pyarrow.parquet as pq
+    from app.core.data_manager import ParquetWritePolicy, SORT_BY_METADATA_KEY
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    df = _make_df(1000).sample(frac=1.0, random_state=0)
+    policy = ParquetWritePolicy(row_group_size=250, compression="lz4", sort_by=["amount"])
+    path = manager.save_intermediate("run1", "n1", df, 0, write_policy=policy)
+
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    assert metadata.num_row_groups == 4
+    assert metadata.row_group(0).column(0).compression == "LZ4"
+    assert parquet_file.schema_arrow.metadata[SORT_BY_METADATA_KEY] == b"amount"
+
+    # 排序后各 row group 的 min/max 不重叠，可用于裁剪
+    stats = [metadata.row_group(i).column(0).statistics for i in range(4)]
+    assert all(s.has_min_max for s in stats)
+    assert all(stats[i].max < stats[i + 1].min for i in range(3))
+
+    # 低基数字符串列使用字典编码
+    vendor_encodings = metadata.row_group(0).column(1).encodings
+    assert any("DICTIONARY" in e for e in vendor_encodings)
+
+    loaded = manager.load_intermediate(path)
+    assert loaded["amount"].is_monotonic_increasing
+    print("✅ 测试通过")
+
+
+def test_write_policy_rejects_unknown_codec():
+    """测试不支持的压缩编码会被拒绝"""
+    from app.core.data_manager import ParquetWritePolicy
+
+    try:
+        ParquetWritePolicy(compression="lzma")
+    except ValueError as e:
+        assert "lzma" in str(e)
+    else:
+        raise AssertionError("unknown codec should raise ValueError")
+
+    policy = ParquetWritePolicy.from_dict({"sort_by": "date, account", "unknown": 1})
+    assert policy.sort_by == ["date", "account"]
+
+
+def test_read_head_reads_only_needed_row_groups(tmp_path):
+    """测试预览读取：行数来自 footer，只读取前 N 行所需的 row group 和列"""
+    print("\n=== Test 6: 按 row group 读取前 N 行 ===")
+
+    from app.core.data_manager import ParquetWritePolicy
+
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    df = _make_df(1000)
+    policy = ParquetWritePolicy(row_group_size=100)
+    path = manager.save_intermediate("run1", "n1", df, 0, write_policy=policy)
+
+    metadata = manager.read_metadata(path)
+    assert metadata.num_rows == 1000
+    assert metadata.num_row_groups == 10
+
+    head = manager.read_head(path, 150, columns=["vendor"])
+    assert head.num_rows == 150
+    assert head.column_names == ["vendor"]
+    assert head.column("vendor").to_pylist() == df["vendor"].head(150).tolist()
+
+    empty = manager.read_head(path, 0)
+    assert empty.num_rows == 0 and empty.column_names == ["amount", "vendor"]
+    print("✅ 测试通过")
@@ -0,0 +1,105 @@
+"""
+数据集句柄测试
+验证句柄不读取数据即可得到 schema/行数，列选择与过滤下推到扫描，
+Arrow 节点直接处理句柄，需要 DataFrame 的节点只物化用到的列
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.data_manager import DataManager
+from app.core.dataset import DatasetHandle, materialize
+from app.core.executor import PromptExecutor
+from app.nodes.audit_nodes import ExcelColumnValidator
+from app.nodes.dataset_nodes import DatasetAggregateNode, DatasetFilterNode, DatasetLoader
+
+
+@pytest.fixture
+def ledger_parquet(tmp_path):
+    path = tmp_path / "ledger.parquet"
+    table = pa.table({
+        "凭证号": list(range(1, 1001)),
+        "科目": ["管理费用", "销售费用", "财务费用", "管理费用"] * 250,
+        "金额": [float(i) for i in range(1, 1001)],
+        "日期": pd.date_range("2024-01-01", periods=1000, freq="h"),
+    })
+    pq.write_table(table, path, row_group_size=100)
+    return str(path)
+
+
+def test_handle_metadata_and_lazy_ops(ledger_parquet):
+    """测试 schema/行数、select/filter 惰性组合与物化"""
+    print("\n=== Test 1: 数据集句柄 ===")
+    handle = DatasetHandle(ledger_parquet)
+    assert handle.num_rows == 1000
+    assert handle.column_names == ["凭证号", "科目", "金额", "日期"]
+    assert handle.is_plain_file
+
+    subset = handle.select(["科目", "金额"]).filter(ds.field("金额") > 900).filter(ds.field("科目") == "管理费用")
+    assert not subset.is_plain_file
+    assert subset.column_names == ["科目", "金额"]
+    assert subset.num_rows == 50
+    df = subset.to_pandas()
+    assert list(df.columns) == ["科目", "金额"] and (df["金额"] > 900).all()
+    # 原句柄不受影响
+    assert handle.num_rows == 1000
+
+    assert list(materialize(handle, ["金额", "不存在"]).columns) == ["金额"]
+    assert str(handle.head(3)["日期"].dtype).startswith("datetime64")
+
+    with pytest.raises(ValueError):
+        handle.select(["不存在"])
+    with pytest.raises(FileNotFoundError):
+        DatasetHandle(ledger_parquet + ".missing")
+    print("✅ 测试通过")
+
+
+def test_arrow_nodes(ledger_parquet):
+    """测试数据集加载（投影）、过滤、聚合节点全程不经过 pandas"""
+    print("\n=== Test 2: 数据集节点 ===")
+    handle, info = DatasetLoader().load_dataset(ledger_parquet, projection=["科目", "金额"])
+    assert handle.column_names == ["科目", "金额"]
+    assert info.startswith("1000 rows")
+
+    filtered, count = DatasetFilterNode().filter_dataset(handle, "科目", "in", "管理费用,财务费用")
+    assert count == 750
+    (summary,) = DatasetAggregateNode().aggregate_dataset(filtered, "金额:sum,金额:count", group_by="科目")
+    table = summary.to_table().sort_by("科目")
+    print(table.to_pandas())
+    assert table.column_names == ["科目", "金额_sum", "金额_count"]
+    assert table.column("科目").to_pylist() == ["管理费用", "财务费用"]
+    assert table.column("金额_count").to_pylist() == [500, 250]
+
+    (_, cnt) = DatasetFilterNode().filter_dataset(handle, "金额", ">=", "999.5")
+    assert cnt == 1
+    with pytest.raises(ValueError):
+        DatasetFilterNode().filter_dataset(handle, "金额", ">", "abc")
+    print("✅ 测试通过")
+
+
+def test_executor_materializes_for_dataframe_nodes(tmp_path, ledger_parquet):
+    """测试执行器：DATAFRAME 输入只物化所需列，DATASET 输入直接传递；磁盘数据集缓存时不复制"""
+    print("\n=== Test 3: 执行器物化 ===")
+    executor = PromptExecutor()
+    handle = DatasetHandle(ledger_parquet)
+
+    inputs = executor._validate_and_convert_inputs(
+        {"dataframe": handle, "column_name": "金额"}, ExcelColumnValidator, "ExcelColumnValidator",
+        input_columns={"dataframe": ["金额", "凭证号"]}
+    )
+    assert isinstance(inputs["dataframe"], pd.DataFrame)
+    assert list(inputs["dataframe"].columns) == ["凭证号", "金额"]
+
+    inputs = executor._validate_and_convert_inputs(
+        {"dataset": pd.DataFrame({"a": [1]}), "column": "a"}, DatasetFilterNode, "DatasetFilterNode"
+    )
+    assert isinstance(inputs["dataset"], DatasetHandle)
+
+    manager = DataManager(cache_dir=str(tmp_path / "cache"))
+    assert manager.save_intermediate("run", "n1", handle) == ledger_parquet
+    path = manager.save_intermediate("run", "n2", handle.filter(ds.field("金额") <= 10))
+    assert pq.read_metadata(path).num_rows == 10
+    executor.shutdown()
+    print("✅ 测试通过")
@@ -0,0 +1,115 @@
+"""
+dtype 压缩测试
+验证文本/日期/整数列的类型选择、数据不变、内存报告，以及压缩后的 DataFrame 可直接交给已有节点处理
+（包括向 category / string 列填充空值）
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.core.data_manager import DataManager
+from app.core.dtype_optimizer import compact_dtypes, compact_outputs
+from app.nodes.audit_nodes import ExcelColumnValidator
+from app.nodes.clean_nodes import ColumnMapperNode, DtypeOptimizerNode, NullValueCleanerNode
+
+ROWS = 200
+
+
+def ledger() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "凭证号": np.arange(1000, 1000 + ROWS),
+        "科目": rng.choice(["管理费用", "销售费用", "财务费用"], ROWS),
+        "摘要": [f"报销单 {i}" for i in range(ROWS)],
+        "日期": [None if i % 10 == 0 else f"2024年1月{i % 28 + 1}日" for i in range(ROWS)],
+        "记账日": [datetime.date(2024, 1, i % 28 + 1) for i in range(ROWS)],
+        "金额": rng.random(ROWS) * 10000,
+        "编号": [1, "A-2"] * (ROWS // 2),
+    })
+
+
+def test_compact_dtypes():
+    """测试每类列的目标类型，值保持不变"""
+    print("\n=== Test 1: dtype 压缩 ===")
+    df = ledger()
+    compacted, report = compact_dtypes(df, category_max_ratio=0.5)
+    print(compacted.dtypes)
+    print(report)
+
+    assert str(compacted["凭证号"].dtype) == "int16"
+    assert str(compacted["科目"].dtype) == "category"
+    assert str(compacted["摘要"].dtype) == "string"
+    assert str(compacted["日期"].dtype) == "datetime64[ns]"
+    assert str(compacted["记账日"].dtype) == "datetime64[ns]"
+    assert compacted["金额"].dtype == np.float64
+    assert compacted["编号"].dtype == object
+    assert set(report["columns"]) == {"凭证号", "科目", "摘要", "日期", "记账日"}
+
+    assert compacted["日期"].isna().sum() == ROWS // 10
+    assert compacted["日期"][1] == pd.Timestamp("2024-01-02")
+    assert compacted["科目"].astype(str).tolist() == df["科目"].tolist()
+    assert compacted["凭证号"].tolist() == df["凭证号"].tolist()
+    assert report["memory_after"] < report["memory_before"] / 2
+    # 原 DataFrame 不被修改
+    assert df["科目"].dtype == object
+    # 默认不转换 category
+    assert str(compact_dtypes(df)[0]["科目"].dtype) == "string"
+    print("✅ 测试通过")
+
+
+def test_nodes_accept_compacted_frames(tmp_path):
+    """测试压缩后的 DataFrame 经过映射、校验节点和 Parquet 缓存，结果与未压缩时一致"""
+    print("\n=== Test 2: 下游节点兼容 ===")
+    df = ledger()
+    (compacted,), reports = compact_outputs((df,), category_max_ratio=0.5)
+    assert reports[0]["saved_bytes"] > 0
+
+    def run(frame):
+        mapped, _ = ColumnMapperNode().process_columns(frame, '{"科目": "account", "金额": "amount"}', True)
+        outliers, _, _ = ExcelColumnValidator().execute_validation(mapped, "amount", 0, 5000)
+        return mapped, outliers
+
+    mapped, outliers = run(compacted)
+    expected_mapped, expected_outliers = run(df)
+    assert len(outliers) == len(expected_outliers)
+    assert mapped["account"].astype(str).tolist() == expected_mapped["account"].tolist()
+
+    manager = DataManager(cache_dir=str(tmp_path))
+    path = manager.save_intermediate("run", "node", compacted.drop(columns=["编号"]))
+    restored = manager.load_intermediate(path)
+    assert str(restored["科目"].dtype) == "category"
+    assert restored["摘要"].tolist() == df["摘要"].tolist()
+    print("✅ 测试通过")
+
+
+def test_optimizer_node_report():
+    """测试 DtypeOptimizerNode 输出报告"""
+    print("\n=== Test 3: DtypeOptimizerNode ===")
+    optimized, report = DtypeOptimizerNode().optimize_dtypes(ledger(), category_max_ratio=0.0, parse_dates=False)
+    print(report)
+
+    assert str(optimized["科目"].dtype) == "string"
+    assert optimized["日期"].dtype != "datetime64[ns]"
+    assert "Saved:" in report and "科目: object -> string" in report
+    print("✅ 测试通过")
+
+
+def test_null_cleaner_on_compacted_frames():
+    """测试向压缩后的 category / string 列填充空值，结果与未压缩时一致"""
+    print("\n=== Test 4: 压缩后填充空值 ===")
+    df = ledger()
+    df.loc[::7, ["科目", "摘要"]] = None
+    df.loc[::9, "金额"] = np.nan
+    cleaner = NullValueCleanerNode()
+    for ratio in (0.0, 0.5):
+        compacted, _ = compact_dtypes(df, category_max_ratio=ratio)
+        print(compacted.dtypes.to_dict())
+        for strategy, value in (("fill_zero", 0), ("fill_custom", "未知"), ("fill_custom", 0)):
+            cleaned, _ = cleaner.clean_nulls(compacted, "科目,摘要,金额", strategy, value)
+            expected, _ = cleaner.clean_nulls(df, "科目,摘要,金额", strategy, value)
+            assert cleaned[["科目", "摘要", "金额"]].notna().all().all()
+            for col in ("科目", "摘要"):
+                assert cleaned[col].astype(object).tolist() == expected[col].tolist()
+            assert cleaned["金额"].tolist() == expected["金额"].tolist()
+    print("✅ 测试通过")
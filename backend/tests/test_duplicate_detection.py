@@ -0,0 +1,98 @@
+"""
+重复交易检测测试
+验证哈希索引上的完全重复、窗口内疑似重复与逐对比较结果一致，
+以及按项目保存的历史索引增量比对（同一期间重复运行不重复计入）
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.duplicates import DuplicateIndex, hash_rows
+from app.nodes.audit_nodes import DuplicateDetectionNode
+
+
+def payments(rows: int = 2000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "vendor": rng.choice(["甲公司", "乙公司", "丙公司", "丁公司"], rows),
+        "amount": rng.choice([100.0, 250.5, 999.99, 1200.0, 5000.0], rows),
+        "invoice_no": [f"INV{i:05d}" for i in rng.integers(0, rows * 5, rows)],
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90, rows), unit="D"),
+    })
+    df.loc[5, "invoice_no"] = None
+    return df
+
+
+def test_exact_and_near_duplicates():
+    """测试完全重复与疑似重复：与按定义逐组计算的结果一致"""
+    print("\n=== Test 1: 完全重复与疑似重复 ===")
+    df = payments()
+    df = pd.concat([df, df.iloc[[1, 2, 3]]], ignore_index=True)
+    df.loc[len(df) - 1, "vendor"] = " " + df.loc[len(df) - 1, "vendor"] + " "
+
+    duplicates, count, report = DuplicateDetectionNode().detect(df, date_column="date", window_days=3)
+    print(report)
+    keys = ["vendor", "amount", "invoice_no"]
+    normalized = df.assign(vendor=df["vendor"].str.strip())
+    expected_exact = normalized.dropna(subset=keys).duplicated(keys, keep=False)
+    exact = duplicates[duplicates["duplicate_type"] == "exact"]
+    assert sorted(exact.index) == sorted(expected_exact[expected_exact].index)
+    assert (df.loc[exact["matched_with"].astype(int), "invoice_no"].to_numpy() == exact["invoice_no"].to_numpy()).all()
+
+    # 疑似重复：同供应商同金额且存在另一行日期相差不超过 3 天（且不是完全重复）
+    near = duplicates[duplicates["duplicate_type"] == "near"]
+    near_expected = set()
+    for _, group in normalized.groupby(["vendor", "amount"]):
+        days = group["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        order = np.argsort(days, kind="stable")
+        gaps = np.diff(days[order])
+        linked = np.zeros(len(group), dtype=bool)
+        linked[order[1:]] |= gaps <= 3
+        linked[order[:-1]] |= gaps <= 3
+        near_expected |= set(group.index[linked])
+    assert set(near.index) == near_expected - set(exact.index)
+    assert (near["days_apart"] <= 3).all()
+    assert count == len(duplicates) and 5 not in exact.index
+
+    hashes, valid = hash_rows(df.assign(amount=df["amount"].astype("float32")), keys)
+    assert valid.sum() == len(df) - 1
+    with pytest.raises(ValueError):
+        DuplicateDetectionNode().detect(df, key_columns="missing")
+    print("✅ 测试通过")
+
+
+def test_history_index_incremental(tmp_path):
+    """测试历史索引：新期间与之前期间比对，同一期间重复运行替换该期间的索引"""
+    print("\n=== Test 2: 历史索引增量比对 ===")
+    node = DuplicateDetectionNode()
+    q1 = payments(500, seed=1)
+    q2 = payments(300, seed=2)
+    q2.loc[:9, ["vendor", "amount", "invoice_no"]] = q1.loc[:9, ["vendor", "amount", "invoice_no"]].to_numpy()
+    q2.loc[10, ["vendor", "amount"]] = ["戊公司", 777.0]
+    q2.loc[10, "date"] = pd.Timestamp("2024-04-02")
+    q1.loc[0, ["vendor", "amount", "date"]] = ["戊公司", 777.0, pd.Timestamp("2024-03-30")]
+    q2.loc[0, ["vendor", "amount", "invoice_no"]] = ["己公司", 1.0, "X"]
+
+    options = dict(date_column="date", window_days=5, history_index="payments", state_dir=str(tmp_path))
+    node.detect(q1, period_label="2024-Q1", **options)
+    duplicates, _, report = node.detect(q2, period_label="2024-Q2", **options)
+    print(report)
+    history_exact = duplicates[duplicates["duplicate_type"] == "history_exact"]
+    # 第 5 行发票号为空，不参与完全重复比对
+    assert set(range(1, 10)) - {5} <= set(history_exact.index)
+    assert history_exact.loc[1, "matched_with"].startswith("2024-Q1#")
+    assert duplicates.loc[10, "duplicate_type"] == "history_near"
+    assert duplicates.loc[10, "matched_with"] == "2024-Q1#0" and duplicates.loc[10, "days_apart"] == 3
+
+    index = DuplicateIndex(str(tmp_path / "duplicate_index" / "payments.parquet"))
+    assert len(index.load()) == len(q1) + len(q2)
+    again, _, _ = node.detect(q2, period_label="2024-Q2", **options)
+    pd.testing.assert_frame_equal(again, duplicates)
+    assert len(index.load()) == len(q1) + len(q2)
+    assert set(index.load()["period"]) == {"2024-Q1", "2024-Q2"}
+
+    with pytest.raises(ValueError):
+        node.detect(q2, date_column="date", history_index="payments")
+    with pytest.raises(ValueError):
+        node.detect(q2, history_index="../x", period_label="p", state_dir=str(tmp_path))
+    print("✅ 测试通过")
@@ -0,0 +1,98 @@
+"""
+名称模糊匹配测试
+验证名称规范化（全角、公司后缀、地名位置）、地名不同的降权，
+以及 LSH 分块在较大名单上对注入变体的召回
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.entity_matching import match_names, normalize_names
+from app.nodes.audit_nodes import EntityMatchNode
+
+
+def test_normalization_and_matching():
+    """测试规范化与名单内匹配：后缀、括号地名、全角字符视为同一主体，不同地名降权"""
+    print("\n=== Test 1: 规范化与名单内匹配 ===")
+    names = pd.Series([
+        "北京华信科技有限公司",
+        "华信科技（北京）有限公司",
+        "ＨＵＡＸＩＮ Tech Co., Ltd.",
+        "Huaxin Tech Company Limited",
+        "北京银行",
+        "上海银行",
+        "无关贸易公司",
+        None,
+    ])
+    normalized = normalize_names(names)
+    print(normalized)
+    assert normalized.loc[0, "core"] == normalized.loc[1, "core"] == "华信科技"
+    assert normalized.loc[0, "region"] == normalized.loc[1, "region"] == "北京"
+    assert normalized.loc[2, "core"] == normalized.loc[3, "core"] == "huaxintech"
+    # 去掉地名后主体名太短时保留地名
+    assert normalized.loc[4, "core"] == "北京银行" and normalized.loc[5, "core"] == "上海银行"
+
+    matches, count, report = EntityMatchNode().match_entities(names.to_frame("vendor"), threshold=0.8)
+    print(report)
+    print(matches)
+    pairs = {(row.left_index, row.right_index) for row in matches.itertuples()}
+    assert {(0, 1), (2, 3)} <= pairs
+    assert (4, 5) not in pairs and count == len(matches)
+    assert (matches["score"] >= 0.8).all()
+
+    # 同一主体、不同地名：相似度乘以降权系数
+    regional = match_names(pd.Series(["北京华信科技有限公司", "上海华信科技有限公司"]), threshold=0.5)
+    assert len(regional) == 1 and not regional.loc[0, "region_match"] and regional.loc[0, "score"] == 0.5
+
+    with pytest.raises(ValueError):
+        EntityMatchNode().match_entities(names.to_frame("vendor"), name_column="missing")
+    with pytest.raises(ValueError):
+        match_names(names, threshold=0)
+    print("✅ 测试通过")
+
+
+def test_repeated_names_are_deduplicated():
+    """测试重复名称：交易明细中重复出现的名称先去重，不占满比较窗口，结果给出出现次数"""
+    print("\n=== Test 2: 重复名称去重 ===")
+    names = pd.Series(
+        ["北京华信科技有限公司"] * 200 + ["华信科技（北京）有限公司"] * 150 + ["华信科技发展有限公司", "无关贸易公司"] * 3
+    )
+    matches = match_names(names, threshold=0.6)
+    print(matches)
+    assert len(matches) == 3
+    assert (matches["left_name"] != matches["right_name"]).all()
+    top = matches.iloc[0]
+    assert top["score"] == 1.0 and {top["left_count"], top["right_count"]} == {200, 150}
+    assert {top["left_index"], top["right_index"]} == {0, 200}
+    variant = matches[matches["right_name"] == "华信科技发展有限公司"]
+    assert len(variant) == 2 and (variant["right_count"] == 3).all() and (variant["right_index"] == 350).all()
+    print("✅ 测试通过")
+
+
+def test_reference_matching_recall():
+    """测试两个名单匹配：较大名单中注入的后缀/括号/全角变体全部召回，左侧固定为待查名单"""
+    print("\n=== Test 3: 名单间匹配召回 ===")
+    rng = np.random.default_rng(0)
+    alphabet = np.array(list("华信达通宏远鑫源泰安永盛恒发丰茂嘉德瑞祥天成光明新兴东方中和金海"))
+    cores = pd.unique(np.array(["".join(rng.choice(alphabet, rng.integers(4, 8))) for _ in range(20000)]))
+    master = pd.Series([f"{core}有限公司" for core in cores], index=[f"V{i}" for i in range(len(cores))])
+
+    picked = rng.choice(len(cores), 200, replace=False)
+    variants = []
+    for k, i in enumerate(picked):
+        core = cores[i]
+        variants.append([f"{core}股份有限公司", f"{core}（集团）公司", f"{core}有限责任公司"][k % 3])
+    vendors = pd.DataFrame({"name": variants}, index=[f"P{k}" for k in range(len(variants))])
+
+    matches, count, report = EntityMatchNode().match_entities(
+        vendors, name_column="name", reference=master.to_frame("vendor"), reference_column="vendor", threshold=0.9
+    )
+    print(report)
+    assert set(matches["left_index"]) <= set(vendors.index)
+    assert set(matches["right_index"]) <= set(master.index)
+    found = set(zip(matches["left_index"], matches["right_index"]))
+    expected = {(f"P{k}", f"V{i}") for k, i in enumerate(picked)}
+    recall = len(found & expected) / len(expected)
+    print(f"召回率: {recall:.3f}")
+    assert recall == 1.0
+    print("✅ 测试通过")
@@ -0,0 +1,77 @@
+"""
+Excel 读取引擎测试
+验证各引擎在相同参数下与 pandas.read_excel 结果一致
+"""
+import pandas as pd
+import pytest
+
+from app.core.excel_reader import HAS_CALAMINE, parse_usecols, read_excel, select_engine
+
+ENGINES = ["openpyxl", "pandas"] + (["calamine"] if HAS_CALAMINE else [])
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "ledger.xlsx"
+    df = pd.DataFrame({
+        "凭证号": [1001, 1002, None, 1004],
+        "科目": ["管理费用", "销售费用", "财务费用", None],
+        "日期": pd.to_datetime(["2024-01-01 00:00", "2024-01-02 10:30", None, "2024-01-04 00:00"]),
+        "金额": [1.5, 2.0, 3.0, 4.0],
+        "编号": [1, "A-2", 3.5, None],
+    })
+    with pd.ExcelWriter(path) as writer:
+        df.to_excel(writer, sheet_name="明细", index=False)
+        df.head(2).to_excel(writer, sheet_name="汇总", index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_match_pandas(workbook, engine):
+    """测试全表、列范围、行数限制、跳过行和 sheet 选择"""
+    print(f"\n=== 引擎: {engine} ===")
+    cases = [
+        {},
+        {"usecols": "A:B", "nrows": 2},
+        {"usecols": "科目,金额"},
+        {"skiprows": 1, "nrows": 1},
+        {"sheet_name": "汇总"},
+        {"sheet_name": 1, "usecols": [0, 3]},
+    ]
+    for kwargs in cases:
+        expected_kwargs = dict(kwargs)
+        if "usecols" in kwargs:
+            expected_kwargs["usecols"] = parse_usecols(kwargs["usecols"])
+        expected = pd.read_excel(workbook, **expected_kwargs)
+        pd.testing.assert_frame_equal(read_excel(workbook, engine=engine, **kwargs), expected)
+    print("✅ 测试通过")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_uppercase_column_names(tmp_path, engine):
+    """测试大写列名（ID、TAX）按列名选择，不被当作列字母"""
+    path = tmp_path / "upper.xlsx"
+    df = pd.DataFrame({"ID": [1, 2], "vendor": ["甲", "乙"], "TAX": [0.13, 0.06], "QTY": [3, 4]})
+    df.to_excel(path, index=False)
+    result = read_excel(str(path), engine=engine, usecols="ID,TAX")
+    pd.testing.assert_frame_equal(result, df[["ID", "TAX"]])
+    pd.testing.assert_frame_equal(read_excel(str(path), engine=engine, usecols="ID,vendor"), df[["ID", "vendor"]])
+    pd.testing.assert_frame_equal(read_excel(str(path), engine=engine, usecols="C:D"), df[["TAX", "QTY"]])
+
+
+def test_parse_usecols_and_engine_selection():
+    """测试列选择解析与引擎选择"""
+    assert parse_usecols("A:C,E") == [0, 1, 2, 4]
+    assert parse_usecols("金额, 日期") == ["金额", "日期"]
+    assert parse_usecols("") is None
+    assert parse_usecols("E:E") == [4]
+    # 没有列范围时大写的 token 是列名
+    assert parse_usecols("ID,TAX") == ["ID", "TAX"]
+    assert parse_usecols("ID,vendor") == ["ID", "vendor"]
+    with pytest.raises(ValueError):
+        parse_usecols("A:B,金额")
+
+    assert select_engine("a.xlsx") == ("calamine" if HAS_CALAMINE else "openpyxl")
+    assert select_engine("a.xlsx", "pandas") == "pandas"
+    with pytest.raises(ValueError):
+        select_engine("a.xlsx", "xlrd")
@@ -0,0 +1,105 @@
+"""
+上传文件入库转换测试
+验证 Excel -> Parquet 转换、读取时只转换请求的 sheet、按内容哈希复用，以及 ExcelLoader 透明读取转换结果
+"""
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from app.core.ingest import IngestStore, file_sha256
+from app.nodes import file_nodes
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """两个 sheet 的测试工作簿，其中一列数字与文本混杂"""
+    path = tmp_path / "ledger.xlsx"
+    ledger = pd.DataFrame({
+        "凭证号": [1001, 1002, 1003],
+        "金额": [100.5, None, 300.0],
+        "日期": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+        "科目": ["管理费用", "销售费用", None],
+    })
+    mixed = pd.DataFrame({"编号": [1, "A-2", 3.5]})
+    with pd.ExcelWriter(path) as writer:
+        ledger.to_excel(writer, sheet_name="明细", index=False)
+        mixed.to_excel(writer, sheet_name="编号", index=False)
+    return str(path)
+
+
+def test_ingest_converts_each_sheet(tmp_path, workbook):
+    """测试每个 sheet 转换为 Parquet，读回结果与直接解析 Excel 一致"""
+    print("\n=== Test 1: Excel -> Parquet ===")
+
+    store = IngestStore(root=str(tmp_path / "ingest"))
+    manifest = store.ingest(workbook)
+    print(f"清单: {[(s['name'], s['rows']) for s in manifest['sheets']]}")
+
+    assert manifest["sha256"] == file_sha256(workbook)
+    assert [s["name"] for s in manifest["sheets"]] == ["明细", "编号"]
+    assert os.path.exists(os.path.join(store.entry_dir(manifest["sha256"]), "sheet_1.parquet"))
+
+    pd.testing.assert_frame_equal(store.load(workbook), pd.read_excel(workbook))
+    assert store.load(workbook, sheet_name="明细").shape == (3, 4)
+
+    # 混合类型列统一为字符串
+    mixed = store.load(workbook, sheet_name="编号")
+    assert mixed["编号"].tolist() == ["1", "A-2", "3.5"]
+    assert store.load(workbook, sheet_name="不存在") is None
+    print("✅ 测试通过")
+
+
+def test_load_converts_requested_sheet_only(tmp_path, workbook):
+    """测试读取时只转换请求的 sheet，其余 sheet 第一次读取时再转换"""
+    print("\n=== Test 2: 按需转换 sheet ===")
+
+    store = IngestStore(root=str(tmp_path / "ingest"))
+    entry = store.entry_dir(file_sha256(workbook))
+    assert store.load(workbook, sheet_name="编号")["编号"].tolist() == ["1", "A-2", "3.5"]
+    manifest = store.get_manifest(file_sha256(workbook))
+    print(manifest["sheets"])
+    assert [s["name"] for s in manifest["sheets"]] == ["明细", "编号"]
+    assert "rows" not in manifest["sheets"][0] and manifest["sheets"][1]["rows"] == 3
+    assert not os.path.exists(os.path.join(entry, "sheet_0.parquet"))
+    # 不转换时未转换的 sheet 由调用方回退到直接解析
+    assert store.load(workbook, convert=False) is None
+
+    pd.testing.assert_frame_equal(store.load(workbook), pd.read_excel(workbook))
+    assert os.path.exists(os.path.join(entry, "sheet_0.parquet"))
+    assert store.ingest(workbook)["sheets"][0]["rows"] == 3
+    print("✅ 测试通过")
+
+
+def test_loader_reuses_parquet_until_file_changes(tmp_path, workbook, monkeypatch):
+    """测试 ExcelLoader 命中转换结果时不再解析 Excel，文件内容变化后重新转换"""
+    print("\n=== Test 3: ExcelLoader 透明读取 ===")
+
+    store = IngestStore(root=str(tmp_path / "ingest"))
+    monkeypatch.setattr(file_nodes, "ingest_store", store)
+    store.ingest(workbook)
+
+    def fail_read_excel(*args, **kwargs):
+        raise AssertionError("Excel should not be parsed again")
+
+    with monkeypatch.context() as m:
+        m.setattr(pd, "read_excel", fail_read_excel)
+        (df,) = file_nodes.ExcelLoader().load_excel(workbook)
+    assert len(df) == 3
+
+    # 修改文件内容后哈希变化，重新转换
+    time.sleep(0.01)
+    pd.DataFrame({"凭证号": [9]}).to_excel(workbook, index=False)
+    (df,) = file_nodes.ExcelLoader().load_excel(workbook)
+    assert df["凭证号"].tolist() == [9]
+    assert len(os.listdir(store.root)) == 2
+    print("✅ 测试通过")
+
+
+def test_ingest_skips_unsupported_files(tmp_path):
+    """测试非表格文件不转换"""
+    path = tmp_path / "notes.txt"
+    path.write_text("hello", encoding="utf-8")
+    store = IngestStore(root=str(tmp_path / "ingest"))
+    assert store.ingest(str(path)) is None
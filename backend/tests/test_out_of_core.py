@@ -0,0 +1,152 @@
+"""
+分区执行测试
+验证部分聚合合并结果与整体计算一致，逐行节点按分区执行后输出分区数据集，
+以及 CSV 加载节点 partitioned 模式经执行器驱动下游节点
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core import partial_aggregates
+from app.core.dataset import DatasetHandle
+from app.core.executor import PromptExecutor
+from app.core.out_of_core import run_aggregate, run_rowwise
+from app.core.partial_aggregates import GroupSummary, NumericSummary, merge_summaries, summarize_numeric
+from app.nodes.audit_nodes import CommonMetricsNode, ExcelColumnValidator, SceneMetricsNode
+from app.nodes.clean_nodes import ColumnMapperNode, NullValueCleanerNode
+
+ROWS = 1000
+
+
+def ledger() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    amount = rng.random(ROWS) * 10000
+    amount[::50] = np.nan
+    return pd.DataFrame({
+        "凭证号": np.arange(ROWS),
+        "vendor": rng.choice(["甲公司", "乙公司", "丙公司", "丁公司"], ROWS),
+        "amount": amount,
+    })
+
+
+@pytest.fixture
+def ledger_parquet(tmp_path):
+    path = tmp_path / "ledger.parquet"
+    pq.write_table(pa.Table.from_pandas(ledger(), preserve_index=False), path, row_group_size=128)
+    return str(path)
+
+
+def test_partial_aggregates_match_pandas(monkeypatch):
+    """测试数值汇总、分组汇总两两合并后与整体计算一致"""
+    print("\n=== Test 1: 部分聚合合并 ===")
+    df = ledger()
+    parts = [df.iloc[i:i + 300] for i in range(0, ROWS, 300)]
+
+    merged = {}
+    for part in parts:
+        merged = merge_summaries(merged, summarize_numeric(part))
+    summary = merged["amount"]
+    assert summary.count == df["amount"].count()
+    assert summary.total == pytest.approx(df["amount"].sum())
+    assert summary.mean == pytest.approx(df["amount"].mean())
+    assert summary.std == pytest.approx(df["amount"].std())
+    assert (summary.minimum, summary.maximum) == (df["amount"].min(), df["amount"].max())
+    # 值的个数未超过草图压缩参数时中位数是精确的
+    assert summary.median == pytest.approx(df["amount"].median())
+    assert NumericSummary().merge(summary) is summary
+
+    # 超过压缩参数：草图压缩，中位数为估计值
+    monkeypatch.setattr(partial_aggregates, "SKETCH_COMPRESSION", 200)
+    estimated = NumericSummary.from_series(df["amount"].iloc[:500]).merge(NumericSummary.from_series(df["amount"].iloc[500:]))
+    assert len(estimated.sketch.means) <= 200
+    assert abs(estimated.median - df["amount"].median()) < 200
+
+    groups = GroupSummary.from_frame(parts[0], ["vendor"], ["amount"])
+    for part in parts[1:]:
+        groups = groups.merge(GroupSummary.from_frame(part, ["vendor"], ["amount"]))
+    expected = df.groupby("vendor")["amount"]
+    pd.testing.assert_series_equal(groups.sums("amount"), expected.sum(), check_names=False)
+    pd.testing.assert_series_equal(groups.means("amount"), expected.mean(), check_names=False)
+    print("✅ 测试通过")
+
+
+def test_partitioned_nodes(tmp_path, ledger_parquet):
+    """测试逐行节点按分区写出分片、聚合节点按分区合并，结果与整体执行一致"""
+    print("\n=== Test 2: 分区执行节点 ===")
+    handle = DatasetHandle(ledger_parquet, partition_rows=300)
+    partitions = list(handle.iter_partitions())
+    assert [len(p) for p in partitions] == [384, 384, 232]
+
+    validator = ExcelColumnValidator()
+    outliers, report, _ = run_rowwise(
+        validator.execute_validation, ExcelColumnValidator,
+        {"column_name": "amount", "min_value": 0, "max_value": 5000}, "dataframe",
+        handle, str(tmp_path / "validator"),
+    )
+    expected, _, _ = validator.execute_validation(ledger(), "amount", 0, 5000)
+    assert isinstance(outliers, DatasetHandle) and outliers.partition_rows == 300
+    assert outliers.num_rows == len(expected)
+    assert sorted(outliers.to_pandas()["凭证号"]) == sorted(expected["凭证号"])
+    assert isinstance(report, str)
+
+    cleaned, _ = run_rowwise(
+        NullValueCleanerNode().clean_nulls, NullValueCleanerNode,
+        {"target_columns": "amount", "strategy": "drop_rows"}, "dataframe",
+        handle, str(tmp_path / "cleaner"),
+    )
+    assert cleaned.num_rows == ledger()["amount"].count()
+    assert NullValueCleanerNode.partition_mode({"strategy": "fill_mean"}) is None
+    assert ColumnMapperNode.partition_mode({}) == "rowwise"
+
+    metrics, _ = run_aggregate(CommonMetricsNode(), {}, "dataframe", handle)
+    expected_metrics, _ = CommonMetricsNode().calculate_metrics(ledger())
+    assert metrics.keys() == expected_metrics.keys()
+    for key, value in expected_metrics.items():
+        assert metrics[key] == pytest.approx(value), key
+
+    (scene,) = run_aggregate(SceneMetricsNode(), {"business_scene": "invoice_audit"}, "dataframe", handle)
+    (expected_scene,) = SceneMetricsNode().calculate_scene_metrics(ledger(), "invoice_audit")
+    assert scene["top_vendor"] == expected_scene["top_vendor"]
+    assert scene["vendor_concentration"] == pytest.approx(expected_scene["vendor_concentration"])
+    print("✅ 测试通过")
+
+
+def test_executor_runs_partitioned_workflow(tmp_path, monkeypatch):
+    """测试 CSV 加载节点 partitioned 模式：执行器按分区执行校验节点和指标节点"""
+    print("\n=== Test 3: 执行器分区执行 ===")
+    from app.core import executor as executor_module
+    from app.core.config import settings
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "output").mkdir()
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    monkeypatch.setattr(settings, "OUT_OF_CORE_PARTITION_ROWS", 300)
+    messages = []
+
+    async def send(message, client_id):
+        messages.append(message)
+
+    monkeypatch.setattr(executor_module.ws_manager, "send_personal_message", send)
+    csv_path = tmp_path / "ledger.csv"
+    ledger().to_csv(csv_path, index=False)
+
+    workflow = {
+        "1": {"class_type": "CsvLoader", "inputs": {"file_path": str(csv_path), "mode": "partitioned"}},
+        "2": {"class_type": "ExcelColumnValidator",
+              "inputs": {"dataframe": ["1", 0], "column_name": "amount", "min_value": 0, "max_value": 5000}},
+        "3": {"class_type": "CommonMetricsNode", "inputs": {"dataframe": ["1", 0]}},
+    }
+    executor = PromptExecutor()
+    asyncio.run(executor._execute_graph_internal("ooc", "client", workflow))
+    executor.shutdown()
+
+    outputs = {m["node"]: m["output"] for m in messages if m.get("type") == "executed"}
+    expected, _, _ = ExcelColumnValidator().execute_validation(ledger(), "amount", 0, 5000)
+    assert outputs["1"][0]["type"] == "dataset" and outputs["1"][0]["rows"] == ROWS
+    assert outputs["2"][0]["type"] == "dataset" and outputs["2"][0]["rows"] == len(expected)
+    assert "'record_count': 1000" in outputs["3"][0]["value"]
+    assert (tmp_path / "cache" / "ooc" / "2_partitions_0").is_dir()
+    print("✅ 测试通过")
@@ -0,0 +1,165 @@
+"""
+输出响应格式测试
+验证内容协商、向量化 JSON 转换，以及 Arrow IPC / NDJSON 流式输出
+"""
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api import preview_routes
+from app.core import output_query
+from app.core.data_manager import DataManager
+from app.core.lru_cache import ByteLRUCache
+from app.core.output_formats import MEDIA_ARROW_STREAM, MEDIA_NDJSON, negotiate_format, table_to_rows
+
+
+def _request(accept: str = "*/*", if_none_match: str = None) -> Request:
+    headers = [(b"accept", accept.encode())]
+    if if_none_match:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def _send(endpoint, *args, **kwargs):
+    """调用路由函数，返回 (状态码, 响应头, 响应体 bytes)"""
+    async def run():
+        response = await endpoint(*args, **kwargs)
+        if hasattr(response, "body_iterator"):
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        else:
+            body = response.body
+        return response.status_code, response.headers, body
+    return asyncio.run(run())
+
+
+def _call(endpoint, *args, **kwargs):
+    """调用路由函数，返回 (响应头, 响应体 bytes)"""
+    _, headers, body = _send(endpoint, *args, **kwargs)
+    return headers, body
+
+
+@pytest.fixture
+def cached_output(tmp_path, monkeypatch):
+    """缓存写入临时目录，预览路由与查询模块使用同一个 DataManager"""
+    monkeypatch.chdir(tmp_path)
+    manager = DataManager(cache_dir="cache", memory_cache_bytes=0)
+    monkeypatch.setattr(preview_routes, "data_manager", manager)
+    monkeypatch.setattr(output_query, "data_manager", manager)
+    monkeypatch.setattr(preview_routes, "response_cache", ByteLRUCache(1024 * 1024, sizeof=lambda e: len(e[0])))
+
+    df = pd.DataFrame({
+        "amount": [1.5, np.nan, 3.0, 4.0],
+        "vendor": ["甲", "乙", None, "甲"],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-02", None, "2024-01-04"]),
+    })
+    manager.save_intermediate("p1", "n1", df, 0)
+    return df
+
+
+def test_negotiate_format():
+    """测试 format 参数优先、Accept 头按 q 值选择"""
+    assert negotiate_format(None) == "json"
+    assert negotiate_format("*/*") == "json"
+    assert negotiate_format(f"{MEDIA_NDJSON};q=0.5, {MEDIA_ARROW_STREAM}") == "arrow"
+    assert negotiate_format(MEDIA_ARROW_STREAM, "ndjson") == "ndjson"
+    with pytest.raises(ValueError):
+        negotiate_format(None, "csv")
+
+
+def test_table_to_rows_matches_legacy_conversion():
+    """测试向量化转换结果：NaN -> None，时间 -> ISO 字符串"""
+    table = pa.table({
+        "amount": [1.0, float("nan"), None],
+        "date": pa.array([pd.Timestamp("2024-01-01"), None, pd.Timestamp("2024-01-02 08:30")], type=pa.timestamp("ns")),
+    })
+    rows = table_to_rows(table)
+    assert rows == [
+        {"amount": 1.0, "date": "2024-01-01T00:00:00"},
+        {"amount": None, "date": None},
+        {"amount": None, "date": "2024-01-02T08:30:00"},
+    ]
+
+
+def test_preview_content_negotiation(cached_output):
+    """测试预览接口的 JSON / Arrow / NDJSON 三种格式"""
+    print("\n=== Test 1: 预览内容协商 ===")
+    df = cached_output
+    preview = preview_routes.preview_node_output
+
+    _, body = _call(preview, "p1", "n1", _request(), 0, None, 100, None, None)
+    body = json.loads(body)
+    assert body["total_rows"] == 4
+    assert body["rows"][1] == {"amount": None, "vendor": "乙", "date": "2024-01-02T00:00:00"}
+
+    headers, body = _call(preview, "p1", "n1", _request(MEDIA_ARROW_STREAM), 0, None, 100, None, None)
+    assert headers["content-type"] == MEDIA_ARROW_STREAM
+    assert headers["x-total-rows"] == "4"
+    table = pa.ipc.open_stream(body).read_all()
+    pd.testing.assert_frame_equal(table.to_pandas(), df)
+
+    headers, body = _call(preview, "p1", "n1", _request(), 0, None, 2, "vendor", "ndjson")
+    assert headers["content-type"].startswith(MEDIA_NDJSON)
+    lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert lines == [{"vendor": "甲"}, {"vendor": "乙"}]
+
+    with pytest.raises(HTTPException) as exc_info:
+        _call(preview, "p1", "n1", _request(), 0, None, 100, None, "csv")
+    assert exc_info.value.status_code == 400
+    print("✅ 测试通过")
+
+
+def test_export_and_query_streams(cached_output):
+    """测试完整导出与查询接口的流式格式"""
+    print("\n=== Test 2: 导出与查询流式输出 ===")
+    df = cached_output
+
+    _, body = _call(preview_routes.export_node_output, "p1", "n1", 0, _request(), None, None, None)
+    assert len(body.decode("utf-8").splitlines()) == len(df)
+
+    query = preview_routes.DataQueryRequest(sort=[{"column": "amount", "descending": True}], limit=2)
+    headers, body = _call(preview_routes.query_node_output, "p1", "n1", 0, query, _request(MEDIA_ARROW_STREAM), None, None)
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.column("amount").to_pylist() == [4.0, 3.0]
+    assert headers["x-total-matched"] == "4"
+    assert "x-next-cursor" in headers
+
+    query = preview_routes.DataQueryRequest(limit=1)
+    _, body = _call(preview_routes.query_node_output, "p1", "n1", 0, query, _request(), None, None)
+    assert json.loads(body)["rows"] == [{"amount": 1.5, "vendor": "甲", "date": "2024-01-01T00:00:00"}]
+    print("✅ 测试通过")
+
+
+def test_etag_and_response_cache(cached_output):
+    """测试 ETag / If-None-Match 304 与服务端响应缓存"""
+    print("\n=== Test 3: ETag 与响应缓存 ===")
+    preview = preview_routes.preview_node_output
+
+    status, headers, body = _send(preview, "p1", "n1", _request(), 0, None, 100, None, None)
+    etag = headers["etag"]
+    assert status == 200
+
+    # 相同参数第二次请求命中服务端缓存，ETag 不变
+    status, headers, cached_body = _send(preview, "p1", "n1", _request(), 0, None, 100, None, None)
+    assert headers["etag"] == etag and cached_body == body
+    assert preview_routes.response_cache.stats()["hits"] == 1
+
+    status, headers, body = _send(preview, "p1", "n1", _request(if_none_match=f'W/{etag}'), 0, None, 100, None, None)
+    assert status == 304 and body == b""
+
+    # 参数不同 ETag 不同
+    _, headers, _ = _send(preview, "p1", "n1", _request(), 0, None, 10, None, None)
+    assert headers["etag"] != etag
+
+    # 输出重新生成后 ETag 改变，旧 ETag 不再命中
+    df = cached_output.head(2)
+    preview_routes.data_manager.save_intermediate("p1", "n1", df, 0)
+    status, headers, body = _send(preview, "p1", "n1", _request(if_none_match=etag), 0, None, 100, None, None)
+    assert status == 200 and headers["etag"] != etag
+    assert json.loads(body)["total_rows"] == 2
+    print("✅ 测试通过")
@@ -0,0 +1,131 @@
+"""
+运行输出查询测试
+验证过滤下推、多列排序、offset 与 keyset 分页
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.data_manager import DataManager, ParquetWritePolicy
+from app.core import output_query
+from app.core.output_query import query_output
+
+
+@pytest.fixture
+def ledger_path(tmp_path, monkeypatch):
+    """写入一个多 row group 的测试输出，并让查询模块使用独立的 DataManager"""
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    monkeypatch.setattr(output_query, "data_manager", manager)
+
+    rng = np.random.default_rng(42)
+    rows = 5000
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "amount": rng.integers(0, 20, rows).astype(float),
+        "vendor": rng.choice(["北京甲公司", "上海乙公司", "深圳丙公司"], rows),
+        "date": pd.date_range("2024-01-01", periods=rows, freq="h"),
+    })
+    path = manager.save_intermediate(
+        "run1", "n1", df, 0, write_policy=ParquetWritePolicy(row_group_size=500)
+    )
+    return path, df
+
+
+def test_filter_pushdown_and_offset(ledger_path):
+    """测试过滤条件与 offset 分页"""
+    print("\n=== Test 1: 过滤 + offset 分页 ===")
+    path, df = ledger_path
+
+    filters = [
+        {"column": "vendor", "op": "in", "value": ["北京甲公司", "深圳丙公司"]},
+        {"column": "date", "op": "ge", "value": "2024-03-01"},
+        {"column": "amount", "op": "between", "value": [5, 15]},
+    ]
+    expected = df[
+        df["vendor"].isin(["北京甲公司", "深圳丙公司"])
+        & (df["date"] >= "2024-03-01")
+        & df["amount"].between(5, 15)
+    ]
+
+    page = query_output(path, filters=filters, offset=100, limit=50, columns=["id", "vendor"])
+    print(f"匹配行数: {page.total_matched}")
+    assert page.total_matched == len(expected)
+    assert page.table.column_names == ["id", "vendor"]
+    assert page.table.column("id").to_pylist() == expected["id"].iloc[100:150].tolist()
+    print("✅ 测试通过")
+
+
+def test_keyset_paging_matches_full_sort(ledger_path):
+    """测试 keyset 游标分页与一次性完整排序结果一致（含大量重复排序键）"""
+    print("\n=== Test 2: 多列排序 + keyset 分页 ===")
+    path, df = ledger_path
+
+    sort = [{"column": "amount", "descending": True}, {"column": "vendor"}]
+    expected = df.sort_values(["amount", "vendor"], ascending=[False, True], kind="stable")
+
+    collected = []
+    cursor = None
+    pages = 0
+    while True:
+        page = query_output(path, sort=sort, limit=333, cursor=cursor)
+        collected.extend(page.table.column("id").to_pylist())
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    print(f"页数: {pages}")
+    assert collected == expected["id"].tolist()
+    print("✅ 测试通过")
+
+
+def test_keyset_paging_with_null_sort_keys(tmp_path, monkeypatch):
+    """测试排序列含空值时的 keyset 分页：空值排在最后，每一行恰好返回一次"""
+    print("\n=== Test 3: 排序列含空值的 keyset 分页 ===")
+    manager = DataManager(cache_dir=str(tmp_path), memory_cache_bytes=0)
+    monkeypatch.setattr(output_query, "data_manager", manager)
+    rng = np.random.default_rng(7)
+    rows = 400
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "amount": rng.integers(0, 5, rows).astype(float),
+        "vendor": rng.choice(["甲", "乙", None], rows),
+    })
+    df.loc[rng.choice(rows, 60, replace=False), "amount"] = np.nan
+    path = manager.save_intermediate(
+        "run1", "nulls", df, 0, write_policy=ParquetWritePolicy(row_group_size=64)
+    )
+
+    for sort in (
+        [{"column": "amount"}],
+        [{"column": "amount", "descending": True}, {"column": "vendor"}],
+        [{"column": "vendor", "descending": True}, {"column": "amount"}],
+    ):
+        expected = df.sort_values(
+            [s["column"] for s in sort], ascending=[not s.get("descending", False) for s in sort],
+            kind="stable", na_position="last"
+        )
+        collected = []
+        cursor = None
+        while True:
+            page = query_output(path, sort=sort, limit=7, cursor=cursor)
+            collected.extend(page.table.column("id").to_pylist())
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert collected == expected["id"].tolist(), sort
+    print("✅ 测试通过")
+
+
+def test_invalid_query_raises(ledger_path):
+    """测试未知列和不支持的运算符"""
+    path, _ = ledger_path
+
+    with pytest.raises(ValueError):
+        query_output(path, filters=[{"column": "missing", "op": "eq", "value": 1}])
+    with pytest.raises(ValueError):
+        query_output(path, filters=[{"column": "amount", "op": "regex", "value": ".*"}])
+    with pytest.raises(ValueError):
+        query_output(path, sort=[{"column": "missing"}])
+
+    assert query_output(path + ".missing") is None
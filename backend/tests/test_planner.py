@@ -0,0 +1,105 @@
+"""
+投影下推测试
+验证执行计划按下游节点声明的列计算加载节点的投影，以及加载节点按投影只读取需要的列
+"""
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.core.ingest import IngestStore
+from app.core.planner import plan_projections
+from app.nodes import file_nodes
+from app.nodes.audit_nodes import NODE_CLASS_MAPPINGS as AUDIT_NODES
+from app.nodes.clean_nodes import NODE_CLASS_MAPPINGS as CLEAN_NODES
+from app.nodes.file_nodes import NODE_CLASS_MAPPINGS as FILE_NODES
+from app.nodes.viz_nodes import NODE_CLASS_MAPPINGS as VIZ_NODES
+
+NODE_CLASSES = {**FILE_NODES, **CLEAN_NODES, **AUDIT_NODES, **VIZ_NODES}
+
+
+def plan(graph):
+    return plan_projections(graph, list(graph), NODE_CLASSES.get)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "ledger.xlsx"
+    pd.DataFrame({
+        "凭证号": [1001, 1002, 1003],
+        "金额": [100.5, 2000.0, 300.0],
+        "科目": ["管理费用", "销售费用", "财务费用"],
+        "摘要": ["a", "b", "c"],
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def test_plan_from_declared_columns():
+    """测试映射、绘图节点声明的列被下推到加载节点"""
+    print("\n=== Test 1: 计算投影 ===")
+    graph = {
+        "load": {"class_type": "ExcelLoader", "inputs": {"file_path": "ledger.xlsx"}},
+        "map": {"class_type": "ColumnMapperNode", "inputs": {
+            "dataframe": ["load", 0],
+            "mapping_json": '{"金额": "amount", "科目": "account"}',
+            "keep_other_columns": False,
+        }},
+    }
+    assert plan(graph) == {"load": ["科目", "金额"]}
+
+    graph["map"]["inputs"]["keep_other_columns"] = True
+    graph["plot"] = {"class_type": "QuickPlotNode", "inputs": {
+        "dataframe": ["map", 0], "x_column": "account", "y_column": "凭证号",
+    }}
+    assert plan(graph) == {"load": ["凭证号", "科目", "金额"]}
+    print("✅ 测试通过")
+
+
+def test_unconsumed_outputs_keep_all_columns():
+    """测试最终输出、未声明列的节点、关闭下推时不做投影"""
+    print("\n=== Test 2: 不下推的情况 ===")
+    graph = {
+        "load": {"class_type": "ExcelLoader", "inputs": {"file_path": "ledger.xlsx"}},
+        "check": {"class_type": "ExcelColumnValidator", "inputs": {
+            "dataframe": ["load", 0], "column_name": "金额", "max_value": 1000,
+        }},
+    }
+    # 校验结果是最终输出，保留全部列
+    assert plan(graph) == {}
+
+    graph["plot"] = {"class_type": "QuickPlotNode", "inputs": {
+        "dataframe": ["check", 0], "x_column": "凭证号", "y_column": "金额",
+    }}
+    assert plan(graph) == {"load": ["凭证号", "金额"]}
+
+    # 连线参数在计划阶段无法确定
+    graph["plot"]["inputs"]["x_column"] = ["load", 0]
+    assert plan(graph) == {}
+    graph["plot"]["inputs"]["x_column"] = "凭证号"
+
+    graph["load"]["pushdown"] = False
+    assert plan(graph) == {}
+
+    # 默认关闭时只下推到显式开启的加载节点（加载节点自身的输出会只包含投影的列）
+    del graph["load"]["pushdown"]
+    assert plan_projections(graph, list(graph), NODE_CLASSES.get, default=False) == {}
+    graph["load"]["pushdown"] = True
+    assert plan_projections(graph, list(graph), NODE_CLASSES.get, default=False) == {"load": ["凭证号", "金额"]}
+    assert settings.PROJECTION_PUSHDOWN_ENABLED is False
+    print("✅ 测试通过")
+
+
+@pytest.mark.parametrize("ingest_enabled", [True, False])
+def test_excel_loader_projection(tmp_path, workbook, monkeypatch, ingest_enabled):
+    """测试 ExcelLoader 按投影读取（入库转换与直接解析两条路径），不存在的列忽略，usecols 优先"""
+    print(f"\n=== Test 3: ExcelLoader 投影 (ingest={ingest_enabled}) ===")
+    monkeypatch.setattr(settings, "INGEST_ENABLED", ingest_enabled)
+    monkeypatch.setattr(file_nodes, "ingest_store", IngestStore(str(tmp_path / "ingest")))
+    loader = file_nodes.ExcelLoader()
+
+    (df,) = loader.load_excel(workbook, projection=["金额", "凭证号", "不存在"])
+    assert list(df.columns) == ["凭证号", "金额"]
+    assert df["金额"].tolist() == [100.5, 2000.0, 300.0]
+
+    (df,) = loader.load_excel(workbook, usecols="科目", projection=["金额"])
+    assert list(df.columns) == ["科目"]
+    print("✅ 测试通过")
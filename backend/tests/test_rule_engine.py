@@ -0,0 +1,121 @@
+"""
+规则引擎测试
+验证默认规则与原实现一致、组合条件/分组范围/列间比较/指标表达式，
+以及大量规则在大数据量下的向量化求值
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.rule_engine import HAS_YAML, evaluate_rules, parse_rules
+from app.nodes.audit_nodes import RuleCalculationNode
+
+
+def ledger(rows: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "vendor": rng.choice(["甲公司", "乙公司", "丙公司"], rows),
+        "amount": rng.normal(1000, 100, rows).round(2),
+        "paid": rng.normal(1000, 100, rows).round(2),
+        "invoice_no": [f"INV{i:06d}" for i in range(rows)],
+    })
+    df.loc[[10, 500], "amount"] = [9999.0, 12345.67]
+    df.loc[20, "invoice_no"] = None
+    return df
+
+
+def test_default_rules_match_original():
+    """测试默认规则：金额异常逐行输出，重复记录输出一条汇总"""
+    print("\n=== Test 1: 默认规则 ===")
+    df = ledger()
+    df = pd.concat([df, df.iloc[[0, 1]]], ignore_index=True)
+    metrics = {"amount_mean": float(df["amount"].mean()), "amount_std": float(df["amount"].std())}
+
+    risk_items, risk_count, summary = RuleCalculationNode().execute_rules(df, metrics)
+    print(risk_items)
+    threshold = metrics["amount_mean"] + 3 * metrics["amount_std"]
+    outliers = df[df["amount"] > threshold]
+
+    amount_items = risk_items[risk_items["rule_id"] == "AMOUNT_OUTLIER"]
+    assert amount_items["record_id"].tolist() == outliers.index.tolist()
+    assert amount_items["description"].tolist() == [f"金额异常: {v:.2f}" for v in outliers["amount"]]
+    assert set(amount_items["risk_level"]) == {"HIGH"}
+
+    duplicates = risk_items[risk_items["rule_id"] == "DUPLICATE_RECORDS"]
+    assert duplicates["description"].tolist() == ["发现4条重复记录"]
+    assert duplicates["record_id"].isna().all()
+    assert risk_count == len(outliers) + 1
+    assert summary.set_index("rule_id")["hits"].to_dict() == {"AMOUNT_OUTLIER": len(outliers), "DUPLICATE_RECORDS": 4}
+
+    # 没有 amount 列：金额规则跳过，缺失指标时使用规则中的默认值
+    items, _, summary = RuleCalculationNode().execute_rules(df.drop(columns=["amount"]), {})
+    assert "AMOUNT_OUTLIER" not in set(items["rule_id"])
+    assert "not found" in summary.set_index("rule_id").loc["AMOUNT_OUTLIER", "reason"]
+    print("✅ 测试通过")
+
+
+def test_declarative_conditions():
+    """测试组合条件、分组聚合、列间比较、指标表达式和描述模板"""
+    print("\n=== Test 2: 声明式条件 ===")
+    df = ledger()
+    rules = parse_rules({"rules": [
+        {"id": "BIG_UNPAID", "severity": "high", "description": "{vendor} 付款差额 {amount:.1f}",
+         "when": {"all": [{"column": "amount", "op": ">", "value": "= limit * 2"},
+                          {"column": "paid", "op": "<", "value": {"column": "amount"}}]}},
+        {"id": "VENDOR_HEAVY", "severity": "LOW", "group_by": "vendor", "emit": "summary",
+         "when": {"column": "amount", "agg": "count", "op": ">=", "value": 0}},
+        {"id": "NO_INVOICE", "when": {"any": [{"column": "invoice_no", "op": "is_null"},
+                                              {"column": "invoice_no", "op": "regex", "value": "^X"}]}},
+        {"id": "NOT_DOMESTIC", "when": {"not": {"column": "vendor", "op": "in", "value": ["甲公司", "乙公司"]}}},
+        {"id": "MISSING_METRIC", "when": {"column": "amount", "op": ">", "value": "= unknown_metric"}},
+    ]})
+    result = evaluate_rules(df, rules, {"limit": 3000})
+    items = result.risk_items
+    print(items.head())
+
+    big = items[items["rule_id"] == "BIG_UNPAID"]
+    assert big["record_id"].tolist() == [10, 500]
+    assert big["description"].tolist() == [f"{df.loc[i, 'vendor']} 付款差额 {df.loc[i, 'amount']:.1f}" for i in (10, 500)]
+    assert set(big["risk_level"]) == {"HIGH"}
+    assert items[items["rule_id"] == "NO_INVOICE"]["record_id"].tolist() == [20]
+    assert len(items[items["rule_id"] == "NOT_DOMESTIC"]) == (df["vendor"] == "丙公司").sum()
+
+    hits = result.summary.set_index("rule_id")
+    assert hits.loc["VENDOR_HEAVY", "hits"] == len(df)
+    assert pd.isna(hits.loc["MISSING_METRIC", "hits"])
+
+    for bad in ['[{"when": {"op": "~"}}]', '[{"when": {"column": "a", "op": ">", "agg": "sum"}}]',
+                '[{"id": "A", "when": {"op": "duplicated"}}, {"id": "A", "when": {"op": "duplicated"}}]',
+                '{"rules": "x"}']:
+        with pytest.raises(ValueError):
+            parse_rules(bad)
+    with pytest.raises(ValueError):
+        evaluate_rules(df, parse_rules('[{"when": {"column": "amount", "op": ">", "value": "= __import__(1)"}}]'))
+    if HAS_YAML:
+        yaml_rules = parse_rules("rules:\n  - id: Y\n    when: {column: amount, op: '>', value: 5000}\n")
+        assert evaluate_rules(df, yaml_rules).risk_items["record_id"].tolist() == [10, 500]
+    print("✅ 测试通过")
+
+
+def test_many_rules_single_pass():
+    """测试数百条规则在 20 万行上的求值：共享子条件只计算一次，结果按列拼接"""
+    print("\n=== Test 3: 大量规则 ===")
+    df = ledger(200_000)
+    spec = []
+    for i in range(300):
+        spec.append({"id": f"R{i}", "description": "{amount}",
+                     "when": {"all": [{"column": "amount", "op": ">", "value": 1000 + i},
+                                      {"column": "vendor", "op": "==", "value": "甲公司"}]}})
+    start = time.perf_counter()
+    result = evaluate_rules(df, parse_rules(spec))
+    elapsed = time.perf_counter() - start
+    print(f"300 rules x {len(df)} rows: {elapsed:.2f}s, {len(result.risk_items)} risk items")
+
+    expected = sum(((df["amount"] > 1000 + i) & (df["vendor"] == "甲公司")).sum() for i in (0, 150, 299))
+    hits = result.summary.set_index("rule_id")["hits"]
+    assert hits["R0"] + hits["R150"] + hits["R299"] == expected
+    assert len(result.risk_items) == hits.sum()
+    assert str(result.risk_items["record_id"].dtype) == "Int64"
+    print("✅ 测试通过")
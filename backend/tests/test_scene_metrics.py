@@ -0,0 +1,90 @@
+"""
+场景指标插件测试
+验证内置场景与直接分组计算一致、多个场景共用分组时每种分组只计算一次，
+以及注册新场景和分区执行
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.dataset import DatasetHandle
+from app.core.out_of_core import run_aggregate
+from app.core.partial_aggregates import GroupSummary
+from app.core.scene_metrics import SCENE_PLUGINS, register_scene, select_scenes
+from app.nodes.audit_nodes import SceneMetricsNode
+
+
+def ledger(rows: int = 3000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "vendor": rng.choice(["甲公司", "乙公司", "丙公司"], rows),
+        "employee_id": rng.integers(0, 30, rows),
+        "expense_type": rng.choice(["差旅", "餐饮", "办公"], rows),
+        "amount": rng.lognormal(6, 1, rows),
+    })
+
+
+def test_builtin_scenes_fuse_groupings(monkeypatch):
+    """测试所有场景一起计算：每种分组键只分组一次，结果与直接 groupby 一致"""
+    print("\n=== Test 1: 内置场景与分组合并 ===")
+    df = ledger()
+    calls = []
+    original = GroupSummary.from_frame.__func__
+
+    def counting(cls, frame, keys, columns):
+        calls.append(tuple(keys))
+        return original(cls, frame, keys, columns)
+
+    monkeypatch.setattr(GroupSummary, "from_frame", classmethod(counting))
+    (metrics,) = SceneMetricsNode().calculate_scene_metrics(df, "all")
+    print(metrics)
+    # contract_id 不存在：合同场景跳过；差旅/薪酬共用 employee_id，发票/采购共用 vendor
+    assert sorted(calls) == [("employee_id",), ("expense_type",), ("vendor",)]
+    assert "contract_count" not in metrics
+
+    vendor = df.groupby("vendor")["amount"]
+    employee = df.groupby("employee_id")["amount"]
+    assert metrics["top_vendor"] == vendor.sum().idxmax()
+    assert metrics["vendor_concentration"] == pytest.approx(vendor.sum().max() / df["amount"].sum())
+    assert metrics["avg_travel_per_person"] == pytest.approx(employee.mean().mean())
+    assert metrics["max_pay_variation"] == pytest.approx((employee.std() / employee.mean()).max())
+    assert metrics["supplier_hhi"] == pytest.approx(((vendor.sum() / df["amount"].sum()) ** 2).sum())
+    assert metrics["top_expense_type"] == df.groupby("expense_type")["amount"].sum().idxmax()
+
+    (single,) = SceneMetricsNode().calculate_scene_metrics(df, "invoice_audit")
+    assert single.keys() == {"top_vendor", "vendor_concentration"}
+    with pytest.raises(ValueError):
+        select_scenes("unknown_audit")
+    print("✅ 测试通过")
+
+
+def test_register_scene_partitioned(tmp_path, monkeypatch):
+    """测试注册新场景后在节点中可选，分区执行与整体计算一致"""
+    print("\n=== Test 2: 注册新场景 ===")
+    # 测试结束后撤销注册
+    monkeypatch.setitem(SCENE_PLUGINS, "vendor_spread_audit", None)
+
+    @register_scene("vendor_spread_audit", group_by=["vendor", "expense_type"],
+                    aggregations={"amount": ["min", "max", "count"]})
+    def vendor_spread(groups, common_metrics):
+        return {"max_spread": float((groups["amount_max"] - groups["amount_min"]).max()),
+                "cells": int(groups["amount_count"].gt(0).sum())}
+
+    with pytest.raises(ValueError):
+        register_scene("bad", group_by=["vendor"], aggregations={"amount": ["median"]})
+    assert "vendor_spread_audit" in SceneMetricsNode.INPUT_TYPES_LEGACY()["required"]["business_scene"][0]
+
+    df = ledger()
+    (expected,) = SceneMetricsNode().calculate_scene_metrics(df, "vendor_spread_audit,payroll_audit")
+    assert expected["cells"] == 9
+
+    path = tmp_path / "ledger.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=400)
+    handle = DatasetHandle(str(path), partition_rows=400)
+    (merged,) = run_aggregate(SceneMetricsNode(), {"business_scene": "vendor_spread_audit,payroll_audit"}, "dataframe", handle)
+    assert merged.keys() == expected.keys()
+    for key, value in expected.items():
+        assert merged[key] == pytest.approx(value), key
+    print("✅ 测试通过")
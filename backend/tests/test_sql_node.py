@@ -0,0 +1,147 @@
+"""
+SQL 节点测试
+验证只读查询检查、输入表命名，以及（安装 duckdb 时）对 DataFrame 与 Parquet 输入执行连接/分组/窗口查询
+"""
+import asyncio
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pydantic import ValidationError
+from starlette.requests import Request
+
+from app.api import project_routes
+from app.core.data_manager import DataManager
+from app.core.dataset import DatasetHandle
+from app.core.sql_engine import HAS_DUCKDB, check_query, output_tables, run_query
+from app.nodes.dataset_nodes import SqlNode
+
+
+def test_check_query():
+    """测试只允许单条只读语句（字符串和注释中的分号、关键字不影响判断）"""
+    print("\n=== Test 1: 只读查询检查 ===")
+    assert check_query("SELECT 1;") == "SELECT 1"
+    assert check_query("-- 汇总\nWITH a AS (SELECT 1 AS x) SELECT * FROM a")
+    assert check_query("SELECT ';' AS s, '; DROP TABLE t1' AS t")
+    assert check_query("(SELECT 1) UNION ALL (SELECT 2)")
+    assert check_query("FROM t1 LIMIT 5")
+
+    for sql in ["", "  ;", "SELECT 1; SELECT 2", "DROP TABLE t1", "COPY t1 TO 'x.csv'",
+                "INSTALL httpfs", "ATTACH 'other.db'", "/* SELECT */ DELETE FROM t1"]:
+        with pytest.raises(ValueError):
+            check_query(sql)
+    print("✅ 测试通过")
+
+
+def test_table_mapping():
+    """测试已连接输入的表名（table_names 按顺序改名）"""
+    print("\n=== Test 2: 输入表命名 ===")
+    df = pd.DataFrame({"a": [1]})
+    assert list(SqlNode.table_mapping({"t1": df, "t3": df})) == ["t1", "t3"]
+    assert list(SqlNode.table_mapping({"t1": df, "t2": df, "table_names": "ledger, vendors"})) == ["ledger", "vendors"]
+    with pytest.raises(ValueError):
+        SqlNode.table_mapping({"t1": df, "t2": df, "table_names": "x,x"})
+    if not HAS_DUCKDB:
+        with pytest.raises(RuntimeError):
+            run_query("SELECT 1", {})
+    print("✅ 测试通过")
+
+
+@pytest.mark.skipif(not HAS_DUCKDB, reason="duckdb is not installed")
+def test_sql_node_queries(tmp_path):
+    """测试 DataFrame 与 Parquet 数据集连接、分组、窗口函数；查询中不能读取其他文件"""
+    print("\n=== Test 3: SQL 查询 ===")
+    path = tmp_path / "ledger.parquet"
+    pq.write_table(pa.table({
+        "凭证号": list(range(1, 9)),
+        "供应商": ["甲", "乙", "甲", "丙", "乙", "甲", "丙", "甲"],
+        "金额": [100.0, 200.0, 300.0, 400.0, 500.0, 600.0, 700.0, 1000.0],
+    }), path)
+    vendors = pd.DataFrame({"供应商": ["甲", "乙", "丙"], "类别": ["关联方", "外部", "外部"]})
+
+    dataset, row_count = SqlNode().run_sql(
+        """
+        SELECT v.类别, SUM(l.金额) AS 合计,
+               RANK() OVER (ORDER BY SUM(l.金额) DESC) AS 排名
+        FROM ledger l JOIN vendors v USING (供应商)
+        GROUP BY v.类别 ORDER BY 排名
+        """,
+        t1=DatasetHandle(str(path)), t2=vendors, table_names="ledger,vendors",
+    )
+    result = dataset.to_pandas()
+    print(result)
+    assert row_count == 2
+    assert result["类别"].tolist() == ["关联方", "外部"]
+    assert result["合计"].tolist() == [2000.0, 1800.0]
+
+    assert run_query("SELECT * FROM t1", {"t1": str(path)}, max_rows=3).num_rows == 3
+    with pytest.raises(ValueError):
+        run_query(f"SELECT * FROM read_parquet('{path}')", {})
+    print("✅ 测试通过")
+
+
+def test_output_tables(tmp_path):
+    """测试运行缓存目录中的输出（Parquet 文件与分区分片目录）注册为表"""
+    print("\n=== Test 4: 运行输出表 ===")
+    table = pa.table({"金额": [1.0, 2.0, 3.0]})
+    pq.write_table(table, tmp_path / "1_0.parquet")
+    pq.write_table(table, tmp_path / "load-csv_1.parquet")
+    (tmp_path / "2_partitions_0").mkdir()
+    pq.write_table(table, tmp_path / "2_partitions_0" / "part-00000.parquet")
+    (tmp_path / "1_0.profile.json").write_text("{}")
+
+    tables = output_tables(str(tmp_path))
+    assert sorted(tables) == ["node_1_0", "node_2_0", "node_load_csv_1"]
+    assert output_tables(str(tmp_path / "missing")) == {}
+
+    if HAS_DUCKDB:
+        result = run_query(
+            "SELECT SUM(金额) AS s FROM node_1_0 UNION ALL SELECT COUNT(*) FROM node_2_0", tables, max_rows=10
+        )
+        assert result.column("s").to_pylist() == [6.0, 3.0]
+        with pytest.raises(TimeoutError):
+            run_query("SELECT COUNT(*) FROM range(100000000) a, range(100000) b WHERE a.range % 7 = b.range", {}, timeout=0.2)
+    print("✅ 测试通过")
+
+
+def test_query_run_outputs_by_reference(tmp_path, monkeypatch):
+    """测试运行输出查询：按引用缓存的数据集（缓存目录中没有 Parquet）同样注册为表，max_rows 必须为正数"""
+    print("\n=== Test 5: 按引用缓存的运行输出 ===")
+    source = tmp_path / "source.parquet"
+    pq.write_table(pa.table({"金额": [1.0, 2.0, 3.0]}), source)
+    projects_root = tmp_path / "projects"
+    cache_dir = projects_root / "p1" / "runs" / "r1" / "cache"
+    manager = DataManager(cache_dir=str(tmp_path / "cache"), memory_cache_bytes=0)
+    assert manager.save_intermediate("r1", "load", DatasetHandle(str(source)), 0, custom_cache_dir=str(cache_dir)) == str(source)
+    assert not any(name.endswith(".parquet") for name in os.listdir(cache_dir))
+    assert manager.output_paths(str(cache_dir)) == {"load_0": str(source)}
+
+    monkeypatch.setattr("app.core.sql_engine.data_manager", manager)
+    assert output_tables(str(cache_dir)) == {"node_load_0": str(source)}
+    (cache_dir / "gone_0.ref.json").write_text(json.dumps({"path": str(tmp_path / "deleted.parquet")}))
+    assert "node_gone_0" not in output_tables(str(cache_dir))
+
+    with pytest.raises(ValidationError):
+        project_routes.RunQueryRequest(sql="SELECT 1", max_rows=-1)
+    with pytest.raises(ValidationError):
+        project_routes.RunQueryRequest(sql="SELECT 1", max_rows=0)
+
+    if HAS_DUCKDB:
+        monkeypatch.setattr(project_routes.project_manager, "projects_root", str(projects_root))
+        request = Request({"type": "http", "method": "POST", "headers": []})
+        body = project_routes.RunQueryRequest(sql="SELECT SUM(金额) AS s FROM node_load_0", max_rows=5)
+        response = asyncio.run(project_routes.query_run_outputs("p1", "r1", body, request, None))
+        payload = json.loads(response.body)
+        assert payload["rows"] == [{"s": 6.0}] and payload["tables"] == ["node_load_0"]
+
+        # 截断时 row_count / X-Row-Count 是返回的行数
+        body = project_routes.RunQueryRequest(sql="SELECT * FROM node_load_0", max_rows=2)
+        payload = json.loads(asyncio.run(project_routes.query_run_outputs("p1", "r1", body, request, None)).body)
+        assert payload["row_count"] == 2 and payload["truncated"]
+        response = asyncio.run(project_routes.query_run_outputs("p1", "r1", body, request, None, format="ndjson"))
+        assert response.headers["x-row-count"] == "2" and response.headers["x-truncated"] == "true"
+        assert "x-total-rows" not in response.headers
+    print("✅ 测试通过")
@@ -0,0 +1,203 @@
+"""
+上传存储测试
+验证流式写入（边写边算哈希、文件头校验）、按内容去重（硬链接）与删除项目后的 blob 回收，
+以及分块续传（重复或并发发送的块不会重复写入）
+"""
+import asyncio
+import hashlib
+import io
+import os
+
+import pandas as pd
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+from starlette.datastructures import Headers, UploadFile
+from starlette.requests import Request
+
+from app.api import project_routes
+from app.core.config import settings
+from app.core.ingest import IngestStore
+from app.core.project_manager import ProjectManager
+from app.core.upload_store import (
+    BlobStore, ChunkedUploadManager, StreamingWriter, UploadConflictError, UploadValidationError, sniff_upload
+)
+
+
+@pytest.fixture
+def xlsx_bytes(tmp_path):
+    path = tmp_path / "source.xlsx"
+    pd.DataFrame({"凭证号": range(2000), "金额": [1.5] * 2000}).to_excel(path, index=False)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """临时存储目录下的项目，路由使用临时的 blob / 续传 / 入库存储"""
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    manager = ProjectManager()
+    blobs = BlobStore()
+    monkeypatch.setattr(project_routes, "project_manager", manager)
+    monkeypatch.setattr(project_routes, "blob_store", blobs)
+    monkeypatch.setattr(project_routes, "chunked_uploads", ChunkedUploadManager(blob_store=blobs))
+    monkeypatch.setattr(project_routes, "ingest_store", IngestStore())
+    return manager.create_project("上传测试").id
+
+
+def _body_request(*pieces: bytes, disconnect: bool = False) -> Request:
+    """请求体按片到达；disconnect=True 时在最后一片之后模拟客户端断开"""
+    messages = [{"type": "http.request", "body": p, "more_body": True} for p in pieces]
+    messages.append({"type": "http.disconnect"} if disconnect else {"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+    return Request({"type": "http", "method": "PUT", "headers": []}, receive)
+
+
+def test_sniff_and_streaming_writer(tmp_path, xlsx_bytes):
+    """测试文件头校验与边写边算哈希"""
+    print("\n=== Test 1: 流式写入 ===")
+    assert sniff_upload(xlsx_bytes[:100], ".xlsx")
+    assert not sniff_upload(xlsx_bytes[:100], ".csv")
+    assert sniff_upload("账号,金额\n".encode("gbk"), ".csv")
+    assert not sniff_upload(b"MZ\x90\x00\x03\x00\x00\x00", ".xlsx")
+
+    writer = StreamingWriter(str(tmp_path / "out.tmp"), ".xlsx")
+    for i in range(0, len(xlsx_bytes), 1000):
+        writer.write(xlsx_bytes[i:i + 1000])
+    sha256, size = writer.finish()
+    assert sha256 == hashlib.sha256(xlsx_bytes).hexdigest() and size == len(xlsx_bytes)
+
+    bad = StreamingWriter(str(tmp_path / "bad.tmp"), ".xlsx")
+    with pytest.raises(UploadValidationError):
+        bad.write(b"not a workbook" * 10000)
+    bad.abort()
+    assert not os.path.exists(tmp_path / "bad.tmp")
+    print("✅ 测试通过")
+
+
+def test_upload_dedupes_by_hardlink(project, xlsx_bytes):
+    """测试单次上传：相同内容只存一份，项目文件是 blob 的硬链接"""
+    print("\n=== Test 2: 上传去重 ===")
+    results = []
+    for name in ("一月.xlsx", "副本.xlsx"):
+        upload = UploadFile(io.BytesIO(xlsx_bytes), filename=name, headers=Headers({}))
+        results.append(asyncio.run(project_routes.upload_file(project, BackgroundTasks(), upload, None)))
+    print(results[0])
+
+    first, second = results
+    assert first["content_hash"] == second["content_hash"] == hashlib.sha256(xlsx_bytes).hexdigest()
+    assert first["stored"] == "link"
+    blob = project_routes.blob_store.blob_path(first["content_hash"])
+    assert os.stat(first["path"]).st_ino == os.stat(second["path"]).st_ino == os.stat(blob).st_ino
+    assert open(second["path"], "rb").read() == xlsx_bytes
+
+    fake = UploadFile(io.BytesIO(b"<html>" * 100), filename="fake.xlsx", headers=Headers({}))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(project_routes.upload_file(project, BackgroundTasks(), fake, None))
+    assert exc.value.status_code == 400
+    print("✅ 测试通过")
+
+
+def test_chunked_upload_resumes(project, xlsx_bytes):
+    """测试分块上传：中断后按已接收字节数续传，完成后内容与哈希一致"""
+    print("\n=== Test 3: 分块续传 ===")
+    request = project_routes.CreateUploadRequest(
+        filename="大文件.xlsx", size=len(xlsx_bytes), sha256=hashlib.sha256(xlsx_bytes).hexdigest()
+    )
+    session = asyncio.run(project_routes.create_upload(project, request, None))
+    upload_id = session["upload_id"]
+    half = len(xlsx_bytes) // 2
+
+    # 第一块传到一半时客户端断开：已到达的数据保留
+    with pytest.raises(Exception):
+        asyncio.run(project_routes.upload_chunk(
+            project, upload_id, 0, _body_request(xlsx_bytes[:1000], xlsx_bytes[1000:half], disconnect=True), None
+        ))
+    status = asyncio.run(project_routes.get_upload(project, upload_id, None))
+    assert status["received"] == half
+
+    # offset 不匹配时拒绝
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(project_routes.upload_chunk(project, upload_id, 0, _body_request(b"x"), None))
+    assert exc.value.status_code == 409
+
+    status = asyncio.run(project_routes.upload_chunk(project, upload_id, half, _body_request(xlsx_bytes[half:]), None))
+    assert status["received"] == len(xlsx_bytes)
+
+    result = asyncio.run(project_routes.complete_upload(project, upload_id, BackgroundTasks(), None))
+    assert open(result["path"], "rb").read() == xlsx_bytes
+    assert result["content_hash"] == request.sha256
+    with pytest.raises(HTTPException):
+        asyncio.run(project_routes.get_upload(project, upload_id, None))
+    print("✅ 测试通过")
+
+
+def test_chunked_upload_hash_mismatch(project, xlsx_bytes):
+    """测试声明的哈希与实际内容不符时拒绝完成"""
+    request = project_routes.CreateUploadRequest(filename="a.xlsx", size=len(xlsx_bytes), sha256="0" * 64)
+    upload_id = asyncio.run(project_routes.create_upload(project, request, None))["upload_id"]
+    asyncio.run(project_routes.upload_chunk(project, upload_id, 0, _body_request(xlsx_bytes), None))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(project_routes.complete_upload(project, upload_id, BackgroundTasks(), None))
+    assert exc.value.status_code == 400
+
+
+def test_duplicate_chunk_not_appended_twice(project, xlsx_bytes):
+    """测试重复 / 并发发送同一块：offset 在持有锁后按磁盘上的实际大小校验，只写入一次"""
+    print("\n=== Test 4: 重复与并发的分块 ===")
+    request = project_routes.CreateUploadRequest(filename="重复.xlsx", size=len(xlsx_bytes))
+    upload_id = asyncio.run(project_routes.create_upload(project, request, None))["upload_id"]
+    half = len(xlsx_bytes) // 2
+
+    async def send_twice():
+        return await asyncio.gather(*[
+            project_routes.upload_chunk(
+                project, upload_id, 0, _body_request(xlsx_bytes[:1000], xlsx_bytes[1000:half]), None
+            )
+            for _ in range(2)
+        ], return_exceptions=True)
+
+    results = asyncio.run(send_twice())
+    print(results)
+    assert sum(isinstance(r, dict) for r in results) == 1
+    conflict = next(r for r in results if isinstance(r, HTTPException))
+    assert conflict.status_code == 409
+
+    # 客户端重试已成功的块
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(project_routes.upload_chunk(project, upload_id, 0, _body_request(xlsx_bytes[:half]), None))
+    assert exc.value.status_code == 409
+    assert asyncio.run(project_routes.get_upload(project, upload_id, None))["received"] == half
+
+    # 加锁前读取的会话已过期时，writer 按 .part 的实际大小拒绝
+    stale = {**project_routes.chunked_uploads.get(upload_id), "received": 0}
+    with pytest.raises(UploadConflictError):
+        project_routes.chunked_uploads.writer(stale, 0)
+
+    asyncio.run(project_routes.upload_chunk(project, upload_id, half, _body_request(xlsx_bytes[half:]), None))
+    result = asyncio.run(project_routes.complete_upload(project, upload_id, BackgroundTasks(), None))
+    assert open(result["path"], "rb").read() == xlsx_bytes
+    print("✅ 测试通过")
+
+
+def test_deleted_project_releases_blobs(project, xlsx_bytes):
+    """测试删除项目：仍被其他项目链接的 blob 保留，不再被引用的 blob 删除"""
+    print("\n=== Test 5: 删除项目回收 blob ===")
+    other = project_routes.project_manager.create_project("另一个项目").id
+    paths = []
+    for project_id in (project, other):
+        upload = UploadFile(io.BytesIO(xlsx_bytes), filename="凭证.xlsx", headers=Headers({}))
+        paths.append(asyncio.run(project_routes.upload_file(project_id, BackgroundTasks(), upload, None))["path"])
+    blob = project_routes.blob_store.blob_path(hashlib.sha256(xlsx_bytes).hexdigest())
+    assert project_routes.blob_store.linked_blobs(os.path.dirname(paths[0])) == [blob]
+
+    asyncio.run(project_routes.delete_project(project, None))
+    assert os.path.exists(blob) and open(paths[1], "rb").read() == xlsx_bytes
+
+    asyncio.run(project_routes.delete_project(other, None))
+    assert not os.path.exists(blob)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(project_routes.delete_project("..", None))
+    assert exc.value.status_code == 400
+    print("✅ 测试通过")